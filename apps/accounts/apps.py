@@ -8,4 +8,6 @@ class AccountsConfig(AppConfig):
 
     def ready(self):
         # Méto global de limpeza de arquivos
-        from apps.core.utils import file_cleanup
\ No newline at end of file
+        from apps.core.utils import file_cleanup
+        # Invalidação dos perfis montados pelo ProfileAssembler
+        import accounts.receivers
\ No newline at end of file
@@ -2,17 +2,61 @@
 """
 Módulo de Backend de Autenticação Customizado.
 
+O identificador de login é resolvido pelo seu formato: com '@' é e-mail,
+com dígitos (e sem '@') é WhatsApp. Assim roda uma única igualdade
+indexada: `UPPER(email)` (índice funcional em `auth_user`) ou `whatsapp`
+(índice único), em vez de um OR que vira varredura sequencial.
+
 Author: Dzaion
-Version: 0.3.0
+Version: 0.4.0
 """
 from __future__ import annotations
 import re
+from functools import lru_cache
+
 import phonenumbers
 from django.contrib.auth.backends import ModelBackend
-from django.db.models import Q
 from accounts.models import User
 
+
+@lru_cache(maxsize=4096)
+def normalize_login_phone(identifier: str) -> str | None:
+    """
+    Número de login em E.164 (sem DDI, assume +55), ou None se inválido.
+    Em cache: os mesmos números se repetem a cada tentativa de login.
+    """
+    cleaned_phone = re.sub(r'[^\d+]', '', identifier)
+    if not cleaned_phone.startswith('+'):
+        cleaned_phone = f"+55{cleaned_phone}"
+    try:
+        parsed_phone = phonenumbers.parse(cleaned_phone, None)
+    except phonenumbers.phonenumberutil.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(parsed_phone):
+        return None
+    return phonenumbers.format_number(parsed_phone, phonenumbers.PhoneNumberFormat.E164)
+
+
 class EmailOrWhatsAppBackend(ModelBackend):
+    @staticmethod
+    def lookup_user(login_identifier: str) -> User | None:
+        """Busca o usuário com uma única consulta, escolhida pelo formato do identificador."""
+        login_identifier = login_identifier.strip()
+        if '@' in login_identifier:
+            # `iexact` gera UPPER(email) = UPPER(%s), coberto pelo índice funcional.
+            lookup = {'email__iexact': login_identifier}
+        elif any(char.isdigit() for char in login_identifier):
+            whatsapp = normalize_login_phone(login_identifier)
+            if whatsapp is None:
+                return None
+            lookup = {'whatsapp': whatsapp}
+        else:
+            return None
+        try:
+            return User.objects.get(**lookup)
+        except (User.DoesNotExist, User.MultipleObjectsReturned):
+            return None
+
     def authenticate(self, request, username: str | None = None, password: str | None = None, **kwargs) -> User | None:
         """
         Autentica um usuário usando e-mail ou número de WhatsApp.
@@ -20,38 +64,17 @@ class EmailOrWhatsAppBackend(ModelBackend):
         do usuário é delegada para as camadas superiores (serializers).
         """
         login_identifier = kwargs.get(User.USERNAME_FIELD) or username
-        
+
         if not login_identifier or not password:
             return None
 
-        normalized_identifier = login_identifier
-        
-        if any(char.isdigit() for char in login_identifier) and '@' not in login_identifier:
-            try:
-                cleaned_phone = re.sub(r'[^\d+]', '', login_identifier)
-                if not cleaned_phone.startswith('+'):
-                    cleaned_phone = f"+55{cleaned_phone}"
-
-                parsed_phone = phonenumbers.parse(cleaned_phone, None)
-                if phonenumbers.is_valid_number(parsed_phone):
-                    normalized_identifier = phonenumbers.format_number(
-                        parsed_phone, phonenumbers.PhoneNumberFormat.E164
-                    )
-            except phonenumbers.phonenumberutil.NumberParseException:
-                pass
-        
-        try:
-            user = User.objects.get(
-                Q(email__iexact=normalized_identifier) | Q(whatsapp=normalized_identifier)
-            )
-            
-            # Retorna o usuário se a senha estiver correta, mesmo que ele esteja inativo.
-            if user.check_password(password):
-                return user
-                
-        except User.DoesNotExist:
+        user = self.lookup_user(login_identifier)
+        if user is None:
             return None
-            
+
+        # Retorna o usuário se a senha estiver correta, mesmo que ele esteja inativo.
+        if user.check_password(password):
+            return user
+
         # Retorna None se a senha estiver incorreta.
         return None
-
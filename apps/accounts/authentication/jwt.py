@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo da Autenticação JWT sem Estado.
+
+O `JWTAuthentication` do simplejwt lê o `User` do banco a cada requisição.
+Aqui, quando o token traz a claim `authz` com o carimbo de versão atual
+(uma leitura do cache), o usuário da requisição é montado a partir dela,
+sem consulta. Sem a claim, ou com o carimbo antigo, o caminho padrão do
+simplejwt é usado.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User
+from guards.services import GuardService
+from .tokens import AUTHZ_CLAIM
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Usuário da requisição a partir das claims do token. `pk`, `is_active`,
+    `bool(user)` e as claims de autorização (`authorization_claims`) não
+    tocam o banco; qualquer outro atributo (inclusive `isinstance`) carrega a
+    linha do User uma única vez e passa a se comportar como ele.
+    """
+
+    def __init__(self, user_id, claims: dict):
+        super().__init__(lambda: User.objects.get(pk=user_id))
+        # Escrito direto no __dict__: o __setattr__ do LazyObject repassaria ao objeto real.
+        self.__dict__.update({
+            'pk': user_id,
+            'id': user_id,
+            'is_active': claims['is_active'],
+            'is_authenticated': True,
+            'is_anonymous': False,
+            'authorization_claims': claims,
+        })
+
+    def __bool__(self):
+        # O LazyObject repassaria ao User (carregando-o); `request.user and ...`
+        # em IsAuthenticated e nas demais permissões só precisa saber que há um usuário.
+        return True
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Autenticação JWT que dispensa o banco enquanto as claims do token estão válidas.
+    """
+
+    def get_user(self, validated_token):
+        claims = validated_token.get(AUTHZ_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if (
+            not claims or user_id is None or api_settings.CHECK_REVOKE_TOKEN
+            or claims.get('version') != GuardService.get_user_version(user_id)
+        ):
+            # Token sem claims ou com papéis/vínculos alterados desde a emissão.
+            return super().get_user(validated_token)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not claims['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return ClaimsUser(User._meta.pk.to_python(user_id), claims)
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    """Mesmo esquema de segurança (Bearer JWT) na documentação OpenAPI."""
+    target_class = 'accounts.authentication.jwt.ClaimsJWTAuthentication'
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Tokens JWT com Claims de Autorização.
+
+O token de acesso carrega, na claim `authz`, o que a autenticação precisa
+para montar o usuário da requisição sem ler o banco:
+
+- `is_active`;
+- `version`: a versão do escopo do usuário no GuardService, incrementada
+  quando papéis globais, vínculos ou o próprio usuário mudam. Um carimbo
+  diferente do atual faz a autenticação voltar ao banco.
+
+Papéis e vínculos não vão no token: as permissões saem dos conjuntos
+compilados do GuardService (em cache, pela mesma versão) e o vínculo com o
+tenant da URL é resolvido uma vez por requisição em `get_tenant_context`.
+
+As claims vão só no token de acesso e são recalculadas a cada refresh.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from guards.services import GuardService
+
+AUTHZ_CLAIM = 'authz'
+
+
+class AuthorizationClaims:
+    """
+    Montagem das claims de autorização de um usuário.
+    """
+
+    @staticmethod
+    def for_user_id(user_id) -> dict | None:
+        """Claims atuais do usuário, ou None se o usuário não existe."""
+        # O carimbo é lido antes dos dados: uma mudança concorrente o torna antigo.
+        version = GuardService.get_user_version(user_id)
+        is_active = User.objects.filter(pk=user_id).values_list('is_active', flat=True).first()
+        if is_active is None:
+            return None
+        return {'is_active': is_active, 'version': version}
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token cujos tokens de acesso levam a claim `authz`, calculada no
+    momento em que o acesso é emitido (login ou refresh).
+    """
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        claims = AuthorizationClaims.for_user_id(self.payload.get(api_settings.USER_ID_CLAIM))
+        if claims is not None:
+            access[AUTHZ_CLAIM] = claims
+        return access
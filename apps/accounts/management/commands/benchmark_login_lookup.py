@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Comando para medir a resolução do identificador de login (e-mail ou
+WhatsApp) em uma tabela `auth_user` grande. Os usuários sintéticos são
+inseridos dentro de uma transação que é desfeita ao final.
+
+A inserção mantém locks em `auth_user` durante toda a medição: o comando só
+roda com DEBUG ligado ou com `--i-know-this-is-not-prod`.
+
+Uso:
+    python manage.py benchmark_login_lookup [--users 1000000] [--lookups 2000] [--drop-index]
+                                            [--i-know-this-is-not-prod]
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from accounts.authentication.backends import EmailOrWhatsAppBackend, normalize_login_phone
+from accounts.models import User
+
+INDEX_NAME = 'auth_user_email_upper_idx'
+
+
+class Command(BaseCommand):
+    help = "Compara a busca antiga (OR com iexact) com a busca por formato do identificador."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help="Usuários sintéticos a inserir.")
+        parser.add_argument('--lookups', type=int, default=2000, help="Buscas medidas por estratégia.")
+        parser.add_argument('--drop-index', action='store_true', help=f"Mede sem o índice {INDEX_NAME}.")
+        parser.add_argument(
+            '--i-know-this-is-not-prod', action='store_true', dest='not_prod',
+            help="Confirma que o banco não é de produção (necessário com DEBUG desligado).",
+        )
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options['not_prod']):
+            raise CommandError(
+                "O benchmark insere milhões de linhas em auth_user. Rode com DEBUG ligado "
+                "ou confirme com --i-know-this-is-not-prod."
+            )
+        if connection.vendor != 'postgresql':
+            raise CommandError("O benchmark requer PostgreSQL.")
+        users, lookups = options['users'], options['lookups']
+        sample = random.Random(42).sample(range(1, users + 1), min(lookups, users))
+        emails = [f"BENCH{n}@Example.invalid" for n in sample]
+        phones = [f"(11) 9{n:08d}" for n in sample]
+
+        with transaction.atomic():
+            self._insert_users(users)
+
+            if options['drop_index']:
+                # Linha de base sem o índice funcional (a remoção também é desfeita no rollback).
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+            self._explain("Antiga (OR, e-mail)", User.objects.filter(
+                Q(email__iexact=emails[0]) | Q(whatsapp=emails[0])
+            ))
+            self._explain("Nova (e-mail)", User.objects.filter(email__iexact=emails[0]))
+            self._explain("Nova (WhatsApp)", User.objects.filter(whatsapp=normalize_login_phone(phones[0])))
+
+            self._report("Antiga (OR, e-mail)", self._time(
+                lambda identifier: list(User.objects.filter(Q(email__iexact=identifier) | Q(whatsapp=identifier))),
+                emails,
+            ))
+            self._report("Nova (e-mail)", self._time(EmailOrWhatsAppBackend.lookup_user, emails))
+            normalize_login_phone.cache_clear()
+            self._report("Nova (WhatsApp, cache frio)", self._time(EmailOrWhatsAppBackend.lookup_user, phones))
+            self._report("Nova (WhatsApp, cache quente)", self._time(EmailOrWhatsAppBackend.lookup_user, phones))
+
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Concluído: os usuários sintéticos foram descartados (rollback)."))
+
+    def _insert_users(self, users: int):
+        self.stdout.write(f"Inserindo {users} usuários sintéticos...")
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {User._meta.db_table}
+                    (id, password, is_superuser, created_at, updated_at, name, cpf, email, whatsapp, is_staff, is_active)
+                SELECT gen_random_uuid(), '!', false, now(), now(), 'Benchmark ' || n,
+                       '9' || lpad(n::text, 10, '0'), 'bench' || n || '@example.invalid',
+                       '+55119' || lpad(n::text, 8, '0'), false, true
+                FROM generate_series(1, %s) AS n
+                ON CONFLICT DO NOTHING
+                """,
+                [users],
+            )
+            cursor.execute(f"ANALYZE {User._meta.db_table}")
+        self.stdout.write(f"Inseridos em {time.perf_counter() - started:.1f}s.")
+
+    @staticmethod
+    def _time(lookup, identifiers) -> list[float]:
+        durations = []
+        for identifier in identifiers:
+            started = time.perf_counter()
+            lookup(identifier)
+            durations.append((time.perf_counter() - started) * 1000)
+        return durations
+
+    def _report(self, label: str, durations: list[float]):
+        durations = sorted(durations)
+        p95 = durations[int(len(durations) * 0.95) - 1] if len(durations) >= 20 else durations[-1]
+        self.stdout.write(
+            f"{label}: média {statistics.mean(durations):.3f} ms, "
+            f"mediana {statistics.median(durations):.3f} ms, p95 {p95:.3f} ms"
+        )
+
+    def _explain(self, label: str, queryset):
+        self.stdout.write(f"{label}:")
+        for line in queryset.explain(analyze=True).splitlines():
+            self.stdout.write(f"    {line}")
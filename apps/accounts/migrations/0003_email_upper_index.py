@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:56
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda em transação, e não bloqueia as escritas em auth_user.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='auth_user_email_upper_idx'),
+        ),
+    ]
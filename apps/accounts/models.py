@@ -3,7 +3,7 @@
 Módulo de Modelos para o App 'accounts'.
 
 Author: Dzaion
-Version: 1.3.0
+Version: 1.4.0
 """
 from __future__ import annotations
 import re
@@ -15,6 +15,7 @@ from dateutil.relativedelta import relativedelta
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 from core.models import BaseModel
@@ -154,6 +155,10 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
         ordering = ['-created_at']
+        indexes = [
+            # Login por e-mail (`email__iexact` gera UPPER(email) = UPPER(%s)).
+            models.Index(Upper('email'), name='auth_user_email_upper_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.name and not self.nickname:
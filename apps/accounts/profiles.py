@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Montador de Perfil (`/me`) do App 'accounts'.
+
+O payload do `UserDetailSerializer` é o mais pesado que servimos (MeView e
+todo login). O `ProfileAssembler` o monta com um número fixo de consultas,
+independente da quantidade de tenants, e o guarda no cache do Django junto
+com um ETag. A entrada é validada por um token de versões:
+
+- versões do perfil, incrementadas pelos sinais em `accounts/receivers.py`
+  ('user:<id>' para dados do usuário, carteira pessoal e vínculos;
+  'tenant:<id>' para dados e carteira do tenant);
+- versões de permissões do GuardService (global, usuário e tenants).
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+from guards.services import GuardService
+from tenants.models import Tenant, TenantMembership
+from .models import User
+
+VERSION_KEY = 'accounts:profile:version:{}'
+PROFILE_KEY = 'accounts:profile:{}:{}'
+
+
+class ProfileAssembler:
+    """
+    Montagem, cache e invalidação do perfil completo do usuário.
+    """
+
+    @staticmethod
+    def get_profile(user: User, context: dict) -> dict:
+        """
+        `{'payload': dict, 'etag': str}` do usuário. Com o cache válido: três
+        leituras do cache e nenhuma consulta ao banco.
+        """
+        request = context.get('request')
+        # As URLs absolutas (foto) dependem do host da requisição.
+        key = PROFILE_KEY.format(user.pk, request.get_host() if request else '')
+        entry = cache.get(key)
+        if entry and entry['version'] == ProfileAssembler._get_version(user.pk, entry['tenant_ids']):
+            return {'payload': entry['payload'], 'etag': entry['etag']}
+
+        tenant_ids = [
+            str(tenant_id) for tenant_id in TenantMembership.objects.filter(
+                user=user, status=TenantMembership.MembershipStatus.ACTIVE
+            ).values_list('tenant_id', flat=True)
+        ]
+        # A versão é lida antes do restante dos dados: uma mudança concorrente invalida esta entrada.
+        version = ProfileAssembler._get_version(user.pk, tenant_ids)
+        payload = ProfileAssembler.assemble(user, tenant_ids, context)
+        etag = '"{}"'.format(hashlib.md5(json.dumps(payload, cls=JSONEncoder, sort_keys=True).encode()).hexdigest())
+        cache.set(
+            key, {'version': version, 'tenant_ids': tenant_ids, 'payload': payload, 'etag': etag},
+            settings.ACCOUNTS_PROFILE_CACHE['TIMEOUT'],
+        )
+        return {'payload': payload, 'etag': etag}
+
+    @staticmethod
+    def assemble(user: User, tenant_ids: list, context: dict) -> dict:
+        """
+        Payload do `UserDetailSerializer` com consultas fixas: permissões
+        globais, carteira pessoal, tenants, carteiras dos tenants e (sem
+        cache) a compilação conjunta das permissões por tenant.
+        """
+        from .serializers import UserDetailSerializer
+
+        prefetch_related_objects([user], 'wallet')
+        tenants = list(Tenant.objects.filter(pk__in=tenant_ids).prefetch_related('wallet')) if tenant_ids else []
+        return UserDetailSerializer(user, context={**context, 'profile_tenants': tenants}).data
+
+    @staticmethod
+    def _get_version(user_id, tenant_ids: list) -> str:
+        """Token das versões do perfil e das permissões do usuário e dos seus tenants."""
+        scopes = [f"user:{user_id}"] + [f"tenant:{tenant_id}" for tenant_id in tenant_ids]
+        keys = [VERSION_KEY.format(scope) for scope in scopes]
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                cache.add(key, uuid.uuid4().hex, None)
+                versions[key] = cache.get(key)
+        permission_versions = GuardService.get_versions(user_id, [None, *tenant_ids])
+        token = '.'.join([versions[key] for key in keys] + list(permission_versions.values()))
+        return hashlib.md5(token.encode()).hexdigest()
+
+    @staticmethod
+    def bump_version(scope: str):
+        """Invalida os perfis de um escopo: 'user:<id>' ou 'tenant:<id>'."""
+        cache.set(VERSION_KEY.format(scope), uuid.uuid4().hex, None)
+
+    @staticmethod
+    def bump_after_commit(scope: str):
+        transaction.on_commit(lambda: ProfileAssembler.bump_version(scope))
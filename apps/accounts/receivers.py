@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Receivers (Ouvintes de Sinais) para o App 'accounts'.
+
+Invalida os perfis montados pelo ProfileAssembler (`/me` e login) quando
+algo do payload muda. As mudanças de permissões por papéis já entram no
+token de versão pelo GuardService.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from finances.models import Wallet
+from tenants.models import Tenant, TenantMembership
+from .models import User
+from .profiles import ProfileAssembler
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_profile(sender, instance: User, update_fields=None, **kwargs):
+    # O login atualiza só o `last_login`, que não faz parte do perfil.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    ProfileAssembler.bump_after_commit(f"user:{instance.pk}")
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """Permissões diretas do usuário (entram em `global_permissions`)."""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            ProfileAssembler.bump_after_commit(f"user:{instance.pk}")
+        return
+    if action == 'pre_clear':
+        instance._accounts_cleared_user_ids = set(instance.user_set.values_list('pk', flat=True))
+        return
+    user_ids = pk_set or set()
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_accounts_cleared_user_ids', set())
+    for user_id in user_ids:
+        ProfileAssembler.bump_after_commit(f"user:{user_id}")
+
+
+@receiver(post_save, sender=TenantMembership)
+@receiver(post_delete, sender=TenantMembership)
+def invalidate_membership_profile(sender, instance: TenantMembership, **kwargs):
+    ProfileAssembler.bump_after_commit(f"user:{instance.user_id}")
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_profiles(sender, instance: Tenant, **kwargs):
+    ProfileAssembler.bump_after_commit(f"tenant:{instance.pk}")
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def invalidate_wallet_profile(sender, instance: Wallet, **kwargs):
+    if instance.tenant_id:
+        ProfileAssembler.bump_after_commit(f"tenant:{instance.tenant_id}")
+    elif instance.user_id:
+        ProfileAssembler.bump_after_commit(f"user:{instance.user_id}")
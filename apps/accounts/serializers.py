@@ -3,7 +3,7 @@
 Módulo de Serializers para o App 'accounts'.
 
 Author: Dzaion
-Version: 1.4.0
+Version: 1.7.0
 """
 from datetime import timedelta
 from django.contrib.auth import authenticate
@@ -12,14 +12,15 @@ from django.contrib.auth.models import Permission
 from django.db.models import Q
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.settings import api_settings
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from accounts.authentication.tokens import ClaimsRefreshToken
 from accounts.models import User
 from finances.models import Wallet
 from guards.services import GuardService
 from finances.serializers import WalletSummarySerializer
+from .profiles import ProfileAssembler
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
@@ -52,23 +53,20 @@ class UserDetailSerializer(serializers.ModelSerializer):
         """
         Retorna apenas as permissões que o usuário possui em um contexto global.
         """
-        if user.is_superuser:
-            return sorted([
-                f"{p.content_type.app_label}.{p.codename}"
-                for p in Permission.objects.all()
-            ])
-
-        global_roles = user.roles.filter(tenant__isnull=True)
-        permissions_from_roles = Permission.objects.filter(role__in=global_roles)
-        direct_permissions = user.user_permissions.all()
-        
-        all_perms = (permissions_from_roles | direct_permissions).distinct().select_related('content_type')
-        
-        return sorted([f"{p.content_type.app_label}.{p.codename}" for p in all_perms])
+        permissions = Permission.objects.all()
+        if not user.is_superuser:
+            # Papéis globais e permissões diretas, em uma única consulta.
+            permissions = permissions.filter(
+                Q(role__users=user, role__tenant__isnull=True) | Q(user=user)
+            ).distinct()
+        return sorted(
+            f"{app_label}.{codename}"
+            for app_label, codename in permissions.values_list('content_type__app_label', 'codename')
+        )
 
     def get_personal_wallet(self, user: User) -> dict | None:
-        """Retorna a carteira pessoal do usuário."""
-        wallet = user.wallet.first()
+        """Retorna a carteira pessoal do usuário (usa o prefetch de `wallet`, se houver)."""
+        wallet = next(iter(user.wallet.all()), None)
         if wallet:
             return WalletSummarySerializer(wallet).data
         return None
@@ -76,24 +74,33 @@ class UserDetailSerializer(serializers.ModelSerializer):
     def get_tenants(self, user: User) -> list[dict]:
         """
         Retorna uma lista dos Tenants aos quais o usuário é membro, incluindo
-        as permissões e carteiras contextuais de cada um.
+        as permissões e carteiras contextuais de cada um. O `ProfileAssembler`
+        entrega os tenants já com as carteiras em `context['profile_tenants']`.
         """
         from tenants.serializers import TenantDetailForUserSerializer
         from tenants.models import Tenant
 
-        tenant_ids = user.memberships.filter(status='ACTIVE').values_list('tenant_id', flat=True)
-        tenants_qs = Tenant.objects.filter(id__in=list(tenant_ids))
+        tenants = self.context.get('profile_tenants')
+        if tenants is None:
+            tenants = list(Tenant.objects.filter(
+                members__user=user, members__status='ACTIVE'
+            ).prefetch_related('wallet'))
 
         context = self.context.copy()
         context['user'] = user
+        # As permissões de todos os tenants de uma vez, em vez de uma consulta por tenant.
+        context['tenant_permissions'] = GuardService.permissions_for_tenants(user, tenants)
         
-        return TenantDetailForUserSerializer(tenants_qs, many=True, context=context).data
+        return TenantDetailForUserSerializer(tenants, many=True, context=context).data
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Serializer de autenticação que retorna o objeto completo do usuário.
+    Os tokens de acesso levam as claims de autorização (ver `ClaimsRefreshToken`).
     """
+    token_class = ClaimsRefreshToken
+
     def validate(self, attrs):
         email_or_whatsapp = attrs.get(self.username_field)
         password = attrs.get('password')
@@ -122,13 +129,13 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         self.user = user
         
         remember_me = self.context['request'].data.get('rememberMe', False)
-        refresh = RefreshToken.for_user(self.user)
+        refresh = self.get_token(self.user)
         if remember_me:
             refresh.set_exp(lifetime=timedelta(days=180))
         else:
             refresh.set_exp(lifetime=api_settings.REFRESH_TOKEN_LIFETIME)
 
-        user_data = UserDetailSerializer(self.user, context=self.context).data
+        user_data = ProfileAssembler.get_profile(self.user, self.context)['payload']
         data = {
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -138,6 +145,11 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh que emite o novo token de acesso com as claims de autorização atuais."""
+    token_class = ClaimsRefreshToken
+
+
 class UserRegisterSerializer(serializers.ModelSerializer):
     """Serializer para o registro de novos usuários."""
     email = serializers.EmailField(help_text="Endereço de e-mail único. Será usado para login.")
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do App 'accounts'.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import Permission
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from finances.models import Wallet
+from guards.models import Role
+from guards.permissions import HasTenantPermission
+from guards.services import GuardService
+from locations.models import Country, Location, State
+from tenants.models import Tenant, TenantMembership
+from .authentication.backends import EmailOrWhatsAppBackend
+from .authentication.jwt import ClaimsUser
+from .authentication.tokens import AUTHZ_CLAIM, ClaimsRefreshToken
+from .models import User
+from .permissions import IsActiveUser
+from .views import MeView
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class GuardedView(views.APIView):
+    permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
+    required_permission = 'guards.view_role'
+
+    def get(self, request, *args, **kwargs):
+        return Response({'user': str(request.user.pk)})
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ClaimsJWTAuthenticationTests(TestCase):
+    """Com as claims em dia e o cache quente, a requisição autenticada não consulta o banco."""
+
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Usuário', cpf='00000000191', email='user@example.invalid', whatsapp='+5511999990001',
+            is_active=True,
+        )
+        role = Role.objects.create(name='Suporte')
+        role.permissions.add(Permission.objects.get(content_type__app_label='guards', codename='view_role'))
+        self.user.roles.add(role)
+        self.token = ClaimsRefreshToken.for_user(self.user).access_token
+        self.view = GuardedView.as_view()
+
+    def get(self, view=None):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return (view or self.view)(request)
+
+    def test_token_carries_only_the_claims_that_are_read(self):
+        self.assertEqual(set(self.token[AUTHZ_CLAIM]), {'is_active', 'version'})
+
+    def test_default_permission_classes_do_not_query(self):
+        self.get()
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'user': str(self.user.pk)})
+
+    def test_denied_permission_does_not_query(self):
+        view = type('DeleteView', (GuardedView,), {'required_permission': 'guards.delete_role'}).as_view()
+        self.get(view)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(view).status_code, 403)
+
+    def test_claims_user_is_truthy_without_loading(self):
+        user = ClaimsUser(self.user.pk, {'is_active': True, 'version': 'v'})
+        with self.assertNumQueries(0):
+            self.assertTrue(user)
+            self.assertEqual(user.pk, self.user.pk)
+
+    def test_stale_claims_fall_back_to_the_database(self):
+        GuardService.bump_version(f"user:{self.user.pk}")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('"auth_user"' in query['sql'] for query in queries.captured_queries))
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class MeViewTests(TestCase):
+    """O `/me` quente sai do cache, com ETag que muda junto com o payload."""
+
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Usuário', cpf='00000000191', email='user@example.invalid', whatsapp='+5511999990001',
+            is_active=True,
+        )
+        self.wallet = Wallet.objects.get(user=self.user)  # criada pelo receiver de `finances`
+        self.token = ClaimsRefreshToken.for_user(self.user).access_token
+        self.view = MeView.as_view()
+
+    def get(self, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            request = APIRequestFactory().get('/me/', HTTP_AUTHORIZATION=f"Bearer {self.token}", **headers)
+            return self.view(request)
+
+    def change(self, callback):
+        with self.captureOnCommitCallbacks(execute=True):
+            callback()
+
+    def test_warm_profile_does_not_query(self):
+        cold = self.get()
+        with self.assertNumQueries(0):
+            warm = self.get()
+        self.assertEqual(warm.status_code, 200)
+        self.assertEqual(warm.data, cold.data)
+        self.assertEqual(warm['ETag'], cold['ETag'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=f"W/{etag}")
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_wallet_debit_changes_the_etag(self):
+        etag = self.get()['ETag']
+        self.wallet.balance = Decimal('4.00')
+        self.change(lambda: self.wallet.save(update_fields=['balance']))
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_membership_change_changes_the_etag(self):
+        state = State.objects.create(country=Country.objects.create(name='Brasil'), name='São Paulo')
+        tenant = Tenant.objects.create(
+            owner=self.user, financial_contact=self.user, legal_name='Tenant de Teste', name='Tenant de Teste',
+            slug='tenant-de-teste', document='12345678000199', type='PJ', street='Rua A', number='1',
+            neighborhood='Centro', postal_code='01000-000',
+            location=Location.objects.create(state=state, city='São Paulo'),
+        )
+        etag = self.get()['ETag']
+        self.change(lambda: TenantMembership.objects.create(
+            user=self.user, tenant=tenant, role=Role.objects.create(name='Membro'),
+            status=TenantMembership.MembershipStatus.ACTIVE,
+        ))
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class LoginLookupTests(TestCase):
+    """O identificador de login é resolvido pelo formato, com uma única consulta."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            name='Usuário', cpf='00000000191', email='user@example.invalid', whatsapp='+5511999990001',
+        )
+
+    def test_email_is_case_insensitive(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(EmailOrWhatsAppBackend.lookup_user('  USER@Example.invalid '), self.user)
+
+    def test_phone_is_normalized(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(EmailOrWhatsAppBackend.lookup_user('(11) 99999-0001'), self.user)
+
+    def test_invalid_phone_does_not_query(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(EmailOrWhatsAppBackend.lookup_user('12345'))
+            self.assertIsNone(EmailOrWhatsAppBackend.lookup_user('usuario'))
+
+    def test_ambiguous_email_returns_none(self):
+        User.objects.create(
+            name='Homônimo', cpf='00000000272', email='USER@example.invalid', whatsapp='+5511999990002',
+        )
+        self.assertIsNone(EmailOrWhatsAppBackend.lookup_user('user@example.invalid'))
+
+
+class BenchmarkLoginLookupTests(SimpleTestCase):
+
+    @override_settings(DEBUG=False)
+    def test_refuses_to_run_outside_debug(self):
+        with self.assertRaisesMessage(CommandError, '--i-know-this-is-not-prod'):
+            call_command('benchmark_login_lookup', users=1, lookups=1)
@@ -3,7 +3,7 @@
 Módulo de Views (Controladores) para o App 'accounts'.
 
 Author: Dzaion
-Version: 1.3.2
+Version: 1.4.0
 """
 from django.db import transaction
 from drf_spectacular.utils import (extend_schema, extend_schema_view,
@@ -18,6 +18,7 @@ from allauth.socialaccount.providers.oauth2.client import OAuth2Client
 from dj_rest_auth.registration.views import SocialLoginView
 
 from .permissions import IsActiveUser
+from .profiles import ProfileAssembler
 from .serializers import (ChangePasswordSerializer,
                           CustomTokenObtainPairSerializer,
                           UserDetailSerializer, UserPhotoSerializer,
@@ -81,7 +82,8 @@ class RegisterView(generics.CreateAPIView):
 @extend_schema_view(
     get=extend_schema(
         summary="Obter Dados do Usuário Logado ('/me')",
-        description="Retorna as informações detalhadas do usuário autenticado.",
+        description="Retorna as informações detalhadas do usuário autenticado. "
+                    "Envia `ETag`; com `If-None-Match` igual, responde 304 sem corpo.",
         tags=["Contas e Autenticação"]
     ),
     put=extend_schema(
@@ -114,6 +116,15 @@ class MeView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def retrieve(self, request, *args, **kwargs):
+        """Perfil montado (e cacheado) pelo ProfileAssembler, com suporte a ETag."""
+        profile = ProfileAssembler.get_profile(request.user, self.get_serializer_context())
+        headers = {'ETag': profile['etag']}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if profile['etag'] in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(profile['payload'], headers=headers)
+
     def get_serializer_class(self):
         """
         Retorna o serializer apropriado com base no método da requisição.
@@ -0,0 +1,30 @@
+"""
+redis_client.py
+----------------
+Utilitário para obter uma conexão compartilhada com o Redis.
+
+Uso:
+1. Importe `get_redis_client` no módulo que precisa de estruturas do Redis
+   (contadores, listas, locks) que não cabem no cache do Django.
+2. A conexão é criada uma única vez por processo e reutilizada.
+"""
+
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> redis.Redis:
+    """Retorna um cliente Redis (com pool de conexões) para o processo atual."""
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+@lru_cache(maxsize=1)
+def get_broker_client() -> redis.Redis:
+    """
+    Retorna um cliente para o Redis usado como broker do Celery,
+    para leituras de monitoramento (ex: tamanho das filas com LLEN).
+    """
+    return redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
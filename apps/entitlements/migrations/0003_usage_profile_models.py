@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0007_model_cascade'),
+        ('entitlements', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dzaionusageprofile',
+            name='model_for_messaging',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messaging_profiles', to='dzaion.aimodel', verbose_name='Modelo de IA para Conversa'),
+        ),
+        migrations.AddField(
+            model_name='dzaionusageprofile',
+            name='model_for_services',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services_profiles', to='dzaion.aimodel', verbose_name='Modelo de IA para Tarefas'),
+        ),
+        migrations.AddField(
+            model_name='dzaionusageprofile',
+            name='service_tier',
+            field=models.CharField(choices=[('auto', 'Automático'), ('default', 'Padrão'), ('flex', 'Flexível (mais barato, mais lento)'), ('priority', 'Prioritário')], default='auto', help_text='O nível de processamento solicitado ao provedor de IA (service_tier).', max_length=10, verbose_name='Nível de Serviço'),
+        ),
+    ]
@@ -7,7 +7,7 @@ dos Tenants e Usuários aos serviços da plataforma, como Assinaturas
 de Módulos e Perfis de Uso da IA.
 
 Author: Dzaion
-Version: 0.1.0
+Version: 0.2.0
 """
 from django.conf import settings
 from django.db import models
@@ -16,8 +16,7 @@ from django.db.models import Q
 from core.models import BaseModel
 from products.models import ProductPlan
 from tenants.models import Tenant
-# TODO: Descomentar a linha abaixo quando o modelo AIModel for criado.
-# from dzaion.models import AIModel
+from dzaion.models import AIModel
 
 
 class Subscription(BaseModel):
@@ -103,6 +102,12 @@ class DzaionUsageProfile(BaseModel):
     """
     O perfil que define os termos comerciais e de configuração para o uso do Dzaion IA.
     """
+    class ServiceTier(models.TextChoices):
+        AUTO = 'auto', 'Automático'
+        DEFAULT = 'default', 'Padrão'
+        FLEX = 'flex', 'Flexível (mais barato, mais lento)'
+        PRIORITY = 'priority', 'Prioritário'
+
     tenant = models.ForeignKey(
         Tenant,
         on_delete=models.CASCADE,
@@ -129,21 +134,27 @@ class DzaionUsageProfile(BaseModel):
         verbose_name='Limite de Crédito (R$)',
         help_text='O limite de gastos. Nulo significa ilimitado.'
     )
-    # TODO: Descomentar os campos abaixo quando o modelo AIModel for criado.
-    # model_for_messaging = models.ForeignKey(
-    #     AIModel,
-    #     on_delete=models.SET_NULL,
-    #     null=True, blank=True,
-    #     related_name='messaging_profiles',
-    #     verbose_name='Modelo de IA para Conversa'
-    # )
-    # model_for_services = models.ForeignKey(
-    #     AIModel,
-    #     on_delete=models.SET_NULL,
-    #     null=True, blank=True,
-    #     related_name='services_profiles',
-    #     verbose_name='Modelo de IA para Tarefas'
-    # )
+    model_for_messaging = models.ForeignKey(
+        AIModel,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='messaging_profiles',
+        verbose_name='Modelo de IA para Conversa'
+    )
+    model_for_services = models.ForeignKey(
+        AIModel,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='services_profiles',
+        verbose_name='Modelo de IA para Tarefas'
+    )
+    service_tier = models.CharField(
+        max_length=10,
+        choices=ServiceTier.choices,
+        default=ServiceTier.AUTO,
+        verbose_name='Nível de Serviço',
+        help_text='O nível de processamento solicitado ao provedor de IA (service_tier).'
+    )
 
     class Meta:
         verbose_name = 'Perfil de Uso da IA'
@@ -6,23 +6,22 @@ Contém os endpoints da API para que os Tenants possam gerenciar
 suas assinaturas de módulos (Subscriptions).
 
 Author: Dzaion
-Version: 0.1.0
+Version: 0.2.0
 """
 from datetime import date
 from dateutil.relativedelta import relativedelta
-from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema
 
+from guards.mixins import TenantContextMixin
 from guards.permissions import HasTenantPermission
-from tenants.models import Tenant
 from .models import Subscription
 from .serializers import SubscriptionSerializer, SubscriptionCreateSerializer
 
 @extend_schema(summary="Listar e Assinar Módulos para um Tenant", tags=["Assinaturas (Entitlements)"])
-class SubscriptionListCreateAPIView(generics.ListCreateAPIView):
+class SubscriptionListCreateAPIView(TenantContextMixin, generics.ListCreateAPIView):
     """
     Endpoint para listar as assinaturas de um Tenant e para
     criar uma nova assinatura (comprar um módulo).
@@ -40,7 +39,7 @@ class SubscriptionListCreateAPIView(generics.ListCreateAPIView):
         return SubscriptionSerializer
 
     def perform_create(self, serializer):
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
+        tenant = self.tenant
         plan = serializer.validated_data['plan_id']
         today = date.today()
         
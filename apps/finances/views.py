@@ -3,7 +3,7 @@
 Módulo de Views (Controladores) para o App 'finances'.
 
 Author: Dzaion
-Version: 0.3.0
+Version: 0.4.0
 """
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status, views
@@ -12,8 +12,8 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 
 from accounts.permissions import IsActiveUser
+from guards.mixins import TenantContextMixin
 from guards.permissions import HasTenantPermission
-from tenants.models import Tenant
 from .models import Transaction, Invoice
 from .serializers import (
     WalletSummarySerializer, TransactionSerializer, 
@@ -41,22 +41,20 @@ class MyTransactionListView(generics.ListAPIView):
 # --- Views para Finanças da Empresa (Tenant) ---
 
 @extend_schema(summary="Obter a Carteira de um Tenant", tags=["Finanças do Tenant"])
-class TenantWalletView(generics.RetrieveAPIView):
+class TenantWalletView(TenantContextMixin, generics.RetrieveAPIView):
     serializer_class = WalletSummarySerializer
     permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
     required_permission = 'finances.view_wallet'
     def get_object(self):
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
-        return tenant.wallet.first()
+        return self.tenant.wallet.first()
 
 @extend_schema(summary="Listar Transações de um Tenant (Extrato)", tags=["Finanças do Tenant"])
-class TenantTransactionListView(generics.ListAPIView):
+class TenantTransactionListView(TenantContextMixin, generics.ListAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
     required_permission = 'finances.view_transaction'
     def get_queryset(self):
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
-        tenant_wallet = tenant.wallet.first()
+        tenant_wallet = self.tenant.wallet.first()
         return Transaction.objects.filter(wallet=tenant_wallet).order_by('-processed_at') if tenant_wallet else Transaction.objects.none()
 
 @extend_schema(summary="Listar Faturas de um Tenant", tags=["Finanças do Tenant"])
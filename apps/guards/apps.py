@@ -5,3 +5,9 @@ class GuardsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'guards'
     verbose_name = 'Permissões'
+
+    def ready(self):
+        """
+        Importa os receivers (invalidação dos conjuntos de permissões compilados).
+        """
+        import guards.receivers
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Bitmaps de Permissões do App 'guards'.
+
+Cada Permission (via `PermissionBit`) e cada DzaionAction (`bit_index`)
+tem um índice de bit estável. Cada Role guarda os bitmaps pré-calculados
+das suas permissões e ações como listas de palavras de 64 bits (BIGINT do
+PostgreSQL, com sinal), reconstruídos pelos sinais de M2M. As permissões
+efetivas de um usuário são o OR dos bitmaps dos seus papéis, e "quem pode
+fazer X" vira um teste de bit na própria tabela de papéis.
+
+Author: Dzaion
+Version: 0.1.2
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Q
+
+from dzaion.models import DzaionAction
+from .models import PermissionBit, Role
+
+WORD_BITS = 64
+NAMES_KEY = 'guards:perms:bit_names'
+ALLOCATION_ATTEMPTS = 5
+
+
+class PermissionBitmap:
+    """
+    Codificação dos bitmaps e manutenção dos índices e dos bitmaps dos papéis.
+    """
+
+    # --- Codificação ---
+
+    @staticmethod
+    def encode(bit_indexes) -> list[int]:
+        """Índices de bits -> palavras de 64 bits com sinal (formato do BIGINT)."""
+        return PermissionBitmap.to_words(sum(1 << index for index in set(bit_indexes)))
+
+    @staticmethod
+    def to_words(value: int) -> list[int]:
+        words = []
+        while value:
+            word = value & ((1 << WORD_BITS) - 1)
+            words.append(word - (1 << WORD_BITS) if word >= 1 << (WORD_BITS - 1) else word)
+            value >>= WORD_BITS
+        return words
+
+    @staticmethod
+    def to_int(words) -> int:
+        """Palavras com sinal -> um único inteiro do Python (para o OR entre papéis)."""
+        value = 0
+        for position, word in enumerate(words or ()):
+            value |= (word & ((1 << WORD_BITS) - 1)) << (position * WORD_BITS)
+        return value
+
+    @staticmethod
+    def bit_indexes(value: int) -> list[int]:
+        indexes, position = [], 0
+        while value:
+            if value & 1:
+                indexes.append(position)
+            value >>= 1
+            position += 1
+        return indexes
+
+    @staticmethod
+    def word_and_mask(bit_index: int) -> tuple[int, int]:
+        """Palavra e máscara (com sinal) de um bit, para testes no banco."""
+        word, offset = divmod(bit_index, WORD_BITS)
+        mask = 1 << offset
+        return word, mask - (1 << WORD_BITS) if offset == WORD_BITS - 1 else mask
+
+    @staticmethod
+    def roles_with_bit(field: str, bit_index: int):
+        """
+        Papéis cujo bitmap (`permission_bits` ou `action_bits`) tem o bit ligado.
+        Sem índice: nenhum índice do PostgreSQL atende `bitand`, e o teste roda
+        sobre `guards_role` (poucas linhas, uma por papel), não sobre usuários.
+        """
+        word, mask = PermissionBitmap.word_and_mask(bit_index)
+        # Fora do tamanho do array, o PostgreSQL devolve NULL: o papel não tem o bit.
+        return Role.objects.alias(word=F(f"{field}__{word}").bitand(mask)).filter(Q(word__gt=0) | Q(word__lt=0))
+
+    # --- Nomes dos bits ---
+
+    @staticmethod
+    def decode(value: int, kind: str) -> frozenset:
+        """Bitmap -> `app_label.codename` (kind='permissions') ou `verb_code` (kind='actions')."""
+        indexes = PermissionBitmap.bit_indexes(value)
+        names = PermissionBitmap.get_bit_names()[kind]
+        if any(index not in names for index in indexes):
+            # Bit atribuído depois que os nomes foram guardados em cache.
+            names = PermissionBitmap.get_bit_names(refresh=True)[kind]
+        return frozenset(names[index] for index in indexes if index in names)
+
+    @staticmethod
+    def get_bit_names(refresh: bool = False) -> dict:
+        """`{'permissions': {bit: 'app_label.codename'}, 'actions': {bit: verb_code}}`, em cache."""
+        names = None if refresh else cache.get(NAMES_KEY)
+        if names is None:
+            names = {
+                'permissions': {
+                    bit_index: f"{app_label}.{codename}"
+                    for bit_index, app_label, codename in PermissionBit.objects.values_list(
+                        'bit_index', 'permission__content_type__app_label', 'permission__codename'
+                    )
+                },
+                'actions': dict(
+                    DzaionAction.objects.filter(bit_index__isnull=False).values_list('bit_index', 'verb_code')
+                ),
+            }
+            cache.set(NAMES_KEY, names, None)
+        return names
+
+    @staticmethod
+    def forget_bit_names():
+        """
+        Descarta os nomes em cache. Chamado também a cada novo índice: nomes
+        guardados por uma transação desfeita apontariam o índice reaproveitado
+        para a permissão (ou ação) errada, e `decode` só relê índices ausentes.
+        """
+        cache.delete(NAMES_KEY)
+
+    # --- Índices ---
+
+    @staticmethod
+    def permission_bits(permission_ids) -> dict:
+        """`{permission_id: bit_index}`, atribuindo índices às permissões que ainda não têm."""
+        permission_ids = set(permission_ids)
+        for _ in range(ALLOCATION_ATTEMPTS):
+            bits = dict(PermissionBit.objects.filter(permission_id__in=permission_ids).values_list('permission_id', 'bit_index'))
+            missing = sorted(permission_ids - set(bits))
+            if not missing:
+                return bits
+            try:
+                with transaction.atomic():
+                    start = PermissionBit.objects.aggregate(top=Max('bit_index'))['top']
+                    start = 0 if start is None else start + 1
+                    PermissionBit.objects.bulk_create([
+                        PermissionBit(permission_id=permission_id, bit_index=start + offset)
+                        for offset, permission_id in enumerate(missing)
+                    ])
+                PermissionBitmap.forget_bit_names()
+            except IntegrityError:
+                # Outra transação atribuiu os mesmos índices; relê e tenta de novo.
+                continue
+        raise RuntimeError("Não foi possível atribuir índices de bit às permissões.")
+
+    @staticmethod
+    def action_bits(action_ids) -> dict:
+        """`{action_id: bit_index}`, atribuindo índices às ações que ainda não têm."""
+        action_ids = set(action_ids)
+        for _ in range(ALLOCATION_ATTEMPTS):
+            bits = dict(DzaionAction.objects.filter(pk__in=action_ids, bit_index__isnull=False).values_list('pk', 'bit_index'))
+            missing = sorted(action_ids - set(bits), key=str)
+            if not missing:
+                return bits
+            try:
+                with transaction.atomic():
+                    start = DzaionAction.objects.aggregate(top=Max('bit_index'))['top']
+                    start = 0 if start is None else start + 1
+                    for offset, action_id in enumerate(missing):
+                        DzaionAction.objects.filter(pk=action_id, bit_index__isnull=True).update(bit_index=start + offset)
+                PermissionBitmap.forget_bit_names()
+            except IntegrityError:
+                continue
+        raise RuntimeError("Não foi possível atribuir índices de bit às ações da IA.")
+
+    # --- Bitmaps dos papéis ---
+
+    @staticmethod
+    def rebuild_role(role_id):
+        """
+        Recalcula os bitmaps de um papel a partir das suas M2M. O lock na linha
+        do papel serializa reconstruções concorrentes do mesmo papel.
+        """
+        with transaction.atomic():
+            if not Role.objects.select_for_update().filter(pk=role_id).exists():
+                return
+            permission_ids = Role.permissions.through.objects.filter(role_id=role_id).values_list('permission_id', flat=True)
+            action_ids = Role.dzaion_actions.through.objects.filter(role_id=role_id).values_list('dzaionaction_id', flat=True)
+            Role.objects.filter(pk=role_id).update(
+                permission_bits=PermissionBitmap.encode(PermissionBitmap.permission_bits(permission_ids).values()),
+                action_bits=PermissionBitmap.encode(PermissionBitmap.action_bits(action_ids).values()),
+            )
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Comando para (re)construir a tabela materializada de permissões efetivas
+(`EffectivePermission`), em lotes de usuários.
+
+Uso:
+    python manage.py rebuild_effective_permissions [--chunk-size 500] [--user <id>]
+
+Author: Dzaion
+Version: 0.1.0
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from guards.models import EffectivePermission
+from guards.services import GuardService
+from tenants.models import TenantMembership
+
+
+class Command(BaseCommand):
+    help = "Recalcula EffectivePermission a partir dos papéis e vínculos, aplicando só a diferença."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Usuários por lote (uma transação por lote).")
+        parser.add_argument('--user', default=None, help="Recalcula apenas este usuário.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(pk=options['user'])
+
+        processed = created = deleted = 0
+        chunk = []
+        for user_id in users.values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(user_id)
+            if len(chunk) == chunk_size:
+                chunk_created, chunk_deleted = self._rebuild(chunk)
+                processed, created, deleted = processed + len(chunk), created + chunk_created, deleted + chunk_deleted
+                self.stdout.write(f"{processed} usuários processados...")
+                chunk = []
+        if chunk:
+            chunk_created, chunk_deleted = self._rebuild(chunk)
+            processed, created, deleted = processed + len(chunk), created + chunk_created, deleted + chunk_deleted
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {processed} usuários, {created} permissões criadas, {deleted} removidas."
+        ))
+
+    @staticmethod
+    def _rebuild(user_ids) -> tuple[int, int]:
+        """Todos os pares do lote: os vínculos (de qualquer status) e as linhas já materializadas."""
+        with transaction.atomic():
+            pairs = set(TenantMembership.objects.filter(user_id__in=user_ids).values_list('user_id', 'tenant_id'))
+            pairs |= set(
+                EffectivePermission.objects.filter(user_id__in=user_ids).values_list('user_id', 'tenant_id').distinct()
+            )
+            return GuardService.refresh_effective_permissions(pairs)
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:51
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('guards', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='role',
+            name='action_bits',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='Bitmap de Ações da IA'),
+        ),
+        migrations.AddField(
+            model_name='role',
+            name='permission_bits',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='Bitmap de Permissões'),
+        ),
+        migrations.CreateModel(
+            name='PermissionBit',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('bit_index', models.PositiveIntegerField(unique=True, verbose_name='Índice do Bit')),
+                ('permission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bit', to='auth.permission', verbose_name='Permissão')),
+            ],
+            options={
+                'verbose_name': 'Bit de Permissão',
+                'verbose_name_plural': 'Bits de Permissões',
+                'ordering': ['bit_index'],
+            },
+        ),
+    ]
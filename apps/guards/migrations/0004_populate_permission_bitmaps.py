@@ -0,0 +1,58 @@
+# Atribui índices de bit às permissões e ações já concedidas e calcula os
+# bitmaps dos papéis existentes (ver guards/bitmaps.py).
+
+from django.db import migrations
+
+WORD_BITS = 64
+
+
+def _encode(bit_indexes):
+    value = sum(1 << index for index in set(bit_indexes))
+    words = []
+    while value:
+        word = value & ((1 << WORD_BITS) - 1)
+        words.append(word - (1 << WORD_BITS) if word >= 1 << (WORD_BITS - 1) else word)
+        value >>= WORD_BITS
+    return words
+
+
+def populate_bitmaps(apps, schema_editor):
+    Role = apps.get_model('guards', 'Role')
+    PermissionBit = apps.get_model('guards', 'PermissionBit')
+    DzaionAction = apps.get_model('dzaion', 'DzaionAction')
+
+    permission_ids = sorted(set(Role.permissions.through.objects.values_list('permission_id', flat=True)))
+    PermissionBit.objects.bulk_create([
+        PermissionBit(permission_id=permission_id, bit_index=index)
+        for index, permission_id in enumerate(permission_ids)
+    ])
+    permission_bits = dict(zip(permission_ids, range(len(permission_ids))))
+
+    action_bits = {}
+    for index, action in enumerate(DzaionAction.objects.order_by('created_at', 'pk')):
+        action.bit_index = index
+        action.save(update_fields=['bit_index'])
+        action_bits[action.pk] = index
+
+    for role in Role.objects.all():
+        role.permission_bits = _encode(
+            permission_bits[permission_id]
+            for permission_id in Role.permissions.through.objects.filter(role_id=role.pk).values_list('permission_id', flat=True)
+        )
+        role.action_bits = _encode(
+            action_bits[action_id]
+            for action_id in Role.dzaion_actions.through.objects.filter(role_id=role.pk).values_list('dzaionaction_id', flat=True)
+        )
+        role.save(update_fields=['permission_bits', 'action_bits'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0012_action_bit_index'),
+        ('guards', '0003_role_permission_bitmaps'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:53
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guards', '0004_populate_permission_bitmaps'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('codename', models.CharField(help_text='No formato "app_label.codename" (ex: "finances.view_invoice").', max_length=255, verbose_name='Permissão')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to='tenants.tenant', verbose_name='Inquilino (Tenant)')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Permissão Efetiva',
+                'verbose_name_plural': 'Permissões Efetivas',
+                'indexes': [models.Index(fields=['user', 'codename'], name='guards_effperm_user_code_idx'), models.Index(fields=['tenant', 'codename'], name='guards_effperm_tenant_code_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'tenant', 'codename'), name='unique_effective_permission')],
+            },
+        ),
+    ]
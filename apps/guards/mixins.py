@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Mixins de Views para o App 'guards'.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+from django.http import Http404
+
+from tenants.models import Tenant
+from .services import GuardService
+
+
+class TenantContextMixin:
+    """
+    Para views no contexto de um Tenant (`<tenant_pk>` na URL): expõe o
+    tenant, o vínculo e o papel do usuário, resolvidos uma única vez por
+    requisição (o mesmo contexto usado pelo `HasTenantPermission`), e os
+    repassa aos serializers em `context['tenant_context']`.
+    """
+    tenant_url_kwarg = 'tenant_pk'
+
+    def get_tenant_context(self) -> dict:
+        tenant_context = GuardService.get_tenant_context(self.request, self.kwargs[self.tenant_url_kwarg])
+        if tenant_context is None:
+            raise Http404("Inquilino não encontrado.")
+        return tenant_context
+
+    @property
+    def tenant(self) -> Tenant:
+        return self.get_tenant_context()['tenant']
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.tenant_url_kwarg in self.kwargs:
+            context['tenant_context'] = self.get_tenant_context()
+        return context
@@ -3,11 +3,13 @@
 Módulo de Modelos para o App 'guards'.
 
 Author: Dzaion
-Version: 0.3.0
+Version: 0.5.0
 """
+from django.conf import settings
 from django.db import models
 from django.db.models import Q
 from django.contrib.auth.models import Permission
+from django.contrib.postgres.fields import ArrayField
 
 from core.models import BaseModel
 # DZAION-FIX: Removidas as importações diretas para quebrar o ciclo de importação.
@@ -51,6 +53,18 @@ class Role(BaseModel):
         verbose_name='É um Papel de Administrador?',
         help_text='Se marcado, concede acesso administrativo total no contexto do seu Tenant.'
     )
+    # Bitmaps pré-calculados (palavras de 64 bits) das permissões e ações do papel,
+    # mantidos pelos sinais de M2M em guards/receivers.py.
+    permission_bits = ArrayField(
+        models.BigIntegerField(),
+        default=list, blank=True, editable=False,
+        verbose_name='Bitmap de Permissões'
+    )
+    action_bits = ArrayField(
+        models.BigIntegerField(),
+        default=list, blank=True, editable=False,
+        verbose_name='Bitmap de Ações da IA'
+    )
 
     class Meta:
         verbose_name = 'Papel (Role)'
@@ -73,3 +87,65 @@ class Role(BaseModel):
             return f"{self.name} ({self.tenant.name})"
         return f"{self.name} (Global)"
 
+
+class PermissionBit(BaseModel):
+    """
+    Índice estável de uma Permission nos bitmaps dos papéis. Os índices são
+    atribuídos em ordem crescente e nunca reaproveitados.
+    """
+    permission = models.OneToOneField(
+        Permission,
+        on_delete=models.CASCADE,
+        related_name='bit',
+        verbose_name='Permissão'
+    )
+    bit_index = models.PositiveIntegerField(unique=True, verbose_name='Índice do Bit')
+
+    class Meta:
+        verbose_name = 'Bit de Permissão'
+        verbose_name_plural = 'Bits de Permissões'
+        ordering = ['bit_index']
+
+    def __str__(self):
+        return f"{self.bit_index}: {self.permission.codename}"
+
+
+class EffectivePermission(BaseModel):
+    """
+    Tabela materializada das permissões efetivas (papéis globais + papel do
+    vínculo ATIVO) de cada usuário em cada tenant, para que querysets filtrem
+    por capacidade com um JOIN (ex: "tenants onde posso ver faturas").
+    Mantida incrementalmente pelos sinais em guards/receivers.py e
+    reconstruível pelo comando `rebuild_effective_permissions`.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='effective_permissions',
+        verbose_name='Usuário'
+    )
+    tenant = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.CASCADE,
+        related_name='effective_permissions',
+        verbose_name='Inquilino (Tenant)'
+    )
+    codename = models.CharField(
+        max_length=255,
+        verbose_name='Permissão',
+        help_text='No formato "app_label.codename" (ex: "finances.view_invoice").'
+    )
+
+    class Meta:
+        verbose_name = 'Permissão Efetiva'
+        verbose_name_plural = 'Permissões Efetivas'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'tenant', 'codename'], name='unique_effective_permission')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'codename'], name='guards_effperm_user_code_idx'),
+            models.Index(fields=['tenant', 'codename'], name='guards_effperm_tenant_code_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.tenant_id}: {self.codename}"
@@ -6,10 +6,9 @@ Estas classes são usadas nas Views do DRF para proteger os endpoints
 utilizando a lógica centralizada no GuardService.
 
 Author: Dzaion
-Version: 0.1.0
+Version: 0.3.0
 """
 from rest_framework.permissions import BasePermission
-from tenants.models import Tenant
 from .services import GuardService
 
 
@@ -19,7 +18,8 @@ class HasTenantPermission(BasePermission):
     específico, seja em um contexto global ou de tenant.
 
     A view que utiliza esta permissão DEVE definir um atributo de classe:
-    `required_permission = 'app_label.codename'`
+    `required_permission = 'app_label.codename'`, ou uma lista/tupla de
+    códigos quando a ação exige todos eles (uma única decisão compilada).
     """
     message = "Você não tem permissão para realizar esta ação."
 
@@ -43,14 +43,17 @@ class HasTenantPermission(BasePermission):
         # Isso permite proteger URLs como /api/tenants/<tenant_id>/invoices/
         tenant_id = view.kwargs.get('tenant_id') or view.kwargs.get('tenant_pk')
         if tenant_id:
-            try:
-                # Busca o objeto Tenant para passar como contexto ao GuardService.
-                tenant = Tenant.objects.get(pk=tenant_id)
-            except Tenant.DoesNotExist:
+            # Resolve o tenant (e o vínculo do usuário) uma única vez por requisição;
+            # a view e os serializers reaproveitam o mesmo contexto.
+            tenant_context = GuardService.get_tenant_context(request, tenant_id)
+            if tenant_context is None:
                 # Se o tenant da URL não existe, nega o acesso.
                 return False
+            tenant = tenant_context['tenant']
 
         # Delega a verificação final para o nosso serviço centralizado.
+        if isinstance(permission_code, (list, tuple)):
+            return all(GuardService.user_has_permissions(user, permission_code, tenant).values())
         return GuardService.user_has_permission(
             user=user,
             permission_code=permission_code,
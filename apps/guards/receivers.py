@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Receivers (Ouvintes de Sinais) para o App 'guards'.
+
+Invalida os conjuntos de permissões compilados pelo GuardService sempre que
+algo que os compõe muda, incrementando a versão do escopo afetado:
+
+- permissões/ações de um papel: o tenant do papel (ou 'global');
+- papéis globais de um usuário e vínculos com tenants: o usuário;
+- ações da IA (verb_code): 'global';
+- o próprio usuário (ex: `is_active`, embutido nos tokens de acesso): o usuário.
+
+As mudanças nas M2M de um papel também reconstroem os seus bitmaps
+(`guards/bitmaps.py`) na mesma transação, e as linhas afetadas de
+`EffectivePermission` são recalculadas: na própria transação até
+`ASYNC_THRESHOLD` pares (usuário, tenant); acima disso (ex: papel global com
+milhares de membros), pela tarefa `guards.refresh_effective_permissions`,
+em lotes, após o commit. As assinaturas (app 'entitlements')
+concedem e revogam permissões pelas M2M dos papéis e chegam aqui por elas.
+
+Author: Dzaion
+Version: 0.5.0
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from dzaion.models import DzaionAction
+from tenants.models import TenantMembership
+from .bitmaps import PermissionBitmap
+from .models import Role
+from .services import GuardService
+
+M2M_ACTIONS = ('post_add', 'post_remove', 'post_clear', 'pre_clear')
+
+
+def _bump_after_commit(scope: str):
+    """A versão muda só depois do commit: uma leitura concorrente não recompila dados antigos."""
+    transaction.on_commit(lambda: GuardService.bump_version(scope))
+
+
+def _role_scope(role: Role) -> str:
+    return f"tenant:{role.tenant_id}" if role.tenant_id else 'global'
+
+
+def _refresh_effective(sender, user_ids=None, role_ids=None):
+    """Recalcula `EffectivePermission` dos pares afetados (as ações da IA não entram na tabela)."""
+    if sender is Role.dzaion_actions.through:
+        return
+    pairs = GuardService.effective_permission_pairs(user_ids, role_ids)
+    if len(pairs) <= settings.GUARDS_EFFECTIVE_PERMISSIONS['ASYNC_THRESHOLD']:
+        GuardService.refresh_effective_permissions(pairs)
+        return
+    from .tasks import refresh_effective_permissions
+
+    user_ids = [str(user_id) for user_id in user_ids or ()]
+    role_ids = [str(role_id) for role_id in role_ids or ()]
+    transaction.on_commit(lambda: refresh_effective_permissions.delay(user_ids, role_ids))
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+@receiver(m2m_changed, sender=Role.dzaion_actions.through)
+def invalidate_role_grants(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Permissões ou ações de um papel mudaram. Pelo lado reverso
+    (`permission.role_set.add(...)`), `pk_set` traz os papéis afetados.
+    """
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            PermissionBitmap.rebuild_role(instance.pk)
+            _refresh_effective(sender, role_ids=[instance.pk])
+        _bump_after_commit(_role_scope(instance))
+        return
+    if action == 'pre_clear':
+        # Guarda os papéis afetados para reconstruí-los no 'post_clear'.
+        instance._guards_cleared_role_ids = set(instance.role_set.values_list('pk', flat=True))
+        return
+    role_ids = pk_set or set()
+    if action == 'post_clear':
+        role_ids = getattr(instance, '_guards_cleared_role_ids', set())
+    for role_id in role_ids:
+        PermissionBitmap.rebuild_role(role_id)
+    _refresh_effective(sender, role_ids=role_ids)
+    for scope in {_role_scope(role) for role in Role.objects.filter(pk__in=role_ids)}:
+        _bump_after_commit(scope)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def invalidate_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Papéis de um usuário mudaram (`user.roles` ou, pelo lado reverso, `role.users`)."""
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            _refresh_effective(sender, user_ids=[instance.pk])
+        _bump_after_commit(f"user:{instance.pk}")
+        return
+    if action == 'pre_clear':
+        # Guarda os usuários afetados para recalculá-los no 'post_clear'.
+        instance._guards_cleared_user_ids = set(instance.users.values_list('pk', flat=True))
+        return
+    user_ids = pk_set or set()
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_guards_cleared_user_ids', set())
+    _refresh_effective(sender, user_ids=user_ids)
+    for user_id in user_ids:
+        _bump_after_commit(f"user:{user_id}")
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance: User, update_fields=None, **kwargs):
+    """Usuário salvo. O login atualiza só o `last_login`, que não entra nas claims."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _bump_after_commit(f"user:{instance.pk}")
+
+
+@receiver(post_save, sender=TenantMembership)
+@receiver(post_delete, sender=TenantMembership)
+def invalidate_membership(sender, instance: TenantMembership, **kwargs):
+    """Vínculo criado, alterado (papel, status) ou removido."""
+    GuardService.refresh_effective_permissions([(instance.user_id, instance.tenant_id)])
+    _bump_after_commit(f"user:{instance.user_id}")
+
+
+@receiver(pre_delete, sender=Role)
+def remember_role_users(sender, instance: Role, **kwargs):
+    """A exclusão de um papel global remove `user.roles` sem sinais: guarda os usuários antes."""
+    if instance.tenant_id is None:
+        instance._guards_user_ids = set(instance.users.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_role(sender, instance: Role, **kwargs):
+    """Papel salvo ou removido (a exclusão leva junto os vínculos M2M, sem sinais)."""
+    if kwargs.get('signal') is post_delete and getattr(instance, '_guards_user_ids', None):
+        _refresh_effective(sender, user_ids=instance._guards_user_ids)
+    _bump_after_commit(_role_scope(instance))
+
+
+@receiver(post_save, sender=DzaionAction)
+@receiver(post_delete, sender=DzaionAction)
+def invalidate_dzaion_action(sender, instance: DzaionAction, **kwargs):
+    transaction.on_commit(PermissionBitmap.forget_bit_names)
+    _bump_after_commit('global')
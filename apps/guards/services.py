@@ -6,15 +6,51 @@ Este arquivo contém a classe GuardService, que é o único ponto de entrada
 para toda a lógica de verificação de permissões no ecossistema.
 Ele abstrai a complexidade de consolidar papéis globais e de tenant.
 
+As permissões de cada par (usuário, tenant) são compiladas em conjuntos
+imutáveis (`app_label.codename` e `verb_code`) e guardadas em dois níveis:
+um LRU local do processo e o cache do Django (Redis). As chaves incluem
+versões por escopo (global, tenant, usuário), incrementadas pelos sinais
+em `guards/receivers.py`; uma verificação com o cache quente não consulta
+o banco. A compilação em si combina os bitmaps pré-calculados dos papéis
+(`guards/bitmaps.py`).
+
+As mesmas permissões ficam materializadas em `EffectivePermission`, para
+filtros por capacidade direto nos querysets.
+
 Author: Dzaion
-Version: 0.2.0
+Version: 0.8.0
 """
+import uuid
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
 from django.contrib.auth.models import Permission
-from django.db.models import QuerySet, Q
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
 
 from accounts.models import User
 from dzaion.models import DzaionAction
 from tenants.models import Tenant, TenantMembership
+from .bitmaps import PermissionBitmap
+from .models import EffectivePermission, PermissionBit
+
+VERSION_KEY = 'guards:perms:version:{}'
+COMPILED_KEY = 'guards:perms:compiled:{}:{}:{}'
+
+
+@lru_cache(maxsize=settings.GUARDS_PERMISSION_CACHE['LOCAL_MAXSIZE'])
+def _load_compiled(user_id: str, tenant_id: str | None, version: str) -> dict:
+    """
+    Nível local (LRU do processo). A versão faz parte da chave: uma entrada
+    invalidada nunca mais é pedida e sai do LRU pelo uso.
+    """
+    key = COMPILED_KEY.format(user_id, tenant_id or 'global', version)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = GuardService.compile_permissions(user_id, tenant_id)
+        cache.set(key, compiled, settings.GUARDS_PERMISSION_CACHE['TIMEOUT'])
+    return compiled
 
 
 class GuardService:
@@ -22,6 +58,130 @@ class GuardService:
     Serviço que centraliza toda a lógica de Controle de Acesso Baseado em Papéis (RBAC).
     """
 
+    # --- Conjuntos compilados e versões ---
+
+    @staticmethod
+    def compile_permissions(user_id, tenant_id=None) -> dict:
+        """
+        Consolida os papéis globais do usuário e o papel do seu vínculo ATIVO
+        com o tenant em `{'permissions': frozenset, 'actions': frozenset}`.
+        """
+        return GuardService.compile_permissions_for_tenants(user_id, [tenant_id])[tenant_id]
+
+    @staticmethod
+    def compile_permissions_for_tenants(user_id, tenant_ids: list) -> dict:
+        """
+        Compila de uma vez os conjuntos do usuário em vários tenants (None: só
+        os papéis globais), com as mesmas duas consultas de um único tenant.
+        """
+        # Bitmaps pré-calculados de cada papel (ver guards/bitmaps.py): o OR
+        # entre os papéis substitui as junções com as tabelas de permissões.
+        global_permissions = global_actions = 0
+        for permission_bits, action_bits in User.roles.through.objects.filter(
+            user_id=user_id, role__tenant__isnull=True
+        ).values_list('role__permission_bits', 'role__action_bits'):
+            global_permissions |= PermissionBitmap.to_int(permission_bits)
+            global_actions |= PermissionBitmap.to_int(action_bits)
+
+        membership_bits = {}
+        if any(tenant_ids):
+            membership_bits = {
+                str(tenant_id): (PermissionBitmap.to_int(permission_bits), PermissionBitmap.to_int(action_bits))
+                for tenant_id, permission_bits, action_bits in TenantMembership.objects.filter(
+                    user_id=user_id, tenant_id__in=[tenant_id for tenant_id in tenant_ids if tenant_id],
+                    status=TenantMembership.MembershipStatus.ACTIVE,
+                ).values_list('tenant_id', 'role__permission_bits', 'role__action_bits')
+            }
+
+        compiled = {}
+        for tenant_id in tenant_ids:
+            tenant_permissions, tenant_actions = membership_bits.get(str(tenant_id), (0, 0)) if tenant_id else (0, 0)
+            compiled[tenant_id] = {
+                'permissions': PermissionBitmap.decode(global_permissions | tenant_permissions, 'permissions'),
+                'actions': PermissionBitmap.decode(global_actions | tenant_actions, 'actions'),
+            }
+        return compiled
+
+    @staticmethod
+    def get_compiled_permissions(user: User, tenant: Tenant | None = None) -> dict:
+        """
+        Conjuntos compilados do usuário no contexto do tenant: uma leitura das
+        versões no cache e, com o LRU local quente, nenhuma consulta ao banco.
+        """
+        tenant_id = str(tenant.pk) if tenant else None
+        return _load_compiled(str(user.pk), tenant_id, GuardService.get_versions(user.pk, [tenant_id])[tenant_id])
+
+    @staticmethod
+    def get_versions(user_id, tenant_ids: list) -> dict:
+        """Versão combinada (global, usuário, tenant) de cada tenant, em uma única leitura do cache."""
+        scopes = ['global', f"user:{user_id}"] + [f"tenant:{tenant_id}" for tenant_id in tenant_ids if tenant_id]
+        keys = [VERSION_KEY.format(scope) for scope in scopes]
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Versão ausente (cache novo ou expurgado): nasce com um valor novo, nunca reaproveitado.
+                cache.add(key, uuid.uuid4().hex, None)
+                versions[key] = cache.get(key)
+        base = f"{versions[keys[0]]}.{versions[keys[1]]}"
+        return {
+            tenant_id: f"{base}.{versions[VERSION_KEY.format(f'tenant:{tenant_id}')]}" if tenant_id else base
+            for tenant_id in tenant_ids
+        }
+
+    @staticmethod
+    def get_user_version(user_id) -> str:
+        """
+        Versão do escopo do usuário (papéis globais, vínculos e o próprio
+        usuário): o carimbo das claims dos tokens de acesso.
+        """
+        key = VERSION_KEY.format(f"user:{user_id}")
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def bump_version(scope: str):
+        """
+        Invalida os conjuntos compilados de um escopo: 'global', 'tenant:<id>'
+        ou 'user:<id>'.
+        """
+        cache.set(VERSION_KEY.format(scope), uuid.uuid4().hex, None)
+
+    # --- Contexto de tenant da requisição ---
+
+    @staticmethod
+    def get_tenant_context(request, tenant_id) -> dict | None:
+        """
+        Resolve uma única vez por requisição o tenant da URL e o vínculo ATIVO
+        do usuário com ele, em `{'tenant', 'membership', 'role'}`, guardado em
+        `request.tenant_context` para permissões, views e serializers.
+        Retorna None se o tenant não existe.
+        """
+        context = getattr(request, 'tenant_context', None)
+        if context is not None and str(context['tenant'].pk) == str(tenant_id):
+            return context
+
+        membership = None
+        if request.user and request.user.is_authenticated:
+            # O vínculo traz o tenant e o papel na mesma consulta.
+            membership = TenantMembership.objects.select_related('tenant', 'role').filter(
+                tenant_id=tenant_id, user_id=request.user.pk, status=TenantMembership.MembershipStatus.ACTIVE
+            ).first()
+        tenant = membership.tenant if membership else Tenant.objects.filter(pk=tenant_id).first()
+        if tenant is None:
+            return None
+
+        request.tenant_context = {
+            'tenant': tenant,
+            'membership': membership,
+            'role': membership.role if membership else None,
+        }
+        return request.tenant_context
+
+    # --- Consultas ---
+
     @staticmethod
     def get_user_permissions(user: User, tenant: Tenant | None = None) -> QuerySet[Permission]:
         """
@@ -36,10 +196,10 @@ class GuardService:
                 role_ids.add(membership.role.id)
             except TenantMembership.DoesNotExist:
                 pass
-        
+
         if not role_ids:
             return Permission.objects.none()
-        
+
         # DZAION-FIX: Corrigida a consulta para usar a relação reversa 'role_set'.
         return Permission.objects.filter(role__id__in=list(role_ids)).distinct()
 
@@ -47,38 +207,155 @@ class GuardService:
     def get_user_dzaion_actions(user: User, tenant: Tenant | None = None) -> QuerySet[DzaionAction]:
         """
         Consolida e retorna um queryset de todas as capacidades da IA (DzaionAction)
-        que um usuário possui.
+        que um usuário possui, a partir do conjunto compilado (uma única consulta).
         """
-        role_ids = set(user.roles.filter(tenant__isnull=True).values_list('id', flat=True))
+        verb_codes = GuardService.get_compiled_permissions(user, tenant)['actions']
+        if not verb_codes:
+            return DzaionAction.objects.none()
+        return DzaionAction.objects.filter(verb_code__in=verb_codes)
 
-        if tenant:
-            try:
-                membership = TenantMembership.objects.get(user=user, tenant=tenant, status='ACTIVE')
-                role_ids.add(membership.role.id)
-            except TenantMembership.DoesNotExist:
-                pass
+    @staticmethod
+    def user_has_permissions(user: User, permission_codes, tenant: Tenant | None = None) -> dict[str, bool]:
+        """
+        Várias decisões de uma vez (ex: flags de capacidade da interface), a
+        partir de um único conjunto compilado: `{código: bool}`.
+        """
+        permissions = GuardService.get_compiled_permissions(user, tenant)['permissions']
+        return {code: code in permissions for code in permission_codes}
 
-        if not role_ids:
-            return DzaionAction.objects.none()
+    @staticmethod
+    def permissions_for_tenants(user: User, tenants) -> dict:
+        """
+        Conjuntos compilados do usuário em cada tenant, `{tenant_id: {'permissions',
+        'actions'}}`: uma leitura das versões, uma dos conjuntos e, para os que
+        não estiverem em cache, uma única compilação conjunta.
+        """
+        tenant_ids = [str(tenant.pk) for tenant in tenants]
+        if not tenant_ids:
+            return {}
+        versions = GuardService.get_versions(user.pk, tenant_ids)
+        keys = {tenant_id: COMPILED_KEY.format(user.pk, tenant_id, versions[tenant_id]) for tenant_id in tenant_ids}
+        cached = cache.get_many(list(keys.values()))
+        result = {tenant_id: cached[key] for tenant_id, key in keys.items() if key in cached}
 
-        # DZAION-FIX: Corrigida a consulta para usar a relação reversa 'role_set'.
-        return DzaionAction.objects.filter(role__id__in=list(role_ids)).distinct()
+        missing = [tenant_id for tenant_id in tenant_ids if tenant_id not in result]
+        if missing:
+            compiled = GuardService.compile_permissions_for_tenants(user.pk, missing)
+            cache.set_many(
+                {keys[tenant_id]: compiled[tenant_id] for tenant_id in missing},
+                settings.GUARDS_PERMISSION_CACHE['TIMEOUT'],
+            )
+            result.update(compiled)
+        return result
 
     @staticmethod
     def user_has_permission(user: User, permission_code: str, tenant: Tenant | None = None) -> bool:
         """
         Verifica de forma rápida e eficiente se um usuário possui uma permissão específica.
         """
-        try:
-            app_label, codename = permission_code.split('.')
-        except (ValueError, AttributeError):
+        if not isinstance(permission_code, str) or permission_code.count('.') != 1:
             return False
+        return permission_code in GuardService.get_compiled_permissions(user, tenant)['permissions']
+
+    @staticmethod
+    def members_with_permission(tenant: Tenant, permission_code: str) -> QuerySet[User]:
+        """
+        Usuários com vínculo ATIVO no tenant que possuem a permissão (pelo papel
+        do vínculo ou por um papel global), em uma única consulta: o teste de
+        bit é feito sobre os bitmaps dos papéis, sem junção com as permissões.
+        """
+        if not isinstance(permission_code, str) or permission_code.count('.') != 1:
+            return User.objects.none()
+        app_label, codename = permission_code.split('.')
+        bit_index = PermissionBit.objects.filter(
+            permission__content_type__app_label=app_label, permission__codename=codename
+        ).values_list('bit_index', flat=True).first()
+        if bit_index is None:
+            # Permissão nunca atribuída a nenhum papel.
+            return User.objects.none()
+
+        roles = PermissionBitmap.roles_with_bit('permission_bits', bit_index)
+        return User.objects.filter(
+            Q(memberships__tenant=tenant, memberships__status=TenantMembership.MembershipStatus.ACTIVE)
+            & (Q(memberships__role__in=roles) | Q(roles__in=roles.filter(tenant__isnull=True)))
+        ).distinct()
 
-        # Agora esta chamada utiliza a lógica corrigida.
-        user_permissions = GuardService.get_user_permissions(user, tenant)
-        
-        return user_permissions.filter(
-            content_type__app_label=app_label,
-            codename=codename
-        ).exists()
+    # --- Permissões efetivas materializadas ---
 
+    @staticmethod
+    def tenants_with_permission(user: User, permission_code: str) -> QuerySet[Tenant]:
+        """Tenants em que o usuário tem a permissão: um JOIN com `EffectivePermission`."""
+        return Tenant.objects.filter(effective_permissions__user=user, effective_permissions__codename=permission_code)
+
+    @staticmethod
+    def refresh_effective_permissions(pairs) -> tuple[int, int]:
+        """
+        Recalcula as linhas de `EffectivePermission` dos pares (user_id, tenant_id),
+        aplicando apenas a diferença. Sem vínculo ATIVO, o par fica sem linhas.
+        Retorna (criadas, removidas).
+        """
+        tenants_by_user = defaultdict(set)
+        for user_id, tenant_id in pairs:
+            tenants_by_user[str(user_id)].add(str(tenant_id))
+        if not tenants_by_user:
+            return 0, 0
+
+        tenant_ids = set().union(*tenants_by_user.values())
+        active = {
+            (str(user_id), str(tenant_id))
+            for user_id, tenant_id in TenantMembership.objects.filter(
+                user_id__in=tenants_by_user, tenant_id__in=tenant_ids,
+                status=TenantMembership.MembershipStatus.ACTIVE,
+            ).values_list('user_id', 'tenant_id')
+        }
+        existing = defaultdict(set)
+        for user_id, tenant_id, codename in EffectivePermission.objects.filter(
+            user_id__in=tenants_by_user, tenant_id__in=tenant_ids
+        ).values_list('user_id', 'tenant_id', 'codename'):
+            existing[(str(user_id), str(tenant_id))].add(codename)
+
+        to_create, to_delete = [], Q()
+        for user_id, user_tenant_ids in tenants_by_user.items():
+            active_tenant_ids = [tenant_id for tenant_id in user_tenant_ids if (user_id, tenant_id) in active]
+            compiled = GuardService.compile_permissions_for_tenants(user_id, active_tenant_ids) if active_tenant_ids else {}
+            for tenant_id in user_tenant_ids:
+                desired = compiled[tenant_id]['permissions'] if tenant_id in compiled else frozenset()
+                current = existing.get((user_id, tenant_id), set())
+                to_create.extend(
+                    EffectivePermission(user_id=user_id, tenant_id=tenant_id, codename=codename)
+                    for codename in desired - current
+                )
+                if current - desired:
+                    to_delete |= Q(user_id=user_id, tenant_id=tenant_id, codename__in=current - desired)
+
+        if to_create:
+            EffectivePermission.objects.bulk_create(to_create, ignore_conflicts=True)
+        deleted = EffectivePermission.objects.filter(to_delete).delete()[0] if to_delete else 0
+        return len(to_create), deleted
+
+    @staticmethod
+    def effective_permission_pairs(user_ids=None, role_ids=None) -> set:
+        """
+        Pares (user_id, tenant_id) afetados por uma mudança: os vínculos ATIVOS
+        dos usuários e os de quem recebe os papéis (de tenant, pelo vínculo;
+        globais, em todos os seus vínculos).
+        """
+        user_ids = {str(user_id) for user_id in user_ids or ()}
+        membership_filter = Q()
+        if role_ids:
+            user_ids |= {
+                str(user_id) for user_id in User.roles.through.objects.filter(
+                    role_id__in=role_ids, role__tenant__isnull=True
+                ).values_list('user_id', flat=True)
+            }
+            membership_filter |= Q(role_id__in=role_ids)
+        if user_ids:
+            membership_filter |= Q(user_id__in=user_ids)
+        if not membership_filter:
+            return set()
+        return {
+            (str(user_id), str(tenant_id))
+            for user_id, tenant_id in TenantMembership.objects.filter(
+                membership_filter, status=TenantMembership.MembershipStatus.ACTIVE
+            ).values_list('user_id', 'tenant_id')
+        }
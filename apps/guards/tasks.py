@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Tarefas Assíncronas (Celery) para o App 'guards'.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+
+from .services import GuardService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="guards.refresh_effective_permissions")
+def refresh_effective_permissions(user_ids: list[str] | None = None, role_ids: list[str] | None = None):
+    """
+    Recalcula `EffectivePermission` depois de uma mudança que atinge muitos
+    pares (usuário, tenant), como alterar as permissões de um papel global.
+    Os pares são recalculados a partir do estado atual, em lotes de
+    `CHUNK_SIZE` (uma transação por lote).
+    """
+    pairs = sorted(GuardService.effective_permission_pairs(user_ids, role_ids))
+    chunk_size = settings.GUARDS_EFFECTIVE_PERMISSIONS['CHUNK_SIZE']
+    created = deleted = 0
+    for start in range(0, len(pairs), chunk_size):
+        with transaction.atomic():
+            chunk_created, chunk_deleted = GuardService.refresh_effective_permissions(pairs[start:start + chunk_size])
+        created, deleted = created + chunk_created, deleted + chunk_deleted
+    logger.info(f"Permissões efetivas de {len(pairs)} par(es) recalculadas: {created} criadas, {deleted} removidas.")
@@ -1,3 +1,364 @@
-from django.test import TestCase
+# -*- coding: utf-8 -*-
+"""
+Testes do App 'guards'.
 
-# Create your tests here.
+Author: Dzaion
+Version: 0.3.0
+"""
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from finances.views import TenantWalletView
+from locations.models import Country, Location, State
+from tenants.models import Tenant, TenantMembership
+from . import receivers, services
+from .bitmaps import NAMES_KEY, WORD_BITS, PermissionBitmap
+from .models import PermissionBit, Role
+from .permissions import HasTenantPermission
+from .services import GuardService
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_user(index: int) -> User:
+    return User.objects.create(
+        name=f"Usuário {index}", cpf=f"{index:011d}", email=f"user{index}@example.invalid",
+        whatsapp=f"+55119{index:08d}",
+    )
+
+
+def create_tenant(owner: User, index: int = 1) -> Tenant:
+    state = State.objects.create(country=Country.objects.create(name='Brasil'), name='São Paulo')
+    return Tenant.objects.create(
+        owner=owner, financial_contact=owner, legal_name=f"Tenant de Teste {index}", name=f"Tenant de Teste {index}",
+        slug=f"tenant-de-teste-{index}", document=f"{index:014d}", type='PJ', street='Rua A', number='1',
+        neighborhood='Centro', postal_code='01000-000',
+        location=Location.objects.create(state=state, city='São Paulo'),
+    )
+
+
+@override_settings(GUARDS_EFFECTIVE_PERMISSIONS={'ASYNC_THRESHOLD': 2, 'CHUNK_SIZE': 2})
+class EffectivePermissionRefreshTests(SimpleTestCase):
+    """Mudanças grandes saem do sinal para uma tarefa em lotes, após o commit."""
+
+    def test_small_change_is_refreshed_inside_the_signal(self):
+        pairs = {('u1', 't1'), ('u2', 't1')}
+        with mock.patch.object(receivers.GuardService, 'effective_permission_pairs', return_value=pairs), \
+                mock.patch.object(receivers.GuardService, 'refresh_effective_permissions') as refresh, \
+                mock.patch.object(receivers.transaction, 'on_commit') as on_commit:
+            receivers._refresh_effective(Role.permissions.through, role_ids=['r1'])
+        refresh.assert_called_once_with(pairs)
+        on_commit.assert_not_called()
+
+    def test_large_change_is_deferred_to_a_task(self):
+        pairs = {('u1', 't1'), ('u2', 't1'), ('u3', 't1')}
+        with mock.patch.object(receivers.GuardService, 'effective_permission_pairs', return_value=pairs), \
+                mock.patch.object(receivers.GuardService, 'refresh_effective_permissions') as refresh, \
+                mock.patch.object(receivers.transaction, 'on_commit', side_effect=lambda func: func()), \
+                mock.patch('guards.tasks.refresh_effective_permissions.delay') as delay:
+            receivers._refresh_effective(Role.permissions.through, role_ids=['r1'])
+        refresh.assert_not_called()
+        delay.assert_called_once_with([], ['r1'])
+
+    def test_task_refreshes_in_chunks(self):
+        from .tasks import refresh_effective_permissions
+
+        pairs = {('u1', 't1'), ('u2', 't1'), ('u3', 't1')}
+        with mock.patch('guards.tasks.GuardService.effective_permission_pairs', return_value=pairs), \
+                mock.patch('guards.tasks.GuardService.refresh_effective_permissions', return_value=(1, 0)) as refresh, \
+                mock.patch('guards.tasks.transaction.atomic'):
+            refresh_effective_permissions(role_ids=['r1'])
+        self.assertEqual([len(call.args[0]) for call in refresh.call_args_list], [2, 1])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PermissionCheckQueryTests(TestCase):
+    """Com o cache quente, `user_has_permission` não consulta o banco."""
+
+    def setUp(self):
+        services._load_compiled.cache_clear()
+        self.user = create_user(1)
+        self.tenant = create_tenant(self.user)
+        self.permission = Permission.objects.get(content_type__app_label='guards', codename='view_role')
+        role = Role.objects.create(name='Membro', tenant=self.tenant)
+        role.permissions.add(self.permission)
+        TenantMembership.objects.create(
+            user=self.user, tenant=self.tenant, role=role, status=TenantMembership.MembershipStatus.ACTIVE
+        )
+
+    def test_cold_check_compiles_with_two_queries(self):
+        # Papéis globais + vínculo com o tenant.
+        with self.assertNumQueries(2):
+            self.assertTrue(GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant))
+
+    def test_warm_check_does_not_query(self):
+        GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant)
+        with self.assertNumQueries(0):
+            self.assertTrue(GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant))
+            self.assertFalse(GuardService.user_has_permission(self.user, 'guards.delete_role', self.tenant))
+
+    def test_warm_check_survives_a_cold_local_lru(self):
+        GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant)
+        services._load_compiled.cache_clear()
+        with self.assertNumQueries(0):
+            self.assertTrue(GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant))
+
+    def test_bumped_scope_recompiles(self):
+        GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant)
+        GuardService.bump_version(f"user:{self.user.pk}")
+        with self.assertNumQueries(2):
+            GuardService.user_has_permission(self.user, 'guards.view_role', self.tenant)
+
+    def test_malformed_code_does_not_query(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(GuardService.user_has_permission(self.user, 'view_role', self.tenant))
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SignalScopeTests(TestCase):
+    """Cada sinal incrementa a versão do escopo afetado, e só depois do commit."""
+
+    def setUp(self):
+        self.user = create_user(1)
+        self.tenant = create_tenant(self.user)
+        self.permission = Permission.objects.get(content_type__app_label='guards', codename='view_role')
+        self.global_role = Role.objects.create(name='Suporte')
+        self.tenant_role = Role.objects.create(name='Membro', tenant=self.tenant)
+
+    def bumped_scopes(self, change) -> set:
+        with mock.patch.object(receivers.GuardService, 'bump_version') as bump_version:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+                bump_version.assert_not_called()
+        return {call.args[0] for call in bump_version.call_args_list}
+
+    def test_role_permissions_forward(self):
+        self.assertEqual(
+            self.bumped_scopes(lambda: self.tenant_role.permissions.add(self.permission)),
+            {f"tenant:{self.tenant.pk}"},
+        )
+        self.assertEqual(self.bumped_scopes(lambda: self.global_role.permissions.add(self.permission)), {'global'})
+
+    def test_role_permissions_reverse(self):
+        self.assertEqual(
+            self.bumped_scopes(lambda: self.permission.role_set.add(self.tenant_role, self.global_role)),
+            {f"tenant:{self.tenant.pk}", 'global'},
+        )
+        self.assertEqual(
+            self.bumped_scopes(lambda: self.permission.role_set.remove(self.tenant_role)),
+            {f"tenant:{self.tenant.pk}"},
+        )
+
+    def test_role_permissions_clear(self):
+        self.tenant_role.permissions.add(self.permission)
+        self.global_role.permissions.add(self.permission)
+        self.assertEqual(
+            self.bumped_scopes(self.tenant_role.permissions.clear), {f"tenant:{self.tenant.pk}"}
+        )
+        self.assertEqual(self.bumped_scopes(self.permission.role_set.clear), {'global'})
+        self.global_role.refresh_from_db()
+        self.assertEqual(self.global_role.permission_bits, [])
+
+    def test_membership_status_change(self):
+        membership = TenantMembership.objects.create(
+            user=self.user, tenant=self.tenant, role=self.tenant_role, status=TenantMembership.MembershipStatus.ACTIVE
+        )
+        membership.status = TenantMembership.MembershipStatus.INACTIVE
+        self.assertEqual(self.bumped_scopes(membership.save), {f"user:{self.user.pk}"})
+
+    def test_role_delete(self):
+        self.user.roles.add(self.global_role)
+        self.assertEqual(self.bumped_scopes(self.global_role.delete), {'global'})
+        self.assertEqual(self.bumped_scopes(self.tenant_role.delete), {f"tenant:{self.tenant.pk}"})
+
+    def test_global_role_assignment(self):
+        self.assertEqual(
+            self.bumped_scopes(lambda: self.user.roles.add(self.global_role)), {f"user:{self.user.pk}"}
+        )
+        other = create_user(2)
+        self.assertEqual(
+            self.bumped_scopes(lambda: self.global_role.users.add(other)), {f"user:{other.pk}"}
+        )
+        self.assertEqual(
+            self.bumped_scopes(self.global_role.users.clear), {f"user:{self.user.pk}", f"user:{other.pk}"}
+        )
+
+    def test_login_does_not_bump_the_user(self):
+        self.assertEqual(self.bumped_scopes(lambda: self.user.save(update_fields=['last_login'])), set())
+
+
+class PermissionBitmapEncodingTests(SimpleTestCase):
+    """As palavras seguem o BIGINT com sinal do PostgreSQL."""
+
+    def test_round_trip(self):
+        indexes = [0, 5, 63, 64, 130]
+        words = PermissionBitmap.encode(indexes)
+        self.assertEqual(len(words), 3)
+        self.assertEqual(PermissionBitmap.bit_indexes(PermissionBitmap.to_int(words)), indexes)
+
+    def test_top_bit_of_a_word_is_negative(self):
+        self.assertEqual(PermissionBitmap.encode([WORD_BITS - 1]), [-(1 << 63)])
+        self.assertEqual(PermissionBitmap.word_and_mask(WORD_BITS - 1), (0, -(1 << 63)))
+        self.assertEqual(PermissionBitmap.word_and_mask(WORD_BITS), (1, 1))
+        self.assertEqual(PermissionBitmap.word_and_mask(WORD_BITS + 62), (1, 1 << 62))
+
+    def test_empty_bitmap(self):
+        self.assertEqual(PermissionBitmap.encode([]), [])
+        self.assertEqual(PermissionBitmap.to_int([]), 0)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PermissionBitmapRoleTests(TestCase):
+    """Os bitmaps do papel acompanham as M2M, e o teste de bit roda no banco."""
+
+    def setUp(self):
+        # Os índices atribuídos aqui somem no rollback; os nomes em cache também precisam sumir.
+        PermissionBitmap.forget_bit_names()
+        self.addCleanup(PermissionBitmap.forget_bit_names)
+        self.view = Permission.objects.get(content_type__app_label='guards', codename='view_role')
+        self.delete = Permission.objects.get(content_type__app_label='guards', codename='delete_role')
+        self.role = Role.objects.create(name='Suporte')
+
+    def permissions_of(self, role: Role) -> frozenset:
+        role.refresh_from_db()
+        return PermissionBitmap.decode(PermissionBitmap.to_int(role.permission_bits), 'permissions')
+
+    def test_bitmap_is_rebuilt_on_m2m_changes(self):
+        self.role.permissions.add(self.view, self.delete)
+        self.assertEqual(self.permissions_of(self.role), {'guards.view_role', 'guards.delete_role'})
+
+        self.role.permissions.remove(self.delete)
+        self.assertEqual(self.permissions_of(self.role), {'guards.view_role'})
+
+        self.view.role_set.clear()
+        self.assertEqual(self.permissions_of(self.role), frozenset())
+
+    def test_new_index_discards_names_from_a_rolled_back_transaction(self):
+        # Nomes guardados por uma transação desfeita que já tinha usado o índice 0.
+        cache.set(NAMES_KEY, {'permissions': {0: 'guards.delete_role'}, 'actions': {}}, None)
+        self.role.permissions.add(self.view)
+        self.assertEqual(self.permissions_of(self.role), {'guards.view_role'})
+
+    def test_roles_with_the_top_bit_of_a_word(self):
+        PermissionBit.objects.create(permission=self.view, bit_index=WORD_BITS - 1)
+        self.role.permissions.add(self.view)
+        other = Role.objects.create(name='Leitura')
+
+        roles = PermissionBitmap.roles_with_bit('permission_bits', WORD_BITS - 1)
+        self.assertEqual(list(roles), [self.role])
+        self.assertFalse(PermissionBitmap.roles_with_bit('permission_bits', WORD_BITS - 2).exists())
+        # Fora do tamanho do array: nenhum papel.
+        self.assertFalse(PermissionBitmap.roles_with_bit('permission_bits', 3 * WORD_BITS).exists())
+        self.assertNotIn(other, roles)
+
+    def test_members_with_permission(self):
+        member, outsider = create_user(1), create_user(2)
+        tenant = create_tenant(member)
+        self.role.permissions.add(self.view)
+        tenant_role = Role.objects.create(name='Membro', tenant=tenant)
+        for user in (member, outsider):
+            TenantMembership.objects.create(
+                user=user, tenant=tenant, role=tenant_role, status=TenantMembership.MembershipStatus.ACTIVE
+            )
+        member.roles.add(self.role)
+
+        self.assertEqual(list(GuardService.members_with_permission(tenant, 'guards.view_role')), [member])
+        self.assertFalse(GuardService.members_with_permission(tenant, 'guards.delete_role').exists())
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TenantContextMixinTests(TestCase):
+    """O tenant e o vínculo são resolvidos uma vez, para a permissão e para a view."""
+
+    def setUp(self):
+        services._load_compiled.cache_clear()
+        self.member, self.outsider = create_user(1), create_user(2)
+        User.objects.filter(pk__in=[self.member.pk, self.outsider.pk]).update(is_active=True)
+        self.member.refresh_from_db()
+        self.outsider.refresh_from_db()
+        self.tenant = create_tenant(self.member)
+        role = Role.objects.create(name='Financeiro', tenant=self.tenant)
+        role.permissions.add(Permission.objects.get(content_type__app_label='finances', codename='view_wallet'))
+        TenantMembership.objects.create(
+            user=self.member, tenant=self.tenant, role=role, status=TenantMembership.MembershipStatus.ACTIVE
+        )
+        self.view = TenantWalletView.as_view()
+
+    def get(self, user, tenant_pk=None):
+        request = APIRequestFactory().get('/wallet/')
+        force_authenticate(request, user=user)
+        return self.view(request, tenant_pk=tenant_pk or self.tenant.pk)
+
+    def test_warm_request_resolves_the_tenant_once(self):
+        self.get(self.member)
+        # Vínculo (com tenant e papel) + carteira; as permissões saem do cache.
+        with self.assertNumQueries(2):
+            response = self.get(self.member)
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_member_is_denied(self):
+        self.assertEqual(self.get(self.outsider).status_code, 403)
+
+    def test_missing_tenant_is_denied(self):
+        # `HasTenantPermission` nega antes de a view chegar ao 404 do mixin.
+        response = self.get(self.member, tenant_pk='00000000-0000-0000-0000-000000000000')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class BatchPermissionTests(TestCase):
+    """Várias decisões, ou vários tenants, saem de uma única compilação."""
+
+    def setUp(self):
+        services._load_compiled.cache_clear()
+        self.user = create_user(1)
+        self.tenants = [create_tenant(self.user, index) for index in (1, 2)]
+        role = Role.objects.create(name='Membro', tenant=self.tenants[0])
+        role.permissions.add(Permission.objects.get(content_type__app_label='guards', codename='view_role'))
+        for tenant in self.tenants:
+            TenantMembership.objects.create(
+                user=self.user, tenant=tenant, role=role, status=TenantMembership.MembershipStatus.ACTIVE
+            )
+        # Nomes dos bits em cache, como em produção.
+        PermissionBitmap.get_bit_names()
+
+    def test_many_codes_compile_once(self):
+        codes = ['guards.view_role', 'guards.delete_role', 'malformado']
+        with self.assertNumQueries(2):
+            decisions = GuardService.user_has_permissions(self.user, codes, self.tenants[0])
+        self.assertEqual(decisions, {'guards.view_role': True, 'guards.delete_role': False, 'malformado': False})
+        with self.assertNumQueries(0):
+            GuardService.user_has_permissions(self.user, codes, self.tenants[0])
+
+    def test_cold_tenants_compile_together(self):
+        with mock.patch.object(
+            GuardService, 'compile_permissions_for_tenants', wraps=GuardService.compile_permissions_for_tenants
+        ) as compile_for_tenants, self.assertNumQueries(2):
+            result = GuardService.permissions_for_tenants(self.user, self.tenants)
+        compile_for_tenants.assert_called_once()
+        self.assertEqual(set(result), {str(tenant.pk) for tenant in self.tenants})
+        self.assertTrue(all('guards.view_role' in compiled['permissions'] for compiled in result.values()))
+
+    def test_only_missing_tenants_are_compiled(self):
+        GuardService.permissions_for_tenants(self.user, self.tenants[:1])
+        with mock.patch.object(
+            GuardService, 'compile_permissions_for_tenants', wraps=GuardService.compile_permissions_for_tenants
+        ) as compile_for_tenants:
+            result = GuardService.permissions_for_tenants(self.user, self.tenants)
+        compile_for_tenants.assert_called_once_with(self.user.pk, [str(self.tenants[1].pk)])
+        self.assertEqual(len(result), 2)
+
+    def test_permission_class_requires_every_listed_code(self):
+        request = mock.MagicMock(user=self.user, tenant_context=None)
+        view = mock.MagicMock(kwargs={'tenant_pk': str(self.tenants[0].pk)})
+        view.required_permission = ['guards.view_role']
+        self.assertTrue(HasTenantPermission().has_permission(request, view))
+        view.required_permission = ['guards.view_role', 'guards.delete_role']
+        self.assertFalse(HasTenantPermission().has_permission(request, view))
+        view.required_permission = []
+        self.assertFalse(HasTenantPermission().has_permission(request, view))
@@ -3,7 +3,7 @@
 Módulo de Serializers para o App 'tenants'.
 
 Author: Dzaion
-Version: 1.1.0
+Version: 1.3.0
 """
 from rest_framework import serializers
 from .models import Tenant, TenantContact, TenantMembership, TenantLinkRequest
@@ -13,6 +13,7 @@ from locations.models import Location
 from contacts.serializers import ChannelContactsSerializer
 from contacts.models import ChannelContacts
 from guards.models import Role
+from guards.services import GuardService
 from finances.serializers import WalletSummarySerializer
 
 
@@ -35,17 +36,21 @@ class TenantDetailForUserSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_permissions(self, tenant_obj: Tenant) -> list[str]:
+        """
+        Permissões efetivas do usuário no tenant. Em listas, os conjuntos de
+        todos os tenants chegam prontos em `context['tenant_permissions']`
+        (`GuardService.permissions_for_tenants`).
+        """
         user = self.context.get('user')
         if not user: return []
-        try:
-            membership = user.memberships.get(tenant=tenant_obj, status='ACTIVE')
-            permissions_qs = membership.role.permissions.select_related('content_type')
-            return sorted([f"{p.content_type.app_label}.{p.codename}" for p in permissions_qs])
-        except TenantMembership.DoesNotExist:
-            return []
+        compiled = self.context.get('tenant_permissions', {}).get(str(tenant_obj.pk))
+        if compiled is None:
+            compiled = GuardService.get_compiled_permissions(user, tenant_obj)
+        return sorted(compiled['permissions'])
 
     def get_wallet(self, tenant_obj: Tenant) -> dict | None:
-        wallet = tenant_obj.wallet.first()
+        # Usa o prefetch de `wallet`, se houver.
+        wallet = next(iter(tenant_obj.wallet.all()), None)
         return WalletSummarySerializer(wallet).data if wallet else None
 
 class TenantSerializer(serializers.ModelSerializer):
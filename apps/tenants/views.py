@@ -3,18 +3,19 @@
 Módulo de Views (Controladores) para o App 'tenants'.
 
 Author: Dzaion
-Version: 0.7.0
+Version: 0.9.0
 """
 from rest_framework import generics, status, views
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 
 from accounts.models import User
 from accounts.permissions import IsActiveUser
+from guards.mixins import TenantContextMixin
 from guards.permissions import HasTenantPermission
+from guards.services import GuardService
 from .models import Tenant, TenantContact, TenantMembership, TenantLinkRequest
 from .serializers import (
     TenantSerializer, TenantCreateSerializer, TenantUpdateSerializer,
@@ -24,7 +25,13 @@ from .serializers import (
 )
 from .services import TenantService
 
-@extend_schema(summary="Listar e Criar Inquilinos (Tenants)", tags=["Tenants"])
+@extend_schema(
+    summary="Listar e Criar Inquilinos (Tenants)", tags=["Tenants"],
+    parameters=[OpenApiParameter(
+        'permission', str, required=False,
+        description='Lista apenas os tenants em que o usuário tem a permissão (ex: "finances.view_invoice").'
+    )]
+)
 class TenantListCreateAPIView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsActiveUser]
     
@@ -32,6 +39,10 @@ class TenantListCreateAPIView(generics.ListCreateAPIView):
         return TenantCreateSerializer if self.request.method == 'POST' else TenantSerializer
 
     def get_queryset(self):
+        permission_code = self.request.query_params.get('permission')
+        if permission_code:
+            # JOIN com a tabela materializada de permissões efetivas (só vínculos ATIVOS).
+            return GuardService.tenants_with_permission(self.request.user, permission_code)
         return Tenant.objects.filter(members__user=self.request.user).distinct()
 
     def perform_create(self, serializer):
@@ -60,7 +71,7 @@ class TenantRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
         return 'tenants.change_tenant'
 
 @extend_schema(summary="Listar e Adicionar Contatos de uma Empresa", tags=["Tenants"])
-class TenantContactListCreateAPIView(generics.ListCreateAPIView):
+class TenantContactListCreateAPIView(TenantContextMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
     required_permission = 'tenants.add_tenantcontact'
 
@@ -71,8 +82,7 @@ class TenantContactListCreateAPIView(generics.ListCreateAPIView):
         return TenantContact.objects.filter(tenant_id=self.kwargs['tenant_pk'])
 
     def perform_create(self, serializer):
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
-        serializer.save(tenant=tenant)
+        serializer.save(tenant=self.tenant)
 
 @extend_schema(summary="Ver, Atualizar e Deletar um Contato de Empresa", tags=["Tenants"])
 class TenantContactRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
@@ -95,7 +105,7 @@ class TenantMembershipListAPIView(generics.ListAPIView):
         return TenantMembership.objects.filter(tenant_id=self.kwargs['tenant_pk'])
 
 @extend_schema(summary="Convidar Novo Membro para um Tenant", tags=["Tenants"])
-class TenantMembershipInviteAPIView(generics.GenericAPIView):
+class TenantMembershipInviteAPIView(TenantContextMixin, generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
     required_permission = 'tenants.add_tenantmembership'
     serializer_class = TenantMembershipInviteSerializer
@@ -103,7 +113,7 @@ class TenantMembershipInviteAPIView(generics.GenericAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
+        tenant = self.tenant
         email = serializer.validated_data['email']
         role = serializer.validated_data['role_id']
         
@@ -136,12 +146,11 @@ class TenantMembershipUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
         return 'tenants.change_tenantmembership'
 
 @extend_schema(summary="Criar Solicitação de Vínculo com Matriz", tags=["Tenants"])
-class TenantLinkRequestCreateAPIView(generics.CreateAPIView):
+class TenantLinkRequestCreateAPIView(TenantContextMixin, generics.CreateAPIView):
     permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
     required_permission = 'tenants.add_tenantlinkrequest'
     serializer_class = TenantLinkRequestSerializer
 
     def perform_create(self, serializer):
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
-        serializer.save(requesting_tenant=tenant)
+        serializer.save(requesting_tenant=self.tenant)
 
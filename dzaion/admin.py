@@ -3,19 +3,19 @@
 Módulo de Configuração do Django Admin para o App 'dzaion'.
 
 Author: Dzaion
-Version: 0.2.0
+Version: 0.6.1
 """
 from django.contrib import admin
-from .models import AIModel, DzaionAction, Conversation, Message, TokenUsageLog, AIThoughtProcess
+from .models import AIModel, DzaionAction, Conversation, Message, TokenUsageLog, TokenUsageRollup, ModelEscalationLog, ProactiveCampaign, AIThoughtProcess, MissionCheckpoint
 
 @admin.register(AIModel)
 class AIModelAdmin(admin.ModelAdmin):
-    list_display = ('name', 'identifier', 'usage_mode')
+    list_display = ('name', 'identifier', 'usage_mode', 'input_price_per_million', 'output_price_per_million')
     search_fields = ('name', 'identifier')
 
 @admin.register(DzaionAction)
 class DzaionActionAdmin(admin.ModelAdmin):
-    list_display = ('name', 'verb_code', 'cost_bearer', 'is_active')
+    list_display = ('name', 'verb_code', 'cost_bearer', 'default_model', 'cascade_model', 'is_active')
     list_filter = ('cost_bearer', 'is_active')
     search_fields = ('name', 'verb_code')
 
@@ -35,7 +35,7 @@ class ConversationAdmin(admin.ModelAdmin):
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'conversation', 'direction', 'content_snippet', 'status', 'created_at')
     list_filter = ('direction', 'status')
-    search_fields = ('conversation__id', 'content')
+    search_fields = ('conversation__id', 'content', 'provider_message_id')
     readonly_fields = ('created_at', 'updated_at')
 
     def content_snippet(self, obj):
@@ -44,8 +44,8 @@ class MessageAdmin(admin.ModelAdmin):
 
 @admin.register(TokenUsageLog)
 class TokenUsageLogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'payer', 'dzaion_action', 'total_tokens', 'is_billed', 'created_at')
-    list_filter = ('is_billed', 'dzaion_action', 'ai_model')
+    list_display = ('id', 'payer', 'dzaion_action', 'total_tokens', 'is_billed', 'is_speculative', 'created_at')
+    list_filter = ('is_billed', 'is_speculative', 'dzaion_action', 'ai_model')
     search_fields = ('payer_user__email', 'payer_tenant__name')
     readonly_fields = ('created_at', 'updated_at')
     
@@ -57,6 +57,31 @@ class TokenUsageLogAdmin(admin.ModelAdmin):
         return obj.input_tokens + obj.output_tokens
     total_tokens.short_description = 'Total de Tokens'
 
+@admin.register(TokenUsageRollup)
+class TokenUsageRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket_start', 'granularity', 'payer', 'ai_model', 'dzaion_action', 'input_tokens', 'output_tokens', 'cost')
+    list_filter = ('granularity', 'ai_model', 'dzaion_action')
+    search_fields = ('payer_user__email', 'payer_tenant__name')
+    date_hierarchy = 'bucket_start'
+
+    def payer(self, obj):
+        return obj.payer_user or obj.payer_tenant
+    payer.short_description = 'Pagador'
+
+@admin.register(ModelEscalationLog)
+class ModelEscalationLogAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'dzaion_action', 'from_model', 'to_model', 'reason', 'input_tokens', 'output_tokens')
+    list_filter = ('reason', 'dzaion_action', 'from_model')
+    search_fields = ('user__email', 'detail')
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(ProactiveCampaign)
+class ProactiveCampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'action', 'status', 'total_users', 'enqueued_count', 'completed_count', 'failed_count', 'created_at')
+    list_filter = ('status', 'action')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at', 'cursor')
+
 @admin.register(AIThoughtProcess)
 class AIThoughtProcessAdmin(admin.ModelAdmin):
     list_display = ('user', 'action', 'status', 'expires_at', 'finished_at')
@@ -64,3 +89,9 @@ class AIThoughtProcessAdmin(admin.ModelAdmin):
     search_fields = ('user__email',)
     readonly_fields = ('created_at', 'updated_at')
 
+@admin.register(MissionCheckpoint)
+class MissionCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('mission_id', 'phase', 'created_at')
+    list_filter = ('phase',)
+    search_fields = ('mission_id',)
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Controle de Admissão do App 'dzaion'.
+
+Antes de uma missão chegar ao Orquestrador, o `dzaion_mission_handler`
+consulta o `AdmissionController`, que observa o tamanho das filas no
+broker (somado ao backlog do escalonador justo) e as latências recentes das fases da missão. Conforme os limites
+de `DZAION_ADMISSION`, a missão pode ser:
+
+- PROACTIVE: adiada (reagendada) ou descartada;
+- REACTIVE: executada com um modelo de fallback mais rápido e/ou precedida
+  de uma confirmação imediata ("estou processando").
+
+Toda decisão é contabilizada em `DzaionMetrics`.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import logging
+import time
+
+from django.conf import settings
+
+from core.utils.redis_client import get_broker_client
+from .metrics import DzaionMetrics, percentile
+from .scheduler import FairScheduler
+
+logger = logging.getLogger('dzaion')
+
+
+class AdmissionController:
+    """
+    Decide, a partir dos sinais de carga, como cada missão será tratada.
+    """
+    ADMIT = 'ADMIT'
+    DEFER = 'DEFER'
+    SHED = 'SHED'
+
+    # Cache por processo dos sinais, para não consultar o Redis a cada missão.
+    _signals: dict | None = None
+    _signals_expire_at: float = 0.0
+
+    @classmethod
+    def get_signals(cls) -> dict:
+        """
+        Sinais de carga: tamanho das filas no broker e p90 das latências recentes.
+        As missões retidas no escalonador justo contam como fila REACTIVE.
+        """
+        now = time.monotonic()
+        if cls._signals is not None and now < cls._signals_expire_at:
+            return cls._signals
+
+        config = settings.DZAION_ADMISSION
+        try:
+            broker = get_broker_client()
+            pipeline = broker.pipeline()
+            pipeline.llen(config['REACTIVE_QUEUE'])
+            pipeline.llen(config['PROACTIVE_QUEUE'])
+            reactive_depth, proactive_depth = pipeline.execute()
+            signals = {
+                'reactive_queue_depth': reactive_depth + FairScheduler.backlog(),
+                'proactive_queue_depth': proactive_depth,
+                'llm_p90': percentile(DzaionMetrics.get_latency_samples('llm'), 0.90),
+                'queue_wait_p90': percentile(DzaionMetrics.get_latency_samples('queue_wait'), 0.90),
+            }
+        except Exception as e:
+            # Sem sinais, a missão é admitida normalmente (fail-open).
+            logger.warning(f"Não foi possível ler os sinais de carga: {e}")
+            signals = {'reactive_queue_depth': 0, 'proactive_queue_depth': 0, 'llm_p90': 0.0, 'queue_wait_p90': 0.0}
+
+        cls._signals = signals
+        cls._signals_expire_at = now + config['SIGNALS_CACHE_SECONDS']
+        return signals
+
+    @staticmethod
+    def _tripped(rule: dict, signals: dict, queue_wait: float) -> list[str]:
+        """Retorna quais limites da regra foram ultrapassados."""
+        reasons = []
+        if rule.get('QUEUE_DEPTH') is not None and signals['reactive_queue_depth'] >= rule['QUEUE_DEPTH']:
+            reasons.append(f"fila={signals['reactive_queue_depth']}")
+        if rule.get('LLM_P90_SECONDS') is not None and signals['llm_p90'] >= rule['LLM_P90_SECONDS']:
+            reasons.append(f"llm_p90={signals['llm_p90']:.1f}s")
+        if rule.get('QUEUE_WAIT_SECONDS') is not None and queue_wait >= rule['QUEUE_WAIT_SECONDS']:
+            reasons.append(f"espera={queue_wait:.1f}s")
+        return reasons
+
+    @classmethod
+    def decide(cls, mission_data: dict) -> dict:
+        """
+        Retorna a decisão de admissão da missão:
+        `{'action': ADMIT|DEFER|SHED, 'reasons', 'fallback_model', 'acknowledge', 'countdown'}`.
+        """
+        config = settings.DZAION_ADMISSION
+        decision = {'action': cls.ADMIT, 'reasons': [], 'fallback_model': None, 'acknowledge': False, 'countdown': 0}
+        if not config['ENABLED']:
+            return decision
+
+        signals = cls.get_signals()
+        enqueued_at = mission_data.get('enqueued_at')
+        queue_wait = max(time.time() - enqueued_at, 0.0) if enqueued_at else 0.0
+        mission_type = mission_data.get('mission_type')
+
+        if mission_type == 'PROACTIVE':
+            shed = cls._tripped(config['PROACTIVE_SHED'], signals, queue_wait)
+            defer = cls._tripped(config['PROACTIVE_DEFER'], signals, queue_wait)
+            if shed or (defer and mission_data.get('deferrals', 0) >= config['MAX_DEFERRALS']):
+                decision.update(action=cls.SHED, reasons=shed or defer)
+            elif defer:
+                decision.update(action=cls.DEFER, reasons=defer, countdown=config['DEFER_SECONDS'])
+
+        elif mission_type == 'REACTIVE':
+            fallback = cls._tripped(config['REACTIVE_FALLBACK'], signals, queue_wait)
+            if fallback and config['FALLBACK_MODEL']:
+                decision['fallback_model'] = config['FALLBACK_MODEL']
+                decision['reasons'] += fallback
+            acknowledge = cls._tripped(config['REACTIVE_ACKNOWLEDGE'], signals, queue_wait)
+            if acknowledge:
+                decision['acknowledge'] = True
+                decision['reasons'] += acknowledge
+
+        DzaionMetrics.increment('admission_decisions', mission_type=mission_type, action=decision['action'])
+        if decision['fallback_model']:
+            DzaionMetrics.increment('admission_fallbacks', mission_type=mission_type)
+        if decision['acknowledge']:
+            DzaionMetrics.increment('admission_acknowledgements', mission_type=mission_type)
+        if decision['reasons']:
+            logger.warning(f"Admissão de missão {mission_type}: {decision['action']} ({', '.join(decision['reasons'])}).")
+        return decision
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DzaionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dzaion'
+
+    def ready(self):
+        """
+        Importa os receivers (sinais) quando o app estiver pronto.
+        """
+        import dzaion.receivers
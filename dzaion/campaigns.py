@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Campanhas Proativas do App 'dzaion'.
+
+Um envio em massa de missões PROACTIVE não enfileira mais uma tarefa por
+usuário de uma só vez: a tarefa `fan_out_campaign` percorre o segmento em
+lotes (paginação por chave, sem OFFSET), entrega as missões ao
+`FairScheduler` (uma sub-fila por campanha, liberada para a fila dedicada
+`dzaion_proactive`) e se reagenda conforme a taxa de envio. Os
+dados comuns da campanha (ação, modelo, prefixo do prompt) são resolvidos
+uma vez por worker, e o progresso é contado no Redis.
+
+O cancelamento não depende desse cache: ele grava uma marca no Redis,
+consultada pelo Orquestrador a cada missão, e descarta as missões que ainda
+aguardam na sub-fila da campanha no escalonador.
+
+Author: Dzaion
+Version: 0.5.0
+"""
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from accounts.models import User
+from core.utils.redis_client import get_redis_client
+from tenants.models import TenantMembership
+from .exceptions import CampaignError
+from .models import DzaionAction, ProactiveCampaign
+from .scheduler import FairScheduler
+
+logger = logging.getLogger('dzaion')
+
+PROGRESS_KEY = 'dzaion:campaign:{}:progress'
+CANCELLED_KEY = 'dzaion:campaign:{}:cancelled'
+SEGMENT_KEYS = {'user_ids', 'tenant', 'role', 'whatsapp_verified'}
+
+# Cache por processo (worker) dos dados comuns de cada campanha: {campaign_id: (expira_em, dados)}
+_shared_context_cache: dict[str, tuple[float, dict]] = {}
+
+
+class CampaignService:
+    """
+    Serviço de criação, envio em lotes e acompanhamento das campanhas proativas.
+    """
+
+    @staticmethod
+    def build_queryset(segment: dict):
+        """
+        Traduz o segmento da campanha para uma consulta de usuários ativos.
+        """
+        unknown = set(segment) - SEGMENT_KEYS
+        if unknown:
+            raise CampaignError(f"Filtros de segmento desconhecidos: {', '.join(sorted(unknown))}.")
+
+        queryset = User.objects.filter(is_active=True)
+        if segment.get('user_ids'):
+            queryset = queryset.filter(id__in=segment['user_ids'])
+        if segment.get('tenant'):
+            queryset = queryset.filter(
+                memberships__tenant_id=segment['tenant'],
+                memberships__status=TenantMembership.MembershipStatus.ACTIVE,
+            )
+        if segment.get('role'):
+            queryset = queryset.filter(roles__id=segment['role'])
+        if segment.get('whatsapp_verified'):
+            queryset = queryset.filter(whatsapp_verified_at__isnull=False)
+        return queryset.distinct()
+
+    @staticmethod
+    def create_campaign(name: str, action: DzaionAction, segment: dict, send_rate_per_minute: int, created_by=None) -> ProactiveCampaign:
+        """
+        Cria a campanha e agenda o primeiro lote após o commit.
+        """
+        from .tasks import fan_out_campaign
+
+        total_users = CampaignService.build_queryset(segment).count()
+        if not total_users:
+            raise CampaignError("O segmento informado não contém usuários.")
+
+        campaign = ProactiveCampaign.objects.create(
+            name=name,
+            action=action,
+            segment=segment,
+            send_rate_per_minute=send_rate_per_minute,
+            total_users=total_users,
+            created_by=created_by,
+        )
+        transaction.on_commit(lambda: fan_out_campaign.delay(str(campaign.id)))
+        logger.info(f"Campanha '{name}' criada para {total_users} usuários ({action.verb_code}).")
+        return campaign
+
+    @staticmethod
+    def enqueue_next_chunk(campaign: ProactiveCampaign) -> int:
+        """
+        Enfileira o próximo lote de missões a partir do cursor da campanha.
+        Retorna quantas missões foram enfileiradas (0 quando o segmento acabou).
+        """
+        config = settings.DZAION_CAMPAIGNS
+        queryset = CampaignService.build_queryset(campaign.segment).order_by('id')
+        if campaign.cursor:
+            queryset = queryset.filter(id__gt=campaign.cursor)
+        user_ids = list(queryset.values_list('id', flat=True)[:config['CHUNK_SIZE']])
+        if not user_ids:
+            return 0
+
+        campaign_id = str(campaign.id)
+        enqueued_at = time.time()
+        # A campanha inteira é um único pagador no escalonador: a rajada não
+        # ocupa mais que a sua fatia da capacidade dos workers.
+        FairScheduler.submit_many([
+            {
+                'mission_type': 'PROACTIVE',
+                'mission_id': str(uuid.uuid4()),
+                'campaign_id': campaign_id,
+                'trigger_info': {'user_id': str(user_id), 'action_verb': campaign.action.verb_code},
+                'enqueued_at': enqueued_at,
+            }
+            for user_id in user_ids
+        ], payer_key=FairScheduler.campaign_key(campaign))
+
+        campaign.cursor = user_ids[-1]
+        ProactiveCampaign.objects.filter(pk=campaign.pk).update(
+            cursor=campaign.cursor, enqueued_count=F('enqueued_count') + len(user_ids)
+        )
+        campaign.enqueued_count += len(user_ids)
+        return len(user_ids)
+
+    @staticmethod
+    def next_chunk_countdown(campaign: ProactiveCampaign, enqueued: int) -> float:
+        """Intervalo até o próximo lote para respeitar a taxa de envio da campanha."""
+        return enqueued * 60 / max(campaign.send_rate_per_minute, 1)
+
+    @staticmethod
+    def get_shared_context(campaign_id: str) -> dict:
+        """
+        Dados comuns a todas as missões da campanha, resolvidos uma vez por worker.
+        """
+        cached = _shared_context_cache.get(campaign_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        campaign = ProactiveCampaign.objects.select_related(
+            'action', 'action__default_model', 'action__cascade_model'
+        ).get(pk=campaign_id)
+        context = {
+            'status': campaign.status,
+            'action': campaign.action,
+            'prompt_prefix': render_to_string('prompts/general.txt'),
+        }
+        _shared_context_cache[campaign_id] = (time.monotonic() + settings.DZAION_CAMPAIGNS['SHARED_CONTEXT_TTL'], context)
+        return context
+
+    @staticmethod
+    def is_cancelled(campaign_id: str) -> bool:
+        """
+        Consulta barata (uma leitura no Redis) feita a cada missão: o status
+        em cache no worker pode estar desatualizado por até SHARED_CONTEXT_TTL.
+        """
+        try:
+            return bool(get_redis_client().exists(CANCELLED_KEY.format(campaign_id)))
+        except Exception as e:
+            logger.warning(f"Falha ao consultar o cancelamento da campanha {campaign_id}: {e}")
+            return False
+
+    @staticmethod
+    def record_result(campaign_id: str, success: bool):
+        """Conta o resultado de uma missão no Redis (sem disputa pela linha da campanha)."""
+        try:
+            get_redis_client().hincrby(PROGRESS_KEY.format(campaign_id), 'completed' if success else 'failed', 1)
+        except Exception as e:
+            logger.error(f"Falha ao registrar o progresso da campanha {campaign_id}: {e}", exc_info=True)
+
+    @staticmethod
+    def sync_progress(campaign: ProactiveCampaign) -> ProactiveCampaign:
+        """
+        Copia os contadores do Redis para a campanha e a conclui quando todas
+        as missões enfileiradas terminaram (ou o prazo de acompanhamento expirou).
+        """
+        progress = get_redis_client().hgetall(PROGRESS_KEY.format(campaign.id))
+        campaign.completed_count = int(progress.get('completed', 0))
+        campaign.failed_count = int(progress.get('failed', 0))
+        fields = ['completed_count', 'failed_count', 'updated_at']
+
+        if campaign.status == ProactiveCampaign.CampaignStatus.RUNNING and campaign.enqueued_count >= campaign.total_users:
+            finished = campaign.completed_count + campaign.failed_count >= campaign.enqueued_count
+            timeout = settings.DZAION_CAMPAIGNS['COMPLETION_TIMEOUT']
+            expired = campaign.started_at and (timezone.now() - campaign.started_at).total_seconds() > timeout
+            if finished or expired:
+                campaign.status = ProactiveCampaign.CampaignStatus.COMPLETED
+                campaign.finished_at = timezone.now()
+                fields += ['status', 'finished_at']
+        campaign.save(update_fields=fields)
+        return campaign
+
+    @staticmethod
+    def cancel(campaign: ProactiveCampaign) -> ProactiveCampaign:
+        """
+        Interrompe o envio dos próximos lotes. Após o commit, marca a campanha
+        como cancelada no Redis (todos os workers a veem na próxima missão) e
+        descarta as missões que aguardam na sub-fila do escalonador. As que já
+        foram publicadas são descartadas pelo Orquestrador.
+        """
+        if campaign.status in (ProactiveCampaign.CampaignStatus.COMPLETED, ProactiveCampaign.CampaignStatus.CANCELLED):
+            raise CampaignError("A campanha já foi finalizada.")
+        campaign.status = ProactiveCampaign.CampaignStatus.CANCELLED
+        campaign.finished_at = timezone.now()
+        campaign.save(update_fields=['status', 'finished_at', 'updated_at'])
+        _shared_context_cache.pop(str(campaign.id), None)
+        transaction.on_commit(lambda: CampaignService._stop_queued_missions(campaign))
+        return campaign
+
+    @staticmethod
+    def _stop_queued_missions(campaign: ProactiveCampaign):
+        ttl = settings.DZAION_CAMPAIGNS['COMPLETION_TIMEOUT']
+        get_redis_client().set(CANCELLED_KEY.format(campaign.id), 1, ex=ttl)
+        dropped = FairScheduler.drop_queue(FairScheduler.campaign_key(campaign))
+        logger.info(f"Campanha {campaign.id} cancelada: {dropped} missão(ões) removida(s) do escalonador.")
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo da Cascata de Modelos do App 'dzaion'.
+
+Quando uma DzaionAction define um `cascade_model`, a primeira chamada da
+missão é feita nesse modelo econômico. A resposta só é descartada (e a
+chamada refeita no modelo principal) se falhar em alguma das checagens:
+argumentos de ferramenta inválidos para o `parameters_schema`, o marcador
+de baixa confiança ou uma recusa.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import json
+import re
+
+from django.conf import settings
+from jsonschema import Draft202012Validator
+
+from .models import DzaionAction, ModelEscalationLog
+
+
+class CascadePolicy:
+    """
+    Regras de aceitação da resposta do modelo econômico.
+    """
+
+    @staticmethod
+    def get_checks(action: DzaionAction) -> dict:
+        """Mescla as checagens da ação com os padrões de DZAION_CASCADE."""
+        defaults = settings.DZAION_CASCADE
+        checks = action.cascade_checks or {}
+        return {
+            'validate_tool_arguments': checks.get('validate_tool_arguments', defaults['VALIDATE_TOOL_ARGUMENTS']),
+            'confidence_marker': checks.get('confidence_marker', defaults['CONFIDENCE_MARKER']),
+            'refusal_patterns': checks.get('refusal_patterns', defaults['REFUSAL_PATTERNS']),
+        }
+
+    @staticmethod
+    def build_attempt_messages(messages: list, checks: dict) -> list:
+        """
+        Acrescenta ao prompt de sistema a instrução do marcador de confiança,
+        usada apenas na tentativa do modelo econômico.
+        """
+        marker = checks['confidence_marker']
+        if not marker or not messages or messages[0].get('role') != 'system':
+            return messages
+        instruction = (
+            f"\n\nSe você não tiver certeza de como atender ao pedido, responda apenas com {marker}."
+        )
+        return [{**messages[0], "content": messages[0]['content'] + instruction}] + messages[1:]
+
+    @staticmethod
+    def evaluate(message, action: DzaionAction, checks: dict) -> tuple[str | None, str]:
+        """
+        Avalia a resposta do modelo econômico.
+        Retorna `(motivo, detalhe)`, com motivo None se a resposta for aceita.
+        """
+        if getattr(message, 'refusal', None):
+            return ModelEscalationLog.Reason.REFUSAL, message.refusal
+
+        if message.tool_calls:
+            if not checks['validate_tool_arguments']:
+                return None, ''
+            validator = Draft202012Validator(action.parameters_schema or {})
+            for tool_call in message.tool_calls:
+                if tool_call.function.name != action.verb_code:
+                    return ModelEscalationLog.Reason.TOOL_ARGUMENTS, f"Ferramenta desconhecida: {tool_call.function.name}"
+                try:
+                    arguments = json.loads(tool_call.function.arguments or '{}')
+                except ValueError as e:
+                    return ModelEscalationLog.Reason.TOOL_ARGUMENTS, f"JSON inválido: {e}"
+                error = next(iter(validator.iter_errors(arguments)), None)
+                if error is not None:
+                    return ModelEscalationLog.Reason.TOOL_ARGUMENTS, error.message
+            return None, ''
+
+        content = message.content or ''
+        marker = checks['confidence_marker']
+        if marker and marker in content:
+            return ModelEscalationLog.Reason.LOW_CONFIDENCE, content[:500]
+        if not content.strip():
+            return ModelEscalationLog.Reason.LOW_CONFIDENCE, "Resposta vazia."
+        for pattern in checks['refusal_patterns']:
+            if re.search(pattern, content, flags=re.IGNORECASE):
+                return ModelEscalationLog.Reason.REFUSAL, content[:500]
+        return None, ''
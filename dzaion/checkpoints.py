@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Checkpoints de Missão do App 'dzaion'.
+
+Cada missão recebe um `mission_id` de quem a enfileira (webhook, campanhas).
+O Orquestrador registra cada fase concluída (intenção, respostas do LLM,
+resultados das ferramentas, envio) em `MissionCheckpoint`; como a tarefa
+da missão só é confirmada ao broker no final (`acks_late`), uma missão
+interrompida é reentregue e retomada da última fase registrada, sem pagar
+de novo pelos tokens nem enviar a resposta em duplicidade.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import MissionCheckpoint
+
+logger = logging.getLogger('dzaion')
+
+
+class MissionCheckpointService:
+    """
+    Leitura e gravação das fases concluídas de uma missão.
+    """
+
+    @staticmethod
+    def load(mission_id: str | None) -> dict:
+        """Fases já concluídas da missão: `{fase: payload}` (uma única consulta)."""
+        if not mission_id:
+            return {}
+        checkpoints = dict(
+            MissionCheckpoint.objects.filter(mission_id=mission_id).values_list('phase', 'payload')
+        )
+        if checkpoints:
+            logger.info(f"Missão {mission_id} retomada; fases concluídas: {', '.join(checkpoints)}.")
+        return checkpoints
+
+    @staticmethod
+    def save(mission_id: str | None, phase: str, payload: dict | None = None):
+        """Registra a conclusão de uma fase. Falhas não interrompem a missão."""
+        if not mission_id:
+            return
+        try:
+            MissionCheckpoint.objects.update_or_create(
+                mission_id=mission_id, phase=phase, defaults={'payload': payload or {}}
+            )
+        except Exception as e:
+            logger.error(f"Falha ao registrar o checkpoint {phase} da missão {mission_id}: {e}", exc_info=True)
+
+    @staticmethod
+    def purge() -> int:
+        """Remove os checkpoints mais antigos que o prazo de retenção."""
+        cutoff = timezone.now() - timedelta(days=settings.DZAION_CHECKPOINTS['RETENTION_DAYS'])
+        deleted, _ = MissionCheckpoint.objects.filter(created_at__lt=cutoff).delete()
+        return deleted
@@ -3,14 +3,15 @@
 Módulo do Cliente da API da OpenAI.
 
 Author: Dzaion
-Version: 0.3.3
+Version: 0.6.0
 """
 import logging
 import json
-from openai import OpenAI, APIError, AuthenticationError
+from openai import OpenAI, APIError, AuthenticationError, BadRequestError, NotFoundError
+from openai.types.chat import ChatCompletionMessage
 from decouple import config
 
-from .exceptions import AIAuthenticationError, AIAPIError
+from .exceptions import AIAuthenticationError, AIAPIError, ConversationChainExpiredError
 
 logger = logging.getLogger('dzaion_client')
 
@@ -26,9 +27,10 @@ class OpenAIClient:
         
         self.client = OpenAI(api_key=self.api_key)
 
-    def generate_response(self, model: str, messages: list, tools: list | None = None, service_tier: str = 'auto') -> dict:
+    def generate_response(self, model: str, messages: list, tools: list | None = None, service_tier: str = 'auto', timeout: float | None = None) -> dict:
         """
         Gera uma resposta da IA, lidando tanto com texto simples quanto com Tool Calling.
+        `timeout` (segundos) limita a requisição ao tempo restante do prazo da missão.
         """
         request_payload = {
             "model": model,
@@ -48,7 +50,8 @@ class OpenAIClient:
 
         try:
             # Usando a API de Chat Completions, que é a base para o Tool Calling
-            response = self.client.chat.completions.create(**request_payload)
+            client = self.client.with_options(timeout=timeout) if timeout else self.client
+            response = client.chat.completions.create(**request_payload)
             
             response_message = response.choices[0].message
             
@@ -77,3 +80,96 @@ class OpenAIClient:
             logger.error(f"Erro inesperado ao chamar a API da OpenAI: {e}", exc_info=True)
             raise AIAPIError("Um erro inesperado ocorreu ao se comunicar com a OpenAI.")
 
+    def generate_chained_response(self, model: str, messages: list, previous_response_id: str | None = None,
+                                  tools: list | None = None, service_tier: str = 'auto', timeout: float | None = None,
+                                  instructions: str | None = None) -> dict:
+        """
+        Gera uma resposta pela API de Responses, com o estado da conversa guardado
+        na OpenAI: com `previous_response_id`, `messages` traz apenas o que é novo
+        no turno (mensagem do usuário, resultados das ferramentas).
+        `instructions` (o prompt de sistema) não é herdado da resposta anterior
+        pela API: deve ser enviado em toda chamada.
+        As mensagens e as ferramentas seguem o formato do Chat Completions, e a
+        resposta é devolvida no mesmo formato de `generate_response`, com o
+        `response_id` que encadeia o próximo turno.
+        Lança `ConversationChainExpiredError` se a resposta anterior expirou.
+        """
+        request_payload = {
+            "model": model,
+            "input": self._to_response_items(messages),
+            "service_tier": service_tier,
+            "store": True,
+        }
+        if previous_response_id:
+            request_payload["previous_response_id"] = previous_response_id
+        if instructions:
+            request_payload["instructions"] = instructions
+        if tools:
+            request_payload["tools"] = [
+                {"type": "function", "name": tool["function"]["name"], "description": tool["function"].get("description"),
+                 "parameters": tool["function"].get("parameters"), "strict": False}
+                for tool in tools
+            ]
+            request_payload["tool_choice"] = "auto"
+
+        logger.debug(
+            f"Enviando requisição (Responses) para a OpenAI com o modelo {model}: "
+            f"{len(request_payload['input'])} item(ns), resposta anterior {previous_response_id or '-'}."
+        )
+
+        try:
+            client = self.client.with_options(timeout=timeout) if timeout else self.client
+            response = client.responses.create(**request_payload)
+
+            tool_calls = [
+                {'id': item.call_id, 'type': 'function', 'function': {'name': item.name, 'arguments': item.arguments}}
+                for item in response.output if item.type == 'function_call'
+            ]
+            response_message = ChatCompletionMessage(
+                role='assistant', content=response.output_text or None, tool_calls=tool_calls or None
+            )
+            usage_data = {
+                'input_tokens': response.usage.input_tokens if response.usage else 0,
+                'output_tokens': response.usage.output_tokens if response.usage else 0,
+                'total_tokens': response.usage.total_tokens if response.usage else 0,
+            }
+            logger.debug(f"Resposta {response.id} recebida da OpenAI. Mensagem: {response_message}")
+
+            return {
+                'message': response_message,
+                'usage': usage_data,
+                'response_id': response.id,
+            }
+
+        except (BadRequestError, NotFoundError) as e:
+            if previous_response_id and (isinstance(e, NotFoundError) or getattr(e, 'param', None) == 'previous_response_id'):
+                logger.info(f"Resposta anterior {previous_response_id} expirou na OpenAI.")
+                raise ConversationChainExpiredError(f"Resposta anterior expirada: {previous_response_id}")
+            logger.error(f"Erro na API da OpenAI: {e.status_code} - {e.response}")
+            raise AIAPIError(f"A API da OpenAI retornou um erro: {getattr(e, 'message', str(e))}")
+        except AuthenticationError as e:
+            logger.error(f"Erro de autenticação com a API da OpenAI: {e}")
+            raise AIAuthenticationError(f"Erro de autenticação com a OpenAI: {e}")
+        except APIError as e:
+            logger.error(f"Erro na API da OpenAI: {getattr(e, 'status_code', '-')} - {getattr(e, 'response', '-')}")
+            raise AIAPIError(f"A API da OpenAI retornou um erro: {getattr(e, 'message', str(e))}")
+        except Exception as e:
+            logger.error(f"Erro inesperado ao chamar a API da OpenAI: {e}", exc_info=True)
+            raise AIAPIError("Um erro inesperado ocorreu ao se comunicar com a OpenAI.")
+
+    @staticmethod
+    def _to_response_items(messages: list) -> list:
+        """Converte mensagens do Chat Completions em itens de entrada da API de Responses."""
+        items = []
+        for message in messages:
+            if message['role'] == 'tool':
+                items.append({"type": "function_call_output", "call_id": message['tool_call_id'], "output": message['content']})
+                continue
+            if message.get('content'):
+                items.append({"role": message['role'], "content": message['content']})
+            for tool_call in message.get('tool_calls') or []:
+                items.append({
+                    "type": "function_call", "call_id": tool_call['id'],
+                    "name": tool_call['function']['name'], "arguments": tool_call['function']['arguments'],
+                })
+        return items
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Estado Quente das Conversas do App 'dzaion'.
+
+O estado da conversa ativa de cada usuário (processo de pensamento, status,
+prazo de validade) e uma janela com as últimas mensagens ficam no Redis.
+A cada turno, o Orquestrador lê e grava apenas no Redis; as alterações são
+acumuladas em uma fila de write-behind e gravadas em lote nos modelos do
+Django pela tarefa `flush_conversation_state`.
+
+- O banco continua sendo o registro definitivo: quando o estado não está no
+  Redis (primeira mensagem, expiração), o Orquestrador consulta o banco e
+  aquece o cache.
+- As mensagens são criadas com `bulk_create`, que não dispara o `post_save`;
+  o índice de memória (BM25) é atualizado explicitamente no flush.
+- Conversas encerradas deixam uma marca (tombstone) por alguns minutos, para
+  que o banco (ainda não atualizado) não ressuscite o processo finalizado.
+- A fila é consumida de forma confiável: cada lote é movido (LMOVE) para uma
+  lista de processamento e só é removido dela depois do commit. Se o flusher
+  morrer no meio, o lote é reaplicado na execução seguinte (`apply` é
+  idempotente).
+
+Author: Dzaion
+Version: 0.3.0
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.utils.redis_client import get_redis_client
+from .models import AIThoughtProcess, Conversation, DzaionAction, Message
+from .retrieval import MessageMemoryIndex
+
+logger = logging.getLogger('dzaion')
+
+STATE_KEY = 'dzaion:conv:state:{}'
+WINDOW_KEY = 'dzaion:conv:window:{}'
+PENDING_KEY = 'dzaion:conv:pending'
+PROCESSING_KEY = 'dzaion:conv:pending:processing'
+LOCK_KEY = 'dzaion:conv:flush:lock'
+
+CLOSED_STATUSES = (AIThoughtProcess.ProcessStatus.FINISHED, AIThoughtProcess.ProcessStatus.FAILED)
+
+
+class ConversationStateStore:
+    """
+    Estado quente das conversas no Redis, com persistência write-behind.
+    """
+
+    # --- Leitura ---
+
+    @staticmethod
+    def get_active(user) -> dict | None:
+        """
+        Estado da conversa ativa do usuário no Redis.
+        Retorna None quando o estado não está em cache (consultar o banco) e
+        `{'active': False}` quando se sabe que não há processo ativo.
+        """
+        raw = get_redis_client().get(STATE_KEY.format(user.pk))
+        if not raw:
+            return None
+        state = json.loads(raw)
+        if state['active'] and state['expires_at'] <= time.time():
+            # Expirado: o caminho do banco marca o processo como FAILED.
+            return None
+        return state
+
+    @staticmethod
+    def restore(user, state: dict) -> AIThoughtProcess:
+        """
+        Reconstrói o processo e a conversa a partir do estado em cache, sem
+        consultá-los no banco (apenas a ação é carregada).
+        """
+        action = DzaionAction.objects.select_related('default_model', 'cascade_model').get(pk=state['action_id'])
+        conversation = Conversation(
+            id=uuid.UUID(state['conversation_id']),
+            user_id=state['conversation_user_id'],
+            tenant_id=state['conversation_tenant_id'],
+            initial_action=action,
+            status=state['conversation_status'],
+            last_response_id=state.get('conversation_last_response_id'),
+        )
+        thought_process = AIThoughtProcess(
+            id=uuid.UUID(state['thought_process_id']),
+            user=user,
+            tenant_context_id=state['tenant_context_id'],
+            action=action,
+            conversation=conversation,
+            status=state['status'],
+            expires_at=datetime.fromtimestamp(state['expires_at'], tz=timezone.get_current_timezone()),
+        )
+        # Instâncias que já existem no banco: save() faz UPDATE, não INSERT.
+        for instance in (conversation, thought_process):
+            instance._state.adding = False
+            instance._state.db = 'default'
+        return thought_process
+
+    @staticmethod
+    def load_window(conversation: Conversation, limit: int | None = None) -> list[dict] | None:
+        """
+        Histórico da conversa no formato de mensagens do LLM, a partir da janela
+        em cache. Retorna None se a janela não estiver no Redis.
+        """
+        redis = get_redis_client()
+        key = WINDOW_KEY.format(conversation.pk)
+        pipeline = redis.pipeline()
+        pipeline.exists(key)
+        pipeline.lrange(key, -limit if limit else 0, -1)
+        exists, raw_messages = pipeline.execute()
+        if not exists:
+            return None
+        history = []
+        for raw in raw_messages:
+            message = json.loads(raw)
+            if message.get('content') is None:
+                continue  # marcador da janela vazia
+            role = "user" if message['direction'] == Message.Direction.INBOUND else "assistant"
+            history.append({"role": role, "content": message['content']})
+        return history
+
+    # --- Escrita ---
+
+    @staticmethod
+    def remember(thought_process: AIThoughtProcess, history: list[dict] | None = None):
+        """
+        Aquece o cache com um processo lido ou criado no banco (sem write-behind).
+        `history` (mensagens do LLM, da mais antiga para a mais recente) semeia a janela.
+        """
+        redis = get_redis_client()
+        pipeline = redis.pipeline()
+        ttl = ConversationStateStore._set_state(pipeline, thought_process)
+        if history is not None:
+            key = WINDOW_KEY.format(thought_process.conversation_id)
+            entries = [
+                json.dumps({
+                    'direction': Message.Direction.INBOUND if item['role'] == 'user' else Message.Direction.OUTBOUND,
+                    'content': item['content'],
+                })
+                for item in history[-settings.DZAION_CONVERSATION_STATE['WINDOW_SIZE']:]
+            ]
+            pipeline.delete(key)
+            # Uma janela vazia também fica em cache, para não voltar ao banco a cada turno.
+            pipeline.rpush(key, *(entries or [json.dumps({'content': None})]))
+            pipeline.expire(key, ttl)
+        pipeline.execute()
+
+    @staticmethod
+    def append_message(conversation: Conversation, owner_user_id, direction: str, content: str, status: str) -> Message:
+        """
+        Acrescenta a mensagem à janela em cache e à fila de write-behind.
+        Retorna a instância (ainda não gravada) com o ID definitivo.
+        """
+        message = Message(
+            id=uuid.uuid4(), conversation_id=conversation.pk, direction=direction, content=content, status=status,
+            created_at=timezone.now(),
+        )
+        config = settings.DZAION_CONVERSATION_STATE
+        window_key = WINDOW_KEY.format(conversation.pk)
+        pipeline = get_redis_client().pipeline()
+        # RPUSHX: sem janela em cache, o histórico é relido do banco (não há janela parcial).
+        pipeline.rpushx(window_key, json.dumps({'direction': direction, 'content': content}))
+        pipeline.ltrim(window_key, -config['WINDOW_SIZE'], -1)
+        pipeline.rpush(PENDING_KEY, json.dumps({
+            'op': 'message',
+            'id': str(message.id),
+            'conversation_id': str(conversation.pk),
+            'owner_user_id': str(owner_user_id),
+            'direction': direction,
+            'content': content,
+            'status': status,
+            'created_at': message.created_at.isoformat(),
+        }))
+        pipeline.execute()
+        return message
+
+    @staticmethod
+    def save_state(thought_process: AIThoughtProcess, conversation: Conversation):
+        """
+        Grava o estado do turno no Redis e agenda a persistência do processo e
+        da conversa. Renova o prazo de validade como o `AIThoughtProcess.save`.
+        """
+        seconds = thought_process.action.default_expiration_seconds
+        if seconds > 0:
+            thought_process.expires_at = timezone.now() + timedelta(seconds=seconds)
+        pipeline = get_redis_client().pipeline()
+        ttl = ConversationStateStore._set_state(pipeline, thought_process)
+        pipeline.expire(WINDOW_KEY.format(conversation.pk), ttl)
+        pipeline.rpush(PENDING_KEY, json.dumps({
+            'op': 'process',
+            'id': str(thought_process.pk),
+            'status': thought_process.status,
+            'expires_at': thought_process.expires_at.isoformat(),
+            'conversation_id': str(conversation.pk),
+            'conversation_status': conversation.status,
+            'conversation_last_response_id': conversation.last_response_id,
+        }))
+        pipeline.execute()
+
+    @staticmethod
+    def mark_message_status(message_id: str, status: str, provider_message_ids: list[str] | None = None):
+        """Agenda uma atualização de status para uma mensagem que ainda não chegou ao banco."""
+        get_redis_client().rpush(PENDING_KEY, json.dumps({
+            'op': 'message_status', 'id': message_id, 'status': status, 'provider_message_ids': provider_message_ids,
+        }))
+
+    @staticmethod
+    def _set_state(pipeline, thought_process: AIThoughtProcess) -> int:
+        config = settings.DZAION_CONVERSATION_STATE
+        active = thought_process.status not in CLOSED_STATUSES
+        expires_at = thought_process.expires_at.timestamp()
+        if active:
+            ttl = int(min(max(expires_at - time.time(), 1), config['MAX_TTL_SECONDS']))
+        else:
+            ttl = config['TOMBSTONE_SECONDS']
+        conversation = thought_process.conversation
+        state = {
+            'active': active,
+            'thought_process_id': str(thought_process.pk),
+            'action_id': str(thought_process.action_id),
+            'tenant_context_id': str(thought_process.tenant_context_id) if thought_process.tenant_context_id else None,
+            'status': thought_process.status,
+            'expires_at': expires_at,
+            'conversation_id': str(conversation.pk),
+            'conversation_user_id': str(conversation.user_id) if conversation.user_id else None,
+            'conversation_tenant_id': str(conversation.tenant_id) if conversation.tenant_id else None,
+            'conversation_status': conversation.status,
+            'conversation_last_response_id': conversation.last_response_id,
+        }
+        pipeline.set(STATE_KEY.format(thought_process.user_id), json.dumps(state), ex=ttl)
+        return ttl
+
+    # --- Persistência (write-behind) ---
+
+    @staticmethod
+    def flush() -> int:
+        """
+        Grava no banco as alterações acumuladas. Um único flusher por vez, para
+        que os lotes sejam aplicados na ordem em que foram gerados.
+        Retorna quantas operações foram aplicadas.
+        """
+        lock = get_redis_client().lock(LOCK_KEY, timeout=120, blocking=False)
+        if not lock.acquire():
+            logger.info("Flush do estado das conversas já em andamento; execução ignorada.")
+            return 0
+        try:
+            batch_size = settings.DZAION_CONVERSATION_STATE['FLUSH_BATCH_SIZE']
+            applied = 0
+            while True:
+                raw_ops = ConversationStateStore.drain(batch_size)
+                if not raw_ops:
+                    break
+                # Se o apply falhar, o lote fica na lista de processamento e é
+                # retomado (antes dos mais novos) na próxima execução.
+                with transaction.atomic():
+                    ConversationStateStore.apply(raw_ops)
+                ConversationStateStore.acknowledge()
+                applied += len(raw_ops)
+                if len(raw_ops) < batch_size:
+                    break
+            return applied
+        finally:
+            lock.release()
+
+    @staticmethod
+    def drain(batch_size: int) -> list[str]:
+        """
+        Próximo lote a gravar. Um lote que ficou na lista de processamento
+        (falha ou queda do flusher) é devolvido antes de qualquer outro;
+        senão, até `batch_size` operações são movidas atomicamente da fila
+        para a lista de processamento.
+        """
+        redis = get_redis_client()
+        raw_ops = redis.lrange(PROCESSING_KEY, 0, -1)
+        if raw_ops:
+            logger.warning(f"Retomando {len(raw_ops)} operação(ões) de um flush interrompido.")
+            return raw_ops
+        pipeline = redis.pipeline(transaction=True)
+        for _ in range(batch_size):
+            pipeline.lmove(PENDING_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+        return [raw for raw in pipeline.execute() if raw is not None]
+
+    @staticmethod
+    def acknowledge():
+        """Descarta o lote em processamento, depois do commit."""
+        get_redis_client().delete(PROCESSING_KEY)
+
+    @staticmethod
+    def apply(raw_ops: list[str]) -> dict:
+        """
+        Grava um lote da fila de write-behind: mensagens em um `bulk_create`
+        (idempotente), o índice de memória dessas mensagens, os status de
+        mensagens e o último estado de cada processo/conversa. Reaplicar o
+        mesmo lote não altera o resultado.
+        """
+        ops = [json.loads(raw) for raw in raw_ops]
+        message_ops = [op for op in ops if op['op'] == 'message']
+
+        messages = [
+            Message(
+                id=op['id'], conversation_id=op['conversation_id'], direction=op['direction'],
+                content=op['content'], status=op['status'],
+            )
+            for op in message_ops
+        ]
+        if messages:
+            Message.objects.bulk_create(messages, ignore_conflicts=True)
+            # O `auto_now_add` sobrescreve o horário no bulk_create; restaura o horário real do turno,
+            # que define a ordem do histórico.
+            for message, op in zip(messages, message_ops):
+                message.created_at = datetime.fromisoformat(op['created_at'])
+            Message.objects.bulk_update(messages, ['created_at'])
+            MessageMemoryIndex.index_messages(messages, {op['conversation_id']: op['owner_user_id'] for op in message_ops})
+
+        for op in ops:
+            if op['op'] == 'message_status':
+                fields = {'status': op['status']}
+                if op.get('provider_message_ids'):
+                    fields['provider_message_id'] = op['provider_message_ids'][0]
+                    fields['provider_message_ids'] = op['provider_message_ids']
+                elif op.get('provider_message_id'):
+                    # Operação enfileirada antes do registro de todas as partes.
+                    fields['provider_message_id'] = op['provider_message_id']
+                    fields['provider_message_ids'] = [op['provider_message_id']]
+                Message.objects.filter(pk=op['id']).update(**fields)
+
+        # Vale o último estado de cada processo no lote.
+        processes = {op['id']: op for op in ops if op['op'] == 'process'}
+        now = timezone.now()
+        for op in processes.values():
+            AIThoughtProcess.objects.filter(pk=op['id']).update(
+                status=op['status'], expires_at=datetime.fromisoformat(op['expires_at']), updated_at=now
+            )
+            Conversation.objects.filter(pk=op['conversation_id']).update(
+                status=op['conversation_status'], last_response_id=op.get('conversation_last_response_id'), updated_at=now
+            )
+
+        return {'messages': len(messages), 'processes': len(processes)}
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Prazos (Deadlines) das Missões do App 'dzaion'.
+
+Cada missão tem um prazo de ponta a ponta, definido em `DZAION_DEADLINES`
+pelo tipo de missão e pelo `service_tier` do contratante. Para as missões
+REACTIVE, ele conta a partir do momento em que a mensagem foi enfileirada;
+para as PROACTIVE, a partir da liberação pelo escalonador (a espera imposta
+pelo ritmo da campanha não consome o prazo). Esgotado o prazo, apenas a
+missão REACTIVE responde ao usuário com um pedido de desculpas. Cada fase recebe o tempo restante como
+timeout (chamadas à OpenAI, ferramentas, envio da resposta), e o
+Orquestrador passa para alternativas mais baratas quando sobra pouco tempo.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import logging
+import math
+import time
+
+from django.conf import settings
+
+from .exceptions import MissionDeadlineExceededError
+from .metrics import DzaionMetrics
+
+logger = logging.getLogger('dzaion')
+
+
+class MissionDeadline:
+    """
+    O prazo de uma missão, como instante absoluto (epoch). Com os prazos
+    desligados, o prazo é infinito e as fases não recebem timeout.
+    """
+
+    def __init__(self, expires_at: float = math.inf):
+        self.expires_at = expires_at
+
+    @staticmethod
+    def budget(mission_type: str, service_tier: str) -> float:
+        budgets = settings.DZAION_DEADLINES['BUDGETS'].get(mission_type, {})
+        return budgets.get(service_tier, budgets.get('default', math.inf))
+
+    @classmethod
+    def for_mission(cls, mission_type: str, service_tier: str, started_at: float | None = None) -> 'MissionDeadline':
+        if not settings.DZAION_DEADLINES['ENABLED']:
+            return cls()
+        return cls((started_at or time.time()) + cls.budget(mission_type, service_tier))
+
+    def remaining(self) -> float:
+        return self.expires_at - time.time()
+
+    def is_low(self) -> bool:
+        """Sobra pouco tempo: o Orquestrador deve preferir as alternativas mais rápidas."""
+        return self.remaining() < settings.DZAION_DEADLINES['LOW_BUDGET_SECONDS']
+
+    def timeout(self, cap: float | None = None, floor: float | None = None) -> float | None:
+        """
+        Timeout de uma fase: o tempo restante, limitado pelo teto da fase e
+        nunca abaixo do mínimo. None quando não há prazo nem teto.
+        """
+        remaining = self.remaining()
+        if cap is not None:
+            remaining = min(remaining, cap)
+        if math.isinf(remaining):
+            return None
+        return max(remaining, floor if floor is not None else settings.DZAION_DEADLINES['MIN_PHASE_TIMEOUT'])
+
+    def check(self, phase: str):
+        """Encerra a missão se o prazo já acabou antes da fase começar."""
+        if self.remaining() > 0:
+            return
+        DzaionMetrics.increment('deadline_exceeded', phase=phase)
+        logger.warning(f"Prazo da missão esgotado antes da fase '{phase}'.")
+        raise MissionDeadlineExceededError(
+            "Desculpe, sua solicitação demorou mais do que o esperado. Pode me enviar de novo em instantes?"
+        )
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Avaliação Offline (Replay) do App 'dzaion'.
+
+Permite medir o efeito de mudanças no prompt do roteador, no modelo do
+roteador, nos modelos das ações ou nos `parameters_schema` sem afetar
+usuários reais:
+
+1. `ReplayDatasetExporter` exporta pares históricos Message/AIThoughtProcess
+   anonimizados para um arquivo JSONL.
+2. `ReplayOrchestrator` reexecuta cada caso pelo `_route_reactive_intent` e
+   pelo `_execute_llm_interaction` do Orquestrador real, contra um cliente
+   plugável (OpenAIClient ou StubAIClient), sem gravar nada no banco e sem
+   executar ferramentas.
+3. `ReplayHarness` consolida acurácia do roteador vs. o verbo registrado,
+   tokens por missão e a distribuição de latência por AIModel.
+
+Author: Dzaion
+Version: 0.6.3
+"""
+import hashlib
+import hmac
+import json
+import logging
+import re
+import statistics
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from openai.types.chat import ChatCompletionMessage
+
+from accounts.models import User
+from guards.services import GuardService
+from .models import AIModel, AIThoughtProcess, DzaionAction, Message
+from .metrics import percentile
+from .orchestrators import DzaionOrchestrator
+from .retrieval import tokenize
+
+logger = logging.getLogger('dzaion')
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+CPF_PATTERN = re.compile(r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b')
+PHONE_PATTERN = re.compile(r'\+?\(?\d[\d\s().-]{7,}\d')
+
+
+def anonymize_text(text: str, user: User | None = None) -> str:
+    """
+    Remove dados pessoais de um texto: e-mails, CPFs, telefones e o nome do usuário.
+    """
+    # Padrões estruturados primeiro: o nome costuma aparecer dentro do e-mail
+    # e, trocado antes, deixaria o endereço fora do padrão.
+    text = EMAIL_PATTERN.sub('[EMAIL]', text or '')
+    text = CPF_PATTERN.sub('[CPF]', text)
+    text = PHONE_PATTERN.sub('[TELEFONE]', text)
+    if user is not None:
+        for part in (user.name or '').split():
+            if len(part) > 2:
+                text = re.sub(rf'\b{re.escape(part)}\b', '[NOME]', text, flags=re.IGNORECASE)
+    return text
+
+
+def pseudonymize(value) -> str:
+    """Gera um identificador estável e irreversível (HMAC com a SECRET_KEY)."""
+    return hmac.new(settings.SECRET_KEY.encode(), str(value).encode(), hashlib.sha256).hexdigest()[:16]
+
+
+class ReplayDatasetExporter:
+    """
+    Exporta casos de replay a partir do histórico de processos de pensamento.
+    """
+
+    @staticmethod
+    def build_case(thought_process: AIThoughtProcess) -> dict | None:
+        messages = list(thought_process.conversation.messages.order_by('created_at'))
+        first_inbound = next((m for m in messages if m.direction == Message.Direction.INBOUND), None)
+        if first_inbound is None:
+            return None
+
+        user = thought_process.user
+        position = messages.index(first_inbound)
+        history = [
+            {"role": "user" if m.direction == Message.Direction.INBOUND else "assistant",
+             "content": anonymize_text(m.content, user)}
+            for m in messages[:position]
+        ]
+        recorded_reply = next(
+            (m.content for m in messages[position + 1:] if m.direction == Message.Direction.OUTBOUND), None
+        )
+        permitted_verbs = list(
+            GuardService.get_user_dzaion_actions(user, thought_process.tenant_context).values_list('verb_code', flat=True)
+        )
+        return {
+            'case_id': pseudonymize(thought_process.id),
+            'user_ref': pseudonymize(user.id),
+            'expected_verb': thought_process.action.verb_code,
+            'message_body': anonymize_text(first_inbound.content, user),
+            'history': history,
+            'recorded_reply': anonymize_text(recorded_reply, user) if recorded_reply else None,
+            'permitted_verbs': permitted_verbs,
+            'created_at': thought_process.created_at.isoformat(),
+        }
+
+    @staticmethod
+    def export(output_path: str, since=None, limit: int | None = None) -> int:
+        queryset = AIThoughtProcess.objects.select_related(
+            'user', 'action', 'conversation', 'tenant_context'
+        ).order_by('-created_at')
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        if limit:
+            queryset = queryset[:limit]
+
+        exported = 0
+        with open(output_path, 'w', encoding='utf-8') as output:
+            for thought_process in queryset.iterator(chunk_size=500):
+                case = ReplayDatasetExporter.build_case(thought_process)
+                if case:
+                    output.write(json.dumps(case, ensure_ascii=False) + '\n')
+                    exported += 1
+        logger.info(f"{exported} casos de replay exportados para {output_path}.")
+        return exported
+
+    @staticmethod
+    def load(dataset_path: str) -> list[dict]:
+        with open(dataset_path, encoding='utf-8') as dataset:
+            return [json.loads(line) for line in dataset if line.strip()]
+
+
+class StubAIClient:
+    """
+    Cliente de IA local, sem rede, com a mesma interface do OpenAIClient.
+
+    - Como roteador, escolhe o verbo do cardápio com maior sobreposição de
+      termos com a mensagem do usuário (ou 'general_chat').
+    - Como modelo principal, chama a ferramenta disponível ou responde com texto.
+    O uso de tokens é estimado em ~4 caracteres por token.
+    """
+    MENU_PATTERN = re.compile(r"- '([^']+)': (.*)")
+
+    def __init__(self, call_tools: bool = True, reply_text: str = "Certo, tudo pronto!"):
+        self.call_tools = call_tools
+        self.reply_text = reply_text
+
+    def generate_response(self, model: str, messages: list, tools: list | None = None, service_tier: str = 'auto', **kwargs) -> dict:
+        system_prompt = next((m.get('content') or '' for m in messages if isinstance(m, dict) and m.get('role') == 'system'), '')
+        last_user = next((m.get('content') or '' for m in reversed(messages) if isinstance(m, dict) and m.get('role') == 'user'), '')
+
+        if 'CARDÁPIO DE AÇÕES PERMITIDAS' in system_prompt:
+            message = ChatCompletionMessage(role='assistant', content=self._route(system_prompt, last_user))
+        elif tools and self.call_tools and not any(isinstance(m, dict) and m.get('role') == 'tool' for m in messages):
+            tool_name = tools[0]['function']['name']
+            message = ChatCompletionMessage.model_validate({
+                'role': 'assistant', 'content': None,
+                'tool_calls': [{'id': 'stub-call-1', 'type': 'function', 'function': {'name': tool_name, 'arguments': '{}'}}],
+            })
+        else:
+            message = ChatCompletionMessage(role='assistant', content=self.reply_text)
+
+        input_chars = sum(len(json.dumps(m, default=str)) for m in messages)
+        output_chars = len(json.dumps(message.model_dump(), default=str))
+        usage = {'input_tokens': input_chars // 4, 'output_tokens': output_chars // 4}
+        usage['total_tokens'] = usage['input_tokens'] + usage['output_tokens']
+        return {'message': message, 'usage': usage}
+
+    def _route(self, system_prompt: str, user_message: str) -> str:
+        message_terms = set(tokenize(user_message))
+        best_verb, best_overlap = 'general_chat', 0
+        for verb_code, name in self.MENU_PATTERN.findall(system_prompt):
+            overlap = len(message_terms & set(tokenize(f"{name} {verb_code.replace('_', ' ')}")))
+            if overlap > best_overlap:
+                best_verb, best_overlap = verb_code, overlap
+        return best_verb
+
+
+class InstrumentedClient:
+    """
+    Envolve um cliente de IA registrando latência e tokens de cada chamada.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls: list[dict] = []
+
+    def generate_response(self, model: str, messages: list, **kwargs) -> dict:
+        started = time.perf_counter()
+        response = self.inner.generate_response(model=model, messages=messages, **kwargs)
+        self.calls.append({
+            'model': model,
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'input_tokens': response['usage'].get('input_tokens', 0),
+            'output_tokens': response['usage'].get('output_tokens', 0),
+        })
+        return response
+
+
+class _ReplayRecord:
+    """Substituto sem persistência para o AIThoughtProcess/Conversation durante o replay."""
+    id = 'replay'
+    # Sem cadeia na API de Responses: o Orquestrador lê e grava este campo da conversa.
+    last_response_id = None
+
+    def __init__(self):
+        self.status = None
+
+    def save(self, *args, **kwargs):
+        pass
+
+
+class ReplayOrchestrator(DzaionOrchestrator):
+    """
+    Orquestrador de replay: usa a lógica real de roteamento e interação com o LLM,
+    mas lê o contexto do caso exportado e não grava nem executa nada.
+    """
+
+    def __init__(self, case: dict, client, router_model: AIModel | None = None, ai_model: AIModel | None = None):
+        super().__init__(
+            {'mission_type': 'REACTIVE', 'trigger_info': {'message_body': case['message_body']}},
+            client=client,
+        )
+        self.case = case
+        self.user = User(name='Usuário Anônimo')
+        self.router_model_override = router_model
+        self.ai_model_override = ai_model
+        self.escalations = []
+
+    def _get_user_actions(self):
+        return DzaionAction.objects.filter(verb_code__in=self.case['permitted_verbs'], is_active=True)
+
+    def _get_router_model(self) -> AIModel:
+        return self.router_model_override or super()._get_router_model()
+
+    def _load_conversation_history(self, limit: int = None) -> list:
+        history = list(self.case.get('history', []))
+        return history[-limit:] if limit else history
+
+    def _build_memory_context(self) -> str:
+        return ""
+
+    def _save_message(self, content: str, direction: str, status: str = 'SENT'):
+        return None
+
+    def _persist_interaction_state(self):
+        pass
+
+    def _should_suspend_for_tools(self) -> bool:
+        return False
+
+    def _classify_locally(self, allowed_verbs: set) -> str | None:
+        # O replay mede o roteador (LLM); o classificador local é avaliado pelo próprio treino.
+        return None
+
+    def _use_single_call_routing(self, user_actions) -> bool:
+        # O replay avalia o roteador: a decisão sempre passa por ele.
+        return False
+
+    def _responses_api_enabled(self) -> bool:
+        # Os casos não têm conversa na OpenAI: o histórico vai completo em cada chamada.
+        return False
+
+    def _execute_tool_call(self, tool_call: dict) -> dict:
+        content = json.dumps({"status": "success", "message": "Execução simulada (replay)."})
+        return {'tool_call_id': tool_call['id'], 'name': tool_call['function']['name'], 'status': 'success', 'content': content}
+
+    def _log_escalation(self, from_model: AIModel, reason: str, detail: str, usage: dict):
+        self.escalations.append({'from_model': from_model.identifier, 'reason': reason})
+
+    def replay(self) -> dict:
+        predicted_verb = self._route_reactive_intent()
+        self.dzaion_action = DzaionAction.objects.select_related('default_model').get(verb_code=predicted_verb)
+        self.ai_model = self.ai_model_override or self.dzaion_action.default_model or AIModel.objects.first()
+        self.thought_process = _ReplayRecord()
+        self.conversation = _ReplayRecord()
+        result = self._execute_llm_interaction()
+        return {
+            'predicted_verb': predicted_verb,
+            'text': result.get('text'),
+            'usage': dict(self.total_usage),
+            'escalations': self.escalations,
+        }
+
+
+class ReplayHarness:
+    """
+    Executa um dataset de replay e consolida o relatório de avaliação.
+    """
+
+    def __init__(self, client, router_model: AIModel | None = None, ai_model: AIModel | None = None):
+        self.client = InstrumentedClient(client)
+        self.router_model = router_model
+        self.ai_model = ai_model
+
+    def run(self, cases: list[dict]) -> dict:
+        results = []
+        for case in cases:
+            calls_before = len(self.client.calls)
+            started = time.perf_counter()
+            try:
+                # Garante que nada do replay seja persistido, mesmo por efeitos colaterais.
+                with transaction.atomic():
+                    outcome = ReplayOrchestrator(case, self.client, self.router_model, self.ai_model).replay()
+                    transaction.set_rollback(True)
+                error = None
+            except Exception as e:
+                logger.warning(f"Caso {case.get('case_id')} falhou no replay: {e}")
+                outcome = {'predicted_verb': None, 'usage': {'input_tokens': 0, 'output_tokens': 0}, 'escalations': []}
+                error = str(e)
+            results.append({
+                'case_id': case.get('case_id'),
+                'expected_verb': case.get('expected_verb'),
+                'predicted_verb': outcome['predicted_verb'],
+                'tokens': outcome['usage']['input_tokens'] + outcome['usage']['output_tokens'],
+                'latency_ms': (time.perf_counter() - started) * 1000,
+                'calls': self.client.calls[calls_before:],
+                'escalations': outcome['escalations'],
+                'error': error,
+            })
+        return self.build_report(results)
+
+    @staticmethod
+    def build_report(results: list[dict]) -> dict:
+        total = len(results)
+        correct = sum(1 for r in results if r['predicted_verb'] == r['expected_verb'])
+        tokens = [r['tokens'] for r in results if not r['error']]
+        mission_latency = [r['latency_ms'] for r in results if not r['error']]
+
+        confusion: dict[str, Counter] = defaultdict(Counter)
+        for r in results:
+            confusion[r['expected_verb']][r['predicted_verb'] or 'ERRO'] += 1
+
+        per_model: dict[str, dict] = defaultdict(lambda: {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'latencies': []})
+        for r in results:
+            for call in r['calls']:
+                stats = per_model[call['model']]
+                stats['calls'] += 1
+                stats['input_tokens'] += call['input_tokens']
+                stats['output_tokens'] += call['output_tokens']
+                stats['latencies'].append(call['latency_ms'])
+
+        models = {}
+        for identifier, stats in per_model.items():
+            latencies = stats.pop('latencies')
+            models[identifier] = {
+                **stats,
+                'latency_ms': {
+                    'mean': round(statistics.fmean(latencies), 2),
+                    'p50': round(percentile(latencies, 0.50), 2),
+                    'p90': round(percentile(latencies, 0.90), 2),
+                    'p99': round(percentile(latencies, 0.99), 2),
+                },
+            }
+
+        return {
+            'cases': total,
+            'errors': sum(1 for r in results if r['error']),
+            'router_accuracy': round(correct / total, 4) if total else 0.0,
+            'tokens_per_mission': {
+                'mean': round(statistics.fmean(tokens), 1) if tokens else 0,
+                'p50': percentile(tokens, 0.50),
+                'p90': percentile(tokens, 0.90),
+                'max': max(tokens) if tokens else 0,
+            },
+            'mission_latency_ms': {
+                'p50': round(percentile(mission_latency, 0.50), 2),
+                'p90': round(percentile(mission_latency, 0.90), 2),
+                'p99': round(percentile(mission_latency, 0.99), 2),
+            },
+            'models': models,
+            'escalation_rate': round(sum(1 for r in results if r.get('escalations')) / total, 4) if total else 0.0,
+            'confusion': {expected: dict(predicted) for expected, predicted in confusion.items()},
+        }
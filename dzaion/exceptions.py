@@ -3,7 +3,7 @@
 Módulo de Exceções Customizadas para o App 'dzaion'.
 
 Author: Dzaion
-Version: 0.1.0
+Version: 0.5.0
 """
 
 class DzaionError(Exception):
@@ -22,6 +22,10 @@ class IntentClassificationError(DzaionError):
     """Lançada quando a intenção do usuário não pode ser classificada."""
     pass
 
+class MissionDeadlineExceededError(DzaionError):
+    """Lançada quando o prazo de ponta a ponta da missão se esgota antes de uma fase."""
+    pass
+
 class AIClientError(DzaionError):
     """Classe base para erros do cliente da API de IA."""
     pass
@@ -34,3 +38,29 @@ class AIAPIError(AIClientError):
     """Lançada quando a API da OpenAI retorna um erro de negócio."""
     pass
 
+class ConversationChainExpiredError(AIClientError):
+    """Lançada quando a resposta anterior (`previous_response_id`) não existe mais na OpenAI."""
+    pass
+
+
+class DispatchError(DzaionError):
+    """Classe base para erros do pipeline de envio de mensagens (outbound)."""
+    pass
+
+class DispatchRateLimitedError(DispatchError):
+    """Lançada quando o envio excede o limite de taxa do destinatário ou da conta."""
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CampaignError(DzaionError):
+    """Lançada quando uma campanha proativa não pode ser criada ou alterada."""
+    pass
+
+
+class MissionPublishError(DzaionError):
+    """Lançada quando a publicação de missões no broker falha; `published` conta as que foram publicadas antes."""
+    def __init__(self, message: str, published: int):
+        super().__init__(message)
+        self.published = published
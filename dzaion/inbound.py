@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Caminho de Entrada (Inbound) do App 'dzaion'.
+
+Recebe as mensagens do provedor de WhatsApp e as transforma em missões
+REACTIVE sem tocar no banco de dados: a deduplicação é feita no Redis
+(SET NX com TTL) pelo ID da mensagem no provedor, de modo que as
+retentativas do provedor não geram missões (nem gastos de LLM) duplicados.
+As missões são entregues ao `FairScheduler`, na sub-fila do pagador.
+
+Author: Dzaion
+Version: 0.5.0
+"""
+import logging
+import re
+import time
+import uuid
+
+from django.conf import settings
+
+from core.utils.redis_client import get_redis_client
+from .scheduler import FairScheduler
+
+logger = logging.getLogger('dzaion')
+
+SEEN_KEY_PREFIX = 'dzaion:inbound:seen:'
+
+
+class InboundWebhookService:
+    """
+    Serviço que normaliza o payload do webhook e enfileira as missões.
+    """
+
+    @staticmethod
+    def extract_messages(payload) -> list[dict]:
+        """
+        Extrai as mensagens de texto recebidas de um payload do provedor.
+        Ignora ecos de mensagens enviadas pela própria conta.
+        """
+        if isinstance(payload, dict):
+            items = payload.get('messages') or ([payload] if payload.get('message_id') or payload.get('id') else [])
+        else:
+            items = payload or []
+
+        messages = []
+        for item in items:
+            if not isinstance(item, dict) or item.get('from_me') or item.get('fromMe'):
+                continue
+            provider_message_id = item.get('message_id') or item.get('id')
+            sender = item.get('from') or item.get('contact_phone_number') or item.get('phone')
+            body = item.get('body') or item.get('text') or item.get('message')
+            if isinstance(body, dict):
+                body = body.get('body')
+            if not (provider_message_id and sender and body):
+                continue
+            messages.append({
+                'provider_message_id': str(provider_message_id),
+                'whatsapp_number': InboundWebhookService.normalize_number(str(sender)),
+                'message_body': str(body),
+            })
+        return messages
+
+    @staticmethod
+    def extract_status_events(payload) -> list[dict]:
+        """Extrai os callbacks de status que o provedor envia pelo mesmo webhook."""
+        if isinstance(payload, dict):
+            return list(payload.get('statuses') or [])
+        return []
+
+    @staticmethod
+    def normalize_number(number: str) -> str:
+        """
+        Converte o remetente para E.164 de forma barata (sem phonenumbers),
+        ex: '5538999998888@c.us' -> '+5538999998888'.
+        """
+        digits = re.sub(r'\D', '', number.split('@')[0])
+        return f"+{digits}"
+
+    @staticmethod
+    def claim(provider_message_id: str) -> bool:
+        """
+        Marca a mensagem como vista. Retorna False se ela já foi recebida antes.
+        """
+        ttl = settings.DZAION_INBOUND['DEDUP_TTL']
+        return bool(get_redis_client().set(f"{SEEN_KEY_PREFIX}{provider_message_id}", 1, nx=True, ex=ttl))
+
+    @staticmethod
+    def release(provider_message_id: str):
+        """Desfaz a marcação, permitindo que a retentativa do provedor seja aceita."""
+        get_redis_client().delete(f"{SEEN_KEY_PREFIX}{provider_message_id}")
+
+    @staticmethod
+    def enqueue_missions(messages: list[dict]) -> dict:
+        """
+        Enfileira uma missão REACTIVE para cada mensagem inédita.
+        Se a missão não for aceita pelo escalonador, a marcação é desfeita e a
+        exceção é propagada, para que o provedor tente novamente. Uma missão
+        aceita nunca tem a marcação desfeita: a retentativa a duplicaria.
+        """
+        enqueued, duplicates = 0, 0
+        for message in messages:
+            provider_message_id = message['provider_message_id']
+            if not InboundWebhookService.claim(provider_message_id):
+                duplicates += 1
+                continue
+            try:
+                FairScheduler.submit({
+                    'mission_type': 'REACTIVE',
+                    'mission_id': str(uuid.uuid4()),
+                    'trigger_info': message,
+                    'enqueued_at': time.time(),
+                }, payer_key=FairScheduler.payer_for_sender(message['whatsapp_number']))
+            except Exception:
+                InboundWebhookService.release(provider_message_id)
+                raise
+            enqueued += 1
+
+        if duplicates:
+            logger.info(f"{duplicates} mensagem(ns) duplicada(s) ignorada(s) no webhook.")
+        return {'enqueued': enqueued, 'duplicates': duplicates}
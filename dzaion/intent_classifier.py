@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Classificador Local de Intenções do App 'dzaion'.
+
+Antes de pagar uma chamada ao Roteador Universal, o Orquestrador consulta
+um Naive Bayes multinomial sobre n-gramas de caracteres (com hashing),
+treinado pelo comando `train_intent_classifier` com as decisões de
+roteamento já registradas em `AIThoughtProcess.action`.
+
+- Os scores do Naive Bayes são muito confiantes (crescem com o tamanho da
+  mensagem); a probabilidade usada é o softmax dos scores divididos por uma
+  temperatura ajustada no conjunto de calibração (reservado do treino).
+- A probabilidade é a de todas as ações aprendidas: a massa das ações não
+  permitidas ao usuário não é redistribuída entre as permitidas.
+- Mensagens fora da distribuição (poucos n-gramas vistos no treino) e
+  cardápios com menos de 2 ações aprendidas seguem direto para o LLM.
+- Acima de `THRESHOLD` de confiança, a ação é decidida localmente, em
+  microssegundos e sem custo.
+- Abaixo dele (ou sem modelo treinado), a mensagem segue para o LLM.
+
+O modelo é salvo em `MODEL_PATH` (.npz) e carregado uma vez por processo,
+sendo recarregado quando o arquivo é substituído por um novo treino.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import logging
+import math
+import os
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .metrics import DzaionMetrics
+from .models import AIThoughtProcess, Message
+
+logger = logging.getLogger('dzaion')
+
+# Modelo carregado neste processo: (mtime do arquivo, modelo).
+_loaded: tuple[float, 'IntentClassifier'] | None = None
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+
+class IntentClassifier:
+    """
+    Naive Bayes multinomial sobre n-gramas de caracteres.
+    `feature_log_prob` tem uma linha por ação e uma coluna por balde do hashing;
+    `known_features` marca os baldes vistos no treino e `temperature` calibra
+    as probabilidades.
+    """
+
+    def __init__(self, labels: list[str], class_log_prior: np.ndarray, feature_log_prob: np.ndarray,
+                 ngram_range: tuple[int, int], n_features: int, known_features: np.ndarray | None = None,
+                 temperature: float = 1.0):
+        self.labels = labels
+        self.class_log_prior = class_log_prior
+        self.feature_log_prob = feature_log_prob
+        self.ngram_range = ngram_range
+        self.n_features = n_features
+        self.known_features = known_features
+        self.temperature = temperature
+        self.label_index = {label: index for index, label in enumerate(labels)}
+
+    # --- Vetorização ---
+
+    @staticmethod
+    def vectorize(text: str, ngram_range: tuple[int, int], n_features: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Baldes e contagens dos n-gramas da mensagem. O crc32 é estável entre
+        processos (o `hash()` do Python não é).
+        """
+        padded = f" {normalize_text(text)} "
+        buckets = [
+            zlib.crc32(padded[start:start + size].encode('ascii')) % n_features
+            for size in range(ngram_range[0], ngram_range[1] + 1)
+            for start in range(len(padded) - size + 1)
+        ]
+        if not buckets:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        indices, counts = np.unique(np.asarray(buckets, dtype=np.int64), return_counts=True)
+        return indices, counts.astype(np.float64)
+
+    # --- Treino ---
+
+    @classmethod
+    def fit(cls, texts: list[str], labels: list[str], ngram_range: tuple[int, int], n_features: int,
+            alpha: float = 1.0) -> 'IntentClassifier':
+        classes = sorted(set(labels))
+        class_index = {label: index for index, label in enumerate(classes)}
+        counts = np.zeros((len(classes), n_features), dtype=np.float64)
+        for text, label in zip(texts, labels):
+            indices, values = cls.vectorize(text, ngram_range, n_features)
+            counts[class_index[label], indices] += values
+
+        class_count = np.bincount([class_index[label] for label in labels], minlength=len(classes))
+        class_log_prior = np.log(class_count / class_count.sum())
+        smoothed = counts + alpha
+        feature_log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        return cls(
+            classes, class_log_prior, feature_log_prob.astype(np.float32), ngram_range, n_features,
+            known_features=counts.sum(axis=0) > 0,
+        )
+
+    def calibrate(self, texts: list[str], labels: list[str]) -> float:
+        """
+        Ajusta a temperatura que minimiza a log-verossimilhança negativa no
+        conjunto de calibração (exemplos fora do treino). Retorna a temperatura.
+        """
+        scores, targets = [], []
+        for text, label in zip(texts, labels):
+            text_scores = self._scores(text)
+            if text_scores is not None and label in self.label_index:
+                scores.append(text_scores)
+                targets.append(self.label_index[label])
+        if not scores:
+            return self.temperature
+
+        scores = np.vstack(scores).astype(np.float64)
+        rows = np.arange(len(targets))
+        best_temperature, best_loss = 1.0, math.inf
+        for temperature in np.geomspace(1.0, 1000.0, 181):
+            log_probabilities = self._log_softmax(scores / temperature)
+            loss = -float(log_probabilities[rows, targets].mean())
+            if loss < best_loss:
+                best_temperature, best_loss = float(temperature), loss
+        self.temperature = best_temperature
+        return best_temperature
+
+    # --- Predição ---
+
+    def coverage(self, indices: np.ndarray, counts: np.ndarray) -> float:
+        """Fração dos n-gramas da mensagem que apareceram no treino."""
+        if self.known_features is None or not counts.sum():
+            return 1.0
+        return float(counts[self.known_features[indices]].sum() / counts.sum())
+
+    def predict(self, text: str, allowed: set[str] | None = None, min_coverage: float = 0.0) -> tuple[str | None, float]:
+        """
+        Ação permitida mais provável e sua probabilidade calibrada, calculada
+        sobre todas as ações aprendidas. Retorna `(None, 0.0)` quando há menos
+        de 2 ações aprendidas permitidas ou quando a mensagem está fora da
+        distribuição do treino (cobertura abaixo de `min_coverage`).
+        """
+        candidates = [index for label, index in self.label_index.items() if allowed is None or label in allowed]
+        if len(candidates) < 2:
+            return None, 0.0
+        indices, counts = self.vectorize(text, self.ngram_range, self.n_features)
+        if not indices.size or self.coverage(indices, counts) < min_coverage:
+            return None, 0.0
+        scores = self.class_log_prior + self.feature_log_prob[:, indices] @ counts
+        probabilities = np.exp(self._log_softmax(scores / self.temperature))
+        rows = np.asarray(candidates)
+        best = rows[int(probabilities[rows].argmax())]
+        return self.labels[best], float(probabilities[best])
+
+    def _scores(self, text: str) -> np.ndarray | None:
+        indices, counts = self.vectorize(text, self.ngram_range, self.n_features)
+        if not indices.size:
+            return None
+        return self.class_log_prior + self.feature_log_prob[:, indices] @ counts
+
+    @staticmethod
+    def _log_softmax(scores: np.ndarray) -> np.ndarray:
+        shifted = scores - scores.max(axis=-1, keepdims=True)
+        return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+    # --- Persistência ---
+
+    def save(self, path: str):
+        """Grava o modelo de forma atômica: os workers nunca leem um arquivo pela metade."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary = f"{path}.tmp.npz"
+        np.savez_compressed(
+            temporary,
+            labels=np.asarray(self.labels),
+            class_log_prior=self.class_log_prior,
+            feature_log_prob=self.feature_log_prob,
+            ngram_range=np.asarray(self.ngram_range),
+            n_features=np.asarray(self.n_features),
+            known_features=np.packbits(self.known_features) if self.known_features is not None else np.empty(0, np.uint8),
+            temperature=np.asarray(self.temperature),
+        )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'IntentClassifier':
+        with np.load(path) as data:
+            n_features = int(data['n_features'])
+            # Modelos anteriores à calibração não têm `known_features` nem `temperature`.
+            packed = data['known_features'] if 'known_features' in data.files else np.empty(0, np.uint8)
+            return cls(
+                labels=[str(label) for label in data['labels']],
+                class_log_prior=data['class_log_prior'],
+                feature_log_prob=data['feature_log_prob'],
+                ngram_range=tuple(int(size) for size in data['ngram_range']),
+                n_features=n_features,
+                known_features=np.unpackbits(packed, count=n_features).astype(bool) if packed.size else None,
+                temperature=float(data['temperature']) if 'temperature' in data.files else 1.0,
+            )
+
+
+class IntentClassifierService:
+    """
+    Uso do classificador pelo Orquestrador e montagem do conjunto de treino.
+    """
+
+    @staticmethod
+    def get_model() -> IntentClassifier | None:
+        """Modelo deste processo; recarregado quando o arquivo muda. None sem modelo treinado."""
+        global _loaded
+        path = settings.DZAION_INTENT_CLASSIFIER['MODEL_PATH']
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if _loaded is None or _loaded[0] != mtime:
+            _loaded = (mtime, IntentClassifier.load(path))
+            logger.info(f"Classificador de intenções carregado de {path} ({len(_loaded[1].labels)} ações).")
+        return _loaded[1]
+
+    @staticmethod
+    def classify(message_body: str, allowed_verbs: set[str]) -> str | None:
+        """
+        Ação decidida localmente, ou None quando a confiança não basta e a
+        mensagem deve seguir para o Roteador Universal.
+        """
+        config = settings.DZAION_INTENT_CLASSIFIER
+        if not config['ENABLED'] or not message_body:
+            return None
+        try:
+            model = IntentClassifierService.get_model()
+            if model is None:
+                return None
+            verb_code, confidence = model.predict(message_body, allowed_verbs, min_coverage=config['MIN_COVERAGE'])
+        except Exception as e:
+            logger.error(f"Falha no classificador de intenções; seguindo para o roteador: {e}", exc_info=True)
+            DzaionMetrics.increment('intent_classifier', outcome='error')
+            return None
+
+        if verb_code is None or confidence < config['THRESHOLD']:
+            DzaionMetrics.increment('intent_classifier', outcome='fallthrough')
+            return None
+        logger.info(f"Intenção '{verb_code}' decidida pelo classificador local (confiança {confidence:.2f}).")
+        DzaionMetrics.increment('intent_classifier', outcome='hit', action=verb_code)
+        return verb_code
+
+    @staticmethod
+    def training_examples(since=None, limit: int | None = None) -> list[tuple[str, str]]:
+        """
+        Pares (mensagem, verb_code): a 1ª mensagem de cada processo, quando é
+        do usuário (as conversas proativas começam com uma mensagem nossa).
+        """
+        first_message = Message.objects.filter(conversation=OuterRef('conversation')).order_by('created_at')
+        processes = AIThoughtProcess.objects.annotate(
+            first_direction=Subquery(first_message.values('direction')[:1]),
+            first_content=Subquery(first_message.values('content')[:1]),
+        ).filter(first_direction=Message.Direction.INBOUND).order_by('-created_at')
+        if since:
+            processes = processes.filter(created_at__gte=since)
+        rows = processes.values_list('first_content', 'action__verb_code')
+        if limit:
+            rows = rows[:limit]
+        return [(content, verb_code) for content, verb_code in rows.iterator() if content and content.strip()]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Comando para exportar o dataset de replay (casos anonimizados) do histórico.
+
+Uso:
+    python manage.py export_replay_dataset replay.jsonl [--days 30] [--limit 1000]
+
+Author: Dzaion
+Version: 0.1.0
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dzaion.evaluation import ReplayDatasetExporter
+
+
+class Command(BaseCommand):
+    help = "Exporta pares Message/AIThoughtProcess anonimizados para avaliação offline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Caminho do arquivo JSONL de saída.")
+        parser.add_argument('--days', type=int, default=None, help="Exporta apenas os últimos N dias.")
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        exported = ReplayDatasetExporter.export(options['output'], since=since, limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Concluído: {exported} casos exportados para {options['output']}."))
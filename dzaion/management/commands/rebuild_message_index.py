@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Comando para (re)construir o índice de memória (BM25) das mensagens.
+
+Uso:
+    python manage.py rebuild_message_index [--chunk-size 1000]
+
+Author: Dzaion
+Version: 0.1.0
+"""
+from django.core.management.base import BaseCommand
+
+from dzaion.models import Message
+from dzaion.retrieval import MessageMemoryIndex
+
+
+class Command(BaseCommand):
+    help = "Indexa as mensagens que ainda não estão no índice de memória (BM25)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        pending = Message.objects.filter(index_entry__isnull=True).select_related(
+            'conversation', 'conversation__thought_process'
+        ).order_by('created_at')
+
+        indexed = 0
+        for message in pending.iterator(chunk_size=chunk_size):
+            if MessageMemoryIndex.index_message(message):
+                indexed += 1
+            if indexed and indexed % chunk_size == 0:
+                self.stdout.write(f"{indexed} mensagens indexadas...")
+
+        self.stdout.write(self.style.SUCCESS(f"Concluído: {indexed} mensagens indexadas."))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Comando para reexecutar um dataset de replay pelo Orquestrador, sem efeitos colaterais.
+
+Uso:
+    python manage.py replay_missions replay.jsonl [--client stub|openai]
+        [--router-model gpt-5-nano] [--model gpt-5-mini] [--output relatorio.json]
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dzaion.clients import OpenAIClient
+from dzaion.evaluation import ReplayDatasetExporter, ReplayHarness, StubAIClient
+from dzaion.models import AIModel
+
+
+class Command(BaseCommand):
+    help = "Mede acurácia do roteador, tokens por missão e latência por modelo sobre um dataset de replay."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', help="Arquivo JSONL gerado por export_replay_dataset.")
+        parser.add_argument('--client', choices=['stub', 'openai'], default='stub')
+        parser.add_argument('--router-model', default=None, help="Identificador do AIModel a usar no roteador.")
+        parser.add_argument('--model', default=None, help="Identificador do AIModel a usar nas ações.")
+        parser.add_argument('--output', default=None, help="Grava o relatório completo em JSON.")
+
+    def handle(self, *args, **options):
+        cases = ReplayDatasetExporter.load(options['dataset'])
+        if not cases:
+            raise CommandError("O dataset está vazio.")
+
+        client = OpenAIClient() if options['client'] == 'openai' else StubAIClient()
+        harness = ReplayHarness(
+            client,
+            router_model=self._get_model(options['router_model']),
+            ai_model=self._get_model(options['model']),
+        )
+        report = harness.run(cases)
+
+        self.stdout.write(f"Casos: {report['cases']} (erros: {report['errors']})")
+        self.stdout.write(f"Acurácia do roteador: {report['router_accuracy']:.2%}")
+        tokens = report['tokens_per_mission']
+        self.stdout.write(f"Tokens por missão: média {tokens['mean']} | p50 {tokens['p50']} | p90 {tokens['p90']}")
+        for identifier, stats in report['models'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"  {identifier}: {stats['calls']} chamadas | latência p50 {latency['p50']}ms "
+                f"p90 {latency['p90']}ms p99 {latency['p99']}ms"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}."))
+
+    @staticmethod
+    def _get_model(identifier: str | None) -> AIModel | None:
+        if not identifier:
+            return None
+        try:
+            return AIModel.objects.get(identifier=identifier)
+        except AIModel.DoesNotExist:
+            raise CommandError(f"AIModel '{identifier}' não encontrado.")
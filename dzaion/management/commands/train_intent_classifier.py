@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Comando para treinar o classificador local de intenções (Naive Bayes sobre
+n-gramas de caracteres) com o histórico de roteamento. A fração reservada
+(`--holdout`) é dividida ao meio: uma metade calibra a temperatura das
+probabilidades e a outra mede cobertura e precisão no limiar.
+
+Uso:
+    python manage.py train_intent_classifier [--days 180] [--limit 50000] [--holdout 0.1]
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dzaion.intent_classifier import IntentClassifier, IntentClassifierService
+
+
+class Command(BaseCommand):
+    help = "Treina o classificador local de intenções a partir de AIThoughtProcess.action."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Usa apenas os últimos N dias.")
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--holdout', type=float, default=0.1, help="Fração reservada para avaliação.")
+        parser.add_argument('--output', default=None, help="Caminho do modelo (padrão: MODEL_PATH).")
+
+    def handle(self, *args, **options):
+        config = settings.DZAION_INTENT_CLASSIFIER
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        examples = IntentClassifierService.training_examples(since=since, limit=options['limit'])
+
+        # Ações raras demais não são aprendidas: continuam com o roteador.
+        frequency = Counter(verb_code for _, verb_code in examples)
+        examples = [example for example in examples if frequency[example[1]] >= config['MIN_EXAMPLES']]
+        if len({verb_code for _, verb_code in examples}) < 2:
+            raise CommandError("Histórico insuficiente: são necessárias ao menos 2 ações com exemplos suficientes.")
+
+        random.Random(42).shuffle(examples)
+        holdout = int(len(examples) * options['holdout'])
+        if holdout < 2:
+            raise CommandError("O --holdout precisa reservar exemplos para a calibração e a avaliação.")
+        calibration, evaluation, training = (
+            examples[:holdout // 2], examples[holdout // 2:holdout], examples[holdout:]
+        )
+
+        ngram_range = tuple(config['NGRAM_RANGE'])
+        model = IntentClassifier.fit(
+            [text for text, _ in training], [verb_code for _, verb_code in training],
+            ngram_range=ngram_range, n_features=config['N_FEATURES'], alpha=config['ALPHA'],
+        )
+        self.stdout.write(f"{len(training)} exemplos de treino, {len(model.labels)} ações.")
+        temperature = model.calibrate([text for text, _ in calibration], [verb_code for _, verb_code in calibration])
+        self.stdout.write(f"Temperatura calibrada em {len(calibration)} exemplos: {temperature:.2f}.")
+
+        if evaluation:
+            answered = correct = 0
+            for text, verb_code in evaluation:
+                predicted, confidence = model.predict(text, min_coverage=config['MIN_COVERAGE'])
+                if confidence >= config['THRESHOLD']:
+                    answered += 1
+                    correct += predicted == verb_code
+            self.stdout.write(
+                f"Avaliação ({len(evaluation)} exemplos, limiar {config['THRESHOLD']}): "
+                f"cobertura {answered / len(evaluation):.1%}, "
+                f"precisão {correct / answered if answered else 0.0:.1%}."
+            )
+
+        output = options['output'] or config['MODEL_PATH']
+        model.save(output)
+        self.stdout.write(self.style.SUCCESS(f"Concluído: modelo salvo em {output}."))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Métricas Operacionais do App 'dzaion'.
+
+Contadores e amostras de latência guardados no Redis, compartilhados por
+todos os workers. Alimentam o controle de admissão (`admission.py`) e o
+endpoint de métricas da equipe.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import logging
+
+from django.conf import settings
+
+from core.utils.redis_client import get_redis_client
+
+logger = logging.getLogger('dzaion')
+
+COUNTERS_KEY = 'dzaion:metrics:counters'
+LATENCY_KEY = 'dzaion:metrics:latency:{}'
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class DzaionMetrics:
+    """
+    Registro e leitura das métricas do Dzaion.
+    Falhas do Redis nunca interrompem a missão: são apenas registradas no log.
+    """
+
+    @staticmethod
+    def increment(name: str, amount: int = 1, **labels):
+        field = name + ''.join(f"|{key}={value}" for key, value in sorted(labels.items()))
+        try:
+            get_redis_client().hincrby(COUNTERS_KEY, field, amount)
+        except Exception as e:
+            logger.warning(f"Falha ao registrar a métrica '{field}': {e}")
+
+    @staticmethod
+    def observe(phase: str, seconds: float):
+        """Guarda a duração de uma fase, mantendo apenas as amostras mais recentes."""
+        key = LATENCY_KEY.format(phase)
+        try:
+            pipeline = get_redis_client().pipeline()
+            pipeline.lpush(key, round(seconds, 3))
+            pipeline.ltrim(key, 0, settings.DZAION_ADMISSION['LATENCY_WINDOW'] - 1)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Falha ao registrar a latência da fase '{phase}': {e}")
+
+    @staticmethod
+    def get_latency_samples(phase: str) -> list[float]:
+        return [float(value) for value in get_redis_client().lrange(LATENCY_KEY.format(phase), 0, -1)]
+
+    @staticmethod
+    def get_counters() -> dict:
+        return {field: int(value) for field, value in get_redis_client().hgetall(COUNTERS_KEY).items()}
+
+    @staticmethod
+    def get_latency_summary(phases: tuple[str, ...]) -> dict:
+        summary = {}
+        for phase in phases:
+            samples = DzaionMetrics.get_latency_samples(phase)
+            summary[phase] = {
+                'samples': len(samples),
+                'p50': percentile(samples, 0.50),
+                'p90': percentile(samples, 0.90),
+                'p99': percentile(samples, 0.99),
+            }
+        return summary
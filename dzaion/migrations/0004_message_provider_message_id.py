@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0003_alter_aimodel_identifier_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='provider_message_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Identificador devolvido pelo provedor de mensagens, usado para correlacionar os callbacks de entrega.', max_length=255, null=True, verbose_name='ID da Mensagem no Provedor'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('QUEUED', 'Na Fila de Envio'), ('SENT', 'Enviada'), ('DELIVERED', 'Entregue'), ('READ', 'Lida'), ('FAILED', 'Falhou')], default='SENT', max_length=10, verbose_name='Status da Entrega'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:18
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0004_message_provider_message_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageIndexEntry',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('term_frequencies', models.JSONField(default=dict, help_text='Mapa radical -> ocorrências na mensagem.', verbose_name='Frequência dos Termos')),
+                ('length', models.PositiveIntegerField(verbose_name='Tamanho (em termos)')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_entries', to='dzaion.conversation', verbose_name='Conversa')),
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='index_entry', to='dzaion.message', verbose_name='Mensagem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_index_entries', to=settings.AUTH_USER_MODEL, verbose_name='Usuário (Dono da Memória)')),
+            ],
+            options={
+                'verbose_name': 'Entrada do Índice de Memória',
+                'verbose_name_plural': 'Entradas do Índice de Memória',
+                'ordering': ['-created_at'],
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['term_frequencies'], name='msg_index_terms_gin'), models.Index(fields=['user', 'created_at'], name='msg_index_user_created_idx')],
+            },
+        ),
+    ]
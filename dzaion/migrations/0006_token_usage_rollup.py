@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0005_message_index_entry'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenUsageRollup',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hora'), ('DAY', 'Dia')], max_length=4, verbose_name='Granularidade')),
+                ('bucket_start', models.DateTimeField(verbose_name='Início do Período')),
+                ('input_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens de Entrada')),
+                ('output_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens de Saída')),
+                ('request_count', models.PositiveIntegerField(default=0, verbose_name='Chamadas')),
+                ('cost', models.DecimalField(decimal_places=6, default=0, max_digits=16, verbose_name='Custo Estimado')),
+            ],
+            options={
+                'verbose_name': 'Consolidação de Uso de Tokens',
+                'verbose_name_plural': 'Consolidações de Uso de Tokens',
+                'ordering': ['-bucket_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UsageRollupWatermark',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Processo')),
+                ('processed_until', models.DateTimeField(verbose_name='Processado Até')),
+            ],
+            options={
+                'verbose_name': 'Marca de Consolidação',
+                'verbose_name_plural': 'Marcas de Consolidação',
+            },
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='input_price_per_million',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=10, verbose_name='Preço por 1M Tokens de Entrada'),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='output_price_per_million',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=10, verbose_name='Preço por 1M Tokens de Saída'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenusagelog',
+            index=models.Index(fields=['created_at'], name='token_log_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='tokenusagerollup',
+            name='ai_model',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dzaion.aimodel', verbose_name='Modelo de IA'),
+        ),
+        migrations.AddField(
+            model_name='tokenusagerollup',
+            name='dzaion_action',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dzaion.dzaionaction', verbose_name='Ação'),
+        ),
+        migrations.AddField(
+            model_name='tokenusagerollup',
+            name='payer_tenant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='token_usage_rollups', to='tenants.tenant', verbose_name='Inquilino (Pagador)'),
+        ),
+        migrations.AddField(
+            model_name='tokenusagerollup',
+            name='payer_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='token_usage_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Usuário (Pagador)'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenusagerollup',
+            index=models.Index(fields=['granularity', 'payer_tenant', 'bucket_start'], name='usage_rollup_tenant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenusagerollup',
+            index=models.Index(fields=['granularity', 'payer_user', 'bucket_start'], name='usage_rollup_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenusagerollup',
+            index=models.Index(fields=['granularity', 'bucket_start'], name='usage_rollup_bucket_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:24
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0006_token_usage_rollup'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dzaionaction',
+            name='cascade_checks',
+            field=models.JSONField(blank=True, default=dict, help_text='Ex: {"validate_tool_arguments": true, "confidence_marker": "[ESCALAR]", "refusal_patterns": ["não posso"]}. Chaves omitidas usam o padrão de DZAION_CASCADE.', verbose_name='Checagens da Cascata'),
+        ),
+        migrations.AddField(
+            model_name='dzaionaction',
+            name='cascade_model',
+            field=models.ForeignKey(blank=True, help_text='Se definido, é tentado primeiro; a resposta só é refeita no modelo principal se falhar nas checagens.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cascade_actions', to='dzaion.aimodel', verbose_name='Modelo de IA Econômico (Cascata)'),
+        ),
+        migrations.CreateModel(
+            name='ModelEscalationLog',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('reason', models.CharField(choices=[('TOOL_ARGUMENTS', 'Argumentos de Ferramenta Inválidos'), ('LOW_CONFIDENCE', 'Baixa Confiança'), ('REFUSAL', 'Recusa'), ('ERROR', 'Erro na Chamada')], max_length=20, verbose_name='Motivo')),
+                ('detail', models.TextField(blank=True, verbose_name='Detalhe')),
+                ('input_tokens', models.PositiveIntegerField(default=0, verbose_name='Tokens de Entrada (Tentativa Descartada)')),
+                ('output_tokens', models.PositiveIntegerField(default=0, verbose_name='Tokens de Saída (Tentativa Descartada)')),
+                ('dzaion_action', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='escalation_logs', to='dzaion.dzaionaction', verbose_name='Ação')),
+                ('from_model', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='escalations_from', to='dzaion.aimodel', verbose_name='Modelo Econômico')),
+                ('tenant_context', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tenants.tenant', verbose_name='Contexto do Inquilino')),
+                ('to_model', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='escalations_to', to='dzaion.aimodel', verbose_name='Modelo Principal')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='model_escalation_logs', to=settings.AUTH_USER_MODEL, verbose_name='Interlocutor')),
+            ],
+            options={
+                'verbose_name': 'Escalonamento de Modelo',
+                'verbose_name_plural': 'Escalonamentos de Modelo',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0007_model_cascade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProactiveCampaign',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=150, verbose_name='Nome da Campanha')),
+                ('segment', models.JSONField(blank=True, default=dict, help_text='Filtros do público: {"user_ids": [...], "tenant": "<uuid>", "role": "<uuid>", "whatsapp_verified": true}.', verbose_name='Segmento')),
+                ('send_rate_per_minute', models.PositiveIntegerField(default=600, verbose_name='Taxa de Envio (missões/minuto)')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendente'), ('RUNNING', 'Em Andamento'), ('COMPLETED', 'Concluída'), ('CANCELLED', 'Cancelada')], default='PENDING', max_length=10, verbose_name='Status')),
+                ('total_users', models.PositiveIntegerField(default=0, verbose_name='Total de Usuários')),
+                ('enqueued_count', models.PositiveIntegerField(default=0, verbose_name='Missões Enfileiradas')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='Missões Concluídas')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Missões com Falha')),
+                ('cursor', models.UUIDField(blank=True, null=True, verbose_name='Cursor (último usuário enfileirado)')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizada em')),
+                ('action', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='campaigns', to='dzaion.dzaionaction', verbose_name='Ação (Missão)')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_campaigns', to=settings.AUTH_USER_MODEL, verbose_name='Criada por')),
+            ],
+            options={
+                'verbose_name': 'Campanha Proativa',
+                'verbose_name_plural': 'Campanhas Proativas',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
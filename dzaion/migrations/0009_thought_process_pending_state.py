@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0008_proactive_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aithoughtprocess',
+            name='pending_state',
+            field=models.JSONField(blank=True, help_text='Estado intermediário da missão enquanto as ferramentas executam (mensagens, modelo, consumo).', null=True, verbose_name='Estado Pendente'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:36
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0009_thought_process_pending_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissionCheckpoint',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('mission_id', models.UUIDField(db_index=True, verbose_name='ID da Missão')),
+                ('phase', models.CharField(choices=[('INTENT', 'Intenção Classificada'), ('FIRST_RESPONSE', '1ª Resposta do LLM'), ('TOOL_RESULTS', 'Resultados das Ferramentas'), ('SUSPENDED', 'Suspensa (Ferramentas em Tarefas)'), ('RESPONSE', 'Resposta Final'), ('USAGE_LOGGED', 'Consumo Registrado'), ('DISPATCHED', 'Resposta Enfileirada')], max_length=20, verbose_name='Fase')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Dados da Fase')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Missão',
+                'verbose_name_plural': 'Checkpoints de Missão',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='mission_checkpoint_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('mission_id', 'phase'), name='unique_mission_checkpoint_phase')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0010_mission_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_response_id',
+            field=models.CharField(blank=True, help_text='Encadeia o próximo turno pela API de Responses (previous_response_id).', max_length=100, null=True, verbose_name='ID da Última Resposta (OpenAI)'),
+        ),
+    ]
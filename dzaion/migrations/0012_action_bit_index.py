@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0011_conversation_last_response_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dzaionaction',
+            name='bit_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Posição estável desta ação nos bitmaps dos papéis (guards). Atribuída automaticamente.', null=True, unique=True, verbose_name='Índice do Bit'),
+        ),
+    ]
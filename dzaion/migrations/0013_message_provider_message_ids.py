@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:07
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def copy_provider_message_ids(apps, schema_editor):
+    # Mensagens já enviadas passam a ser encontradas pelo array de IDs.
+    Message = apps.get_model('dzaion', 'Message')
+    table = schema_editor.quote_name(Message._meta.db_table)
+    schema_editor.execute(
+        f"UPDATE {table} SET provider_message_ids = ARRAY[provider_message_id] "
+        f"WHERE provider_message_id IS NOT NULL"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0012_action_bit_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='provider_message_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, help_text='Identificadores de todas as partes enviadas (mensagens longas são quebradas), usados para correlacionar os callbacks de entrega.', size=None, verbose_name='IDs das Partes no Provedor'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='provider_message_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Identificador devolvido pelo provedor para a primeira parte da mensagem.', max_length=255, null=True, verbose_name='ID da Mensagem no Provedor'),
+        ),
+        migrations.RunPython(copy_provider_message_ids, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['provider_message_ids'], name='msg_provider_ids_gin'),
+        ),
+    ]
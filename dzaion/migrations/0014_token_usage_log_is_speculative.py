@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0013_message_provider_message_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenusagelog',
+            name='is_speculative',
+            field=models.BooleanField(default=False, verbose_name='Especulação Descartada?'),
+        ),
+    ]
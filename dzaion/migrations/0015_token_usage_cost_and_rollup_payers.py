@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dzaion', '0014_token_usage_log_is_speculative'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenusagelog',
+            name='cost',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=16, null=True, verbose_name='Custo Estimado'),
+        ),
+        migrations.AlterField(
+            model_name='tokenusagerollup',
+            name='payer_tenant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='token_usage_rollups', to='tenants.tenant', verbose_name='Inquilino (Pagador)'),
+        ),
+        migrations.AlterField(
+            model_name='tokenusagerollup',
+            name='payer_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='token_usage_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Usuário (Pagador)'),
+        ),
+    ]
@@ -7,10 +7,12 @@ gerenciando o catálogo de modelos de IA, suas capacidades, o histórico
 de interações e o registro de consumo de recursos.
 
 Author: Dzaion
-Version: 1.0.0
+Version: 1.10.0
 """
 from datetime import timedelta
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.db.models import Q
 from django.utils import timezone
@@ -37,6 +39,14 @@ class AIModel(BaseModel):
         verbose_name='Modo de Operação'
     )
     description = models.TextField(verbose_name='Descrição')
+    input_price_per_million = models.DecimalField(
+        max_digits=10, decimal_places=4, default=0,
+        verbose_name='Preço por 1M Tokens de Entrada'
+    )
+    output_price_per_million = models.DecimalField(
+        max_digits=10, decimal_places=4, default=0,
+        verbose_name='Preço por 1M Tokens de Saída'
+    )
 
     class Meta:
         verbose_name = 'Modelo de IA'
@@ -92,6 +102,26 @@ class DzaionAction(BaseModel):
         verbose_name='Schema de Parâmetros (Tool Calling)',
         help_text='A definição em JSON Schema dos parâmetros que esta ação requer.'
     )
+    cascade_model = models.ForeignKey(
+        AIModel,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='cascade_actions',
+        verbose_name='Modelo de IA Econômico (Cascata)',
+        help_text='Se definido, é tentado primeiro; a resposta só é refeita no modelo principal se falhar nas checagens.'
+    )
+    cascade_checks = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Checagens da Cascata',
+        help_text='Ex: {"validate_tool_arguments": true, "confidence_marker": "[ESCALAR]", "refusal_patterns": ["não posso"]}. '
+                  'Chaves omitidas usam o padrão de DZAION_CASCADE.'
+    )
+    bit_index = models.PositiveIntegerField(
+        null=True, blank=True, unique=True, editable=False,
+        verbose_name='Índice do Bit',
+        help_text='Posição estável desta ação nos bitmaps dos papéis (guards). Atribuída automaticamente.'
+    )
 
     class Meta:
         verbose_name = 'Ação da IA (Verbo)'
@@ -136,6 +166,12 @@ class Conversation(BaseModel):
         default=ConversationStatus.ACTIVE,
         verbose_name='Status da Conversa'
     )
+    last_response_id = models.CharField(
+        max_length=100,
+        null=True, blank=True,
+        verbose_name='ID da Última Resposta (OpenAI)',
+        help_text='Encadeia o próximo turno pela API de Responses (previous_response_id).'
+    )
 
     class Meta:
         verbose_name = 'Conversa com IA'
@@ -165,6 +201,7 @@ class Message(BaseModel):
         OUTBOUND = 'OUTBOUND', 'Saída (IA -> Usuário)'
 
     class MessageStatus(models.TextChoices):
+        QUEUED = 'QUEUED', 'Na Fila de Envio'
         SENT = 'SENT', 'Enviada'
         DELIVERED = 'DELIVERED', 'Entregue'
         READ = 'READ', 'Lida'
@@ -188,16 +225,75 @@ class Message(BaseModel):
         default=MessageStatus.SENT,
         verbose_name='Status da Entrega'
     )
+    provider_message_id = models.CharField(
+        max_length=255,
+        null=True, blank=True,
+        db_index=True,
+        verbose_name='ID da Mensagem no Provedor',
+        help_text='Identificador devolvido pelo provedor para a primeira parte da mensagem.'
+    )
+    provider_message_ids = ArrayField(
+        models.CharField(max_length=255),
+        default=list, blank=True,
+        verbose_name='IDs das Partes no Provedor',
+        help_text='Identificadores de todas as partes enviadas (mensagens longas são quebradas), '
+                  'usados para correlacionar os callbacks de entrega.'
+    )
 
     class Meta:
         verbose_name = 'Mensagem de Conversa'
         verbose_name_plural = 'Mensagens de Conversa'
         ordering = ['created_at']
+        indexes = [
+            GinIndex(fields=['provider_message_ids'], name='msg_provider_ids_gin'),
+        ]
 
     def __str__(self):
         return f"Mensagem {self.id.hex[:8]} na conversa {self.conversation.id.hex[:8]}"
 
 
+class MessageIndexEntry(BaseModel):
+    """
+    A entrada de uma mensagem no índice lexical (BM25) de memória do usuário.
+    """
+    message = models.OneToOneField(
+        Message,
+        on_delete=models.CASCADE,
+        related_name='index_entry',
+        verbose_name='Mensagem'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='message_index_entries',
+        verbose_name='Usuário (Dono da Memória)'
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='index_entries',
+        verbose_name='Conversa'
+    )
+    term_frequencies = models.JSONField(
+        default=dict,
+        verbose_name='Frequência dos Termos',
+        help_text='Mapa radical -> ocorrências na mensagem.'
+    )
+    length = models.PositiveIntegerField(verbose_name='Tamanho (em termos)')
+
+    class Meta:
+        verbose_name = 'Entrada do Índice de Memória'
+        verbose_name_plural = 'Entradas do Índice de Memória'
+        ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['term_frequencies'], name='msg_index_terms_gin'),
+            models.Index(fields=['user', 'created_at'], name='msg_index_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Índice da mensagem {self.message_id.hex[:8]}"
+
+
 class TokenUsageLog(BaseModel):
     """
     O registro financeiro imutável de cada chamada à API da IA.
@@ -235,6 +331,12 @@ class TokenUsageLog(BaseModel):
     input_tokens = models.PositiveIntegerField(verbose_name='Tokens de Entrada')
     output_tokens = models.PositiveIntegerField(verbose_name='Tokens de Saída')
     is_billed = models.BooleanField(default=False, verbose_name='Faturado?', db_index=True)
+    # Custo pelo preço do modelo no momento da chamada. Nulo nos logs anteriores a este campo.
+    cost = models.DecimalField(
+        max_digits=16, decimal_places=6, null=True, blank=True, verbose_name='Custo Estimado'
+    )
+    # Chamada especulativa descartada pelo roteador: paga ao provedor, sem resposta aproveitada.
+    is_speculative = models.BooleanField(default=False, verbose_name='Especulação Descartada?')
 
     class Meta:
         verbose_name = 'Log de Uso de Tokens'
@@ -249,11 +351,187 @@ class TokenUsageLog(BaseModel):
                 name='exclusive_payer_for_token_log'
             )
         ]
+        indexes = [
+            models.Index(fields=['created_at'], name='token_log_created_idx'),
+        ]
 
     def __str__(self):
         return f"Uso de {self.input_tokens + self.output_tokens} tokens"
 
 
+class TokenUsageRollup(BaseModel):
+    """
+    Consolidação incremental do TokenUsageLog por hora e por dia,
+    agrupada por pagador, modelo e ação. Alimenta a API de análise de gastos.
+    """
+    class Granularity(models.TextChoices):
+        HOUR = 'HOUR', 'Hora'
+        DAY = 'DAY', 'Dia'
+
+    granularity = models.CharField(max_length=4, choices=Granularity.choices, verbose_name='Granularidade')
+    bucket_start = models.DateTimeField(verbose_name='Início do Período')
+    payer_tenant = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='token_usage_rollups',
+        verbose_name='Inquilino (Pagador)'
+    )
+    payer_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='token_usage_rollups',
+        verbose_name='Usuário (Pagador)'
+    )
+    ai_model = models.ForeignKey(AIModel, on_delete=models.PROTECT, verbose_name='Modelo de IA')
+    dzaion_action = models.ForeignKey(DzaionAction, on_delete=models.PROTECT, verbose_name='Ação')
+    input_tokens = models.PositiveBigIntegerField(default=0, verbose_name='Tokens de Entrada')
+    output_tokens = models.PositiveBigIntegerField(default=0, verbose_name='Tokens de Saída')
+    request_count = models.PositiveIntegerField(default=0, verbose_name='Chamadas')
+    cost = models.DecimalField(max_digits=16, decimal_places=6, default=0, verbose_name='Custo Estimado')
+
+    class Meta:
+        verbose_name = 'Consolidação de Uso de Tokens'
+        verbose_name_plural = 'Consolidações de Uso de Tokens'
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'payer_tenant', 'bucket_start'], name='usage_rollup_tenant_idx'),
+            models.Index(fields=['granularity', 'payer_user', 'bucket_start'], name='usage_rollup_user_idx'),
+            models.Index(fields=['granularity', 'bucket_start'], name='usage_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_granularity_display()} {self.bucket_start:%Y-%m-%d %H:%M}: {self.input_tokens + self.output_tokens} tokens"
+
+
+class UsageRollupWatermark(BaseModel):
+    """
+    A marca d'água (high-water mark) de um processo de consolidação:
+    até que instante os logs brutos já foram processados.
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='Processo')
+    processed_until = models.DateTimeField(verbose_name='Processado Até')
+
+    class Meta:
+        verbose_name = 'Marca de Consolidação'
+        verbose_name_plural = 'Marcas de Consolidação'
+
+    def __str__(self):
+        return f"{self.name}: {self.processed_until}"
+
+
+class ProactiveCampaign(BaseModel):
+    """
+    Um envio em massa de missões PROACTIVE para um segmento de usuários,
+    enfileirado em lotes e com taxa de envio controlada.
+    """
+    class CampaignStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Pendente'
+        RUNNING = 'RUNNING', 'Em Andamento'
+        COMPLETED = 'COMPLETED', 'Concluída'
+        CANCELLED = 'CANCELLED', 'Cancelada'
+
+    name = models.CharField(max_length=150, verbose_name='Nome da Campanha')
+    action = models.ForeignKey(
+        DzaionAction,
+        on_delete=models.PROTECT,
+        related_name='campaigns',
+        verbose_name='Ação (Missão)'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='created_campaigns',
+        verbose_name='Criada por'
+    )
+    segment = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Segmento',
+        help_text='Filtros do público: {"user_ids": [...], "tenant": "<uuid>", "role": "<uuid>", "whatsapp_verified": true}.'
+    )
+    send_rate_per_minute = models.PositiveIntegerField(default=600, verbose_name='Taxa de Envio (missões/minuto)')
+    status = models.CharField(
+        max_length=10,
+        choices=CampaignStatus.choices,
+        default=CampaignStatus.PENDING,
+        verbose_name='Status'
+    )
+    total_users = models.PositiveIntegerField(default=0, verbose_name='Total de Usuários')
+    enqueued_count = models.PositiveIntegerField(default=0, verbose_name='Missões Enfileiradas')
+    completed_count = models.PositiveIntegerField(default=0, verbose_name='Missões Concluídas')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='Missões com Falha')
+    cursor = models.UUIDField(null=True, blank=True, verbose_name='Cursor (último usuário enfileirado)')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciada em')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Finalizada em')
+
+    class Meta:
+        verbose_name = 'Campanha Proativa'
+        verbose_name_plural = 'Campanhas Proativas'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class ModelEscalationLog(BaseModel):
+    """
+    Registro de cada escalonamento da cascata: a resposta do modelo econômico
+    foi descartada e a chamada foi refeita no modelo principal.
+    """
+    class Reason(models.TextChoices):
+        TOOL_ARGUMENTS = 'TOOL_ARGUMENTS', 'Argumentos de Ferramenta Inválidos'
+        LOW_CONFIDENCE = 'LOW_CONFIDENCE', 'Baixa Confiança'
+        REFUSAL = 'REFUSAL', 'Recusa'
+        ERROR = 'ERROR', 'Erro na Chamada'
+
+    dzaion_action = models.ForeignKey(
+        DzaionAction,
+        on_delete=models.PROTECT,
+        related_name='escalation_logs',
+        verbose_name='Ação'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='model_escalation_logs',
+        verbose_name='Interlocutor'
+    )
+    tenant_context = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name='Contexto do Inquilino'
+    )
+    from_model = models.ForeignKey(
+        AIModel,
+        on_delete=models.PROTECT,
+        related_name='escalations_from',
+        verbose_name='Modelo Econômico'
+    )
+    to_model = models.ForeignKey(
+        AIModel,
+        on_delete=models.PROTECT,
+        related_name='escalations_to',
+        verbose_name='Modelo Principal'
+    )
+    reason = models.CharField(max_length=20, choices=Reason.choices, verbose_name='Motivo')
+    detail = models.TextField(blank=True, verbose_name='Detalhe')
+    input_tokens = models.PositiveIntegerField(default=0, verbose_name='Tokens de Entrada (Tentativa Descartada)')
+    output_tokens = models.PositiveIntegerField(default=0, verbose_name='Tokens de Saída (Tentativa Descartada)')
+
+    class Meta:
+        verbose_name = 'Escalonamento de Modelo'
+        verbose_name_plural = 'Escalonamentos de Modelo'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.from_model} -> {self.to_model} ({self.get_reason_display()})"
+
+
 class AIThoughtProcess(BaseModel):
     """
     O "ticket de trabalho" interno da IA, representando uma tarefa ou intenção.
@@ -301,6 +579,11 @@ class AIThoughtProcess(BaseModel):
         null=True, blank=True,
         verbose_name='Data de Conclusão'
     )
+    pending_state = models.JSONField(
+        null=True, blank=True,
+        verbose_name='Estado Pendente',
+        help_text='Estado intermediário da missão enquanto as ferramentas executam (mensagens, modelo, consumo).'
+    )
 
     class Meta:
         verbose_name = 'Processo de Pensamento da IA'
@@ -323,3 +606,37 @@ class AIThoughtProcess(BaseModel):
     def __str__(self):
         return f"Processo para '{self.action.name}' com {self.user.name}"
 
+
+class MissionCheckpoint(BaseModel):
+    """
+    O registro de uma fase concluída de uma missão. Se a tarefa da missão for
+    reexecutada (retentativa, worker perdido), o Orquestrador retoma a partir
+    da última fase registrada, sem repetir chamadas pagas ao LLM, ferramentas
+    ou envios.
+    """
+    class Phase(models.TextChoices):
+        INTENT = 'INTENT', 'Intenção Classificada'
+        FIRST_RESPONSE = 'FIRST_RESPONSE', '1ª Resposta do LLM'
+        TOOL_RESULTS = 'TOOL_RESULTS', 'Resultados das Ferramentas'
+        SUSPENDED = 'SUSPENDED', 'Suspensa (Ferramentas em Tarefas)'
+        RESPONSE = 'RESPONSE', 'Resposta Final'
+        USAGE_LOGGED = 'USAGE_LOGGED', 'Consumo Registrado'
+        DISPATCHED = 'DISPATCHED', 'Resposta Enfileirada'
+
+    mission_id = models.UUIDField(db_index=True, verbose_name='ID da Missão')
+    phase = models.CharField(max_length=20, choices=Phase.choices, verbose_name='Fase')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Dados da Fase')
+
+    class Meta:
+        verbose_name = 'Checkpoint de Missão'
+        verbose_name_plural = 'Checkpoints de Missão'
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['mission_id', 'phase'], name='unique_mission_checkpoint_phase'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='mission_checkpoint_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Missão {self.mission_id.hex[:8]}: {self.phase}"
@@ -3,23 +3,38 @@
 Módulo do Orquestrador da IA Dzaion.
 
 Author: Dzaion
-Version: 0.6.2
+Version: 0.26.4
 """
 import logging
 import json
+import math
+import time
 
+from celery import chord
+from django.conf import settings
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils import timezone
 
 from accounts.models import User
 from accounts.services import AccountService
 from guards.services import GuardService
-from dispatchers.services import get_dispather_service
-from .models import DzaionAction, AIThoughtProcess, Conversation, Message, AIModel
+from .models import DzaionAction, AIThoughtProcess, Conversation, Message, AIModel, ModelEscalationLog, ProactiveCampaign, MissionCheckpoint
 from .services import DzaionService
 from .tool_registry import TOOL_REGISTRY
-from .exceptions import ContextIdentificationError, IntentClassificationError, AIAPIError, InsufficientFundsForAIError
+from .exceptions import ContextIdentificationError, IntentClassificationError, AIAPIError, InsufficientFundsForAIError, MissionDeadlineExceededError, ConversationChainExpiredError
 from .clients import OpenAIClient
+from .outbound import OutboundDispatchService
+from .retrieval import MessageMemoryIndex
+from .cascade import CascadePolicy
+from .campaigns import CampaignService
+from .metrics import DzaionMetrics
+from .scheduler import FairScheduler
+from .conversation_state import ConversationStateStore
+from .speculation import SpeculationPolicy, get_executor
+from .checkpoints import MissionCheckpointService
+from .deadlines import MissionDeadline
+from .intent_classifier import IntentClassifierService
 
 logger = logging.getLogger('dzaion_orchestrator')
 
@@ -27,20 +42,45 @@ class DzaionOrchestrator:
     """
     Orquestra o ciclo de vida de uma única missão da IA Dzaion.
     """
-    def __init__(self, mission_data: dict):
+    def __init__(self, mission_data: dict, client=None):
         self.mission_data = mission_data
         self.mission_type = mission_data.get('mission_type')
         self.trigger_info = mission_data.get('trigger_info', {})
+        self.campaign_id = mission_data.get('campaign_id')
+        self.model_override = mission_data.get('model_override')
+        self.mission_id = mission_data.get('mission_id')
+        self.checkpoints = {}
+        # Prazo provisório (nível 'auto') até o service_tier do contratante ser conhecido.
+        # A missão proativa espera o ritmo da campanha na sub-fila: seu relógio só começa
+        # quando o escalonador a libera.
+        if self.mission_type == 'PROACTIVE':
+            self.started_at = mission_data.get('released_at') or time.time()
+        else:
+            self.started_at = mission_data.get('enqueued_at') or time.time()
+        if mission_data.get('deadline'):
+            self.deadline = MissionDeadline(mission_data['deadline'])
+        else:
+            self.deadline = MissionDeadline.for_mission(self.mission_type, 'auto', self.started_at)
+        self.suspended = False
+        # Reentrega de uma missão já concluída (checkpoint DISPATCHED): nada a fazer nem a registrar.
+        self.already_done = False
+        self.shared_context = None
         
         self.user = None
         self.tenant_context = None
         self.thought_process = None
         self.dzaion_action = None
         self.conversation = None 
-        self.client = OpenAIClient()
+        self.client = client or OpenAIClient()
         self.total_usage = {'input_tokens': 0, 'output_tokens': 0}
+        self.usage_by_model = {}
         self.service_tier = 'auto'
         self.ai_model = None
+        self.outbound_message = None
+        self.speculation = None
+        self.routed_response = None
+        # Última resposta da cadeia na API de Responses (None: a próxima chamada envia o histórico completo).
+        self.response_id = None
 
     @classmethod
     def run(cls, mission_data: dict):
@@ -48,14 +88,46 @@ class DzaionOrchestrator:
         orchestrator._execute_mission()
 
     def _execute_mission(self):
+        success = False
         try:
+            self.checkpoints = MissionCheckpointService.load(self.mission_id)
+            if MissionCheckpoint.Phase.DISPATCHED in self.checkpoints:
+                # O resultado já foi registrado na execução que concluiu a missão.
+                logger.info(f"Missão {self.mission_id} já foi concluída em uma execução anterior.")
+                self.already_done = True
+                return
+            if MissionCheckpoint.Phase.SUSPENDED in self.checkpoints:
+                # As ferramentas já foram agendadas; a continuação fica com `resume_mission`.
+                self.suspended = True
+                return
+            if self.campaign_id and not self._load_campaign_context():
+                return
+            started = time.monotonic()
             self._identify_context_and_intent()
+            DzaionMetrics.observe('intent', time.monotonic() - started)
             self._check_financial_viability()
-            interaction_result = self._execute_llm_interaction()
+            if MissionCheckpoint.Phase.RESPONSE in self.checkpoints:
+                interaction_result = self._restore_response(self.checkpoints[MissionCheckpoint.Phase.RESPONSE])
+            else:
+                self.deadline.check('llm')
+                llm_started = time.monotonic()
+                interaction_result = self._execute_llm_interaction()
+                DzaionMetrics.observe('llm', time.monotonic() - llm_started)
+            if interaction_result.get('suspended'):
+                # As ferramentas rodam em tarefas próprias; a missão continua em `resume_mission`.
+                self.suspended = True
+                return
             response_text = interaction_result.get('text', "Não consegui processar sua solicitação no momento.")
-            self._log_token_usage()
-            self._dispatch_response(response_text)
+            self._conclude_mission(response_text)
+            DzaionMetrics.observe('mission', time.monotonic() - started)
+            success = True
             
+        except MissionDeadlineExceededError as e:
+            logger.warning(f"Missão {self.mission_type} encerrada pelo prazo: {e}")
+            # Só quem perguntou recebe o pedido de desculpas; a missão proativa falha em silêncio
+            # (o resultado da campanha é registrado no finally).
+            if self.user and self.mission_type == 'REACTIVE':
+                self._dispatch_response(str(e))
         except (ContextIdentificationError, IntentClassificationError, InsufficientFundsForAIError) as e:
             logger.warning(f"Missão encerrada prematuramente: {e}")
             if self.user:
@@ -64,6 +136,107 @@ class DzaionOrchestrator:
             logger.error(f"Erro crítico na missão: {e}", exc_info=True)
             if self.user:
                 self._dispatch_response("Desculpe, encontrei um erro e não consigo continuar no momento.")
+        finally:
+            if self.campaign_id and not (self.suspended or self.already_done):
+                CampaignService.record_result(self.campaign_id, success)
+
+    @classmethod
+    def resume(cls, thought_process_id: str, tool_results: list[dict]):
+        """
+        Continuação de uma missão suspensa: recebe os resultados das ferramentas
+        e faz a chamada final ao LLM a partir do estado salvo no AIThoughtProcess.
+        """
+        thought_process = AIThoughtProcess.objects.select_related(
+            'user', 'action', 'action__default_model', 'conversation', 'tenant_context'
+        ).get(pk=thought_process_id)
+        state = thought_process.pending_state
+        # Reivindica o estado de forma atômica: uma continuação duplicada não executa nada.
+        claimed = AIThoughtProcess.objects.filter(pk=thought_process_id, pending_state__isnull=False).update(pending_state=None)
+        if not state or not claimed:
+            logger.warning(f"Processo {thought_process_id} sem estado pendente. Continuação ignorada.")
+            return
+        thought_process.pending_state = None
+
+        orchestrator = cls({
+            'mission_type': state['mission_type'],
+            'trigger_info': state['trigger_info'],
+            'campaign_id': state.get('campaign_id'),
+            'model_override': state.get('model_override'),
+            'mission_id': state.get('mission_id'),
+            'deadline': state.get('deadline'),
+        })
+        orchestrator._resume_mission(thought_process, state, tool_results)
+
+    def _resume_mission(self, thought_process: AIThoughtProcess, state: dict, tool_results: list[dict]):
+        success = False
+        try:
+            self.thought_process = thought_process
+            self.user = thought_process.user
+            self.dzaion_action = thought_process.action
+            self.tenant_context = thought_process.tenant_context
+            self.conversation = thought_process.conversation
+            self.service_tier = state['service_tier']
+            self.response_id = state.get('response_id')
+            self._restore_usage(state['usage_by_model'])
+            self.ai_model = AIModel.objects.get(pk=state['ai_model_id'])
+
+            interaction_result = self._complete_interaction(state['messages'], tool_results)
+            self._conclude_mission(interaction_result['text'])
+            success = True
+        except Exception as e:
+            logger.error(f"Erro crítico na continuação da missão: {e}", exc_info=True)
+            if self.user:
+                self._dispatch_response("Desculpe, encontrei um erro e não consigo continuar no momento.")
+        finally:
+            if self.campaign_id:
+                CampaignService.record_result(self.campaign_id, success)
+
+    def _conclude_mission(self, response_text: str):
+        """
+        Fases 5 e 6: registra o consumo e enfileira a resposta, cada uma uma
+        única vez por missão (checkpoints).
+        """
+        if MissionCheckpoint.Phase.USAGE_LOGGED not in self.checkpoints:
+            self._log_token_usage()
+            self._save_checkpoint(MissionCheckpoint.Phase.USAGE_LOGGED)
+        self._dispatch_response(response_text)
+        self._save_checkpoint(MissionCheckpoint.Phase.DISPATCHED)
+
+    def _save_checkpoint(self, phase: str, payload: dict | None = None):
+        self.checkpoints[phase] = payload or {}
+        MissionCheckpointService.save(self.mission_id, phase, payload)
+
+    def _restore_response(self, checkpoint: dict) -> dict:
+        """Resposta final de uma execução anterior da missão, sem nova chamada ao LLM."""
+        self._restore_usage(checkpoint['usage_by_model'])
+        self.ai_model = AIModel.objects.get(pk=checkpoint['ai_model_id'])
+        if checkpoint.get('outbound_message_id'):
+            self.outbound_message = Message(id=checkpoint['outbound_message_id'], content=checkpoint['text'])
+        return {'text': checkpoint['text'], 'usage': self.total_usage}
+
+    def _dump_usage(self) -> list[dict]:
+        """Consumo por modelo em formato serializável (estado pendente e checkpoints)."""
+        return [
+            {'ai_model_id': str(model_id) if model_id else None,
+             'input_tokens': usage['input_tokens'], 'output_tokens': usage['output_tokens']}
+            for model_id, usage in self.usage_by_model.items()
+        ]
+
+    def _load_campaign_context(self) -> bool:
+        """
+        Carrega os dados comuns da campanha (cache do worker).
+        Retorna False se a campanha foi cancelada e a missão deve ser descartada:
+        o status em cache pode estar desatualizado, então a marca de
+        cancelamento no Redis também é consultada.
+        """
+        self.shared_context = CampaignService.get_shared_context(self.campaign_id)
+        if (
+            self.shared_context['status'] == ProactiveCampaign.CampaignStatus.CANCELLED
+            or CampaignService.is_cancelled(self.campaign_id)
+        ):
+            logger.info(f"Campanha {self.campaign_id} cancelada. Missão descartada.")
+            return False
+        return True
 
     def _identify_context_and_intent(self):
         """
@@ -90,7 +263,14 @@ class DzaionOrchestrator:
         
         # 2. Verificar Processos Ativos (Memória de Curto Prazo)
         # DZAION-FIX: A checagem de processo ativo vem ANTES do roteador.
-        self.thought_process = DzaionService.find_active_thought_process(self.user)
+        intent = self.checkpoints.get(MissionCheckpoint.Phase.INTENT)
+        if intent:
+            # Reexecução: o processo criado (ou encontrado) na execução anterior é reaproveitado.
+            self.thought_process = AIThoughtProcess.objects.select_related(
+                'action', 'action__default_model', 'action__cascade_model', 'conversation', 'tenant_context'
+            ).get(pk=intent['thought_process_id'])
+        else:
+            self.thought_process = self._find_active_thought_process()
         
         if self.thought_process:
             # Se um processo foi encontrado, a intenção já está definida.
@@ -106,36 +286,63 @@ class DzaionOrchestrator:
                 action_verb = self.trigger_info.get('action_verb')
                 logger.info(f"Intenção proativa recebida: '{action_verb}'")
             elif self.mission_type == 'REACTIVE':
+                self._start_speculation()
                 action_verb = self._route_reactive_intent() # Chama o Roteador Universal
+                self._settle_speculation(action_verb)
                 logger.info(f"Intenção reativa classificada pelo Roteador: '{action_verb}'")
             
             if not action_verb:
                 raise IntentClassificationError("Não foi possível classificar a intenção do usuário.")
             
             # 4. Criar Novo Processo de Pensamento
-            self.dzaion_action = DzaionAction.objects.get(verb_code=action_verb)
+            if self.shared_context and self.shared_context['action'].verb_code == action_verb:
+                self.dzaion_action = self.shared_context['action']
+            else:
+                self.dzaion_action = DzaionAction.objects.get(verb_code=action_verb)
             self.thought_process = DzaionService.create_thought_process_and_conversation(
                 user=self.user, 
                 action=self.dzaion_action
                 # TODO: Lógica para tenant_context em missões reativas
             )
             self.conversation = self.thought_process.conversation
+            if self._hot_state_enabled():
+                ConversationStateStore.remember(self.thought_process, history=[])
             logger.info(f"Nenhum processo ativo. Criando novo processo para '{action_verb}'.")
 
+        if not intent:
+            self._save_checkpoint(MissionCheckpoint.Phase.INTENT, {
+                'thought_process_id': str(self.thought_process.pk), 'action_verb': self.dzaion_action.verb_code,
+            })
+
         # 5. Definir Nível de Serviço
         self._set_service_tier()
 
 
+    def _classify_locally(self, allowed_verbs: set) -> str | None:
+        """Decisão do classificador local, ou None quando ele não está confiante."""
+        return IntentClassifierService.classify(
+            self.trigger_info.get('message_body', ''), allowed_verbs | {'general_chat'}
+        )
+
     def _route_reactive_intent(self) -> str:
         """
         Usa um modelo de IA barato para classificar a intenção do usuário
-        com base nas ações permitidas.
+        com base nas ações permitidas. O classificador local responde antes,
+        quando está confiante o bastante.
         """
         logger.debug("Iniciando Roteador Universal de Intenções.")
-        user_actions = GuardService.get_user_dzaion_actions(self.user, self.tenant_context)
-        if not user_actions.exists():
+        user_actions = list(self._get_user_actions())
+        if not user_actions:
             return 'general_chat'
 
+        allowed_verbs = {action.verb_code for action in user_actions}
+        local_verb = self._classify_locally(allowed_verbs)
+        if local_verb:
+            return local_verb
+        if self._use_single_call_routing(user_actions):
+            return self._route_with_single_call(user_actions)
+        DzaionMetrics.increment('routing', mode='router')
+
         tools_menu = [f"- '{action.verb_code}': {action.name}" for action in user_actions]
         tools_list = "\n".join(tools_menu)
         
@@ -151,22 +358,22 @@ class DzaionOrchestrator:
         )
         
         try:
-            router_model = AIModel.objects.filter(identifier__icontains='nano').first()
-            if not router_model:
-                router_model = self.dzaion_action.default_model if self.dzaion_action else AIModel.objects.first()
-
-            messages = general_history + [{"role": "user", "content": self.trigger_info.get('message_body', '')}]
+            router_model = self._get_router_model()
+            # DZAION-FIX: A API de Chat Completions não aceita `instructions`; o cardápio vai como mensagem de sistema.
+            messages = [{"role": "system", "content": instructions}] + general_history + [
+                {"role": "user", "content": self.trigger_info.get('message_body', '')}
+            ]
             
             response_data = self.client.generate_response(
                 model=router_model.identifier,
-                instructions=instructions,
-                messages=messages
+                messages=messages,
+                timeout=self.deadline.timeout(cap=settings.DZAION_DEADLINES['ROUTER_TIMEOUT'])
             )
-            self._update_total_usage(response_data['usage'])
+            self._update_total_usage(response_data['usage'], router_model)
             
             classified_verb = response_data['message'].content.strip().replace("'", "").replace('"', '')
             
-            if user_actions.filter(verb_code=classified_verb).exists():
+            if classified_verb in allowed_verbs:
                 return classified_verb
             else:
                 return 'general_chat'
@@ -175,6 +382,125 @@ class DzaionOrchestrator:
             logger.error(f"Erro no roteador de intenções: {e}", exc_info=True)
             raise IntentClassificationError("Falha ao classificar a intenção com a IA.")
 
+    def _use_single_call_routing(self, user_actions) -> bool:
+        """Cardápios pequenos dispensam o roteador: a escolha da ação e a 1ª resposta saem de uma só chamada."""
+        return 0 < len(user_actions) <= settings.DZAION_ROUTING['SINGLE_CALL_MAX_ACTIONS']
+
+    def _route_with_single_call(self, user_actions: list) -> str:
+        """
+        Roteamento em chamada única: as ações permitidas vão como ferramentas
+        ao modelo principal, com o prompt compartilhado. A ação é a da
+        ferramenta chamada ('general_chat' numa resposta de texto) e a resposta
+        é aproveitada como 1ª resposta da missão. Ações sem ferramenta
+        executável seguem pelo caminho normal, com as próprias instruções.
+        """
+        self._set_service_tier()
+        self._apply_deadline_fallback()
+        messages = [
+            {"role": "system", "content": f"{self._build_shared_prompt()}\n\n{render_to_string('prompts/action_menu.txt')}"},
+            {"role": "user", "content": self.trigger_info.get('message_body', '')},
+        ]
+        try:
+            response_data = self.client.generate_response(
+                model=self.ai_model.identifier,
+                messages=messages,
+                tools=[self._action_tool(action) for action in user_actions],
+                service_tier=self.service_tier,
+                timeout=self.deadline.timeout()
+            )
+        except Exception as e:
+            logger.error(f"Erro no roteamento em chamada única: {e}", exc_info=True)
+            raise IntentClassificationError("Falha ao classificar a intenção com a IA.")
+        self._update_total_usage(response_data['usage'], self.ai_model)
+
+        assistant_message = response_data['message'].model_dump(exclude_none=True)
+        tool_calls = assistant_message.get('tool_calls') or []
+        actions = {action.verb_code: action for action in user_actions}
+        action_verb = tool_calls[0]['function']['name'] if tool_calls else 'general_chat'
+        action = actions.get(action_verb)
+
+        if tool_calls and not (action and action.parameters_schema and action_verb in TOOL_REGISTRY):
+            # A ferramenta serviu só para escolher a ação; a resposta sai das instruções dela.
+            DzaionMetrics.increment('routing', mode='single_call', outcome='rerouted')
+            return action_verb if action else 'general_chat'
+
+        if tool_calls:
+            # O processo fica ligado a uma única ação: chamadas para outras ações são descartadas.
+            assistant_message['tool_calls'] = [call for call in tool_calls if call['function']['name'] == action_verb]
+        self.routed_response = {'messages': messages + [assistant_message], 'ai_model': self.ai_model}
+        DzaionMetrics.increment('routing', mode='single_call', outcome='answered')
+        return action_verb
+
+    def _start_speculation(self):
+        """
+        Dispara, em paralelo com o roteador, a 1ª chamada do modelo principal
+        para a ação prevista pelo histórico do usuário. Ações com cascata ficam
+        de fora (a tentativa no modelo econômico é sequencial), assim como as
+        que o pagador não tem saldo para executar: a chamada especulativa é
+        paga e acontece antes de `_check_financial_viability`.
+        """
+        if not settings.DZAION_SPECULATION['ENABLED'] or self.model_override or self.deadline.is_low():
+            return
+        try:
+            user_actions = self._get_user_actions()
+            if self._use_single_call_routing(user_actions):
+                # Sem roteador para paralelizar: a 1ª resposta sai da própria chamada de roteamento.
+                return
+            action = SpeculationPolicy.predict_action(self.user, user_actions)
+            if not action or action.cascade_model_id:
+                return
+            self.dzaion_action = action
+            if not self._has_funds():
+                return
+            self._set_service_tier()
+            messages = [
+                {"role": "system", "content": self._build_system_prompt()},
+                {"role": "user", "content": self.trigger_info.get('message_body')},
+            ]
+            tools = self._build_tools()
+            future = get_executor().submit(
+                self.client.generate_response,
+                model=self.ai_model.identifier, messages=messages, tools=tools, service_tier=self.service_tier,
+                timeout=self.deadline.timeout(),
+            )
+            self.speculation = {'action': action, 'ai_model': self.ai_model, 'messages': messages, 'tools': tools, 'future': future}
+            logger.info(f"Especulação iniciada para a ação '{action.verb_code}'.")
+        except Exception as e:
+            SpeculationPolicy.record_error(e)
+        finally:
+            # O roteador decide sem a ação prevista.
+            self.dzaion_action = None
+
+    def _settle_speculation(self, action_verb: str):
+        """Aproveita a resposta especulativa se o roteador confirmou a ação; senão, a descarta."""
+        speculation, self.speculation = self.speculation, None
+        if not speculation:
+            return
+        if speculation['action'].verb_code != action_verb:
+            logger.info(f"Especulação descartada: roteador escolheu '{action_verb}' em vez de '{speculation['action'].verb_code}'.")
+            SpeculationPolicy.discard(
+                speculation['future'], speculation['action'], speculation['ai_model'], self.user, self.tenant_context
+            )
+            return
+        try:
+            speculation['response'] = speculation['future'].result(timeout=settings.DZAION_SPECULATION['RESULT_TIMEOUT'])
+        except Exception as e:
+            SpeculationPolicy.record_error(e)
+            return
+        SpeculationPolicy.record_hit()
+        self.speculation = speculation
+
+    def _get_user_actions(self):
+        """Retorna o cardápio de ações (DzaionAction) permitidas ao usuário."""
+        return GuardService.get_user_dzaion_actions(self.user, self.tenant_context)
+
+    def _get_router_model(self) -> AIModel:
+        """Escolhe o modelo barato usado pelo Roteador Universal de Intenções."""
+        router_model = AIModel.objects.filter(identifier__icontains='nano').first()
+        if not router_model:
+            router_model = self.dzaion_action.default_model if self.dzaion_action else AIModel.objects.first()
+        return router_model
+
     def _set_service_tier(self):
         """
         Define o modelo e o nível de serviço com base no perfil do contratante.
@@ -183,12 +509,27 @@ class DzaionOrchestrator:
         usage_profile = DzaionService.get_or_create_usage_profile(payer)
         
         self.service_tier = usage_profile.service_tier
+        if not self.mission_data.get('deadline'):
+            self.deadline = MissionDeadline.for_mission(self.mission_type, self.service_tier, self.started_at)
+        if self.mission_type == 'REACTIVE':
+            # As próximas mensagens do remetente entram na sub-fila (e com o peso) do pagador.
+            FairScheduler.remember_payer(
+                self.trigger_info.get('whatsapp_number'), FairScheduler.payer_key(payer), self.service_tier
+            )
         
         if self.mission_type == 'REACTIVE' and usage_profile.model_for_messaging:
             self.ai_model = usage_profile.model_for_messaging
-        else:
+        elif self.dzaion_action:
             self.ai_model = self.dzaion_action.default_model
+        else:
+            # Roteamento em chamada única: a ação ainda não foi escolhida.
+            single_call_model = settings.DZAION_ROUTING['SINGLE_CALL_MODEL']
+            self.ai_model = AIModel.objects.filter(identifier=single_call_model).first() if single_call_model else None
         
+        if self.model_override:
+            # Sob carga, o controle de admissão troca o modelo por um fallback mais rápido.
+            self.ai_model = AIModel.objects.filter(identifier=self.model_override).first() or self.ai_model
+
         if not self.ai_model:
             # Fallback de segurança se nenhum modelo for definido
             self.ai_model = AIModel.objects.first()
@@ -203,110 +544,433 @@ class DzaionOrchestrator:
         if not self.dzaion_action:
             raise IntentClassificationError("Ação não definida para checagem financeira.")
             
-        if self.dzaion_action.cost_bearer == DzaionAction.CostBearer.CONTRACTOR:
-            payer = self.tenant_context or self.user
-            wallet = payer.wallet.first()
-            if not wallet or wallet.balance <= 0:
-                logger.warning(f"Usuário {self.user.email} sem saldo para a ação paga '{self.dzaion_action.verb_code}'.")
-                raise InsufficientFundsForAIError(f"Saldo insuficiente para executar a ação: {self.dzaion_action.name}.")
+        if not self._has_funds():
+            logger.warning(f"Usuário {self.user.email} sem saldo para a ação paga '{self.dzaion_action.verb_code}'.")
+            raise InsufficientFundsForAIError(f"Saldo insuficiente para executar a ação: {self.dzaion_action.name}.")
         logger.debug("Verificação de saldo OK.")
 
+    def _has_funds(self) -> bool:
+        """Se o pagador pode custear a ação atual (ações pagas pela plataforma sempre podem)."""
+        if self.dzaion_action.cost_bearer != DzaionAction.CostBearer.CONTRACTOR:
+            return True
+        payer = self.tenant_context or self.user
+        wallet = payer.wallet.first()
+        return bool(wallet and wallet.balance > 0)
+
     def _execute_llm_interaction(self) -> dict:
         logger.info(f"Fase 4: Executando interação com LLM (Missão: {self.mission_type}).")
         
-        system_prompt = self._build_system_prompt()
-        conversation_history = self._load_conversation_history() # Carrega histórico específico
-        messages = [{"role": "system", "content": system_prompt}] + conversation_history
+        first_response = self.checkpoints.get(MissionCheckpoint.Phase.FIRST_RESPONSE)
+        if first_response:
+            # Reexecução: a 1ª resposta (já paga) vem do checkpoint.
+            messages = first_response['messages']
+            self._restore_usage(first_response['usage_by_model'])
+            self.ai_model = AIModel.objects.get(pk=first_response['ai_model_id'])
+            self.response_id = first_response.get('response_id')
+        elif self.speculation:
+            # A 1ª chamada já foi feita em paralelo com o roteador, para a mesma ação.
+            messages, tools = self.speculation['messages'], self.speculation['tools']
+            self._save_message(self.trigger_info.get('message_body'), 'INBOUND')
+            response_data = self.speculation['response']
+            self.ai_model = self.speculation['ai_model']
+            self._update_total_usage(response_data['usage'], self.ai_model)
+        elif self.routed_response:
+            # A chamada única de roteamento já respondeu pela ação escolhida (consumo já contabilizado).
+            messages = self.routed_response['messages']
+            self._save_message(self.trigger_info.get('message_body'), 'INBOUND')
+            self.ai_model = self.routed_response['ai_model']
+        else:
+            system_prompt = self._build_system_prompt()
+            conversation_history = self._load_conversation_history() # Carrega histórico específico
+            messages = [{"role": "system", "content": system_prompt}] + conversation_history
 
-        if self.mission_type == 'REACTIVE':
-            user_message = self.trigger_info.get('message_body')
-            self._save_message(user_message, 'INBOUND')
-            messages.append({"role": "user", "content": user_message})
-
-        tools = self._build_tools()
-
-        logger.debug(f"Iniciando 1ª chamada à IA. Missão: {self.mission_type}.")
-        response_data = self.client.generate_response(
-            model=self.ai_model.identifier,
-            messages=messages,
-            tools=tools,
-            service_tier=self.service_tier
-        )
-        self._update_total_usage(response_data['usage'])
-        response_message = response_data['message']
-        messages.append(response_message.model_dump()) 
+            if self.mission_type == 'REACTIVE':
+                user_message = self.trigger_info.get('message_body')
+                self._save_message(user_message, 'INBOUND')
+                messages.append({"role": "user", "content": user_message})
 
-        final_text = response_message.content or "" 
+            tools = self._build_tools()
+            if self.mission_type == 'REACTIVE':
+                # O turno continua a cadeia da conversa: só a mensagem nova é enviada.
+                self.response_id = self.conversation.last_response_id
 
-        if response_message.tool_calls:
-            logger.info("IA solicitou a execução de ferramentas.")
-            tool_execution_status = "success"
+            logger.debug(f"Iniciando 1ª chamada à IA. Missão: {self.mission_type}.")
+            response_data = self._generate_first_response(messages, tools)
+        if not first_response:
+            if not self.routed_response:
+                # Apenas campos preenchidos: a mensagem precisa ser serializável (estado salvo) e reenviável à API.
+                messages.append(response_data['message'].model_dump(exclude_none=True))
+            self._save_checkpoint(MissionCheckpoint.Phase.FIRST_RESPONSE, {
+                'messages': messages, 'usage_by_model': self._dump_usage(), 'ai_model_id': str(self.ai_model.pk),
+                'response_id': self.response_id,
+            })
+        assistant_message = messages[-1]
 
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_function = TOOL_REGISTRY.get(tool_name)
-                
-                if tool_function:
-                    tool_args = json.loads(tool_call.function.arguments)
-                    logger.info(f"Ferramenta '{tool_name}' solicitada com argumentos: {tool_args}")
-                    
-                    try:
-                        service_args = tool_args.copy()
-                        service_args['user_id'] = str(self.user.id)
-                        
-                        tool_result = tool_function(**service_args)
-                        
-                        if tool_result.get("status") == "error":
-                            tool_execution_status = "error"
-                            
-                        result_content = json.dumps(tool_result)
-                        logger.info(f"Ferramenta '{tool_name}' executada. Resultado: {result_content}")
-                    except Exception as e:
-                        logger.error(f"Erro ao executar a ferramenta '{tool_name}': {e}", exc_info=True)
-                        tool_execution_status = "error"
-                        result_content = json.dumps({"status": "error", "message": f"Erro interno: {str(e)}"})
-                    
-                    messages.append({"role": "tool", "tool_call_id": tool_call.id, "name": tool_name, "content": result_content})
-
-            logger.debug("Iniciando 2ª chamada à IA (com resultados da ferramenta).")
-            final_response_data = self.client.generate_response(
-                model=self.ai_model.identifier, 
-                messages=messages, 
-                service_tier=self.service_tier
-            )
-            self._update_total_usage(final_response_data['usage'])
-            final_text = final_response_data['message'].content
-            
-            if tool_execution_status == "success":
-                logger.info("Ferramenta executada com sucesso. Finalizando processo.")
-                self.thought_process.status = AIThoughtProcess.ProcessStatus.FINISHED
-                self.conversation.status = Conversation.ConversationStatus.FINISHED
+        if assistant_message.get('tool_calls'):
+            logger.info("IA solicitou a execução de ferramentas.")
+            tool_calls = assistant_message['tool_calls']
+            if self._should_suspend_for_tools():
+                self._suspend_for_tools(messages, tool_calls)
+                return {'suspended': True, 'usage': self.total_usage}
+            checkpoint = self.checkpoints.get(MissionCheckpoint.Phase.TOOL_RESULTS)
+            if checkpoint:
+                tool_results = checkpoint['results']
             else:
-                logger.info("Ferramenta falhou. Solicitando nova resposta do usuário.")
-                self.thought_process.status = AIThoughtProcess.ProcessStatus.PENDING_USER_RESPONSE
-        else:
-            logger.debug("IA não solicitou ferramentas. Resposta de texto direto.")
-            if self.mission_type == 'PROACTIVE':
-                self.thought_process.status = AIThoughtProcess.ProcessStatus.PENDING_USER_RESPONSE
+                tool_results = [self._execute_tool_call_within_deadline(tool_call) for tool_call in tool_calls]
+                self._save_checkpoint(MissionCheckpoint.Phase.TOOL_RESULTS, {'results': tool_results})
+            return self._complete_interaction(messages, tool_results)
+
+        logger.debug("IA não solicitou ferramentas. Resposta de texto direto.")
+        if self.mission_type == 'PROACTIVE':
+            self.thought_process.status = AIThoughtProcess.ProcessStatus.PENDING_USER_RESPONSE
+        return self._finish_interaction(assistant_message.get('content') or "")
+
+    def _complete_interaction(self, messages: list, tool_results: list[dict]) -> dict:
+        """
+        Acrescenta os resultados das ferramentas ao histórico e faz a chamada final ao LLM.
+        """
+        tool_execution_status = "success"
+        for tool_result in tool_results:
+            if tool_result['status'] == "error":
+                tool_execution_status = "error"
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_result['tool_call_id'],
+                "name": tool_result['name'],
+                "content": tool_result['content'],
+            })
+
+        logger.debug("Iniciando 2ª chamada à IA (com resultados da ferramenta).")
+        # As ferramentas já rodaram: mesmo com o prazo esgotado, a resposta final é gerada (no modelo mais rápido).
+        self._apply_deadline_fallback()
+        final_response_data = self._generate_main_response(messages, None, new_messages=len(tool_results))
+        self._update_total_usage(final_response_data['usage'], self.ai_model)
+        final_text = final_response_data['message'].content
         
+        if tool_execution_status == "success":
+            logger.info("Ferramenta executada com sucesso. Finalizando processo.")
+            self.thought_process.status = AIThoughtProcess.ProcessStatus.FINISHED
+            self.conversation.status = Conversation.ConversationStatus.FINISHED
+        else:
+            logger.info("Ferramenta falhou. Solicitando nova resposta do usuário.")
+            self.thought_process.status = AIThoughtProcess.ProcessStatus.PENDING_USER_RESPONSE
+        return self._finish_interaction(final_text)
+
+    def _finish_interaction(self, final_text: str) -> dict:
+        self.conversation.last_response_id = self.response_id
+        self._persist_interaction_state()
+        self.outbound_message = self._save_message(final_text, 'OUTBOUND', status=Message.MessageStatus.QUEUED)
+        self._save_checkpoint(MissionCheckpoint.Phase.RESPONSE, {
+            'text': final_text,
+            'usage_by_model': self._dump_usage(),
+            'ai_model_id': str(self.ai_model.pk),
+            'outbound_message_id': str(self.outbound_message.id) if self.outbound_message else None,
+        })
+        return {'text': final_text, 'usage': self.total_usage}
+
+    def _persist_interaction_state(self):
+        """
+        Grava o status do processo e da conversa ao fim do turno: no Redis, com
+        persistência write-behind, ou direto no banco.
+        """
+        if self._hot_state_enabled():
+            ConversationStateStore.save_state(self.thought_process, self.conversation)
+            return
         self.thought_process.save()
         self.conversation.save()
-        self._save_message(final_text, 'OUTBOUND')
-        return {'text': final_text, 'usage': self.total_usage}
+
+    def _hot_state_enabled(self) -> bool:
+        return settings.DZAION_CONVERSATION_STATE['ENABLED']
+
+    def _find_active_thought_process(self) -> AIThoughtProcess | None:
+        """
+        Processo ativo do usuário: primeiro no estado quente (Redis); se não
+        estiver em cache, no banco, aquecendo o cache para os próximos turnos.
+        """
+        if not self._hot_state_enabled():
+            return DzaionService.find_active_thought_process(self.user)
+        try:
+            state = ConversationStateStore.get_active(self.user)
+        except Exception as e:
+            logger.warning(f"Estado quente indisponível; consultando o banco: {e}")
+            return DzaionService.find_active_thought_process(self.user)
+        if state is not None:
+            return ConversationStateStore.restore(self.user, state) if state['active'] else None
+
+        thought_process = DzaionService.find_active_thought_process(self.user)
+        if thought_process:
+            ConversationStateStore.remember(thought_process)
+        return thought_process
+
+    def _should_suspend_for_tools(self) -> bool:
+        return settings.DZAION_TOOLS['RUN_AS_TASKS']
+
+    def _suspend_for_tools(self, messages: list, tool_calls: list[dict]):
+        """
+        Salva o estado intermediário da missão e agenda cada ferramenta como uma
+        tarefa própria (fila `dzaion_tools`). Quando todas terminarem, a tarefa
+        `resume_mission` continua a missão. O worker do LLM fica livre enquanto isso.
+
+        O estado e o checkpoint SUSPENDED são gravados na mesma transação, e o
+        chord só é publicado após o commit: uma reexecução da missão encontra o
+        checkpoint e não agenda as ferramentas de novo.
+        """
+        from .tasks import execute_mission_tool, resume_mission
+
+        self.thought_process.pending_state = {
+            'mission_type': self.mission_type,
+            'trigger_info': self.trigger_info,
+            'campaign_id': self.campaign_id,
+            'model_override': self.model_override,
+            'mission_id': self.mission_id,
+            'deadline': self.deadline.expires_at if math.isfinite(self.deadline.expires_at) else None,
+            'ai_model_id': str(self.ai_model.pk),
+            'service_tier': self.service_tier,
+            'usage_by_model': self._dump_usage(),
+            'messages': messages,
+            'response_id': self.response_id,
+        }
+        self.thought_process.status = AIThoughtProcess.ProcessStatus.PROCESSING
+
+        user_id = str(self.user.id)
+        tools_chord = chord(
+            [execute_mission_tool.s(tool_call, user_id).set(**self._tool_time_limits()) for tool_call in tool_calls],
+            resume_mission.s(str(self.thought_process.id)),
+        )
+        with transaction.atomic():
+            self.thought_process.save(update_fields=['pending_state', 'status', 'updated_at'])
+            self._save_checkpoint(MissionCheckpoint.Phase.SUSPENDED, {'thought_process_id': str(self.thought_process.id)})
+            transaction.on_commit(tools_chord.apply_async)
+        if self._hot_state_enabled():
+            ConversationStateStore.remember(self.thought_process)
+        logger.info(f"Missão suspensa: {len(tool_calls)} ferramenta(s) agendada(s) para o processo {self.thought_process.id}.")
+
+    def _tool_time_limits(self) -> dict:
+        """Limites de tempo da tarefa de cada ferramenta, a partir do tempo restante da missão."""
+        timeout = self.deadline.timeout(cap=settings.DZAION_DEADLINES['TOOL_TIMEOUT'])
+        if timeout is None:
+            return {}
+        return {'soft_time_limit': timeout, 'time_limit': timeout + settings.DZAION_DEADLINES['TIME_LIMIT_GRACE']}
+
+    def _restore_usage(self, usage_by_model: list[dict]):
+        models_by_id = AIModel.objects.in_bulk([u['ai_model_id'] for u in usage_by_model if u['ai_model_id']])
+        for usage in usage_by_model:
+            ai_model = models_by_id.get(usage['ai_model_id']) if usage['ai_model_id'] else None
+            self._update_total_usage(usage, ai_model)
+
+    def _generate_first_response(self, messages: list, tools: list) -> dict:
+        """
+        Primeira chamada da missão. Se a ação tiver uma política de cascata, tenta
+        primeiro o modelo econômico e só escalona para o modelo principal se a
+        resposta falhar nas checagens. O modelo que respondeu segue na missão.
+        """
+        cascade_model = self.dzaion_action.cascade_model if self.dzaion_action and not self.model_override else None
+        if cascade_model and self.deadline.is_low():
+            # Sem tempo para uma tentativa sequencial no modelo econômico.
+            cascade_model = None
+        self._apply_deadline_fallback()
+        if cascade_model and cascade_model.pk != self.ai_model.pk:
+            checks = CascadePolicy.get_checks(self.dzaion_action)
+            usage = {}
+            try:
+                response_data = self.client.generate_response(
+                    model=cascade_model.identifier,
+                    messages=CascadePolicy.build_attempt_messages(messages, checks),
+                    tools=tools,
+                    service_tier=self.service_tier,
+                    timeout=self.deadline.timeout()
+                )
+                usage = response_data['usage']
+                self._update_total_usage(usage, cascade_model)
+                reason, detail = CascadePolicy.evaluate(response_data['message'], self.dzaion_action, checks)
+            except Exception as e:
+                reason, detail = ModelEscalationLog.Reason.ERROR, str(e)
+
+            if reason is None:
+                logger.info(f"Cascata: resposta do modelo econômico '{cascade_model.identifier}' aceita.")
+                self.ai_model = cascade_model
+                # A resposta não está na cadeia da API de Responses: o próximo turno reenvia o histórico.
+                self.response_id = None
+                return response_data
+            logger.info(f"Cascata: escalonando de '{cascade_model.identifier}' para '{self.ai_model.identifier}' ({reason}).")
+            self._log_escalation(cascade_model, reason, detail, usage)
+
+        response_data = self._generate_main_response(messages, tools, new_messages=1)
+        self._update_total_usage(response_data['usage'], self.ai_model)
+        return response_data
+
+    def _generate_main_response(self, messages: list, tools: list | None, new_messages: int) -> dict:
+        """
+        Chamada ao modelo principal. Com a API de Responses, encadeia a resposta
+        anterior e envia apenas as `new_messages` últimas mensagens, de modo que
+        o payload não cresce com a conversa. Se a cadeia expirou, reenvia o
+        histórico completo e começa uma nova.
+
+        O prompt de sistema (reconstruído a cada turno com a memória e as
+        instruções da ação atual) vai sempre como `instructions`, que a API não
+        herda da resposta anterior.
+        """
+        if not self._responses_api_enabled():
+            self.response_id = None
+            return self.client.generate_response(
+                model=self.ai_model.identifier,
+                messages=messages,
+                tools=tools,
+                service_tier=self.service_tier,
+                timeout=self.deadline.timeout()
+            )
+
+        instructions = "\n\n".join(
+            message['content'] for message in messages if message['role'] == 'system' and message.get('content')
+        ) or None
+        conversation_messages = [message for message in messages if message['role'] != 'system']
+
+        response_data = None
+        if self.response_id and new_messages > 0:
+            try:
+                response_data = self.client.generate_chained_response(
+                    model=self.ai_model.identifier,
+                    messages=conversation_messages[-new_messages:],
+                    previous_response_id=self.response_id,
+                    tools=tools,
+                    service_tier=self.service_tier,
+                    timeout=self.deadline.timeout(),
+                    instructions=instructions,
+                )
+                DzaionMetrics.increment('responses_chain', outcome='chained')
+            except ConversationChainExpiredError:
+                DzaionMetrics.increment('responses_chain', outcome='expired')
+        if response_data is None:
+            response_data = self.client.generate_chained_response(
+                model=self.ai_model.identifier,
+                messages=conversation_messages,
+                tools=tools,
+                service_tier=self.service_tier,
+                timeout=self.deadline.timeout(),
+                instructions=instructions,
+            )
+            DzaionMetrics.increment('responses_chain', outcome='started')
+        self.response_id = response_data['response_id']
+        return response_data
+
+    def _responses_api_enabled(self) -> bool:
+        return settings.DZAION_RESPONSES_API['ENABLED']
+
+    def _apply_deadline_fallback(self):
+        """Com pouco tempo restante, troca o modelo da missão pelo modelo de fallback (mais rápido)."""
+        fallback_identifier = settings.DZAION_DEADLINES['FALLBACK_MODEL']
+        if not fallback_identifier or not self.deadline.is_low() or self.ai_model.identifier == fallback_identifier:
+            return
+        fallback_model = AIModel.objects.filter(identifier=fallback_identifier).first()
+        if fallback_model:
+            logger.info(f"Prazo curto ({self.deadline.remaining():.1f}s): usando o modelo de fallback '{fallback_identifier}'.")
+            DzaionMetrics.increment('deadline_fallbacks')
+            self.ai_model = fallback_model
+
+    def _log_escalation(self, from_model: AIModel, reason: str, detail: str, usage: dict):
+        try:
+            ModelEscalationLog.objects.create(
+                dzaion_action=self.dzaion_action, user=self.user, tenant_context=self.tenant_context,
+                from_model=from_model, to_model=self.ai_model, reason=reason, detail=detail,
+                input_tokens=usage.get('input_tokens', 0), output_tokens=usage.get('output_tokens', 0),
+            )
+        except Exception as e:
+            logger.error(f"Falha ao registrar o escalonamento de modelo: {e}", exc_info=True)
+
+    def _execute_tool_call(self, tool_call: dict) -> dict:
+        return DzaionOrchestrator.execute_tool_call(tool_call, str(self.user.id))
+
+    def _execute_tool_call_within_deadline(self, tool_call: dict) -> dict:
+        """Execução em linha: uma ferramenta não começa depois de esgotado o prazo da missão."""
+        if self.deadline.remaining() <= 0:
+            logger.warning(f"Prazo esgotado: ferramenta '{tool_call['function']['name']}' não executada.")
+            content = json.dumps({"status": "error", "message": "Tempo esgotado antes da execução da ferramenta."})
+            return {'tool_call_id': tool_call['id'], 'name': tool_call['function']['name'], 'status': 'error', 'content': content}
+        return self._execute_tool_call(tool_call)
+
+    @staticmethod
+    def execute_tool_call(tool_call: dict, user_id: str) -> dict:
+        """
+        Executa a função de serviço de uma ferramenta em nome do usuário.
+        Usado tanto na execução em linha quanto pela tarefa `execute_mission_tool`.
+        """
+        tool_name = tool_call['function']['name']
+        tool_function = TOOL_REGISTRY.get(tool_name)
+        status = "success"
+        if not tool_function:
+            logger.error(f"Ferramenta '{tool_name}' não encontrada no registro.")
+            status = "error"
+            content = json.dumps({"status": "error", "message": f"Ferramenta '{tool_name}' indisponível."})
+        else:
+            try:
+                tool_args = json.loads(tool_call['function'].get('arguments') or '{}')
+                logger.info(f"Ferramenta '{tool_name}' solicitada com argumentos: {tool_args}")
+                tool_result = tool_function(**{**tool_args, 'user_id': user_id})
+                if tool_result.get("status") == "error":
+                    status = "error"
+                content = json.dumps(tool_result)
+                logger.info(f"Ferramenta '{tool_name}' executada. Resultado: {content}")
+            except Exception as e:
+                logger.error(f"Erro ao executar a ferramenta '{tool_name}': {e}", exc_info=True)
+                status = "error"
+                content = json.dumps({"status": "error", "message": f"Erro interno: {str(e)}"})
+        return {'tool_call_id': tool_call['id'], 'name': tool_name, 'status': status, 'content': content}
 
     def _build_system_prompt(self) -> str:
-        general_instructions = render_to_string('prompts/general.txt')
+        return f"{self._build_shared_prompt()}\n\n{self.dzaion_action.instructions}"
+
+    def _build_shared_prompt(self) -> str:
+        """Instruções gerais, contexto do usuário e memória: a parte do prompt comum a todas as ações."""
+        if self.shared_context:
+            general_instructions = self.shared_context['prompt_prefix']
+        else:
+            general_instructions = render_to_string('prompts/general.txt')
         user_context = render_to_string('prompts/user_context.txt', {'user': self.user})
-        return f"{general_instructions}\n\n{user_context}\n\n{self.dzaion_action.instructions}"
+        memory_context = self._build_memory_context()
+        if memory_context:
+            user_context = f"{user_context}\n\n{memory_context}"
+        return f"{general_instructions}\n\n{user_context}"
+
+    def _build_memory_context(self) -> str:
+        """
+        Memória de longo prazo: busca no índice BM25 do usuário os trechos de
+        conversas anteriores mais relevantes para a mensagem atual (ou para a
+        ação, em missões proativas), em vez de carregar conversas inteiras.
+        Os templates de prompt desligam o autoescape: o texto vai ao modelo
+        como foi escrito, não como HTML.
+        """
+        query = self.trigger_info.get('message_body') or (self.dzaion_action.name if self.dzaion_action else '')
+        try:
+            results = MessageMemoryIndex.search(self.user, query, exclude_conversation=self.conversation)
+        except Exception as e:
+            logger.error(f"Falha ao consultar a memória de longo prazo: {e}", exc_info=True)
+            return ""
+        if not results:
+            return ""
+        logger.info(f"{len(results)} trecho(s) de memória recuperado(s) para o prompt.")
+        return render_to_string('prompts/memory_context.txt', {
+            'memories': [message for message, _ in results],
+            'snippet_length': settings.DZAION_MEMORY['SNIPPET_LENGTH'],
+        })
 
     def _build_tools(self) -> list:
         if self.dzaion_action and self.dzaion_action.parameters_schema:
-            return [{"type": "function", "function": {"name": self.dzaion_action.verb_code, "description": self.dzaion_action.name, "parameters": self.dzaion_action.parameters_schema}}]
+            return [self._action_tool(self.dzaion_action)]
         return []
 
+    @staticmethod
+    def _action_tool(action: DzaionAction) -> dict:
+        parameters = action.parameters_schema or {"type": "object", "properties": {}}
+        return {"type": "function", "function": {"name": action.verb_code, "description": action.name, "parameters": parameters}}
+
     def _load_conversation_history(self, limit: int = None) -> list:
         if not self.conversation: return []
-        
+
+        if self._hot_state_enabled():
+            history = ConversationStateStore.load_window(self.conversation, limit)
+            if history is not None:
+                return history
+
         messages_qs = self.conversation.messages.all().order_by('-created_at')
         if limit:
             messages_qs = messages_qs[:limit]
@@ -317,43 +981,71 @@ class DzaionOrchestrator:
             history.append({"role": role, "content": msg.content})
         
         logger.info(f"Carregado {len(history)} mensagens do histórico da conversa {self.conversation.id}.")
+        if self._hot_state_enabled() and not limit and self.thought_process:
+            # Semeia a janela em cache para os próximos turnos.
+            ConversationStateStore.remember(self.thought_process, history=history)
         return history
 
-    def _save_message(self, content: str, direction: str, status: str = 'SENT'):
-        if not content: return
-        Message.objects.create(
+    def _save_message(self, content: str, direction: str, status: str = 'SENT') -> Message | None:
+        if not content: return None
+        if self._hot_state_enabled():
+            return ConversationStateStore.append_message(self.conversation, self.user.pk, direction, content, status)
+        message = Message.objects.create(
             conversation=self.conversation,
             direction=direction,
             content=content,
             status=status
         )
         logger.info(f"Mensagem '{direction}' salva na conversa {self.conversation.id}.")
+        return message
 
-    def _update_total_usage(self, usage_data: dict):
-        self.total_usage['input_tokens'] += usage_data.get('input_tokens', 0)
-        self.total_usage['output_tokens'] += usage_data.get('output_tokens', 0)
+    def _update_total_usage(self, usage_data: dict, ai_model: AIModel | None = None):
+        input_tokens = usage_data.get('input_tokens', 0)
+        output_tokens = usage_data.get('output_tokens', 0)
+        self.total_usage['input_tokens'] += input_tokens
+        self.total_usage['output_tokens'] += output_tokens
+        # Consumo separado por modelo, para que cada um seja registrado com o seu custo.
+        model_usage = self.usage_by_model.setdefault(
+            ai_model.pk if ai_model else None, {'ai_model': ai_model, 'input_tokens': 0, 'output_tokens': 0}
+        )
+        model_usage['input_tokens'] += input_tokens
+        model_usage['output_tokens'] += output_tokens
 
     def _log_token_usage(self):
         if not self.dzaion_action: return
         logger.info(f"Fase 5: Registrando uso de tokens: {self.total_usage}")
-        try:
-            DzaionService.log_token_usage(
-                dzaion_action=self.dzaion_action, user=self.user, ai_model=self.ai_model,
-                input_tokens=self.total_usage.get('input_tokens', 0), output_tokens=self.total_usage.get('output_tokens', 0),
-                tenant_context=self.tenant_context,
-            )
-        except Exception as e:
-            logger.error(f"Falha ao registrar o uso de tokens: {e}", exc_info=True)
+        for model_usage in self.usage_by_model.values():
+            if not (model_usage['input_tokens'] or model_usage['output_tokens']):
+                continue
+            try:
+                DzaionService.log_token_usage(
+                    dzaion_action=self.dzaion_action, user=self.user, ai_model=model_usage['ai_model'] or self.ai_model,
+                    input_tokens=model_usage['input_tokens'], output_tokens=model_usage['output_tokens'],
+                    tenant_context=self.tenant_context,
+                )
+            except Exception as e:
+                logger.error(f"Falha ao registrar o uso de tokens: {e}", exc_info=True)
 
     def _dispatch_response(self, response_text: str):
-        logger.info(f"Fase 6: Enviando resposta: '{response_text}'")
+        """
+        Fase 6: Enfileira a resposta no pipeline de envio. O worker da missão
+        não espera pelo provedor de mensagens.
+        """
+        logger.info(f"Fase 6: Enfileirando resposta: '{response_text}'")
         if not response_text: 
             logger.warning("Nenhum texto de resposta para enviar.")
             return
+        # A mensagem salva só corresponde à resposta final; respostas de erro não são persistidas.
+        message = self.outbound_message
+        if message and message.content != response_text:
+            message = None
         try:
-            dispatcher = get_dispather_service()
-            dispatcher.send_text_message(to_number=self.user.whatsapp, message=response_text)
-            logger.info("Resposta enviada com sucesso.")
+            OutboundDispatchService.enqueue(
+                to_number=self.user.whatsapp, text=response_text, message=message,
+                timeout=self.deadline.timeout(
+                    cap=settings.DZAION_DEADLINES['DISPATCH_TIMEOUT'], floor=settings.DZAION_DEADLINES['DISPATCH_MIN_TIMEOUT']
+                ),
+            )
         except Exception as e:
-            logger.error(f"Falha ao enviar resposta via dispatcher: {e}", exc_info=True)
+            logger.error(f"Falha ao enfileirar resposta para envio: {e}", exc_info=True)
 
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Pipeline de Envio (Outbound) do App 'dzaion'.
+
+Tira o envio de mensagens do caminho crítico da missão: o Orquestrador
+apenas enfileira a resposta, e workers dedicados (fila `dzaion_dispatch`)
+fazem a quebra de mensagens longas, respeitam os limites de taxa por
+destinatário e por conta, e tentam novamente com backoff exponencial.
+Os callbacks de entrega/leitura do provedor são acumulados no Redis e
+aplicados ao `Message.status` em lote. Um callback pode chegar antes de a
+mensagem ser gravada pelo write-behind do estado das conversas: os que não
+encontram a mensagem são guardados e reaplicados nas execuções seguintes,
+até `STATUS_MAX_ATTEMPTS` vezes.
+
+Author: Dzaion
+Version: 0.4.0
+"""
+import itertools
+import json
+import logging
+import random
+
+from django.conf import settings
+
+from core.utils.redis_client import get_redis_client
+from .exceptions import DispatchRateLimitedError
+from .models import Message
+
+logger = logging.getLogger('dispather_log')
+
+STATUS_EVENTS_KEY = 'dzaion:dispatch:status_events'
+STATUS_RETRY_KEY = 'dzaion:dispatch:status_events:retry'
+
+# Ordem de progressão do status. Um callback nunca faz o status "voltar".
+STATUS_RANK = {
+    Message.MessageStatus.QUEUED: 0,
+    Message.MessageStatus.SENT: 1,
+    Message.MessageStatus.DELIVERED: 2,
+    Message.MessageStatus.READ: 3,
+}
+
+# Normaliza os nomes de status usados pelos provedores para o MessageStatus.
+PROVIDER_STATUS_MAP = {
+    'sent': Message.MessageStatus.SENT,
+    'server_ack': Message.MessageStatus.SENT,
+    'delivered': Message.MessageStatus.DELIVERED,
+    'delivery_ack': Message.MessageStatus.DELIVERED,
+    'read': Message.MessageStatus.READ,
+    'read_ack': Message.MessageStatus.READ,
+    'played': Message.MessageStatus.READ,
+    'failed': Message.MessageStatus.FAILED,
+    'error': Message.MessageStatus.FAILED,
+}
+
+
+def split_message(text: str, max_length: int) -> list[str]:
+    """
+    Quebra um texto longo em partes de até `max_length` caracteres,
+    preferindo cortar em parágrafos, depois em linhas, frases e palavras.
+    """
+    text = (text or '').strip()
+    if len(text) <= max_length:
+        return [text] if text else []
+
+    chunks = []
+    remaining = text
+    while len(remaining) > max_length:
+        window = remaining[:max_length]
+        cut = -1
+        for separator in ('\n\n', '\n', '. ', ' '):
+            position = window.rfind(separator)
+            if position > max_length // 2:
+                cut = position + len(separator)
+                break
+        if cut <= 0:
+            cut = max_length
+        chunks.append(remaining[:cut].strip())
+        remaining = remaining[cut:].strip()
+    if remaining:
+        chunks.append(remaining)
+    return chunks
+
+
+class FixedWindowRateLimiter:
+    """
+    Limitador de taxa de janela fixa, com contadores atômicos no Redis.
+    """
+
+    @staticmethod
+    def acquire(limits: list[tuple[str, int, int]]) -> int:
+        """
+        Tenta consumir uma unidade de cada limite `(chave, máximo, janela_em_segundos)`.
+        Retorna 0 se todos permitirem o envio, ou quantos segundos esperar.
+        Se algum limite estourar, nenhum contador fica consumido.
+        """
+        redis = get_redis_client()
+        pipeline = redis.pipeline()
+        for key, _, window in limits:
+            pipeline.incr(key)
+            pipeline.expire(key, window, nx=True)
+            pipeline.ttl(key)
+        results = pipeline.execute()
+
+        retry_after = 0
+        for index, (key, limit, window) in enumerate(limits):
+            count, ttl = results[index * 3], results[index * 3 + 2]
+            if count > limit:
+                retry_after = max(retry_after, ttl if ttl and ttl > 0 else window)
+
+        if retry_after:
+            rollback = redis.pipeline()
+            for key, _, _ in limits:
+                rollback.decr(key)
+            rollback.execute()
+        return retry_after
+
+
+class LocalStubProvider:
+    """
+    Provedor de mensagens local, sem rede, para testes e desenvolvimento.
+    Ativado com `MESSAGING_PROVIDER=stub`. Guarda as mensagens enviadas em memória.
+    """
+    sent_messages: list[dict] = []
+    fail_next: int = 0
+    _sequence = itertools.count(1)
+
+    def send_text_message(self, to_number: str, message: str) -> dict:
+        if LocalStubProvider.fail_next > 0:
+            LocalStubProvider.fail_next -= 1
+            raise ConnectionError("Falha simulada pelo provedor local.")
+        provider_message_id = f"stub-{next(LocalStubProvider._sequence)}"
+        LocalStubProvider.sent_messages.append(
+            {'message_id': provider_message_id, 'to_number': to_number, 'message': message}
+        )
+        logger.debug(f"[stub] Mensagem {provider_message_id} enviada para {to_number}.")
+        return {'message_id': provider_message_id}
+
+    @classmethod
+    def reset(cls):
+        cls.sent_messages = []
+        cls.fail_next = 0
+
+
+def get_outbound_provider():
+    """
+    Retorna o provedor de envio configurado em `MESSAGING_PROVIDER`.
+    """
+    if settings.MESSAGING_PROVIDER == 'stub':
+        return LocalStubProvider()
+    from dispatchers.services import get_dispather_service
+    return get_dispather_service()
+
+
+class OutboundDispatchService:
+    """
+    Serviço que centraliza o envio de mensagens de saída e a ingestão
+    dos status de entrega reportados pelo provedor.
+    """
+
+    @staticmethod
+    def enqueue(to_number: str, text: str, message: Message | None = None, timeout: float | None = None):
+        """
+        Agenda o envio de uma resposta na fila de dispatch.
+        `timeout` (segundos) limita o tempo de execução da tarefa de envio.
+        """
+        from .tasks import dispatch_outbound_message
+
+        if not text:
+            logger.warning("Nenhum texto de resposta para enfileirar.")
+            return
+        options = {}
+        if timeout:
+            options = {
+                'soft_time_limit': timeout,
+                'time_limit': timeout + settings.DZAION_DEADLINES['TIME_LIMIT_GRACE'],
+            }
+        dispatch_outbound_message.apply_async(
+            kwargs={
+                'to_number': to_number,
+                'text': text,
+                'message_id': str(message.id) if message else None,
+            },
+            **options,
+        )
+        logger.info(f"Resposta para {to_number} enfileirada para envio.")
+
+    @staticmethod
+    def split(text: str) -> list[str]:
+        return split_message(text, settings.DZAION_DISPATCH['MAX_MESSAGE_LENGTH'])
+
+    @staticmethod
+    def send_chunk(provider, to_number: str, text: str) -> str | None:
+        """
+        Envia uma parte da mensagem respeitando os limites de taxa.
+        Levanta DispatchRateLimitedError se o envio precisar ser adiado.
+        """
+        config = settings.DZAION_DISPATCH
+        recipient_limit, recipient_window = config['RECIPIENT_RATE_LIMIT']
+        account_limit, account_window = config['ACCOUNT_RATE_LIMIT']
+        retry_after = FixedWindowRateLimiter.acquire([
+            (f"dzaion:ratelimit:recipient:{to_number}", recipient_limit, recipient_window),
+            (f"dzaion:ratelimit:account:{settings.MESSAGING_PROVIDER}", account_limit, account_window),
+        ])
+        if retry_after:
+            raise DispatchRateLimitedError(
+                f"Limite de envio atingido para {to_number}.", retry_after=retry_after
+            )
+
+        result = provider.send_text_message(to_number=to_number, message=text)
+        if isinstance(result, dict):
+            return result.get('message_id') or result.get('id')
+        return None
+
+    @staticmethod
+    def retry_countdown(retries: int) -> int:
+        """Backoff exponencial com jitter, limitado por RETRY_BACKOFF_MAX."""
+        config = settings.DZAION_DISPATCH
+        backoff = config['RETRY_BACKOFF_BASE'] ** (retries + 1)
+        return int(min(backoff + random.uniform(0, backoff / 2), config['RETRY_BACKOFF_MAX']))
+
+    @staticmethod
+    def mark_message(message_id: str | None, status: str, provider_message_ids: list[str] | None = None):
+        """
+        Grava o status da mensagem e os IDs de todas as partes enviadas ao
+        provedor (o callback de qualquer parte atualiza a mensagem).
+        """
+        if not message_id:
+            return
+        fields = {'status': status}
+        if provider_message_ids:
+            fields['provider_message_id'] = provider_message_ids[0]
+            fields['provider_message_ids'] = provider_message_ids
+        if not Message.objects.filter(pk=message_id).update(**fields):
+            # A mensagem ainda está na fila de write-behind do estado das conversas.
+            from .conversation_state import ConversationStateStore
+            ConversationStateStore.mark_message_status(message_id, status, provider_message_ids)
+
+    # --- Ingestão de status de entrega ---
+
+    @staticmethod
+    def buffer_status_events(events: list[dict]) -> int:
+        """
+        Normaliza os callbacks do provedor e os acumula no Redis para
+        aplicação em lote. Retorna a quantidade de eventos aceitos.
+        """
+        normalized = []
+        for event in events:
+            if not isinstance(event, dict):
+                continue
+            provider_message_id = event.get('message_id') or event.get('id')
+            status = PROVIDER_STATUS_MAP.get(str(event.get('status', '')).lower())
+            if provider_message_id and status:
+                normalized.append(json.dumps({'provider_message_id': str(provider_message_id), 'status': status}))
+        if normalized:
+            get_redis_client().rpush(STATUS_EVENTS_KEY, *normalized)
+        return len(normalized)
+
+    @staticmethod
+    def requeue_unmatched_events() -> int:
+        """
+        Devolve à fila principal os callbacks que ainda não encontraram a
+        mensagem (guardados na execução anterior). Retorna quantos voltaram.
+        """
+        redis = get_redis_client()
+        pending = redis.llen(STATUS_RETRY_KEY)
+        if not pending:
+            return 0
+        pipeline = redis.pipeline(transaction=True)
+        for _ in range(pending):
+            pipeline.lmove(STATUS_RETRY_KEY, STATUS_EVENTS_KEY, 'LEFT', 'RIGHT')
+        return sum(1 for moved in pipeline.execute() if moved is not None)
+
+    @staticmethod
+    def drain_status_events(batch_size: int) -> list[dict]:
+        redis = get_redis_client()
+        pipeline = redis.pipeline()
+        pipeline.lrange(STATUS_EVENTS_KEY, 0, batch_size - 1)
+        pipeline.ltrim(STATUS_EVENTS_KEY, batch_size, -1)
+        raw_events, _ = pipeline.execute()
+        return [json.loads(raw) for raw in raw_events]
+
+    @staticmethod
+    def apply_status_updates(events: list[dict]) -> int:
+        """
+        Aplica os status em lote: um único UPDATE por status de destino.
+        Para cada mensagem vale o status mais avançado do lote, e o status
+        gravado nunca regride (ex: READ não volta para DELIVERED).
+        """
+        latest: dict[str, str] = {}
+        for event in events:
+            current = latest.get(event['provider_message_id'])
+            if current is None or OutboundDispatchService._is_progression(current, event['status']):
+                latest[event['provider_message_id']] = event['status']
+
+        by_status: dict[str, list[str]] = {}
+        for provider_message_id, status in latest.items():
+            by_status.setdefault(status, []).append(provider_message_id)
+
+        updated = 0
+        for status, provider_ids in by_status.items():
+            if status == Message.MessageStatus.FAILED:
+                allowed_from = [Message.MessageStatus.QUEUED, Message.MessageStatus.SENT]
+            else:
+                allowed_from = [s for s, rank in STATUS_RANK.items() if rank < STATUS_RANK[status]]
+            updated += Message.objects.filter(
+                provider_message_ids__overlap=provider_ids,
+                status__in=allowed_from,
+            ).update(status=status)
+        logger.info(f"{updated} status de mensagem atualizados a partir de {len(events)} callbacks.")
+        OutboundDispatchService._retry_unmatched(events, list(latest))
+        return updated
+
+    @staticmethod
+    def _retry_unmatched(events: list[dict], provider_ids: list[str]):
+        """
+        Guarda para a próxima execução os callbacks cuja mensagem ainda não
+        está no banco (ou ainda não tem os IDs do provedor gravados).
+        """
+        known = set()
+        for ids in Message.objects.filter(provider_message_ids__overlap=provider_ids).values_list(
+            'provider_message_ids', flat=True
+        ):
+            known.update(ids)
+
+        max_attempts = settings.DZAION_DISPATCH['STATUS_MAX_ATTEMPTS']
+        retry, dropped = [], 0
+        for event in events:
+            if event['provider_message_id'] in known:
+                continue
+            attempts = event.get('attempts', 0) + 1
+            if attempts >= max_attempts:
+                dropped += 1
+                continue
+            retry.append(json.dumps({**event, 'attempts': attempts}))
+        if retry:
+            get_redis_client().rpush(STATUS_RETRY_KEY, *retry)
+        if dropped:
+            logger.warning(f"{dropped} callback(s) de status descartado(s): mensagem não encontrada.")
+
+    @staticmethod
+    def _is_progression(current: str, new: str) -> bool:
+        if new == Message.MessageStatus.FAILED:
+            return current in (Message.MessageStatus.QUEUED, Message.MessageStatus.SENT)
+        if current == Message.MessageStatus.FAILED:
+            return False
+        return STATUS_RANK[new] > STATUS_RANK[current]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Classes de Permissão Customizadas para o App 'dzaion'.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import hashlib
+import hmac
+import logging
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+logger = logging.getLogger('dzaion')
+
+
+class HasValidWebhookSignature(BasePermission):
+    """
+    Permissão do DRF que valida a assinatura HMAC-SHA256 enviada pelo
+    provedor de mensagens no cabeçalho configurado em
+    `DZAION_INBOUND['SIGNATURE_HEADER']` (formato `sha256=<hex>`).
+
+    Não acessa o banco de dados: apenas o corpo bruto da requisição e o segredo.
+    """
+    message = "Assinatura do webhook inválida."
+
+    def has_permission(self, request, view):
+        secret = settings.WHATSAPP_WEBHOOK_SECRET
+        if not secret:
+            # Em desenvolvimento, permite testar o webhook sem segredo configurado.
+            if settings.DEBUG:
+                return True
+            logger.error("WHATSAPP_WEBHOOK_SECRET não configurado; webhook recusado.")
+            return False
+
+        header_name = settings.DZAION_INBOUND['SIGNATURE_HEADER']
+        received = request.headers.get(header_name, '')
+        if received.startswith('sha256='):
+            received = received[len('sha256='):]
+        if not received:
+            return False
+
+        expected = hmac.new(secret.encode(), request.body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, received)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Receivers (Ouvintes de Sinais) para o App 'dzaion'.
+
+Mantém o índice de memória (BM25) atualizado à medida que as
+mensagens das conversas são salvas.
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import logging
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Message
+from .retrieval import MessageMemoryIndex
+
+logger = logging.getLogger(__name__)
+
+@receiver(post_save, sender=Message)
+def handle_message_indexing(sender, instance: Message, created, **kwargs):
+    """
+    Indexa cada nova mensagem no índice lexical do usuário dono da conversa.
+    """
+    if not created:
+        return
+    try:
+        MessageMemoryIndex.index_message(instance)
+    except Exception as e:
+        logger.error(f"Erro ao indexar a mensagem {instance.id}: {e}", exc_info=True)
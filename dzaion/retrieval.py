@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Memória de Longo Prazo (Recuperação Lexical) do App 'dzaion'.
+
+Mantém um índice BM25 por usuário sobre o conteúdo das mensagens
+(`Message.content`), com stemming e stopwords em português. O índice é
+atualizado incrementalmente a cada mensagem salva, e o Orquestrador usa
+`MessageMemoryIndex.search` para trazer apenas os trechos passados mais
+relevantes para o prompt, sem depender de um serviço externo de embeddings.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Avg, Count, Q
+
+from .models import Message, MessageIndexEntry
+
+logger = logging.getLogger('dzaion')
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+PORTUGUESE_STOPWORDS = frozenset("""
+a ao aos aquela aquelas aquele aqueles aquilo as até com como da das de dela delas dele deles
+depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas este estes
+eu foi fomos for foram fui há isso isto já lhe lhes mais mas me mesmo meu meus minha minhas
+muito na nas nem no nos nossa nossas nosso nossos num numa não o os ou para pela pelas pelo
+pelos por qual quando que quem se sem ser seu seus só sua suas também te tem tinha tu tua tuas
+um uma umas uns você vocês vos à às é está estão estou ok oi olá sim pra pro tá né
+""".split())
+
+# Regras simplificadas do RSLP (Orengo & Huyck): (sufixo, tamanho mínimo do radical, substituição)
+_PLURAL_RULES = [
+    ('ns', 1, 'm'), ('ões', 3, 'ão'), ('ães', 1, 'ão'), ('ais', 1, 'al'), ('éis', 2, 'el'),
+    ('eis', 2, 'el'), ('óis', 2, 'ol'), ('is', 2, 'il'), ('les', 3, 'l'), ('res', 3, 'r'), ('s', 2, ''),
+]
+_FEMININE_RULES = [
+    ('ona', 3, 'ão'), ('ã', 2, 'ão'), ('ora', 3, 'or'), ('na', 4, 'no'), ('inha', 3, 'inho'),
+    ('esa', 3, 'ês'), ('osa', 3, 'oso'), ('iva', 3, 'ivo'), ('ada', 2, 'ado'), ('ida', 3, 'ido'),
+    ('ia', 3, ''), ('eira', 3, 'eiro'),
+]
+_AUGMENTATIVE_RULES = [
+    ('díssimo', 5, ''), ('abilíssimo', 5, ''), ('íssimo', 3, ''), ('ésimo', 3, ''), ('érrimo', 4, ''),
+    ('zinho', 2, ''), ('quinho', 4, 'c'), ('uinho', 4, ''), ('adinho', 3, ''), ('inho', 3, ''),
+    ('alhão', 4, ''), ('uça', 4, ''), ('aço', 4, ''), ('adão', 4, ''), ('ázio', 3, ''), ('arraz', 4, ''),
+    ('zarrão', 3, ''), ('arrão', 4, ''), ('zão', 2, ''), ('ão', 3, ''),
+]
+_NOUN_RULES = [
+    ('encialista', 4, ''), ('alista', 5, ''), ('agem', 3, ''), ('iamento', 4, ''), ('amento', 3, ''),
+    ('imento', 3, ''), ('mento', 6, ''), ('alizado', 4, ''), ('atizado', 4, ''), ('izado', 5, ''),
+    ('ativo', 4, ''), ('tivo', 4, ''), ('ivo', 4, ''), ('ado', 2, ''), ('ido', 3, ''), ('ador', 3, ''),
+    ('edor', 3, ''), ('idor', 4, ''), ('atória', 5, ''), ('tor', 3, ''), ('or', 2, ''), ('abilidade', 5, ''),
+    ('icionista', 4, ''), ('cionista', 5, ''), ('ionista', 5, ''), ('ionar', 5, ''), ('ional', 4, ''),
+    ('ência', 3, ''), ('ância', 4, ''), ('edouro', 3, ''), ('queiro', 3, 'c'), ('eiro', 3, ''),
+    ('oso', 3, ''), ('alizaç', 5, ''), ('ismo', 3, ''), ('izaç', 5, ''), ('aç', 3, ''), ('iç', 3, ''),
+    ('ário', 3, ''), ('ério', 6, ''), ('ês', 4, ''), ('eza', 3, ''), ('ez', 4, ''), ('esco', 4, ''),
+    ('ante', 2, ''), ('ástico', 4, ''), ('ático', 3, ''), ('ico', 4, ''), ('ividade', 5, ''),
+    ('idade', 4, ''), ('oria', 4, ''), ('encial', 5, ''), ('ista', 4, ''), ('quice', 4, 'c'),
+    ('ice', 4, ''), ('íaco', 3, ''), ('ente', 4, ''), ('inal', 3, ''), ('ano', 4, ''), ('ável', 2, ''),
+    ('ível', 3, ''), ('ura', 4, ''), ('ual', 3, ''), ('ial', 3, ''), ('al', 4, ''),
+]
+_VERB_RULES = [
+    ('aríamos', 2, ''), ('ássemos', 2, ''), ('eríamos', 2, ''), ('êssemos', 2, ''), ('iríamos', 3, ''),
+    ('íssemos', 3, ''), ('áramos', 2, ''), ('aremos', 2, ''), ('ariam', 2, ''), ('aríeis', 2, ''),
+    ('assem', 2, ''), ('ávamos', 2, ''), ('êramos', 3, ''), ('eremos', 3, ''), ('eriam', 3, ''),
+    ('essem', 3, ''), ('íramos', 3, ''), ('iremos', 3, ''), ('iriam', 3, ''), ('issem', 3, ''),
+    ('ando', 2, ''), ('endo', 3, ''), ('indo', 3, ''), ('ondo', 3, ''), ('aram', 2, ''), ('arão', 2, ''),
+    ('arem', 2, ''), ('aria', 2, ''), ('asse', 2, ''), ('avam', 2, ''), ('eram', 3, ''), ('erão', 3, ''),
+    ('erem', 3, ''), ('eria', 3, ''), ('esse', 3, ''), ('iram', 3, ''), ('irão', 3, ''), ('irem', 3, ''),
+    ('iria', 3, ''), ('isse', 3, ''), ('ada', 2, ''), ('ida', 3, ''), ('ara', 2, ''), ('era', 3, ''),
+    ('ira', 3, ''), ('ava', 2, ''), ('iam', 3, ''), ('ado', 2, ''), ('ido', 3, ''), ('ias', 3, ''),
+    ('ais', 2, ''), ('eis', 2, ''), ('ear', 4, ''), ('ar', 2, ''), ('er', 2, ''), ('ir', 3, ''),
+    ('as', 2, ''), ('ou', 2, ''), ('am', 2, ''), ('em', 2, ''), ('ei', 3, ''), ('ia', 3, ''),
+    ('eu', 3, ''), ('iu', 3, ''), ('es', 3, ''),
+]
+_VOWEL_RULES = [('a', 3, ''), ('e', 3, ''), ('o', 3, '')]
+
+
+def _apply_rules(word: str, rules: list[tuple[str, int, str]]) -> tuple[str, bool]:
+    for suffix, min_stem, replacement in rules:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            return word[:-len(suffix)] + replacement, True
+    return word, False
+
+
+def _strip_accents(word: str) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFD', word) if unicodedata.category(c) != 'Mn')
+
+
+def stem(word: str) -> str:
+    """
+    Reduz uma palavra em português ao seu radical (versão simplificada do RSLP).
+    """
+    if len(word) < 4:
+        return _strip_accents(word)
+    if word.endswith('s'):
+        word, _ = _apply_rules(word, _PLURAL_RULES)
+    if word.endswith('a') or word.endswith('ã'):
+        word, _ = _apply_rules(word, _FEMININE_RULES)
+    word, _ = _apply_rules(word, _AUGMENTATIVE_RULES)
+    word, changed = _apply_rules(word, _NOUN_RULES)
+    if not changed:
+        word, changed = _apply_rules(word, _VERB_RULES)
+        if not changed:
+            word, _ = _apply_rules(word, _VOWEL_RULES)
+    return _strip_accents(word)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Normaliza um texto em uma lista de radicais, sem stopwords.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall((text or '').lower()):
+        if len(token) < 2 or token in PORTUGUESE_STOPWORDS or token.isdigit():
+            continue
+        tokens.append(stem(token))
+    return tokens
+
+
+class MessageMemoryIndex:
+    """
+    Índice lexical (BM25) das mensagens de cada usuário.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    @staticmethod
+    def index_message(message: Message) -> MessageIndexEntry | None:
+        """
+        Adiciona uma mensagem ao índice do usuário dono da conversa.
+        """
+        terms = tokenize(message.content)
+        if not terms:
+            return None
+
+        conversation = message.conversation
+        user_id = conversation.user_id or conversation.thought_process.user_id
+        return MessageIndexEntry.objects.create(
+            message=message,
+            user_id=user_id,
+            conversation_id=conversation.id,
+            term_frequencies=dict(Counter(terms)),
+            length=len(terms),
+        )
+
+    @staticmethod
+    def index_messages(messages: list[Message], user_ids: dict) -> int:
+        """
+        Indexa um lote de mensagens (usado após `bulk_create`, que não dispara
+        o `post_save`). `user_ids` mapeia conversa -> dono da memória.
+        Mensagens já indexadas são ignoradas.
+        """
+        entries = []
+        for message in messages:
+            terms = tokenize(message.content)
+            if not terms:
+                continue
+            entries.append(MessageIndexEntry(
+                message_id=message.id,
+                user_id=user_ids[message.conversation_id],
+                conversation_id=message.conversation_id,
+                term_frequencies=dict(Counter(terms)),
+                length=len(terms),
+            ))
+        MessageIndexEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        return len(entries)
+
+    @staticmethod
+    def search(user, query: str, top_k: int | None = None, exclude_conversation=None) -> list[tuple[Message, float]]:
+        """
+        Retorna as `top_k` mensagens passadas do usuário mais relevantes para
+        o texto de consulta, ordenadas pelo score BM25.
+        """
+        config = settings.DZAION_MEMORY
+        top_k = top_k or config['TOP_K']
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        entries = MessageIndexEntry.objects.filter(user=user)
+        if exclude_conversation is not None:
+            entries = entries.exclude(conversation=exclude_conversation)
+
+        # 1. Estatísticas do corpus do usuário (N, tamanho médio e df de cada termo) em uma consulta.
+        stats = entries.aggregate(
+            total=Count('id'),
+            avg_length=Avg('length'),
+            **{f"df_{index}": Count('id', filter=Q(term_frequencies__has_key=term))
+               for index, term in enumerate(query_terms)}
+        )
+        total = stats['total']
+        if not total:
+            return []
+        avg_length = stats['avg_length'] or 1
+        idf = {}
+        for index, term in enumerate(query_terms):
+            df = stats[f"df_{index}"]
+            if df:
+                idf[term] = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        if not idf:
+            return []
+
+        # 2. Candidatos: apenas mensagens que contêm algum termo da consulta (índice GIN).
+        candidates = entries.filter(
+            term_frequencies__has_any_keys=list(idf)
+        ).order_by('-created_at').values_list('message_id', 'term_frequencies', 'length')[:config['MAX_CANDIDATES']]
+
+        scored = []
+        for message_id, frequencies, length in candidates:
+            score = 0.0
+            for term, term_idf in idf.items():
+                tf = frequencies.get(term, 0)
+                if tf:
+                    norm = tf + MessageMemoryIndex.K1 * (1 - MessageMemoryIndex.B + MessageMemoryIndex.B * length / avg_length)
+                    score += term_idf * tf * (MessageMemoryIndex.K1 + 1) / norm
+            scored.append((score, message_id))
+        scored.sort(reverse=True)
+        top = scored[:top_k]
+        if not top:
+            return []
+
+        messages = Message.objects.in_bulk([message_id for _, message_id in top])
+        return [(messages[message_id], score) for score, message_id in top if message_id in messages]
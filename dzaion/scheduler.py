@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Escalonador Justo (Fair Scheduler) de Missões do App 'dzaion'.
+
+Em vez de publicar as missões direto na fila FIFO do Celery, o webhook e as
+campanhas as entregam ao `FairScheduler`, que mantém uma sub-fila por
+pagador no Redis e libera as missões para os workers por Deficit Round
+Robin (DRR), ponderado pelo `service_tier` do `DzaionUsageProfile`.
+
+- O total de missões em execução é limitado a `MAX_INFLIGHT` (a capacidade
+  dos workers), de modo que a fila do broker fica curta.
+- Nenhum pagador ocupa mais que `MAX_PAYER_SHARE` dessa capacidade: a rajada
+  de um tenant não atrasa as respostas dos demais.
+- Cada missão liberada ganha uma concessão (lease) com prazo, devolvida ao
+  fim do `dzaion_mission_handler`; concessões de workers que morreram
+  expiram sozinhas.
+- Uma missão só sai da sub-fila depois de publicada no broker: se o broker
+  falhar, ela continua lá e é liberada em um tique seguinte.
+
+Author: Dzaion
+Version: 0.4.0
+"""
+import json
+import logging
+import math
+import time
+import uuid
+
+from django.conf import settings
+
+from core.utils.redis_client import get_redis_client
+from .exceptions import MissionPublishError
+
+logger = logging.getLogger('dzaion')
+
+QUEUE_KEY = 'dzaion:sched:queue:{}'
+ACTIVE_KEY = 'dzaion:sched:active'
+DEFICIT_KEY = 'dzaion:sched:deficit'
+WEIGHTS_KEY = 'dzaion:sched:weights'
+PAYER_OF_SENDER_KEY = 'dzaion:sched:payer_of_sender'
+INFLIGHT_KEY = 'dzaion:sched:inflight'
+PAYER_INFLIGHT_KEY = 'dzaion:sched:inflight:{}'
+CURSOR_KEY = 'dzaion:sched:cursor'
+LOCK_KEY = 'dzaion:sched:lock'
+
+
+class FairScheduler:
+    """
+    Sub-filas por pagador com Deficit Round Robin ponderado.
+    """
+
+    # --- Identificação do pagador e pesos ---
+
+    @staticmethod
+    def payer_key(payer) -> str:
+        """Chave de escalonamento de um pagador (User ou Tenant)."""
+        return f"{payer._meta.model_name}:{payer.pk}"
+
+    @staticmethod
+    def campaign_key(campaign) -> str:
+        """Chave de escalonamento de uma campanha proativa."""
+        return f"campaign:{campaign.pk}"
+
+    @staticmethod
+    def payer_for_sender(whatsapp_number: str) -> str:
+        """
+        Pagador de uma mensagem recebida, sem consultar o banco: usa o
+        mapeamento gravado pelo Orquestrador na última missão do remetente.
+        """
+        payer = get_redis_client().hget(PAYER_OF_SENDER_KEY, whatsapp_number)
+        return payer or f"sender:{whatsapp_number}"
+
+    @staticmethod
+    def remember_payer(whatsapp_number: str | None, payer_key: str, service_tier: str):
+        """Grava o pagador do remetente e o peso correspondente ao seu service_tier."""
+        weights = settings.DZAION_SCHEDULER['TIER_WEIGHTS']
+        try:
+            pipeline = get_redis_client().pipeline()
+            if whatsapp_number:
+                pipeline.hset(PAYER_OF_SENDER_KEY, whatsapp_number, payer_key)
+            pipeline.hset(WEIGHTS_KEY, payer_key, weights.get(service_tier, 1))
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Falha ao registrar o pagador {payer_key} no escalonador: {e}")
+
+    # --- Submissão ---
+
+    @staticmethod
+    def submit(mission_data: dict, payer_key: str):
+        FairScheduler.submit_many([mission_data], payer_key)
+
+    @staticmethod
+    def submit_many(missions: list[dict], payer_key: str):
+        """
+        Coloca as missões na sub-fila do pagador e tenta liberá-las em seguida.
+        Com o escalonador desligado, publica direto no Celery.
+
+        Só levanta exceção se as missões não foram aceitas. Uma vez na
+        sub-fila, a liberação é de melhor esforço: se falhar, o tique
+        periódico (`schedule_missions`) as libera depois.
+        """
+        if not missions:
+            return
+        if not settings.DZAION_SCHEDULER['ENABLED']:
+            FairScheduler._publish(missions)
+            return
+
+        pipeline = get_redis_client().pipeline()
+        pipeline.rpush(QUEUE_KEY.format(payer_key), *[json.dumps(mission) for mission in missions])
+        pipeline.sadd(ACTIVE_KEY, payer_key)
+        pipeline.execute()
+        try:
+            FairScheduler.dispatch()
+        except Exception as e:
+            logger.warning(f"Liberação imediata das missões de {payer_key} falhou; o tique periódico as liberará: {e}")
+
+    # --- Liberação (DRR) ---
+
+    @staticmethod
+    def dispatch() -> int:
+        """
+        Libera missões para os workers enquanto houver capacidade, visitando os
+        pagadores ativos em rodízio. Cada visita soma `QUANTUM * peso` ao
+        déficit do pagador, que pode liberar tantas missões quanto o déficit,
+        respeitando o teto por pagador. Retorna quantas missões foram liberadas.
+        """
+        redis = get_redis_client()
+        lock = redis.lock(LOCK_KEY, timeout=30, blocking=False)
+        if not lock.acquire():
+            return 0
+        try:
+            return FairScheduler._dispatch(redis)
+        finally:
+            lock.release()
+
+    @staticmethod
+    def _dispatch(redis) -> int:
+        config = settings.DZAION_SCHEDULER
+        payers = sorted(redis.smembers(ACTIVE_KEY))
+        if not payers:
+            return 0
+
+        expired_before = time.time() - config['LEASE_SECONDS']
+        pipeline = redis.pipeline()
+        pipeline.zremrangebyscore(INFLIGHT_KEY, 0, expired_before)
+        pipeline.zcard(INFLIGHT_KEY)
+        for payer in payers:
+            pipeline.zremrangebyscore(PAYER_INFLIGHT_KEY.format(payer), 0, expired_before)
+            pipeline.zcard(PAYER_INFLIGHT_KEY.format(payer))
+        pipeline.hmget(WEIGHTS_KEY, payers)
+        pipeline.hmget(DEFICIT_KEY, payers)
+        pipeline.get(CURSOR_KEY)
+        results = pipeline.execute()
+
+        capacity = config['MAX_INFLIGHT'] - results[1]
+        inflight = {payer: results[3 + index * 2] for index, payer in enumerate(payers)}
+        weights = {
+            payer: float(w or (config['CAMPAIGN_WEIGHT'] if payer.startswith('campaign:') else config['DEFAULT_WEIGHT']))
+            for payer, w in zip(payers, results[-3])
+        }
+        deficits = {payer: float(d or 0) for payer, d in zip(payers, results[-2])}
+        payer_cap = max(1, math.ceil(config['MAX_PAYER_SHARE'] * config['MAX_INFLIGHT']))
+
+        # O rodízio recomeça logo depois do último pagador atendido.
+        last_served = results[-1]
+        start = next((index for index, payer in enumerate(payers) if payer > last_served), 0) if last_served else 0
+        ring = payers[start:] + payers[:start]
+
+        dispatched, empty, failure = 0, set(), None
+        progress = capacity > 0
+        while progress and capacity > 0 and not failure:
+            progress = False
+            for payer in ring:
+                if capacity <= 0:
+                    break
+                if payer in empty:
+                    continue
+                deficits[payer] = min(deficits[payer] + config['QUANTUM'] * weights[payer], payer_cap)
+                allowed = min(int(deficits[payer]), payer_cap - inflight[payer], capacity)
+                if allowed <= 0:
+                    continue
+                queue_key = QUEUE_KEY.format(payer)
+                # Lê sem remover: a missão só sai da sub-fila depois de publicada.
+                raw_missions = redis.lrange(queue_key, 0, allowed - 1)
+                if len(raw_missions) < allowed:
+                    empty.add(payer)
+                if not raw_missions:
+                    continue
+                missions = [json.loads(raw) for raw in raw_missions]
+                try:
+                    FairScheduler._lease_and_publish(redis, payer, missions)
+                    count = len(missions)
+                except MissionPublishError as e:
+                    count, failure = e.published, e
+                    empty.discard(payer)
+                if count:
+                    # As submissões só acrescentam ao fim da fila; sob o lock, o início é nosso.
+                    redis.ltrim(queue_key, count, -1)
+                deficits[payer] -= count
+                inflight[payer] += count
+                capacity -= count
+                dispatched += count
+                progress = True
+                redis.set(CURSOR_KEY, payer)
+                if failure:
+                    logger.error(f"Falha ao publicar missões de {payer}; {len(missions) - count} continuam na fila: {failure}")
+                    break
+
+        pipeline = redis.pipeline()
+        for payer in payers:
+            if payer in empty:
+                # DRR: o déficit de uma fila que esvaziou é zerado.
+                pipeline.srem(ACTIVE_KEY, payer)
+                pipeline.hdel(DEFICIT_KEY, payer)
+            else:
+                pipeline.hset(DEFICIT_KEY, payer, deficits[payer])
+        pipeline.execute()
+        # Uma submissão que chegou entre a leitura e o SREM volta a ficar ativa.
+        for payer in empty:
+            if redis.llen(QUEUE_KEY.format(payer)):
+                redis.sadd(ACTIVE_KEY, payer)
+
+        if dispatched:
+            logger.debug(f"Escalonador liberou {dispatched} missão(ões).")
+        return dispatched
+
+    @staticmethod
+    def _lease_and_publish(redis, payer: str, missions: list[dict]):
+        """
+        Concede as leases e publica as missões. Se a publicação falhar, as
+        leases das missões não publicadas são devolvidas e o erro é propagado.
+        """
+        now = time.time()
+        pipeline = redis.pipeline()
+        for mission in missions:
+            token = uuid.uuid4().hex
+            mission['scheduler'] = {'payer': payer, 'token': token}
+            # Início do prazo das missões proativas (ver `deadlines.py`).
+            mission['released_at'] = now
+            pipeline.zadd(INFLIGHT_KEY, {f"{payer}|{token}": now})
+            pipeline.zadd(PAYER_INFLIGHT_KEY.format(payer), {token: now})
+        pipeline.execute()
+        try:
+            FairScheduler._publish(missions)
+        except MissionPublishError as e:
+            pipeline = redis.pipeline()
+            for mission in missions[e.published:]:
+                token = mission['scheduler']['token']
+                pipeline.zrem(INFLIGHT_KEY, f"{payer}|{token}")
+                pipeline.zrem(PAYER_INFLIGHT_KEY.format(payer), token)
+            pipeline.execute()
+            raise
+
+    @staticmethod
+    def _publish(missions: list[dict]):
+        """
+        Publica as missões no Celery. Levanta MissionPublishError com a
+        quantidade publicada antes da falha.
+        """
+        from .tasks import dzaion_mission_handler
+
+        proactive_queue = settings.DZAION_CAMPAIGNS['QUEUE']
+        published = 0
+        try:
+            with dzaion_mission_handler.app.producer_or_acquire() as producer:
+                for mission in missions:
+                    options = {'queue': proactive_queue} if mission.get('mission_type') == 'PROACTIVE' else {}
+                    dzaion_mission_handler.apply_async(args=[mission], producer=producer, **options)
+                    published += 1
+        except Exception as e:
+            raise MissionPublishError(str(e), published=published) from e
+
+    @staticmethod
+    def release(lease: dict | None):
+        """
+        Devolve a concessão de uma missão que terminou e libera a próxima.
+        """
+        if not lease:
+            return
+        try:
+            pipeline = get_redis_client().pipeline()
+            pipeline.zrem(INFLIGHT_KEY, f"{lease['payer']}|{lease['token']}")
+            pipeline.zrem(PAYER_INFLIGHT_KEY.format(lease['payer']), lease['token'])
+            pipeline.execute()
+            FairScheduler.dispatch()
+        except Exception as e:
+            logger.error(f"Falha ao devolver a concessão do escalonador: {e}", exc_info=True)
+
+    @staticmethod
+    def drop_queue(payer_key: str) -> int:
+        """
+        Descarta as missões que aguardam na sub-fila de um pagador (ex: campanha
+        cancelada). Usa o lock da liberação, para não cortar um lote que está
+        sendo publicado. Retorna quantas missões foram descartadas.
+        """
+        redis = get_redis_client()
+        with redis.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            pipeline = redis.pipeline()
+            pipeline.llen(QUEUE_KEY.format(payer_key))
+            pipeline.delete(QUEUE_KEY.format(payer_key))
+            pipeline.srem(ACTIVE_KEY, payer_key)
+            pipeline.hdel(DEFICIT_KEY, payer_key)
+            return pipeline.execute()[0]
+
+    @staticmethod
+    def backlog() -> int:
+        """Total de missões aguardando nas sub-filas dos pagadores."""
+        redis = get_redis_client()
+        payers = redis.smembers(ACTIVE_KEY)
+        if not payers:
+            return 0
+        pipeline = redis.pipeline()
+        for payer in payers:
+            pipeline.llen(QUEUE_KEY.format(payer))
+        return sum(pipeline.execute())
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Serializers para o App 'dzaion'.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from .campaigns import SEGMENT_KEYS
+from .models import DzaionAction, ProactiveCampaign, TokenUsageRollup
+from .usage import TokenUsageRollupService
+
+
+class UsageSeriesQuerySerializer(serializers.Serializer):
+    """Valida os parâmetros de consulta da API de análise de gastos."""
+    granularity = serializers.ChoiceField(
+        choices=TokenUsageRollup.Granularity.choices, default=TokenUsageRollup.Granularity.DAY
+    )
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    group_by = serializers.ChoiceField(choices=list(TokenUsageRollupService.GROUP_BY_FIELDS), default='none')
+    ai_model = serializers.CharField(required=False, help_text="Identificador do AIModel.")
+    dzaion_action = serializers.CharField(required=False, help_text="verb_code da DzaionAction.")
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] >= data['end']:
+            raise serializers.ValidationError("'start' deve ser anterior a 'end'.")
+        return data
+
+
+class StaffUsageSeriesQuerySerializer(UsageSeriesQuerySerializer):
+    """Parâmetros da visão da equipe, que pode filtrar por qualquer pagador."""
+    tenant = serializers.UUIDField(required=False)
+    user = serializers.UUIDField(required=False)
+
+
+class UsageSeriesPointSerializer(serializers.Serializer):
+    """Um ponto da série de tokens e custo."""
+    bucket_start = serializers.DateTimeField()
+    ai_model = serializers.CharField(allow_null=True)
+    dzaion_action = serializers.CharField(allow_null=True)
+    input_tokens = serializers.IntegerField()
+    output_tokens = serializers.IntegerField()
+    total_tokens = serializers.IntegerField()
+    request_count = serializers.IntegerField()
+    cost = serializers.DecimalField(max_digits=16, decimal_places=6)
+
+
+class ProactiveCampaignSerializer(serializers.ModelSerializer):
+    """Serializer para exibir uma campanha proativa e o seu progresso."""
+    action_verb = serializers.CharField(source='action.verb_code', read_only=True)
+
+    class Meta:
+        model = ProactiveCampaign
+        fields = [
+            'id', 'name', 'action_verb', 'segment', 'send_rate_per_minute', 'status',
+            'total_users', 'enqueued_count', 'completed_count', 'failed_count',
+            'started_at', 'finished_at', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class ProactiveCampaignCreateSerializer(serializers.Serializer):
+    """Serializer para validar a criação de uma campanha proativa."""
+    name = serializers.CharField(max_length=150)
+    action_verb = serializers.SlugRelatedField(
+        slug_field='verb_code',
+        queryset=DzaionAction.objects.filter(is_active=True),
+    )
+    segment = serializers.DictField(required=False, default=dict)
+    send_rate_per_minute = serializers.IntegerField(
+        min_value=1, default=settings.DZAION_CAMPAIGNS['DEFAULT_SEND_RATE']
+    )
+
+    def validate_segment(self, value):
+        unknown = set(value) - SEGMENT_KEYS
+        if unknown:
+            raise serializers.ValidationError(f"Filtros desconhecidos: {', '.join(sorted(unknown))}.")
+        if 'user_ids' in value and not isinstance(value['user_ids'], list):
+            raise serializers.ValidationError("'user_ids' deve ser uma lista.")
+        return value
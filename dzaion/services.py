@@ -3,12 +3,13 @@
 Módulo da Camada de Serviço para o App 'dzaion'.
 
 Author: Dzaion
-Version: 0.5.0
+Version: 0.7.0
 """
 import logging
 from django.utils import timezone
 from .models import AIThoughtProcess, TokenUsageLog, DzaionAction, AIModel, Conversation
 from .exceptions import InsufficientFundsForAIError
+from .usage import estimate_cost
 from accounts.models import User
 from tenants.models import Tenant
 
@@ -98,10 +99,14 @@ class DzaionService:
         input_tokens: int,
         output_tokens: int,
         tenant_context: Tenant | None = None,
-        message = None
+        message = None,
+        is_speculative: bool = False
     ):
         """
-        Verifica o saldo (se aplicável) e registra o consumo de tokens.
+        Verifica o saldo (se aplicável) e registra o consumo de tokens, com o
+        custo pelo preço do modelo no momento da chamada.
+        O consumo de uma especulação descartada já foi pago ao provedor e é
+        registrado sem a verificação de saldo.
         """
         payer_user, payer_tenant = None, None
         
@@ -111,7 +116,7 @@ class DzaionService:
         else:
             payer_tenant = payer_entity
 
-        if dzaion_action.cost_bearer == DzaionAction.CostBearer.CONTRACTOR:
+        if not is_speculative and dzaion_action.cost_bearer == DzaionAction.CostBearer.CONTRACTOR:
             wallet = payer_entity.wallet.first()
             if not wallet or wallet.balance <= 0:
                 raise InsufficientFundsForAIError("O contratante não possui saldo para esta operação.")
@@ -123,7 +128,9 @@ class DzaionService:
             ai_model=ai_model,
             input_tokens=input_tokens,
             output_tokens=output_tokens,
-            message=message
+            cost=estimate_cost(ai_model, input_tokens, output_tokens),
+            message=message,
+            is_speculative=is_speculative
         )
         logger.info(f"Log de uso de tokens criado para a ação '{dzaion_action.verb_code}'.")
 
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo do Roteamento Especulativo do App 'dzaion'.
+
+Em uma mensagem REACTIVE sem processo ativo, o roteador de intenções e a
+chamada ao modelo principal rodavam em sequência. Quando o histórico do
+usuário indica com segurança a ação provável, o Orquestrador dispara a
+1ª chamada do modelo principal para essa ação em paralelo com o roteador:
+
+- se o roteador confirmar a ação, a resposta especulativa é aproveitada;
+- se não, ela é descartada (cancelada, se ainda não começou) e os tokens
+  gastos são contabilizados como desperdício.
+
+Acertos, erros e tokens desperdiçados são registrados em `DzaionMetrics`. Os
+tokens desperdiçados também entram no `TokenUsageLog` (`is_speculative`), para
+que a análise de gastos feche com a fatura do provedor.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import logging
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import DzaionMetrics
+from .models import AIThoughtProcess, DzaionAction
+from .services import DzaionService
+
+logger = logging.getLogger('dzaion')
+
+# Executor por processo (worker), criado sob demanda (depois do fork do Celery).
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DZAION_SPECULATION['MAX_WORKERS'], thread_name_prefix='dzaion-speculation'
+        )
+    return _executor
+
+
+class SpeculationPolicy:
+    """
+    Previsão da ação provável e contabilidade das chamadas especulativas.
+    """
+
+    @staticmethod
+    def predict_action(user, user_actions) -> DzaionAction | None:
+        """
+        Ação mais frequente nos processos recentes do usuário, desde que seja
+        permitida e responda por uma fatia mínima desse histórico.
+        """
+        config = settings.DZAION_SPECULATION
+        recent = list(
+            AIThoughtProcess.objects.filter(user=user)
+            .order_by('-created_at')
+            .values_list('action_id', flat=True)[:config['HISTORY_SIZE']]
+        )
+        if len(recent) < config['MIN_HISTORY']:
+            return None
+        action_id, count = Counter(recent).most_common(1)[0]
+        if count / len(recent) < config['MIN_CONFIDENCE']:
+            return None
+        return user_actions.filter(pk=action_id).select_related('default_model', 'cascade_model').first()
+
+    @staticmethod
+    def record_hit():
+        DzaionMetrics.increment('speculation', outcome='hit')
+
+    @staticmethod
+    def record_error(error: Exception):
+        logger.warning(f"Chamada especulativa falhou; seguindo pelo caminho normal: {error}")
+        DzaionMetrics.increment('speculation', outcome='error')
+
+    @staticmethod
+    def discard(future: Future, action: DzaionAction, ai_model, user, tenant_context=None):
+        """
+        Descarta uma especulação que o roteador não confirmou. Se a chamada já
+        estiver em andamento, os tokens são contados como desperdício ao final.
+        """
+        DzaionMetrics.increment('speculation', outcome='miss')
+        if future.cancel():
+            return
+        future.add_done_callback(
+            lambda done: SpeculationPolicy._record_waste(done, action, ai_model, user, tenant_context)
+        )
+
+    @staticmethod
+    def _record_waste(future: Future, action: DzaionAction, ai_model, user, tenant_context):
+        """
+        Registra os tokens da chamada descartada na métrica e no `TokenUsageLog`.
+        Roda na thread que concluiu a chamada, fora do fluxo da missão.
+        """
+        if future.cancelled() or future.exception() is not None:
+            return
+        usage = future.result()['usage']
+        input_tokens, output_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+        DzaionMetrics.increment('speculation_wasted_tokens', amount=input_tokens + output_tokens, action=action.verb_code)
+        if not (input_tokens or output_tokens):
+            return
+        close_old_connections()
+        try:
+            DzaionService.log_token_usage(
+                dzaion_action=action, user=user, ai_model=ai_model,
+                input_tokens=input_tokens, output_tokens=output_tokens,
+                tenant_context=tenant_context, is_speculative=True,
+            )
+        except Exception as e:
+            logger.error(f"Falha ao registrar o uso de tokens da especulação descartada: {e}", exc_info=True)
+
+    @staticmethod
+    def get_summary(counters: dict) -> dict:
+        """Taxa de acerto e tokens desperdiçados, a partir dos contadores de `DzaionMetrics`."""
+        hits = counters.get('speculation|outcome=hit', 0)
+        misses = counters.get('speculation|outcome=miss', 0)
+        wasted = sum(value for field, value in counters.items() if field.startswith('speculation_wasted_tokens'))
+        return {
+            'hits': hits,
+            'misses': misses,
+            'errors': counters.get('speculation|outcome=error', 0),
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'wasted_tokens': wasted,
+        }
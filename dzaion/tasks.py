@@ -3,24 +3,241 @@
 Módulo de Tarefas Assíncronas (Celery) para o App 'dzaion'.
 
 Author: Dzaion
-Version: 0.2.0
+Version: 0.12.0
 """
 import logging
+import time
+
 from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
 from .orchestrators import DzaionOrchestrator
+from .outbound import OutboundDispatchService, get_outbound_provider
+from .exceptions import DispatchRateLimitedError
+from .models import Message, ProactiveCampaign
+from .campaigns import CampaignService
+from .admission import AdmissionController
+from .metrics import DzaionMetrics
+from .usage import TokenUsageRollupService
+from .scheduler import FairScheduler
+from .conversation_state import ConversationStateStore
+from .checkpoints import MissionCheckpointService
 
 logger = logging.getLogger(__name__)
 
-@shared_task(name="dzaion.dzaion_mission_handler")
+@shared_task(name="dzaion.dzaion_mission_handler", acks_late=True, reject_on_worker_lost=True)
 def dzaion_mission_handler(mission_data: dict):
     """
     A "Torre de Controle": ponto de entrada único para todas as missões da IA.
 
-    Sua única responsabilidade é receber a missão e delegá-la ao Orquestrador.
+    Passa a missão pelo controle de admissão e a delega ao Orquestrador.
+    Ao final, devolve a concessão do escalonador justo.
+
+    A tarefa só é confirmada ao broker no final: se o worker morrer, a missão
+    é reentregue e retomada dos seus checkpoints.
     """
     logger.info(f"Dzaion Mission Handler recebeu uma nova missão: {mission_data}")
+    try:
+        _handle_mission(mission_data)
+    finally:
+        FairScheduler.release(mission_data.get('scheduler'))
+
+
+def _handle_mission(mission_data: dict):
+    decision = AdmissionController.decide(mission_data)
+
+    if decision['action'] == AdmissionController.SHED:
+        logger.warning(f"Missão descartada pelo controle de admissão: {mission_data.get('trigger_info')}")
+        if mission_data.get('campaign_id'):
+            CampaignService.record_result(mission_data['campaign_id'], success=False)
+        return
+
+    if decision['action'] == AdmissionController.DEFER:
+        # A missão adiada volta direto ao broker, sem concessão do escalonador
+        # (e o prazo da missão proativa recomeça quando ela for executada).
+        deferred = {
+            **{key: value for key, value in mission_data.items() if key not in ('scheduler', 'released_at')},
+            'deferrals': mission_data.get('deferrals', 0) + 1,
+            'enqueued_at': time.time() + decision['countdown'],
+        }
+        dzaion_mission_handler.apply_async(
+            args=[deferred], queue=settings.DZAION_ADMISSION['PROACTIVE_QUEUE'], countdown=decision['countdown']
+        )
+        return
+
+    if mission_data.get('enqueued_at'):
+        DzaionMetrics.observe('queue_wait', time.time() - mission_data['enqueued_at'])
+
+    if decision['acknowledge']:
+        to_number = mission_data.get('trigger_info', {}).get('whatsapp_number')
+        if to_number:
+            try:
+                OutboundDispatchService.enqueue(to_number, settings.DZAION_ADMISSION['ACKNOWLEDGEMENT_TEXT'])
+            except Exception as e:
+                logger.error(f"Falha ao enfileirar a confirmação de recebimento: {e}", exc_info=True)
+
+    if decision['fallback_model']:
+        mission_data = {**mission_data, 'model_override': decision['fallback_model']}
+
     try:
         DzaionOrchestrator.run(mission_data=mission_data)
     except Exception as e:
         logger.error(f"Erro ao executar a missão no DzaionOrchestrator: {e}", exc_info=True)
 
+
+@shared_task(bind=True, name="dzaion.dispatch_outbound_message", max_retries=settings.DZAION_DISPATCH['MAX_RETRIES'])
+def dispatch_outbound_message(
+    self, to_number: str, text: str, message_id: str | None = None, next_chunk: int = 0,
+    provider_message_ids: list[str] | None = None,
+):
+    """
+    Envia uma resposta ao usuário pelo provedor de mensagens.
+
+    Roda na fila dedicada `dzaion_dispatch`. Mensagens longas são quebradas em
+    partes; em caso de retentativa, o envio continua a partir de `next_chunk`,
+    sem repetir as partes já entregues ao provedor. Os IDs de todas as partes
+    (`provider_message_ids`) acompanham as retentativas e são gravados na mensagem.
+    """
+    chunks = OutboundDispatchService.split(text)
+    provider = get_outbound_provider()
+    provider_message_ids = list(provider_message_ids or [])
+
+    def retry_kwargs():
+        return {
+            'to_number': to_number, 'text': text, 'message_id': message_id,
+            'next_chunk': next_chunk, 'provider_message_ids': provider_message_ids,
+        }
+
+    try:
+        for index in range(next_chunk, len(chunks)):
+            provider_message_id = OutboundDispatchService.send_chunk(provider, to_number, chunks[index])
+            if provider_message_id:
+                provider_message_ids.append(provider_message_id)
+            next_chunk = index + 1
+    except DispatchRateLimitedError as e:
+        # Espera de limite de taxa não conta como falha do provedor.
+        logger.info(f"{e} Reagendando em {e.retry_after}s.")
+        raise self.retry(kwargs=retry_kwargs(), countdown=e.retry_after, max_retries=None)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            logger.error(f"Envio para {to_number} falhou definitivamente: {e}", exc_info=True)
+            OutboundDispatchService.mark_message(message_id, Message.MessageStatus.FAILED, provider_message_ids)
+            return
+        countdown = OutboundDispatchService.retry_countdown(self.request.retries)
+        logger.warning(f"Falha ao enviar para {to_number} ({e}). Nova tentativa em {countdown}s.")
+        raise self.retry(exc=e, kwargs=retry_kwargs(), countdown=countdown)
+
+    OutboundDispatchService.mark_message(message_id, Message.MessageStatus.SENT, provider_message_ids)
+    logger.info(f"Resposta enviada para {to_number} em {len(chunks)} parte(s).")
+
+
+@shared_task(name="dzaion.flush_delivery_statuses")
+def flush_delivery_statuses():
+    """
+    Aplica em lote os callbacks de entrega/leitura acumulados pelo webhook.
+    Os callbacks que ainda não encontraram a mensagem na execução anterior
+    voltam ao lote.
+    """
+    OutboundDispatchService.requeue_unmatched_events()
+    batch_size = settings.DZAION_DISPATCH['STATUS_BATCH_SIZE']
+    while True:
+        events = OutboundDispatchService.drain_status_events(batch_size)
+        if not events:
+            break
+        OutboundDispatchService.apply_status_updates(events)
+        if len(events) < batch_size:
+            break
+
+
+@shared_task(name="dzaion.flush_conversation_state")
+def flush_conversation_state():
+    """
+    Persiste em lote (write-behind) as mensagens e o estado das conversas
+    mantidos no Redis pelo Orquestrador.
+    """
+    applied = ConversationStateStore.flush()
+    if applied:
+        logger.info(f"{applied} alteração(ões) de conversas persistida(s) no banco.")
+
+
+@shared_task(name="dzaion.purge_mission_checkpoints")
+def purge_mission_checkpoints():
+    """
+    Remove os checkpoints de missões mais antigos que o prazo de retenção.
+    """
+    deleted = MissionCheckpointService.purge()
+    if deleted:
+        logger.info(f"{deleted} checkpoint(s) de missão removido(s).")
+
+
+@shared_task(name="dzaion.rollup_token_usage")
+def rollup_token_usage():
+    """
+    Consolida incrementalmente o TokenUsageLog nas tabelas por hora e por dia.
+    """
+    TokenUsageRollupService.run()
+
+
+@shared_task(name="dzaion.fan_out_campaign")
+def fan_out_campaign(campaign_id: str):
+    """
+    Enfileira o próximo lote de uma campanha proativa e se reagenda conforme
+    a taxa de envio. Depois do último lote, segue acompanhando o progresso
+    até que todas as missões terminem.
+    """
+    campaign = ProactiveCampaign.objects.select_related('action').get(pk=campaign_id)
+    if campaign.status in (ProactiveCampaign.CampaignStatus.COMPLETED, ProactiveCampaign.CampaignStatus.CANCELLED):
+        return
+    if campaign.status == ProactiveCampaign.CampaignStatus.PENDING:
+        campaign.status = ProactiveCampaign.CampaignStatus.RUNNING
+        campaign.started_at = timezone.now()
+        campaign.save(update_fields=['status', 'started_at', 'updated_at'])
+
+    enqueued = 0
+    if campaign.enqueued_count < campaign.total_users:
+        enqueued = CampaignService.enqueue_next_chunk(campaign)
+        if not enqueued:
+            # O segmento encolheu desde a criação da campanha.
+            campaign.total_users = campaign.enqueued_count
+            campaign.save(update_fields=['total_users', 'updated_at'])
+
+    CampaignService.sync_progress(campaign)
+    if campaign.status == ProactiveCampaign.CampaignStatus.RUNNING:
+        if enqueued:
+            countdown = CampaignService.next_chunk_countdown(campaign, enqueued)
+        else:
+            countdown = settings.DZAION_CAMPAIGNS['COMPLETION_POLL_INTERVAL']
+        fan_out_campaign.apply_async((campaign_id,), countdown=countdown)
+
+
+@shared_task(name="dzaion.execute_mission_tool")
+def execute_mission_tool(tool_call: dict, user_id: str) -> dict:
+    """
+    Executa uma ferramenta solicitada pelo LLM, na fila `dzaion_tools`,
+    fora do worker que atende as chamadas ao LLM.
+    """
+    return DzaionOrchestrator.execute_tool_call(tool_call, user_id)
+
+
+@shared_task(name="dzaion.resume_mission")
+def resume_mission(tool_results: list[dict], thought_process_id: str):
+    """
+    Continuação de uma missão suspensa, chamada quando todas as suas
+    ferramentas terminaram (callback do chord).
+    """
+    try:
+        DzaionOrchestrator.resume(thought_process_id, tool_results)
+    except Exception as e:
+        logger.error(f"Erro ao retomar a missão do processo {thought_process_id}: {e}", exc_info=True)
+
+
+@shared_task(name="dzaion.schedule_missions")
+def schedule_missions():
+    """
+    Tique periódico do escalonador justo: libera as missões que aguardam nas
+    sub-filas dos pagadores (ex: após a expiração de concessões).
+    """
+    dispatched = FairScheduler.dispatch()
+    if dispatched:
+        logger.info(f"Escalonador liberou {dispatched} missão(ões) no tique periódico.")
@@ -1,3 +1,980 @@
-from django.test import TestCase
+# -*- coding: utf-8 -*-
+"""
+Testes do App 'dzaion'.
 
-# Create your tests here.
+Os testes que dependem do Redis usam um cliente simulado; os que dependem
+do banco usam o `TestCase` do Django (PostgreSQL).
+
+Author: Dzaion
+Version: 0.1.0
+"""
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openai.types.chat import ChatCompletionMessage
+
+from accounts.models import User
+from . import tasks
+from .admission import AdmissionController
+from .campaigns import CANCELLED_KEY, CampaignService
+from .cascade import CascadePolicy
+from .checkpoints import MissionCheckpointService
+from .conversation_state import PROCESSING_KEY, ConversationStateStore
+from .evaluation import ReplayHarness, StubAIClient, anonymize_text, pseudonymize
+from .exceptions import MissionDeadlineExceededError, MissionPublishError
+from .inbound import InboundWebhookService
+from .intent_classifier import IntentClassifier
+from .models import (
+    AIModel, DzaionAction, Message, MissionCheckpoint, ModelEscalationLog, ProactiveCampaign, TokenUsageLog,
+    TokenUsageRollup,
+)
+from .orchestrators import DzaionOrchestrator
+from .outbound import STATUS_RETRY_KEY, LocalStubProvider, OutboundDispatchService
+from .scheduler import INFLIGHT_KEY, QUEUE_KEY, FairScheduler
+from .speculation import SpeculationPolicy
+from .tasks import dispatch_outbound_message
+from .usage import TokenUsageRollupService, estimate_cost
+
+
+@override_settings(MESSAGING_PROVIDER='stub')
+class OutboundDispatchTests(SimpleTestCase):
+    """Envio em partes e ingestão dos callbacks de status."""
+
+    def setUp(self):
+        LocalStubProvider.reset()
+        patcher = mock.patch('dzaion.outbound.FixedWindowRateLimiter.acquire', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.short_chunks = {**settings.DZAION_DISPATCH, 'MAX_MESSAGE_LENGTH': 10}
+
+    def test_all_chunk_ids_are_recorded(self):
+        with override_settings(DZAION_DISPATCH=self.short_chunks), \
+                mock.patch.object(OutboundDispatchService, 'mark_message') as mark_message:
+            dispatch_outbound_message(to_number='+5511999990000', text='aaaa bbbb cccc dddd', message_id='m1')
+
+        sent_ids = [sent['message_id'] for sent in LocalStubProvider.sent_messages]
+        self.assertEqual(len(sent_ids), 2)
+        mark_message.assert_called_once_with('m1', Message.MessageStatus.SENT, sent_ids)
+
+    def test_retry_keeps_ids_of_chunks_already_sent(self):
+        with override_settings(DZAION_DISPATCH=self.short_chunks), \
+                mock.patch.object(OutboundDispatchService, 'mark_message') as mark_message:
+            dispatch_outbound_message(
+                to_number='+5511999990000', text='aaaa bbbb cccc dddd', message_id='m1',
+                next_chunk=1, provider_message_ids=['earlier-id'],
+            )
+
+        self.assertEqual(len(LocalStubProvider.sent_messages), 1)
+        mark_message.assert_called_once_with(
+            'm1', Message.MessageStatus.SENT, ['earlier-id', LocalStubProvider.sent_messages[0]['message_id']]
+        )
+
+    def test_buffer_status_events_skips_malformed_entries(self):
+        redis = mock.MagicMock()
+        with mock.patch('dzaion.outbound.get_redis_client', return_value=redis):
+            accepted = OutboundDispatchService.buffer_status_events(
+                ['texto', None, 42, {'id': 'abc', 'status': 'delivered'}, {'status': 'read'}]
+            )
+        self.assertEqual(accepted, 1)
+        self.assertEqual(redis.rpush.call_count, 1)
+
+
+    def test_unmatched_status_events_are_kept_for_the_next_flush(self):
+        redis = mock.MagicMock()
+        events = [
+            {'provider_message_id': 'known', 'status': Message.MessageStatus.DELIVERED},
+            {'provider_message_id': 'unflushed', 'status': Message.MessageStatus.READ},
+            {'provider_message_id': 'lost', 'status': Message.MessageStatus.READ, 'attempts': 11},
+        ]
+        with mock.patch('dzaion.outbound.get_redis_client', return_value=redis), \
+                mock.patch.object(Message, 'objects') as objects:
+            objects.filter.return_value.values_list.return_value = [['known', 'other-chunk']]
+            OutboundDispatchService._retry_unmatched(events, ['known', 'unflushed', 'lost'])
+
+        redis.rpush.assert_called_once()
+        key, *retried = redis.rpush.call_args.args
+        self.assertEqual(key, STATUS_RETRY_KEY)
+        self.assertEqual([json.loads(raw)['provider_message_id'] for raw in retried], ['unflushed'])
+        self.assertEqual(json.loads(retried[0])['attempts'], 1)
+
+
+class ConversationStateFlushTests(SimpleTestCase):
+    """Consumo confiável da fila de write-behind."""
+
+    def setUp(self):
+        self.redis = mock.MagicMock()
+        patcher = mock.patch('dzaion.conversation_state.get_redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_interrupted_batch_is_resumed_before_new_operations(self):
+        self.redis.lrange.return_value = ['op-1', 'op-2']
+        self.assertEqual(ConversationStateStore.drain(500), ['op-1', 'op-2'])
+        self.redis.lrange.assert_called_once_with(PROCESSING_KEY, 0, -1)
+        self.redis.pipeline.assert_not_called()
+
+    def test_failed_batch_stays_in_processing_list(self):
+        with mock.patch.object(ConversationStateStore, 'drain', return_value=['op-1']), \
+                mock.patch.object(ConversationStateStore, 'apply', side_effect=RuntimeError), \
+                mock.patch.object(ConversationStateStore, 'acknowledge') as acknowledge, \
+                mock.patch('dzaion.conversation_state.transaction.atomic'):
+            with self.assertRaises(RuntimeError):
+                ConversationStateStore.flush()
+        acknowledge.assert_not_called()
+
+    def test_batch_is_acknowledged_after_commit(self):
+        with mock.patch.object(ConversationStateStore, 'drain', return_value=['op-1']), \
+                mock.patch.object(ConversationStateStore, 'apply'), \
+                mock.patch.object(ConversationStateStore, 'acknowledge') as acknowledge, \
+                mock.patch('dzaion.conversation_state.transaction.atomic'):
+            self.assertEqual(ConversationStateStore.flush(), 1)
+        acknowledge.assert_called_once_with()
+
+
+@override_settings(WHATSAPP_WEBHOOK_SECRET='segredo')
+class InboundWebhookTests(SimpleTestCase):
+    """O webhook valida a assinatura e enfileira sem tocar no banco (SimpleTestCase recusa consultas)."""
+
+    def setUp(self):
+        self.url = reverse('whatsapp-inbound-webhook')
+        self.seen = set()
+        patchers = [
+            mock.patch.object(InboundWebhookService, 'claim', side_effect=self._claim),
+            mock.patch.object(FairScheduler, 'submit'),
+            mock.patch('dzaion.scheduler.get_redis_client'),
+        ]
+        patchers[0].start()
+        self.submit = patchers[1].start()
+        patchers[2].start().return_value.hget.return_value = None
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def _claim(self, provider_message_id):
+        if provider_message_id in self.seen:
+            return False
+        self.seen.add(provider_message_id)
+        return True
+
+    def _post(self, payload, secret='segredo'):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            self.url, body, content_type='application/json',
+            headers={settings.DZAION_INBOUND['SIGNATURE_HEADER']: f"sha256={signature}"},
+        )
+
+    def test_signed_message_is_enqueued(self):
+        payload = {'messages': [{'id': 'wamid.1', 'from': '5511999990000@c.us', 'body': 'oi'}]}
+        response = self._post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'enqueued': 1, 'duplicates': 0})
+        mission = self.submit.call_args.args[0]
+        self.assertEqual(mission['mission_type'], 'REACTIVE')
+        self.assertEqual(mission['trigger_info']['whatsapp_number'], '+5511999990000')
+        self.assertEqual(self.submit.call_args.kwargs['payer_key'], 'sender:+5511999990000')
+
+    def test_provider_retry_is_deduplicated(self):
+        payload = {'messages': [{'id': 'wamid.1', 'from': '5511999990000', 'body': 'oi'}]}
+        self._post(payload)
+        response = self._post(payload)
+
+        self.assertEqual(response.json(), {'enqueued': 0, 'duplicates': 1})
+        self.submit.assert_called_once()
+
+    def test_invalid_signature_is_rejected(self):
+        response = self._post({'messages': []}, secret='outro')
+        self.assertEqual(response.status_code, 403)
+        self.submit.assert_not_called()
+
+    def test_own_messages_are_ignored(self):
+        payload = {'messages': [{'id': 'wamid.2', 'from': '5511999990000', 'body': 'eco', 'from_me': True}]}
+        self.assertEqual(self._post(payload).json(), {'enqueued': 0, 'duplicates': 0})
+
+    def test_unavailable_scheduler_asks_the_provider_to_retry(self):
+        self.submit.side_effect = ConnectionError
+        payload = {'messages': [{'id': 'wamid.3', 'from': '5511999990000', 'body': 'oi'}]}
+        with mock.patch.object(InboundWebhookService, 'release') as release:
+            response = self._post(payload)
+        self.assertEqual(response.status_code, 503)
+        release.assert_called_once_with('wamid.3')
+
+
+class MemoryContextTests(SimpleTestCase):
+    """Os trechos de memória e os dados do usuário vão ao prompt sem escape de HTML."""
+
+    def test_prompt_text_is_not_html_escaped(self):
+        orchestrator = DzaionOrchestrator(
+            {'mission_type': 'REACTIVE', 'trigger_info': {'message_body': 'boleto'}}, client=mock.MagicMock()
+        )
+        orchestrator.user = User(name="Ana D'Ávila")
+        memory = Message(
+            content='Paguei o boleto "R&D" de R$ <100>, certo?', direction='INBOUND',
+            created_at=timezone.make_aware(datetime(2026, 3, 10, 14)),
+        )
+        with mock.patch('dzaion.orchestrators.MessageMemoryIndex.search', return_value=[(memory, 1.5)]):
+            prompt = orchestrator._build_shared_prompt()
+
+        self.assertIn('Usuário: Paguei o boleto "R&D" de R$ <100>, certo?', prompt)
+        self.assertIn("Nome: Ana D'Ávila", prompt)
+        self.assertNotIn('&', prompt.replace('R&D', ''))
+
+
+class ReplayDatasetTests(SimpleTestCase):
+    """Os casos de replay não levam dados pessoais e o relatório consolida os resultados."""
+
+    def test_personal_data_is_removed(self):
+        user = User(name='Maria Souza')
+        text = anonymize_text("Sou a Maria, CPF 123.456.789-09, e-mail maria@example.com, tel (11) 99999-0000", user)
+        self.assertEqual(text, "Sou a [NOME], CPF [CPF], e-mail [EMAIL], tel [TELEFONE]")
+
+    def test_pseudonym_is_stable_and_irreversible(self):
+        self.assertEqual(pseudonymize('user-1'), pseudonymize('user-1'))
+        self.assertNotEqual(pseudonymize('user-1'), pseudonymize('user-2'))
+        self.assertNotIn('user-1', pseudonymize('user-1'))
+
+    def test_report_counts_accuracy_and_confusion(self):
+        call = {'model': 'nano', 'latency_ms': 10.0, 'input_tokens': 100, 'output_tokens': 5}
+        results = [
+            {'expected_verb': 'pay_bill', 'predicted_verb': 'pay_bill', 'tokens': 105, 'latency_ms': 12.0,
+             'calls': [call], 'escalations': [], 'error': None},
+            {'expected_verb': 'pay_bill', 'predicted_verb': 'general_chat', 'tokens': 105, 'latency_ms': 14.0,
+             'calls': [call], 'escalations': [{'reason': 'REFUSAL'}], 'error': None},
+            {'expected_verb': 'check_balance', 'predicted_verb': None, 'tokens': 0, 'latency_ms': 1.0,
+             'calls': [], 'escalations': [], 'error': 'falhou'},
+        ]
+        report = ReplayHarness.build_report(results)
+
+        self.assertEqual(report['cases'], 3)
+        self.assertEqual(report['errors'], 1)
+        self.assertEqual(report['router_accuracy'], round(1 / 3, 4))
+        self.assertEqual(report['escalation_rate'], round(1 / 3, 4))
+        self.assertEqual(report['confusion'], {
+            'pay_bill': {'pay_bill': 1, 'general_chat': 1}, 'check_balance': {'ERRO': 1},
+        })
+        self.assertEqual(report['models']['nano']['calls'], 2)
+        self.assertEqual(report['tokens_per_mission']['max'], 105)
+
+
+class ReplayHarnessTests(TestCase):
+    """O replay roda a lógica real do Orquestrador contra um cliente local, sem persistir nada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        model = AIModel.objects.create(
+            name='Nano', identifier='gpt-test-nano', usage_mode=AIModel.UsageMode.REAL_TIME, description='teste'
+        )
+        DzaionAction.objects.create(
+            name='Consultar saldo da carteira', verb_code='check_balance', default_model=model,
+            instructions='Informe o saldo.',
+        )
+        DzaionAction.objects.create(
+            name='Conversa geral', verb_code='general_chat', default_model=model, instructions='Converse.',
+        )
+
+    def test_replay_routes_and_answers_without_side_effects(self):
+        cases = [
+            {'case_id': 'c1', 'expected_verb': 'check_balance', 'message_body': 'qual o saldo da minha carteira?',
+             'history': [], 'permitted_verbs': ['check_balance']},
+            {'case_id': 'c2', 'expected_verb': 'general_chat', 'message_body': 'bom dia',
+             'history': [], 'permitted_verbs': ['check_balance']},
+        ]
+        with mock.patch('dzaion.orchestrators.DzaionMetrics'):
+            report = ReplayHarness(StubAIClient(call_tools=False)).run(cases)
+
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['router_accuracy'], 1.0)
+        self.assertGreater(report['models']['gpt-test-nano']['calls'], 0)
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(TokenUsageLog.objects.exists())
+
+    def test_replay_bypasses_the_local_classifier(self):
+        cases = [
+            {'case_id': 'c1', 'expected_verb': 'check_balance', 'message_body': 'qual o saldo da minha carteira?',
+             'history': [], 'permitted_verbs': ['check_balance']},
+        ]
+        with mock.patch('dzaion.orchestrators.DzaionMetrics'), \
+                mock.patch('dzaion.orchestrators.IntentClassifierService.classify', return_value='general_chat') as classify:
+            report = ReplayHarness(StubAIClient(call_tools=False)).run(cases)
+
+        classify.assert_not_called()
+        self.assertEqual(report['router_accuracy'], 1.0)
+
+
+class TokenUsageRollupTests(TestCase):
+    """A consolidação é incremental, idempotente e soma o custo gravado em cada log."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.model = AIModel.objects.create(
+            name='Mini', identifier='gpt-test-mini', usage_mode=AIModel.UsageMode.REAL_TIME, description='teste',
+            input_price_per_million=Decimal('1.0'), output_price_per_million=Decimal('4.0'),
+        )
+        cls.action = DzaionAction.objects.create(name='Conversa geral', verb_code='general_chat', instructions='.')
+        cls.payer = User.objects.create(
+            name='Pagador', cpf='00000000191', email='pagador@example.invalid', whatsapp='+5511999990001'
+        )
+        cls.hour = timezone.make_aware(datetime(2026, 3, 10, 14))
+
+    def log(self, at, input_tokens=1000, output_tokens=500, priced=True):
+        entry = TokenUsageLog.objects.create(
+            payer_user=self.payer, ai_model=self.model, dzaion_action=self.action,
+            input_tokens=input_tokens, output_tokens=output_tokens,
+            cost=estimate_cost(self.model, input_tokens, output_tokens) if priced else None,
+        )
+        TokenUsageLog.objects.filter(pk=entry.pk).update(created_at=at)
+
+    def rows(self, granularity):
+        return list(TokenUsageRollup.objects.filter(granularity=granularity).order_by('bucket_start').values_list(
+            'bucket_start', 'input_tokens', 'output_tokens', 'request_count', 'cost'
+        ))
+
+    def test_logs_are_rolled_up_by_hour_and_day(self):
+        self.log(self.hour + timedelta(minutes=5))
+        self.log(self.hour + timedelta(minutes=50))
+        self.log(self.hour + timedelta(hours=1, minutes=10))
+        TokenUsageRollupService._run(self.hour + timedelta(hours=3))
+
+        self.assertEqual(self.rows(TokenUsageRollup.Granularity.HOUR), [
+            (self.hour, 2000, 1000, 2, Decimal('0.006000')),
+            (self.hour + timedelta(hours=1), 1000, 500, 1, Decimal('0.003000')),
+        ])
+        self.assertEqual(self.rows(TokenUsageRollup.Granularity.DAY), [
+            (self.hour.replace(hour=0), 3000, 1500, 3, Decimal('0.009000')),
+        ])
+
+    def test_late_logs_are_included_without_duplicates(self):
+        self.log(self.hour + timedelta(minutes=5))
+        TokenUsageRollupService._run(self.hour + timedelta(minutes=30))
+        # Log confirmado depois da execução, na mesma hora da marca d'água.
+        self.log(self.hour + timedelta(minutes=10))
+        TokenUsageRollupService._run(self.hour + timedelta(hours=2))
+
+        self.assertEqual(self.rows(TokenUsageRollup.Granularity.HOUR), [
+            (self.hour, 2000, 1000, 2, Decimal('0.006000')),
+        ])
+        self.assertEqual(len(self.rows(TokenUsageRollup.Granularity.DAY)), 1)
+
+    def test_price_change_does_not_rewrite_logged_cost(self):
+        self.log(self.hour + timedelta(minutes=5))
+        AIModel.objects.filter(pk=self.model.pk).update(input_price_per_million=Decimal('10.0'))
+        # Log anterior ao campo `cost`: usa o preço atual.
+        self.log(self.hour + timedelta(minutes=10), priced=False)
+        TokenUsageRollupService._run(self.hour + timedelta(hours=2))
+
+        self.assertEqual(self.rows(TokenUsageRollup.Granularity.HOUR), [
+            (self.hour, 2000, 1000, 2, Decimal('0.003000') + Decimal('0.012000')),
+        ])
+
+    def test_deleting_the_payer_keeps_the_rollups(self):
+        payer = User.objects.create(
+            name='Ex-cliente', cpf='00000000272', email='ex@example.invalid', whatsapp='+5511999990002'
+        )
+        entry = TokenUsageLog.objects.create(
+            payer_user=payer, ai_model=self.model, dzaion_action=self.action, input_tokens=1000, output_tokens=500,
+        )
+        TokenUsageLog.objects.filter(pk=entry.pk).update(created_at=self.hour + timedelta(minutes=5))
+        TokenUsageRollupService._run(self.hour + timedelta(hours=2))
+        # Os logs brutos já foram arquivados; as consolidações ficam como histórico.
+        TokenUsageLog.objects.filter(payer_user=payer).delete()
+        payer.delete()
+
+        self.assertEqual(TokenUsageRollup.objects.filter(payer_user__isnull=True).count(), 2)
+
+    def test_series_reads_only_the_rollups(self):
+        self.log(self.hour + timedelta(minutes=5))
+        TokenUsageRollupService._run(self.hour + timedelta(hours=2))
+        with self.assertNumQueries(1):
+            series = TokenUsageRollupService.get_series(
+                TokenUsageRollup.objects.all(), TokenUsageRollup.Granularity.DAY, group_by='model'
+            )
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]['ai_model'], 'gpt-test-mini')
+        self.assertEqual(series[0]['total_tokens'], 1500)
+
+
+def tool_call_message(name: str, arguments: str) -> ChatCompletionMessage:
+    return ChatCompletionMessage.model_validate({
+        'role': 'assistant', 'content': None,
+        'tool_calls': [{'id': 'call_1', 'type': 'function', 'function': {'name': name, 'arguments': arguments}}],
+    })
+
+
+class ModelCascadeTests(SimpleTestCase):
+    """A resposta do modelo econômico só é aceita se passar nas checagens da ação."""
+
+    def setUp(self):
+        self.cheap = AIModel(identifier='gpt-test-mini', usage_mode=AIModel.UsageMode.REAL_TIME)
+        self.main = AIModel(identifier='gpt-test-main', usage_mode=AIModel.UsageMode.REAL_TIME)
+        self.action = DzaionAction(
+            verb_code='pay_bill', cascade_model=self.cheap,
+            parameters_schema={
+                'type': 'object', 'properties': {'barcode': {'type': 'string'}}, 'required': ['barcode'],
+            },
+        )
+        self.checks = CascadePolicy.get_checks(self.action)
+
+    def evaluate(self, message):
+        return CascadePolicy.evaluate(message, self.action, self.checks)[0]
+
+    def test_valid_tool_call_is_accepted(self):
+        self.assertIsNone(self.evaluate(tool_call_message('pay_bill', '{"barcode": "123"}')))
+
+    def test_invalid_tool_calls_escalate(self):
+        for message in (
+            tool_call_message('pay_bill', '{}'),
+            tool_call_message('pay_bill', '{"barcode": '),
+            tool_call_message('delete_account', '{"barcode": "123"}'),
+        ):
+            self.assertEqual(self.evaluate(message), ModelEscalationLog.Reason.TOOL_ARGUMENTS)
+
+    def test_marker_empty_answer_and_refusal_escalate(self):
+        def reply(content):
+            return ChatCompletionMessage(role='assistant', content=content)
+
+        self.assertEqual(self.evaluate(reply("[ESCALAR]")), ModelEscalationLog.Reason.LOW_CONFIDENCE)
+        self.assertEqual(self.evaluate(reply("  ")), ModelEscalationLog.Reason.LOW_CONFIDENCE)
+        self.assertEqual(self.evaluate(reply("Não posso ajudar com isso.")), ModelEscalationLog.Reason.REFUSAL)
+        self.assertIsNone(self.evaluate(reply("Boleto pago!")))
+
+    def test_action_overrides_the_default_checks(self):
+        self.action.cascade_checks = {'validate_tool_arguments': False}
+        checks = CascadePolicy.get_checks(self.action)
+        self.assertIsNone(CascadePolicy.evaluate(tool_call_message('pay_bill', '{}'), self.action, checks)[0])
+
+    def test_marker_instruction_goes_only_to_the_attempt(self):
+        messages = [{'role': 'system', 'content': 'prompt'}, {'role': 'user', 'content': 'oi'}]
+        attempt = CascadePolicy.build_attempt_messages(messages, self.checks)
+        self.assertIn('[ESCALAR]', attempt[0]['content'])
+        self.assertEqual(messages[0]['content'], 'prompt')
+
+    def _first_response(self, cheap_message):
+        orchestrator = DzaionOrchestrator({'mission_type': 'REACTIVE'}, client=mock.MagicMock())
+        orchestrator.dzaion_action, orchestrator.ai_model = self.action, self.main
+        orchestrator.response_id = 'resp_1'
+        orchestrator.client.generate_response.return_value = {
+            'message': cheap_message, 'usage': {'input_tokens': 10, 'output_tokens': 2},
+        }
+        main_response = {'message': ChatCompletionMessage(role='assistant', content='ok'), 'usage': {}}
+        with mock.patch.object(orchestrator, '_generate_main_response', return_value=main_response) as main, \
+                mock.patch.object(orchestrator, '_log_escalation') as log_escalation:
+            orchestrator._generate_first_response([{'role': 'system', 'content': 'prompt'}], tools=[])
+        return orchestrator, main, log_escalation
+
+    def test_accepted_answer_keeps_the_cheap_model(self):
+        orchestrator, main, _ = self._first_response(tool_call_message('pay_bill', '{"barcode": "123"}'))
+        main.assert_not_called()
+        self.assertIs(orchestrator.ai_model, self.cheap)
+        self.assertIsNone(orchestrator.response_id)
+
+    def test_rejected_answer_is_escalated_and_logged(self):
+        orchestrator, main, log_escalation = self._first_response(tool_call_message('pay_bill', '{}'))
+        main.assert_called_once()
+        log_escalation.assert_called_once_with(
+            self.cheap, ModelEscalationLog.Reason.TOOL_ARGUMENTS, mock.ANY, {'input_tokens': 10, 'output_tokens': 2}
+        )
+        self.assertIs(orchestrator.ai_model, self.main)
+        self.assertEqual(orchestrator.total_usage['input_tokens'], 10)
+
+
+@override_settings(DZAION_ADMISSION={**settings.DZAION_ADMISSION, 'ENABLED': True})
+class AdmissionControlTests(SimpleTestCase):
+    """Sob carga, as missões proativas cedem lugar e as reativas degradam com aviso."""
+
+    QUIET = {'reactive_queue_depth': 0, 'proactive_queue_depth': 0, 'llm_p90': 1.0, 'queue_wait_p90': 0.0}
+
+    def setUp(self):
+        patcher = mock.patch('dzaion.admission.DzaionMetrics')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def decide(self, mission_data: dict, **signals) -> dict:
+        with mock.patch.object(AdmissionController, 'get_signals', return_value={**self.QUIET, **signals}):
+            return AdmissionController.decide(mission_data)
+
+    def test_quiet_system_admits_everything(self):
+        self.assertEqual(self.decide({'mission_type': 'PROACTIVE'})['action'], AdmissionController.ADMIT)
+        decision = self.decide({'mission_type': 'REACTIVE', 'enqueued_at': time.time()})
+        self.assertEqual(decision['action'], AdmissionController.ADMIT)
+        self.assertFalse(decision['acknowledge'])
+        self.assertIsNone(decision['fallback_model'])
+
+    def test_proactive_is_deferred_then_shed(self):
+        decision = self.decide({'mission_type': 'PROACTIVE'}, reactive_queue_depth=200)
+        self.assertEqual(decision['action'], AdmissionController.DEFER)
+        self.assertEqual(decision['countdown'], settings.DZAION_ADMISSION['DEFER_SECONDS'])
+
+        deferred_too_often = {'mission_type': 'PROACTIVE', 'deferrals': settings.DZAION_ADMISSION['MAX_DEFERRALS']}
+        self.assertEqual(self.decide(deferred_too_often, reactive_queue_depth=200)['action'], AdmissionController.SHED)
+        self.assertEqual(self.decide({'mission_type': 'PROACTIVE'}, llm_p90=60.0)['action'], AdmissionController.SHED)
+
+    @override_settings(DZAION_ADMISSION={**settings.DZAION_ADMISSION, 'ENABLED': True, 'FALLBACK_MODEL': 'gpt-test-nano'})
+    def test_reactive_degrades_but_is_never_dropped(self):
+        decision = self.decide(
+            {'mission_type': 'REACTIVE', 'enqueued_at': time.time() - 30}, reactive_queue_depth=5000, llm_p90=90.0
+        )
+        self.assertEqual(decision['action'], AdmissionController.ADMIT)
+        self.assertEqual(decision['fallback_model'], 'gpt-test-nano')
+        self.assertTrue(decision['acknowledge'])
+
+    def test_missing_signals_fail_open(self):
+        AdmissionController._signals = None
+        self.addCleanup(setattr, AdmissionController, '_signals', None)
+        with mock.patch('dzaion.admission.get_broker_client', side_effect=ConnectionError):
+            signals = AdmissionController.get_signals()
+        self.assertEqual(signals['reactive_queue_depth'], 0)
+
+    def test_deferred_mission_goes_back_to_the_broker(self):
+        mission = {'mission_type': 'PROACTIVE', 'campaign_id': 'c1', 'scheduler': {'payer': 'x'}, 'released_at': 1.0}
+        deferral = {'action': AdmissionController.DEFER, 'countdown': 120}
+        with mock.patch.object(AdmissionController, 'decide', return_value=deferral), \
+                mock.patch.object(tasks.dzaion_mission_handler, 'apply_async') as apply_async, \
+                mock.patch.object(tasks.DzaionOrchestrator, 'run') as run:
+            tasks._handle_mission(mission)
+
+        run.assert_not_called()
+        deferred = apply_async.call_args.kwargs['args'][0]
+        self.assertEqual(deferred['deferrals'], 1)
+        self.assertNotIn('scheduler', deferred)
+        self.assertNotIn('released_at', deferred)
+        self.assertEqual(apply_async.call_args.kwargs['countdown'], 120)
+
+    def test_shed_mission_counts_as_a_campaign_failure(self):
+        shed = {'action': AdmissionController.SHED}
+        with mock.patch.object(AdmissionController, 'decide', return_value=shed), \
+                mock.patch.object(tasks.CampaignService, 'record_result') as record_result, \
+                mock.patch.object(tasks.DzaionOrchestrator, 'run') as run:
+            tasks._handle_mission({'mission_type': 'PROACTIVE', 'campaign_id': 'c1'})
+        run.assert_not_called()
+        record_result.assert_called_once_with('c1', success=False)
+
+    def test_degraded_reactive_mission_is_acknowledged_and_runs_on_the_fallback(self):
+        degraded = {
+            'action': AdmissionController.ADMIT, 'acknowledge': True, 'fallback_model': 'gpt-test-nano', 'countdown': 0,
+        }
+        mission = {'mission_type': 'REACTIVE', 'trigger_info': {'whatsapp_number': '+5511999990000'}}
+        with mock.patch.object(AdmissionController, 'decide', return_value=degraded), \
+                mock.patch.object(tasks.OutboundDispatchService, 'enqueue') as enqueue, \
+                mock.patch.object(tasks.DzaionOrchestrator, 'run') as run:
+            tasks._handle_mission(mission)
+        enqueue.assert_called_once_with('+5511999990000', settings.DZAION_ADMISSION['ACKNOWLEDGEMENT_TEXT'])
+        self.assertEqual(run.call_args.kwargs['mission_data']['model_override'], 'gpt-test-nano')
+
+
+class FairSchedulerTests(SimpleTestCase):
+    """Missões só saem da sub-fila do pagador depois de publicadas."""
+
+    def setUp(self):
+        self.redis = mock.MagicMock()
+        patcher = mock.patch('dzaion.scheduler.get_redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_publish_keeps_unpublished_missions_queued(self):
+        payer = 'user:1'
+        self.redis.smembers.return_value = {payer}
+        self.redis.lrange.return_value = [json.dumps({'mission_id': 'a'}), json.dumps({'mission_id': 'b'})]
+        self.redis.pipeline.return_value.execute.side_effect = [
+            [0, 0, 0, 0, ['4'], [None], None],  # concessões, pesos, déficits e cursor
+            [], [], [],                          # leases, devolução das leases e déficits
+        ]
+        with mock.patch.object(FairScheduler, '_publish', side_effect=MissionPublishError('broker', published=1)):
+            self.assertEqual(FairScheduler._dispatch(self.redis), 1)
+
+        self.redis.ltrim.assert_called_once_with(QUEUE_KEY.format(payer), 1, -1)
+        released = [c.args for c in self.redis.pipeline.return_value.zrem.call_args_list]
+        self.assertEqual(len(released), 2)
+        self.assertEqual(released[0][0], INFLIGHT_KEY)
+
+    @override_settings(DZAION_SCHEDULER={**settings.DZAION_SCHEDULER, 'ENABLED': True})
+    def test_inline_dispatch_failure_does_not_reject_accepted_missions(self):
+        with mock.patch.object(FairScheduler, 'dispatch', side_effect=ConnectionError):
+            FairScheduler.submit_many([{'mission_id': 'a'}], 'user:1')
+        self.redis.pipeline.return_value.rpush.assert_called_once()
+
+    @override_settings(DZAION_SCHEDULER={**settings.DZAION_SCHEDULER, 'ENABLED': True})
+    def test_inbound_claim_is_kept_once_the_mission_is_queued(self):
+        message = {'provider_message_id': 'wamid.1', 'whatsapp_number': '+5511999990000', 'message_body': 'oi'}
+        with mock.patch.object(FairScheduler, 'dispatch', side_effect=ConnectionError), \
+                mock.patch.object(InboundWebhookService, 'claim', return_value=True), \
+                mock.patch.object(InboundWebhookService, 'release') as release:
+            result = InboundWebhookService.enqueue_missions([message])
+        self.assertEqual(result['enqueued'], 1)
+        release.assert_not_called()
+
+
+class MissionDeadlineTests(SimpleTestCase):
+    """O prazo esgotado só gera pedido de desculpas para quem perguntou."""
+
+    def _run_with_exhausted_deadline(self, mission_data: dict):
+        orchestrator = DzaionOrchestrator(mission_data, client=mock.MagicMock())
+
+        def identify():
+            orchestrator.user = mock.MagicMock()
+
+        with mock.patch('dzaion.orchestrators.MissionCheckpointService.load', return_value={}), \
+                mock.patch.object(orchestrator, '_load_campaign_context', return_value=True), \
+                mock.patch.object(orchestrator, '_identify_context_and_intent', side_effect=identify), \
+                mock.patch.object(orchestrator, '_check_financial_viability'), \
+                mock.patch.object(orchestrator.deadline, 'check', side_effect=MissionDeadlineExceededError('tarde')), \
+                mock.patch.object(orchestrator, '_dispatch_response') as dispatch_response, \
+                mock.patch('dzaion.orchestrators.CampaignService.record_result') as record_result:
+            orchestrator._execute_mission()
+        return dispatch_response, record_result
+
+    def test_reactive_mission_apologises(self):
+        dispatch_response, _ = self._run_with_exhausted_deadline({'mission_type': 'REACTIVE', 'mission_id': 'm1'})
+        dispatch_response.assert_called_once_with('tarde')
+
+    def test_proactive_mission_fails_silently(self):
+        dispatch_response, record_result = self._run_with_exhausted_deadline(
+            {'mission_type': 'PROACTIVE', 'mission_id': 'm1', 'campaign_id': 'c1'}
+        )
+        dispatch_response.assert_not_called()
+        record_result.assert_called_once_with('c1', False)
+
+    def test_proactive_clock_starts_at_release(self):
+        orchestrator = DzaionOrchestrator(
+            {'mission_type': 'PROACTIVE', 'enqueued_at': 1000.0, 'released_at': 5000.0}, client=mock.MagicMock()
+        )
+        self.assertEqual(orchestrator.started_at, 5000.0)
+
+
+class IntentClassifierTests(SimpleTestCase):
+    """Probabilidades calibradas e queda para o LLM quando o modelo não sabe."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        examples = [
+            *[(f"qual o meu saldo {n}", 'check_balance') for n in range(30)],
+            *[(f"quero ver o extrato da conta {n}", 'check_balance') for n in range(30)],
+            *[(f"pagar o boleto de luz {n}", 'pay_bill') for n in range(30)],
+            *[(f"quero pagar a conta de agua {n}", 'pay_bill') for n in range(30)],
+            *[(f"bom dia tudo bem {n}", 'general_chat') for n in range(30)],
+        ]
+        training, calibration = examples[::2], examples[1::2]
+        # Rótulos ruidosos, como no histórico real do roteador.
+        calibration = [(text, 'general_chat' if n % 5 == 0 else label) for n, (text, label) in enumerate(calibration)]
+        cls.model = IntentClassifier.fit(
+            [text for text, _ in training], [label for _, label in training], ngram_range=(2, 4), n_features=2 ** 12,
+        )
+        cls.model.calibrate([text for text, _ in calibration], [label for _, label in calibration])
+
+    def test_single_allowed_label_falls_through(self):
+        self.assertEqual(self.model.predict("qual o meu saldo", {'check_balance'}), (None, 0.0))
+
+    def test_disallowed_mass_is_not_redistributed(self):
+        _, everything = self.model.predict("pagar o boleto de luz")
+        label, restricted = self.model.predict("pagar o boleto de luz", {'check_balance', 'general_chat'})
+        self.assertNotEqual(label, 'pay_bill')
+        self.assertLess(restricted, 1.0 - everything + 1e-9)
+
+    def test_out_of_distribution_message_is_unknown(self):
+        self.assertEqual(self.model.predict("xyzzy qwfp jkl", min_coverage=0.6), (None, 0.0))
+
+    def test_known_message_is_confident(self):
+        label, confidence = self.model.predict("qual o meu saldo", min_coverage=0.6)
+        self.assertEqual(label, 'check_balance')
+        self.assertGreater(confidence, 0.5)
+
+    def test_noisy_labels_soften_the_probabilities(self):
+        self.assertGreater(self.model.temperature, 1.0)
+        _, confidence = self.model.predict("quero")
+        self.assertLess(confidence, 0.9)
+
+
+class CampaignCancellationTests(SimpleTestCase):
+    """O cancelamento vale para todos os workers, sem esperar o cache expirar."""
+
+    def test_cancel_flags_campaign_and_drops_queued_missions(self):
+        campaign = ProactiveCampaign(status=ProactiveCampaign.CampaignStatus.RUNNING)
+        redis = mock.MagicMock()
+        with mock.patch.object(campaign, 'save'), \
+                mock.patch('dzaion.campaigns.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('dzaion.campaigns.get_redis_client', return_value=redis), \
+                mock.patch.object(FairScheduler, 'drop_queue', return_value=7) as drop_queue:
+            CampaignService.cancel(campaign)
+
+        redis.set.assert_called_once_with(CANCELLED_KEY.format(campaign.id), 1, ex=mock.ANY)
+        drop_queue.assert_called_once_with(FairScheduler.campaign_key(campaign))
+
+    def test_mission_is_discarded_when_cached_status_is_stale(self):
+        orchestrator = DzaionOrchestrator(
+            {'mission_type': 'PROACTIVE', 'campaign_id': 'c1'}, client=mock.MagicMock()
+        )
+        running = {'status': ProactiveCampaign.CampaignStatus.RUNNING, 'action': None, 'prompt_prefix': ''}
+        with mock.patch.object(CampaignService, 'get_shared_context', return_value=running), \
+                mock.patch.object(CampaignService, 'is_cancelled', return_value=True):
+            self.assertFalse(orchestrator._load_campaign_context())
+
+
+@override_settings(DZAION_RESPONSES_API={**settings.DZAION_RESPONSES_API, 'ENABLED': True})
+class ResponsesChainTests(SimpleTestCase):
+    """O prompt de sistema atual acompanha toda chamada encadeada."""
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.client.generate_chained_response.return_value = {'message': None, 'usage': {}, 'response_id': 'resp_2'}
+        self.orchestrator = DzaionOrchestrator({'mission_type': 'REACTIVE'}, client=self.client)
+        self.orchestrator.ai_model = mock.MagicMock(identifier='gpt-test')
+        self.messages = [
+            {'role': 'system', 'content': 'memória e instruções da ação atual'},
+            {'role': 'user', 'content': 'oi'},
+            {'role': 'assistant', 'content': 'olá'},
+            {'role': 'user', 'content': 'qual o meu saldo?'},
+        ]
+
+    def test_chained_call_sends_fresh_system_prompt_as_instructions(self):
+        self.orchestrator.response_id = 'resp_1'
+        self.orchestrator._generate_main_response(self.messages, None, new_messages=1)
+
+        kwargs = self.client.generate_chained_response.call_args.kwargs
+        self.assertEqual(kwargs['previous_response_id'], 'resp_1')
+        self.assertEqual(kwargs['messages'], [self.messages[-1]])
+        self.assertEqual(kwargs['instructions'], 'memória e instruções da ação atual')
+        self.assertEqual(self.orchestrator.response_id, 'resp_2')
+
+    def test_new_chain_sends_system_prompt_only_as_instructions(self):
+        self.orchestrator._generate_main_response(self.messages, None, new_messages=1)
+
+        kwargs = self.client.generate_chained_response.call_args.kwargs
+        self.assertEqual(kwargs['messages'], self.messages[1:])
+        self.assertEqual(kwargs['instructions'], 'memória e instruções da ação atual')
+
+
+class MissionCheckpointTests(TestCase):
+    """Uma missão reexecutada retoma da última fase gravada, sem repetir chamadas pagas nem envios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.model = AIModel.objects.create(
+            name='Main', identifier='gpt-test-main', usage_mode=AIModel.UsageMode.REAL_TIME, description='teste'
+        )
+
+    def setUp(self):
+        self.mission_id = str(uuid.uuid4())
+        self.orchestrator = DzaionOrchestrator(
+            {'mission_type': 'REACTIVE', 'mission_id': self.mission_id}, client=mock.MagicMock()
+        )
+        self.usage = [{'ai_model_id': str(self.model.pk), 'input_tokens': 100, 'output_tokens': 10}]
+
+    def test_phase_is_recorded_once_per_mission(self):
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.INTENT, {'action_verb': 'a'})
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.INTENT, {'action_verb': 'b'})
+        self.assertEqual(
+            MissionCheckpointService.load(self.mission_id), {MissionCheckpoint.Phase.INTENT: {'action_verb': 'b'}}
+        )
+
+    def test_purge_removes_expired_checkpoints(self):
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.INTENT)
+        MissionCheckpointService.save(str(uuid.uuid4()), MissionCheckpoint.Phase.INTENT)
+        expired = timezone.now() - timedelta(days=settings.DZAION_CHECKPOINTS['RETENTION_DAYS'] + 1)
+        MissionCheckpoint.objects.filter(mission_id=self.mission_id).update(created_at=expired)
+        self.assertEqual(MissionCheckpointService.purge(), 1)
+        self.assertEqual(MissionCheckpointService.load(self.mission_id), {})
+
+    def test_dispatched_mission_is_not_run_again(self):
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.DISPATCHED)
+        self.orchestrator.campaign_id = 'c1'
+        with mock.patch.object(self.orchestrator, '_identify_context_and_intent') as identify, \
+                mock.patch('dzaion.orchestrators.CampaignService.record_result') as record_result:
+            self.orchestrator._execute_mission()
+        identify.assert_not_called()
+        # O resultado da campanha foi contado na execução original.
+        record_result.assert_not_called()
+
+    def test_tool_results_and_first_response_are_reused(self):
+        tool_call = {'id': 'call_1', 'type': 'function', 'function': {'name': 'get_balance', 'arguments': '{}'}}
+        messages = [
+            {'role': 'system', 'content': 'prompt'}, {'role': 'user', 'content': 'saldo?'},
+            {'role': 'assistant', 'tool_calls': [tool_call]},
+        ]
+        results = [{'tool_call_id': 'call_1', 'name': 'get_balance', 'status': 'success', 'content': '{}'}]
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.FIRST_RESPONSE, {
+            'messages': messages, 'usage_by_model': self.usage, 'ai_model_id': str(self.model.pk), 'response_id': None,
+        })
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.TOOL_RESULTS, {'results': results})
+        self.orchestrator.checkpoints = MissionCheckpointService.load(self.mission_id)
+
+        with mock.patch.object(self.orchestrator, '_should_suspend_for_tools', return_value=False), \
+                mock.patch.object(self.orchestrator, '_execute_tool_call_within_deadline') as execute_tool, \
+                mock.patch.object(self.orchestrator, '_complete_interaction', return_value={'text': 'ok'}) as complete:
+            self.orchestrator._execute_llm_interaction()
+
+        self.orchestrator.client.generate_response.assert_not_called()
+        execute_tool.assert_not_called()
+        complete.assert_called_once_with(messages, results)
+        self.assertEqual(self.orchestrator.ai_model, self.model)
+        self.assertEqual(self.orchestrator.total_usage, {'input_tokens': 100, 'output_tokens': 10})
+
+    def test_saved_response_is_dispatched_without_logging_usage_again(self):
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.RESPONSE, {
+            'text': 'Seu saldo é R$ 10,00.', 'usage_by_model': self.usage, 'ai_model_id': str(self.model.pk),
+            'outbound_message_id': None,
+        })
+        MissionCheckpointService.save(self.mission_id, MissionCheckpoint.Phase.USAGE_LOGGED)
+
+        with mock.patch.object(self.orchestrator, '_identify_context_and_intent'), \
+                mock.patch.object(self.orchestrator, '_check_financial_viability'), \
+                mock.patch.object(self.orchestrator, '_execute_llm_interaction') as llm, \
+                mock.patch.object(self.orchestrator, '_log_token_usage') as log_usage, \
+                mock.patch.object(self.orchestrator, '_dispatch_response') as dispatch_response, \
+                mock.patch('dzaion.orchestrators.DzaionMetrics'):
+            self.orchestrator._execute_mission()
+
+        llm.assert_not_called()
+        log_usage.assert_not_called()
+        dispatch_response.assert_called_once_with('Seu saldo é R$ 10,00.')
+        self.assertIn(MissionCheckpoint.Phase.DISPATCHED, MissionCheckpointService.load(self.mission_id))
+
+
+class MissionSuspensionTests(SimpleTestCase):
+    """As ferramentas só são agendadas depois de gravado o checkpoint SUSPENDED."""
+
+    def test_checkpoint_is_saved_before_the_chord_is_published(self):
+        orchestrator = DzaionOrchestrator({'mission_type': 'REACTIVE', 'mission_id': 'm1'}, client=mock.MagicMock())
+        orchestrator.user = mock.MagicMock(id='u1')
+        orchestrator.thought_process = mock.MagicMock(id='tp1')
+        orchestrator.ai_model = mock.MagicMock(pk='model-1')
+        tool_calls = [{'id': 'call_1', 'function': {'name': 'get_balance', 'arguments': '{}'}}]
+
+        calls = mock.MagicMock()
+        with mock.patch('dzaion.orchestrators.chord') as chord, \
+                mock.patch('dzaion.orchestrators.transaction') as transaction, \
+                mock.patch('dzaion.orchestrators.MissionCheckpointService.save') as save, \
+                mock.patch.object(orchestrator, '_hot_state_enabled', return_value=False):
+            calls.attach_mock(save, 'save')
+            calls.attach_mock(transaction.on_commit, 'on_commit')
+            orchestrator._suspend_for_tools([], tool_calls)
+
+        self.assertEqual([name for name, _, _ in calls.mock_calls], ['save', 'on_commit'])
+        transaction.on_commit.assert_called_once_with(chord.return_value.apply_async)
+        chord.return_value.apply_async.assert_not_called()
+
+    def test_re_execution_of_a_suspended_mission_does_not_dispatch_again(self):
+        orchestrator = DzaionOrchestrator({'mission_type': 'REACTIVE', 'mission_id': 'm1'}, client=mock.MagicMock())
+        suspended = {MissionCheckpoint.Phase.SUSPENDED: {'thought_process_id': 'tp1'}}
+        with mock.patch('dzaion.orchestrators.MissionCheckpointService.load', return_value=suspended), \
+                mock.patch.object(orchestrator, '_identify_context_and_intent') as identify, \
+                mock.patch.object(orchestrator, '_suspend_for_tools') as suspend:
+            orchestrator._execute_mission()
+        identify.assert_not_called()
+        suspend.assert_not_called()
+
+
+class SingleCallRoutingTests(SimpleTestCase):
+    """Cardápios pequenos podem ser roteados pela própria 1ª chamada do modelo principal (desligado por padrão)."""
+
+    def setUp(self):
+        self.orchestrator = DzaionOrchestrator(
+            {'mission_type': 'REACTIVE', 'trigger_info': {'message_body': 'oi'}}, client=mock.MagicMock()
+        )
+        self.orchestrator.ai_model = AIModel(identifier='gpt-test-main')
+        self.actions = [
+            DzaionAction(verb_code='activate_user', name='Ativar usuário',
+                         parameters_schema={'type': 'object', 'properties': {'user_id': {'type': 'string'}}}),
+            DzaionAction(verb_code='check_balance', name='Consultar saldo'),
+        ]
+        patchers = [
+            mock.patch.object(self.orchestrator, '_set_service_tier'),
+            mock.patch.object(self.orchestrator, '_build_shared_prompt', return_value='prompt'),
+            mock.patch('dzaion.orchestrators.DzaionMetrics'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def route(self, message: ChatCompletionMessage) -> str:
+        self.orchestrator.client.generate_response.return_value = {'message': message, 'usage': {'input_tokens': 50}}
+        return self.orchestrator._route_with_single_call(self.actions)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(self.orchestrator._use_single_call_routing(self.actions))
+
+    @override_settings(DZAION_ROUTING={**settings.DZAION_ROUTING, 'SINGLE_CALL_MAX_ACTIONS': 2})
+    def test_enabled_only_for_small_menus(self):
+        self.assertTrue(self.orchestrator._use_single_call_routing(self.actions))
+        self.assertFalse(self.orchestrator._use_single_call_routing(self.actions * 2))
+        self.assertFalse(self.orchestrator._use_single_call_routing([]))
+
+    def test_actions_are_offered_as_tools(self):
+        self.route(ChatCompletionMessage(role='assistant', content='Olá!'))
+        tools = self.orchestrator.client.generate_response.call_args.kwargs['tools']
+        self.assertEqual([tool['function']['name'] for tool in tools], ['activate_user', 'check_balance'])
+
+    def test_text_answer_is_general_chat_and_reused(self):
+        self.assertEqual(self.route(ChatCompletionMessage(role='assistant', content='Olá!')), 'general_chat')
+        self.assertEqual(self.orchestrator.routed_response['messages'][-1]['content'], 'Olá!')
+        self.assertEqual(self.orchestrator.total_usage['input_tokens'], 50)
+
+    def test_executable_tool_call_is_reused_as_the_first_response(self):
+        message = ChatCompletionMessage.model_validate({'role': 'assistant', 'tool_calls': [
+            {'id': 'c1', 'type': 'function', 'function': {'name': 'activate_user', 'arguments': '{}'}},
+            {'id': 'c2', 'type': 'function', 'function': {'name': 'check_balance', 'arguments': '{}'}},
+        ]})
+        self.assertEqual(self.route(message), 'activate_user')
+        reused = self.orchestrator.routed_response['messages'][-1]
+        self.assertEqual([call['id'] for call in reused['tool_calls']], ['c1'])
+
+    def test_action_without_tool_is_answered_by_its_own_instructions(self):
+        self.assertEqual(self.route(tool_call_message('check_balance', '{}')), 'check_balance')
+        self.assertIsNone(self.orchestrator.routed_response)
+
+    def test_unknown_tool_falls_back_to_general_chat(self):
+        self.assertEqual(self.route(tool_call_message('delete_account', '{}')), 'general_chat')
+        self.assertIsNone(self.orchestrator.routed_response)
+
+
+@override_settings(DZAION_SPECULATION={**settings.DZAION_SPECULATION, 'ENABLED': True})
+class SpeculationTests(SimpleTestCase):
+    """A chamada especulativa (paga) não roda para quem não pode pagar a ação."""
+
+    def test_no_speculation_without_funds(self):
+        orchestrator = DzaionOrchestrator({'mission_type': 'REACTIVE'}, client=mock.MagicMock())
+        orchestrator.user = mock.MagicMock()
+        orchestrator.user.wallet.first.return_value = mock.MagicMock(balance=0)
+        action = mock.MagicMock(cascade_model_id=None, cost_bearer=DzaionAction.CostBearer.CONTRACTOR)
+        with mock.patch.object(orchestrator, '_get_user_actions'), \
+                mock.patch.object(orchestrator, '_use_single_call_routing', return_value=False), \
+                mock.patch('dzaion.orchestrators.SpeculationPolicy.predict_action', return_value=action), \
+                mock.patch('dzaion.orchestrators.get_executor') as get_executor:
+            orchestrator._start_speculation()
+
+        get_executor.return_value.submit.assert_not_called()
+        self.assertIsNone(orchestrator.speculation)
+        self.assertIsNone(orchestrator.dzaion_action)
+
+    def test_discarded_speculation_usage_is_logged(self):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        action, ai_model, user = mock.MagicMock(verb_code='general_chat'), mock.MagicMock(), mock.MagicMock()
+        with mock.patch('dzaion.speculation.DzaionService.log_token_usage') as log_token_usage, \
+                mock.patch('dzaion.speculation.DzaionMetrics.increment'):
+            SpeculationPolicy.discard(future, action, ai_model, user)
+            future.set_result({'usage': {'input_tokens': 120, 'output_tokens': 30}})
+
+        log_token_usage.assert_called_once_with(
+            dzaion_action=action, user=user, ai_model=ai_model, input_tokens=120, output_tokens=30,
+            tenant_context=None, is_speculative=True,
+        )
+
+    def test_cancelled_speculation_is_not_logged(self):
+        future = Future()
+        with mock.patch('dzaion.speculation.DzaionService.log_token_usage') as log_token_usage, \
+                mock.patch('dzaion.speculation.DzaionMetrics.increment'):
+            SpeculationPolicy.discard(future, mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+
+        self.assertTrue(future.cancelled())
+        log_token_usage.assert_not_called()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de URLs para o App 'dzaion'.
+
+Author: Dzaion
+Version: 0.5.0
+"""
+from django.urls import path
+from .views import (
+    WhatsAppInboundWebhookView,
+    DeliveryStatusWebhookView,
+    TenantUsageSeriesView,
+    StaffUsageSeriesView,
+    ProactiveCampaignListCreateView,
+    ProactiveCampaignRetrieveView,
+    ProactiveCampaignCancelView,
+    DzaionMetricsView,
+)
+
+# URLs de webhooks do provedor de mensagens (montadas em /webhooks/whatsapp/)
+webhook_patterns = [
+    path('', WhatsAppInboundWebhookView.as_view(), name='whatsapp-inbound-webhook'),
+    path('status/', DeliveryStatusWebhookView.as_view(), name='whatsapp-status-webhook'),
+]
+
+# URLs no contexto de um Tenant (montadas em /v1/tenants/<tenant_pk>/ai-usage/)
+tenant_patterns = [
+    path('', TenantUsageSeriesView.as_view(), name='tenant-ai-usage'),
+]
+
+# URLs da equipe (montadas em /v1/dzaion/)
+urlpatterns = [
+    path('usage/', StaffUsageSeriesView.as_view(), name='dzaion-ai-usage'),
+    path('campaigns/', ProactiveCampaignListCreateView.as_view(), name='dzaion-campaign-list-create'),
+    path('campaigns/<uuid:pk>/', ProactiveCampaignRetrieveView.as_view(), name='dzaion-campaign-detail'),
+    path('campaigns/<uuid:pk>/cancel/', ProactiveCampaignCancelView.as_view(), name='dzaion-campaign-cancel'),
+    path('metrics/', DzaionMetricsView.as_view(), name='dzaion-metrics'),
+]
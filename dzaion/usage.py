@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Consolidação (Rollup) do Consumo de Tokens do App 'dzaion'.
+
+O `TokenUsageLog` é grande e só cresce; agregá-lo a cada consulta de gastos
+fica mais caro conforme o volume. Aqui os logs são consolidados de forma
+incremental em `TokenUsageRollup` (por hora e por dia, por pagador, modelo
+e ação), a partir de uma marca d'água (`UsageRollupWatermark`). As consultas
+da API leem apenas as tabelas consolidadas.
+
+O custo vem de cada log (`TokenUsageLog.cost`, calculado na gravação), de
+modo que uma mudança de preço do modelo não reescreve o passado. Só os logs
+anteriores a esse campo usam o preço atual.
+
+Author: Dzaion
+Version: 0.2.0
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from core.utils.redis_client import get_redis_client
+from .models import AIModel, TokenUsageLog, TokenUsageRollup, UsageRollupWatermark
+
+logger = logging.getLogger('dzaion')
+
+WATERMARK_NAME = 'token_usage'
+LOCK_KEY = 'dzaion:usage_rollup:lock'
+ONE_MILLION = Decimal(1_000_000)
+
+GROUP_FIELDS = ('payer_tenant_id', 'payer_user_id', 'ai_model_id', 'dzaion_action_id')
+
+
+def estimate_cost(ai_model: AIModel, input_tokens: int, output_tokens: int) -> Decimal:
+    """Custo de uma chamada pelo preço (por 1M de tokens) atual do modelo."""
+    return (
+        input_tokens * Decimal(ai_model.input_price_per_million)
+        + output_tokens * Decimal(ai_model.output_price_per_million)
+    ) / ONE_MILLION
+
+
+def truncate_hour(value):
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def truncate_day(value):
+    return timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class TokenUsageRollupService:
+    """
+    Serviço de consolidação do consumo de tokens e de consulta das séries de gastos.
+    """
+
+    @staticmethod
+    def run(now=None) -> int:
+        """
+        Processa os logs brutos desde a marca d'água até `agora - LAG_SECONDS`.
+        Apenas uma execução por vez (trava no Redis). Retorna a quantidade de
+        linhas consolidadas (por hora) gravadas.
+        """
+        lock = get_redis_client().lock(LOCK_KEY, timeout=600, blocking=False)
+        if not lock.acquire():
+            logger.info("Consolidação de tokens já em andamento; execução ignorada.")
+            return 0
+        try:
+            return TokenUsageRollupService._run(now or timezone.now())
+        finally:
+            lock.release()
+
+    @staticmethod
+    def _run(now) -> int:
+        config = settings.DZAION_USAGE_ROLLUP
+        upper = now - timedelta(seconds=config['LAG_SECONDS'])
+
+        watermark = UsageRollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+        if watermark:
+            start = truncate_hour(watermark.processed_until)
+        else:
+            first_log_at = TokenUsageLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if first_log_at is None:
+                return 0
+            start = truncate_hour(first_log_at)
+
+        end = min(upper, start + timedelta(hours=config['MAX_WINDOW_HOURS']))
+        if end <= start:
+            return 0
+
+        # A hora (e o dia) da marca d'água são sempre recalculados por inteiro: o
+        # recálculo é idempotente e inclui os logs que chegaram depois da execução anterior.
+        with transaction.atomic():
+            written = TokenUsageRollupService.rollup_hours(start, end)
+            TokenUsageRollupService.rollup_days(truncate_day(start), end)
+            UsageRollupWatermark.objects.update_or_create(
+                name=WATERMARK_NAME, defaults={'processed_until': end}
+            )
+        logger.info(f"Consumo de tokens consolidado de {start} até {end} ({written} linhas por hora).")
+        return written
+
+    @staticmethod
+    def rollup_hours(start, end) -> int:
+        """
+        Recalcula as linhas HOUR com início em [start, end) a partir do TokenUsageLog.
+        """
+        # Preços atuais: apenas para os logs sem custo gravado.
+        prices = {
+            model_id: (input_price, output_price)
+            for model_id, input_price, output_price in AIModel.objects.values_list(
+                'id', 'input_price_per_million', 'output_price_per_million'
+            )
+        }
+        groups = (
+            TokenUsageLog.objects.filter(created_at__gte=start, created_at__lt=end)
+            .annotate(bucket=TruncHour('created_at'))
+            .values('bucket', *GROUP_FIELDS)
+            .annotate(
+                input_sum=Sum('input_tokens'), output_sum=Sum('output_tokens'), calls=Count('id'),
+                cost_sum=Sum('cost'),
+                unpriced_input=Sum('input_tokens', filter=Q(cost__isnull=True)),
+                unpriced_output=Sum('output_tokens', filter=Q(cost__isnull=True)),
+            )
+        )
+        rollups = []
+        for group in groups:
+            input_price, output_price = prices.get(group['ai_model_id'], (0, 0))
+            cost = (group['cost_sum'] or Decimal(0)) + (
+                (group['unpriced_input'] or 0) * Decimal(input_price)
+                + (group['unpriced_output'] or 0) * Decimal(output_price)
+            ) / ONE_MILLION
+            rollups.append(TokenUsageRollup(
+                granularity=TokenUsageRollup.Granularity.HOUR,
+                bucket_start=group['bucket'],
+                input_tokens=group['input_sum'],
+                output_tokens=group['output_sum'],
+                request_count=group['calls'],
+                cost=cost,
+                **{field: group[field] for field in GROUP_FIELDS},
+            ))
+
+        TokenUsageRollup.objects.filter(
+            granularity=TokenUsageRollup.Granularity.HOUR, bucket_start__gte=start, bucket_start__lt=end
+        ).delete()
+        TokenUsageRollup.objects.bulk_create(rollups, batch_size=1000)
+        return len(rollups)
+
+    @staticmethod
+    def rollup_days(start, end) -> int:
+        """
+        Recalcula as linhas DAY com início em [start, end) somando as linhas HOUR
+        (nunca relê os logs brutos).
+        """
+        groups = (
+            TokenUsageRollup.objects.filter(
+                granularity=TokenUsageRollup.Granularity.HOUR, bucket_start__gte=start, bucket_start__lt=end
+            )
+            .annotate(bucket=TruncDay('bucket_start'))
+            .values('bucket', *GROUP_FIELDS)
+            .annotate(
+                input_sum=Sum('input_tokens'), output_sum=Sum('output_tokens'),
+                calls=Sum('request_count'), cost_sum=Sum('cost'),
+            )
+        )
+        rollups = [
+            TokenUsageRollup(
+                granularity=TokenUsageRollup.Granularity.DAY,
+                bucket_start=group['bucket'],
+                input_tokens=group['input_sum'],
+                output_tokens=group['output_sum'],
+                request_count=group['calls'],
+                cost=group['cost_sum'],
+                **{field: group[field] for field in GROUP_FIELDS},
+            )
+            for group in groups
+        ]
+        TokenUsageRollup.objects.filter(
+            granularity=TokenUsageRollup.Granularity.DAY, bucket_start__gte=start, bucket_start__lt=end
+        ).delete()
+        TokenUsageRollup.objects.bulk_create(rollups, batch_size=1000)
+        return len(rollups)
+
+    # --- Consultas ---
+
+    GROUP_BY_FIELDS = {
+        'model': ['ai_model__identifier'],
+        'action': ['dzaion_action__verb_code'],
+        'model_action': ['ai_model__identifier', 'dzaion_action__verb_code'],
+        'none': [],
+    }
+
+    @staticmethod
+    def get_series(queryset, granularity: str, start=None, end=None, group_by: str = 'none') -> list[dict]:
+        """
+        Retorna a série de tokens e custo por período a partir das linhas consolidadas.
+        """
+        queryset = queryset.filter(granularity=granularity)
+        if start:
+            queryset = queryset.filter(bucket_start__gte=start)
+        if end:
+            queryset = queryset.filter(bucket_start__lt=end)
+
+        fields = TokenUsageRollupService.GROUP_BY_FIELDS[group_by]
+        rows = (
+            queryset.values('bucket_start', *fields)
+            .annotate(
+                input_tokens_sum=Sum('input_tokens'), output_tokens_sum=Sum('output_tokens'),
+                request_count_sum=Sum('request_count'), cost_sum=Sum('cost'),
+            )
+            .order_by('bucket_start', *fields)
+        )
+        return [
+            {
+                'bucket_start': row['bucket_start'],
+                'ai_model': row.get('ai_model__identifier'),
+                'dzaion_action': row.get('dzaion_action__verb_code'),
+                'input_tokens': row['input_tokens_sum'],
+                'output_tokens': row['output_tokens_sum'],
+                'total_tokens': row['input_tokens_sum'] + row['output_tokens_sum'],
+                'request_count': row['request_count_sum'],
+                'cost': row['cost_sum'],
+            }
+            for row in rows
+        ]
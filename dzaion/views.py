@@ -1,3 +1,240 @@
-from django.shortcuts import render
+# -*- coding: utf-8 -*-
+"""
+Módulo de Views para o App 'dzaion'.
 
-# Create your views here.
+Contém os endpoints de webhook usados pelo provedor de mensagens, a API
+de análise de gastos com IA, a API de campanhas proativas e as métricas
+operacionais. Os webhooks não autenticam usuários nem
+acessam o banco de dados: validam a assinatura, registram o evento no
+Redis/broker e respondem.
+
+Author: Dzaion
+Version: 0.6.0
+"""
+import json
+import logging
+
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, status, views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from accounts.permissions import IsActiveUser
+from guards.permissions import HasTenantPermission
+from products.permissions import IsAdminOrSuperuser
+from .admission import AdmissionController
+from .campaigns import CampaignService
+from .exceptions import CampaignError
+from .inbound import InboundWebhookService
+from .metrics import DzaionMetrics
+from .speculation import SpeculationPolicy
+from .models import ProactiveCampaign, TokenUsageRollup
+from .outbound import OutboundDispatchService
+from .permissions import HasValidWebhookSignature
+from .serializers import (
+    UsageSeriesQuerySerializer, StaffUsageSeriesQuerySerializer, UsageSeriesPointSerializer,
+    ProactiveCampaignSerializer, ProactiveCampaignCreateSerializer,
+)
+from .usage import TokenUsageRollupService
+
+logger = logging.getLogger('dzaion')
+
+
+class WebhookAPIView(views.APIView):
+    """
+    Base para os webhooks do provedor: sem autenticação de usuário,
+    protegidos pela assinatura HMAC do payload.
+    """
+    authentication_classes = []
+    permission_classes = [HasValidWebhookSignature]
+
+    def load_payload(self, request):
+        """Lê o JSON do corpo bruto (o mesmo usado na verificação da assinatura)."""
+        try:
+            return json.loads(request.body or b'null')
+        except ValueError:
+            return None
+
+
+@extend_schema(summary="Receber Mensagens do WhatsApp", tags=["Webhooks"])
+class WhatsAppInboundWebhookView(WebhookAPIView):
+    """
+    Recebe as mensagens dos usuários e enfileira uma missão REACTIVE para cada
+    mensagem inédita. Retentativas do provedor são deduplicadas pelo ID da mensagem.
+    """
+
+    def post(self, request, *args, **kwargs):
+        payload = self.load_payload(request)
+        if payload is None:
+            return Response({"error": "Payload inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        status_events = InboundWebhookService.extract_status_events(payload)
+        if status_events:
+            OutboundDispatchService.buffer_status_events(status_events)
+
+        messages = InboundWebhookService.extract_messages(payload)
+        try:
+            result = InboundWebhookService.enqueue_missions(messages)
+        except Exception as e:
+            logger.error(f"Falha ao enfileirar missões do webhook: {e}", exc_info=True)
+            return Response({"error": "Indisponível no momento."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response(result, status=status.HTTP_200_OK)
+
+
+@extend_schema(summary="Receber Status de Entrega do WhatsApp", tags=["Webhooks"])
+class DeliveryStatusWebhookView(WebhookAPIView):
+    """
+    Recebe os callbacks de entrega/leitura do provedor de mensagens.
+
+    Os eventos são apenas acumulados no Redis; a atualização do
+    `Message.status` acontece em lote na tarefa `flush_delivery_statuses`.
+    """
+
+    def post(self, request, *args, **kwargs):
+        payload = self.load_payload(request)
+        if isinstance(payload, dict):
+            events = payload.get('statuses') or payload.get('events') or [payload]
+        elif isinstance(payload, list):
+            events = payload
+        else:
+            return Response({"error": "Payload inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        accepted = OutboundDispatchService.buffer_status_events(events)
+        return Response({"accepted": accepted}, status=status.HTTP_200_OK)
+
+
+# --- Análise de Gastos com IA ---
+
+class UsageSeriesAPIView(generics.GenericAPIView):
+    """
+    Base das consultas de gastos: lê apenas as tabelas consolidadas
+    (TokenUsageRollup), com custo independente do volume de logs brutos.
+    """
+    serializer_class = UsageSeriesPointSerializer
+    query_serializer_class = UsageSeriesQuerySerializer
+
+    def get_queryset(self):
+        return TokenUsageRollup.objects.all()
+
+    def filter_queryset(self, queryset, params: dict):
+        if params.get('ai_model'):
+            queryset = queryset.filter(ai_model__identifier=params['ai_model'])
+        if params.get('dzaion_action'):
+            queryset = queryset.filter(dzaion_action__verb_code=params['dzaion_action'])
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        query = self.query_serializer_class(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        series = TokenUsageRollupService.get_series(
+            self.filter_queryset(self.get_queryset(), params),
+            granularity=params['granularity'],
+            start=params.get('start'),
+            end=params.get('end'),
+            group_by=params['group_by'],
+        )
+        return Response(self.get_serializer(series, many=True).data)
+
+
+@extend_schema(summary="Série de Gastos com IA de um Tenant", tags=["Dzaion (Análise de Gastos)"],
+               parameters=[UsageSeriesQuerySerializer])
+class TenantUsageSeriesView(UsageSeriesAPIView):
+    permission_classes = [IsAuthenticated, IsActiveUser, HasTenantPermission]
+    required_permission = 'dzaion.view_tokenusagerollup'
+
+    def get_queryset(self):
+        return TokenUsageRollup.objects.filter(payer_tenant_id=self.kwargs['tenant_pk'])
+
+
+@extend_schema(summary="Série de Gastos com IA (Equipe)", tags=["Dzaion (Análise de Gastos)"],
+               parameters=[StaffUsageSeriesQuerySerializer])
+class StaffUsageSeriesView(UsageSeriesAPIView):
+    permission_classes = [IsAuthenticated, IsAdminOrSuperuser]
+    query_serializer_class = StaffUsageSeriesQuerySerializer
+
+    def filter_queryset(self, queryset, params: dict):
+        queryset = super().filter_queryset(queryset, params)
+        if params.get('tenant'):
+            queryset = queryset.filter(payer_tenant_id=params['tenant'])
+        if params.get('user'):
+            queryset = queryset.filter(payer_user_id=params['user'])
+        return queryset
+
+
+# --- Campanhas Proativas ---
+
+@extend_schema(summary="Listar e Criar Campanhas Proativas", tags=["Dzaion (Campanhas)"])
+class ProactiveCampaignListCreateView(generics.ListCreateAPIView):
+    """
+    Cria uma campanha que envia uma ação (verbo) a um segmento de usuários,
+    em lotes e com taxa de envio controlada.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrSuperuser]
+    queryset = ProactiveCampaign.objects.select_related('action')
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return ProactiveCampaignCreateSerializer
+        return ProactiveCampaignSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            campaign = CampaignService.create_campaign(
+                name=data['name'],
+                action=data['action_verb'],
+                segment=data['segment'],
+                send_rate_per_minute=data['send_rate_per_minute'],
+                created_by=request.user,
+            )
+        except CampaignError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ProactiveCampaignSerializer(campaign).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(summary="Ver Progresso de uma Campanha Proativa", tags=["Dzaion (Campanhas)"])
+class ProactiveCampaignRetrieveView(generics.RetrieveAPIView):
+    serializer_class = ProactiveCampaignSerializer
+    permission_classes = [IsAuthenticated, IsAdminOrSuperuser]
+    queryset = ProactiveCampaign.objects.select_related('action')
+
+    def get_object(self):
+        return CampaignService.sync_progress(super().get_object())
+
+
+@extend_schema(summary="Cancelar uma Campanha Proativa", tags=["Dzaion (Campanhas)"])
+class ProactiveCampaignCancelView(views.APIView):
+    permission_classes = [IsAuthenticated, IsAdminOrSuperuser]
+
+    def post(self, request, *args, **kwargs):
+        campaign = get_object_or_404(ProactiveCampaign, pk=self.kwargs['pk'])
+        try:
+            campaign = CampaignService.cancel(campaign)
+        except CampaignError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ProactiveCampaignSerializer(campaign).data, status=status.HTTP_200_OK)
+
+
+# --- Métricas Operacionais ---
+
+@extend_schema(summary="Métricas de Carga e Admissão de Missões", tags=["Dzaion (Métricas)"])
+class DzaionMetricsView(views.APIView):
+    """
+    Expõe os sinais de carga atuais, as latências recentes por fase, os
+    contadores das decisões do controle de admissão e o resumo do roteamento
+    especulativo.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrSuperuser]
+
+    def get(self, request, *args, **kwargs):
+        counters = DzaionMetrics.get_counters()
+        return Response({
+            'signals': AdmissionController.get_signals(),
+            'latency': DzaionMetrics.get_latency_summary(('queue_wait', 'intent', 'llm', 'mission')),
+            'counters': counters,
+            'speculation': SpeculationPolicy.get_summary(counters),
+        }, status=status.HTTP_200_OK)
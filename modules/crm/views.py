@@ -6,7 +6,7 @@ Contém os endpoints da API para o gerenciamento de Contatos,
 incluindo a lógica inteligente de sugestão de vínculo com Usuários.
 
 Author: Dzaion
-Version: 0.1.0
+Version: 0.2.0
 """
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
@@ -16,13 +16,13 @@ from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema
 
 from accounts.models import User
+from guards.mixins import TenantContextMixin
 from guards.permissions import HasTenantPermission
-from tenants.models import Tenant
 from .models import Contact
 from .serializers import ContactSerializer, ContactCreateSerializer, LinkUserToContactSerializer
 
 @extend_schema(summary="Listar e Criar Contatos de um Tenant", tags=["CRM"])
-class ContactListCreateAPIView(generics.ListCreateAPIView):
+class ContactListCreateAPIView(TenantContextMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, HasTenantPermission]
     required_permission = 'crm.add_contact'
 
@@ -35,8 +35,7 @@ class ContactListCreateAPIView(generics.ListCreateAPIView):
         return Contact.objects.filter(tenant_id=self.kwargs['tenant_pk'])
 
     def perform_create(self, serializer):
-        tenant = get_object_or_404(Tenant, pk=self.kwargs['tenant_pk'])
-        return serializer.save(tenant=tenant)
+        return serializer.save(tenant=self.tenant)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -154,19 +154,21 @@ CORS_ALLOWED_ORIGINS = [
 # Simple JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.jwt.ClaimsJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.ClaimsTokenRefreshSerializer",
 }
 
 # DZAION-AUTH: Configurações para dj-rest-auth e allauth
 REST_AUTH = {
     'USE_JWT': True,
     'JWT_AUTH_HTTPONLY': False, # Permite que o frontend acesse o token
+    'JWT_TOKEN_CLAIMS_SERIALIZER': 'accounts.serializers.CustomTokenObtainPairSerializer',
 }
 
 # Sites Framework
@@ -205,6 +207,64 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'America/Sao_Paulo'
 
+# Filas dedicadas: o envio de mensagens roda em workers próprios
+# (ex: celery -A setup worker -Q dzaion_dispatch).
+CELERY_TASK_ROUTES = {
+    'dzaion.dispatch_outbound_message': {'queue': 'dzaion_dispatch'},
+    'dzaion.execute_mission_tool': {'queue': 'dzaion_tools'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'dzaion-flush-delivery-statuses': {
+        'task': 'dzaion.flush_delivery_statuses',
+        'schedule': 5.0,
+    },
+    'dzaion-flush-conversation-state': {
+        'task': 'dzaion.flush_conversation_state',
+        'schedule': 2.0,
+    },
+    'dzaion-purge-mission-checkpoints': {
+        'task': 'dzaion.purge_mission_checkpoints',
+        'schedule': 24 * 3600.0,
+    },
+    'dzaion-rollup-token-usage': {
+        'task': 'dzaion.rollup_token_usage',
+        'schedule': 300.0,
+    },
+    'dzaion-schedule-missions': {
+        'task': 'dzaion.schedule_missions',
+        'schedule': 1.0,
+    },
+}
+
+# Redis para estruturas de dados da aplicação (limites de taxa, buffers, etc.)
+REDIS_URL = config('REDIS_URL', default='redis://127.0.0.1:6379/1')
+
+# Cache do Django, compartilhado por todos os processos (no mesmo Redis, com prefixo próprio)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default=REDIS_URL),
+        'KEY_PREFIX': 'cache',
+    }
+}
+
+# Conjuntos de permissões compilados por (usuário, tenant) no GuardService
+GUARDS_PERMISSION_CACHE = {
+    'TIMEOUT': 3600,            # segundos no cache do Django (entradas de versões antigas expiram sozinhas)
+    'LOCAL_MAXSIZE': 4096,      # entradas no LRU local de cada processo
+}
+
+# Tabela materializada de permissões efetivas (guards.EffectivePermission)
+GUARDS_EFFECTIVE_PERMISSIONS = {
+    'ASYNC_THRESHOLD': 500,     # acima destes pares (usuário, tenant), o recálculo sai do sinal para uma tarefa
+    'CHUNK_SIZE': 500,          # pares por transação na tarefa
+}
+
+# Perfil completo do usuário (/me e login) montado pelo ProfileAssembler
+ACCOUNTS_PROFILE_CACHE = {
+    'TIMEOUT': 3600,            # segundos no cache do Django
+}
+
 # LOGGING DE ERROS
 LOGGING = {
     'version': 1,
@@ -307,8 +367,161 @@ DEFAULT_FROM_EMAIL = 'Dzaion <noreply@dzaion.com>'
 # Chave API da OpenAI
 OPENAI_API_KEY = config('OPENAI_API_KEY')
 
-# Serviço de Mensagem Whatsapp
-MESSAGING_PROVIDER = 'whatsgw'
+# Serviço de Mensagem Whatsapp ('stub' usa o provedor local, sem rede)
+MESSAGING_PROVIDER = config('MESSAGING_PROVIDER', default='whatsgw')
+
+# Webhook de entrada (inbound) do WhatsApp
+WHATSAPP_WEBHOOK_SECRET = config('WHATSAPP_WEBHOOK_SECRET', default='')
+DZAION_INBOUND = {
+    'SIGNATURE_HEADER': 'X-Hub-Signature-256',
+    'DEDUP_TTL': 60 * 60 * 24,  # segundos em que um ID de mensagem é lembrado
+}
+
+# Ferramentas (tool calling): executadas em tarefas próprias, com a missão retomada depois
+DZAION_TOOLS = {
+    'RUN_AS_TASKS': config('DZAION_TOOLS_RUN_AS_TASKS', default=False, cast=bool),
+}
+
+# Escalonador justo das missões: sub-filas por pagador no Redis (Deficit Round Robin)
+DZAION_SCHEDULER = {
+    'ENABLED': config('DZAION_SCHEDULER_ENABLED', default=False, cast=bool),
+    'MAX_INFLIGHT': config('DZAION_SCHEDULER_MAX_INFLIGHT', default=32, cast=int),  # ~concorrência total dos workers de missão
+    'MAX_PAYER_SHARE': 0.5,     # fatia máxima da capacidade ocupada por um único pagador
+    'QUANTUM': 1,               # missões por rodada para peso 1
+    'DEFAULT_WEIGHT': 1,        # pagadores ainda sem perfil conhecido
+    'CAMPAIGN_WEIGHT': 1,       # campanhas proativas
+    'TIER_WEIGHTS': {'priority': 4, 'default': 2, 'auto': 2, 'flex': 1},
+    'LEASE_SECONDS': 600,       # concessões não devolvidas (worker morto) expiram
+}
+
+# Controle de admissão das missões (degradação sob fila/latência alta)
+DZAION_ADMISSION = {
+    'ENABLED': config('DZAION_ADMISSION_ENABLED', default=False, cast=bool),
+    'REACTIVE_QUEUE': 'celery',
+    'PROACTIVE_QUEUE': 'dzaion_proactive',
+    'LATENCY_WINDOW': 200,          # amostras recentes por fase
+    'SIGNALS_CACHE_SECONDS': 5,     # cache dos sinais por worker
+    'PROACTIVE_DEFER': {'QUEUE_DEPTH': 200, 'LLM_P90_SECONDS': 20},
+    'PROACTIVE_SHED': {'QUEUE_DEPTH': 1000, 'LLM_P90_SECONDS': 60},
+    'REACTIVE_FALLBACK': {'QUEUE_DEPTH': 300, 'LLM_P90_SECONDS': 30},
+    'REACTIVE_ACKNOWLEDGE': {'QUEUE_WAIT_SECONDS': 15, 'LLM_P90_SECONDS': 20},
+    'FALLBACK_MODEL': config('DZAION_FALLBACK_MODEL', default=''),
+    'DEFER_SECONDS': 120,
+    'MAX_DEFERRALS': 5,
+    'ACKNOWLEDGEMENT_TEXT': 'Recebi sua mensagem! Estou processando e já te respondo. ⏳',
+}
+
+# Campanhas proativas (envio em massa em lotes, na fila dedicada `dzaion_proactive`)
+DZAION_CAMPAIGNS = {
+    'QUEUE': 'dzaion_proactive',
+    'CHUNK_SIZE': 100,                  # missões publicadas por lote
+    'DEFAULT_SEND_RATE': 600,           # missões por minuto
+    'SHARED_CONTEXT_TTL': 300,          # segundos de cache, por worker, dos dados comuns da campanha
+    'COMPLETION_POLL_INTERVAL': 30,     # segundos entre verificações após o último lote
+    'COMPLETION_TIMEOUT': 6 * 3600,     # prazo máximo de acompanhamento da campanha
+}
+
+# Cascata de modelos: padrões das checagens (sobrescritos por DzaionAction.cascade_checks)
+DZAION_CASCADE = {
+    'VALIDATE_TOOL_ARGUMENTS': True,
+    'CONFIDENCE_MARKER': '[ESCALAR]',
+    'REFUSAL_PATTERNS': [
+        r'n[ãa]o (posso|consigo) (ajudar|fazer|realizar)',
+        r'n[ãa]o tenho (como|permiss[ãa]o)',
+        r"I (can(no|')t|am unable to) help",
+    ],
+}
+
+# Consolidação (rollup) do consumo de tokens para a API de análise de gastos
+DZAION_USAGE_ROLLUP = {
+    'LAG_SECONDS': 120,        # margem para transações ainda não confirmadas
+    'MAX_WINDOW_HOURS': 24,    # janela máxima de logs brutos processada por execução
+}
+
+# Memória de longo prazo (índice BM25 sobre as mensagens de cada usuário)
+DZAION_MEMORY = {
+    'TOP_K': 3,                # trechos injetados no prompt
+    'MAX_CANDIDATES': 500,     # mensagens mais recentes avaliadas por consulta
+    'SNIPPET_LENGTH': 300,     # caracteres por trecho
+}
+
+# Roteamento especulativo: 1ª chamada do modelo principal em paralelo com o roteador
+DZAION_SPECULATION = {
+    'ENABLED': config('DZAION_SPECULATION_ENABLED', default=False, cast=bool),
+    'HISTORY_SIZE': 10,         # processos recentes do usuário considerados na previsão
+    'MIN_HISTORY': 3,           # histórico mínimo para especular
+    'MIN_CONFIDENCE': 0.6,      # fatia mínima do histórico ocupada pela ação prevista
+    'MAX_WORKERS': 8,           # threads por worker para chamadas especulativas
+    'RESULT_TIMEOUT': 120,      # segundos aguardando a chamada especulativa confirmada
+}
+
+# Roteamento das missões reativas
+DZAION_ROUTING = {
+    # Até este tamanho de cardápio, as ações vão como ferramentas numa chamada única (sem roteador); 0 (padrão) desliga.
+    'SINGLE_CALL_MAX_ACTIONS': config('DZAION_SINGLE_CALL_MAX_ACTIONS', default=0, cast=int),
+    'SINGLE_CALL_MODEL': config('DZAION_SINGLE_CALL_MODEL', default=''),  # modelo sem `model_for_messaging` (vazio: o primeiro)
+}
+
+# API de Responses: estado da conversa guardado na OpenAI (previous_response_id)
+DZAION_RESPONSES_API = {
+    'ENABLED': config('DZAION_RESPONSES_API_ENABLED', default=False, cast=bool),
+}
+
+# Classificador local de intenções (pré-etapa do Roteador Universal)
+DZAION_INTENT_CLASSIFIER = {
+    'ENABLED': config('DZAION_INTENT_CLASSIFIER_ENABLED', default=True, cast=bool),
+    'MODEL_PATH': config('DZAION_INTENT_CLASSIFIER_PATH', default=os.path.join(BASE_DIR, 'var', 'intent_classifier.npz')),
+    'THRESHOLD': 0.9,           # confiança (calibrada) mínima para decidir sem o LLM
+    'MIN_COVERAGE': 0.6,        # fração mínima de n-gramas conhecidos; abaixo disso a mensagem é "desconhecida"
+    'NGRAM_RANGE': (2, 4),      # tamanhos dos n-gramas de caracteres
+    'N_FEATURES': 2 ** 16,      # baldes do hashing
+    'ALPHA': 0.1,               # suavização de Laplace
+    'MIN_EXAMPLES': 20,         # exemplos mínimos para uma ação entrar no modelo
+}
+
+# Prazos de ponta a ponta das missões (segundos desde o enfileiramento), por tipo e service_tier
+DZAION_DEADLINES = {
+    'ENABLED': config('DZAION_DEADLINES_ENABLED', default=False, cast=bool),
+    'BUDGETS': {
+        'REACTIVE': {'priority': 30, 'default': 45, 'auto': 45, 'flex': 90},
+        'PROACTIVE': {'priority': 120, 'default': 180, 'auto': 180, 'flex': 600},
+    },
+    'LOW_BUDGET_SECONDS': 12,       # abaixo disso: sem cascata/especulação e com modelo de fallback
+    'FALLBACK_MODEL': config('DZAION_DEADLINE_FALLBACK_MODEL', default=''),
+    'MIN_PHASE_TIMEOUT': 3,         # timeout mínimo de uma chamada
+    'ROUTER_TIMEOUT': 10,           # teto da chamada do roteador
+    'TOOL_TIMEOUT': 30,             # teto por ferramenta (tarefa `execute_mission_tool`)
+    'DISPATCH_TIMEOUT': 30,         # teto da tarefa de envio
+    'DISPATCH_MIN_TIMEOUT': 10,     # a resposta é enviada mesmo com o prazo esgotado
+    'TIME_LIMIT_GRACE': 5,          # folga entre o soft_time_limit e o time_limit das tarefas
+}
+
+# Checkpoints das fases de cada missão (retomada sem repetir chamadas pagas)
+DZAION_CHECKPOINTS = {
+    'RETENTION_DAYS': 7,
+}
+
+# Estado quente das conversas no Redis, persistido no banco em lote (write-behind)
+DZAION_CONVERSATION_STATE = {
+    'ENABLED': config('DZAION_CONVERSATION_STATE_ENABLED', default=False, cast=bool),
+    'WINDOW_SIZE': 40,              # mensagens mantidas na janela de histórico
+    'MAX_TTL_SECONDS': 24 * 3600,   # teto do cache para processos sem expiração
+    'TOMBSTONE_SECONDS': 300,       # marca de conversa encerrada (até o flush chegar ao banco)
+    'FLUSH_BATCH_SIZE': 500,
+}
+
+# Pipeline de envio (outbound) de mensagens
+DZAION_DISPATCH = {
+    'MAX_MESSAGE_LENGTH': 4096,
+    'RECIPIENT_RATE_LIMIT': (6, 60),   # (mensagens, janela em segundos) por destinatário
+    'ACCOUNT_RATE_LIMIT': (80, 1),     # (mensagens, janela em segundos) por conta do provedor
+    'MAX_RETRIES': 5,
+    'RETRY_BACKOFF_BASE': 2,
+    'RETRY_BACKOFF_MAX': 300,
+    'STATUS_BATCH_SIZE': 500,
+    # Execuções do flush de status em que um callback aguarda a mensagem chegar ao banco.
+    'STATUS_MAX_ATTEMPTS': 12,
+}
 
 # Documentação
 SPECTACULAR_SETTINGS = {
@@ -6,6 +6,7 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, Spec
 
 # DZAION-AUTH: Importação da nossa nova view customizada
 from accounts.views import GoogleLoginView
+from dzaion.urls import webhook_patterns as dzaion_webhook_patterns, tenant_patterns as dzaion_tenant_patterns
 
 # URLS V1
 url_v1_patterns = [    # DZAION-AUTH: Rota de login do Google agora usa nossa view customizada
@@ -18,6 +19,8 @@ url_v1_patterns = [    # DZAION-AUTH: Rota de login do Google agora usa nossa vi
     path('locations/', include('locations.urls')),
     path('contacts/', include('contacts.urls')),
     path('tenants/<uuid:tenant_pk>/subscriptions/', include('entitlements.urls')),
+    path('tenants/<uuid:tenant_pk>/ai-usage/', include(dzaion_tenant_patterns)),
+    path('dzaion/', include('dzaion.urls')),
     # URLS dos módulos
     path('crm/', include('crm.urls')),
 ]
@@ -25,6 +28,7 @@ url_v1_patterns = [    # DZAION-AUTH: Rota de login do Google agora usa nossa vi
 # URLS webhooks
 url_webhooks_patterns = [
     # path('whatsapp/', include('dispatchers.urls')),
+    path('whatsapp/', include(dzaion_webhook_patterns)),
 ]
 
 urlpatterns = [